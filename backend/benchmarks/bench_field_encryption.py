@@ -0,0 +1,99 @@
+"""
+Benchmark: costo de lectura del cifrado de campos
+=================================================
+Mide lo que el cifrado agrega a las lecturas (services/field_encryption):
+
+- Descifrado de un campo de ~0.5 KB con la DEK en caché, contra el
+  presupuesto FIELD_BUDGET_US.
+- decrypt_rows sobre un lote de consultas (3 campos cifrados por fila),
+  como en los listados y la exportación.
+
+No necesita MongoDB: la DEK se genera en memoria y la clave maestra en un
+directorio temporal.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_field_encryption [--rows 1000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from beanie import PydanticObjectId
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from models.models import ConsultaRecord
+from services import field_encryption
+from services.field_encryption import FieldKeyring, decrypt_rows, encrypt_fields, field_context
+
+# Presupuesto de lectura por campo cifrado (microsegundos)
+FIELD_BUDGET_US = 25
+FIELD_SIZE = 512
+KEY_ID = "benchmark"
+
+
+def bench_keyring(directory: str) -> FieldKeyring:
+    """Llavero con una DEK activa generada en memoria (sin `data_keys`)."""
+    keyring = FieldKeyring(os.path.join(directory, "master.key"), ttl_seconds=300)
+    keyring._wrapped = {KEY_ID: keyring._wrap(KEY_ID, AESGCM.generate_key(bit_length=256))}
+    keyring._active_key_id = KEY_ID
+    return keyring
+
+
+def consulta_rows(count: int):
+    """Filas crudas de consultas con los campos cifrados como en MongoDB."""
+    text = "x" * FIELD_SIZE
+    rows = []
+    for _ in range(count):
+        row = {"_id": PydanticObjectId(), "diagnostico": text, "tratamiento": text, "notasMedico": text}
+        rows.append(encrypt_fields(row, ConsultaRecord))
+    return rows
+
+
+def per_field_us(keyring: FieldKeyring, iterations: int) -> float:
+    context = field_context(ConsultaRecord.Settings.name, "diagnostico", PydanticObjectId())
+    value = keyring.encrypt("x" * FIELD_SIZE, context)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        keyring.decrypt(value, context)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def batch_ms(rows_count: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        # decrypt_rows descifra en el lugar: un lote nuevo por repetición
+        rows = consulta_rows(rows_count)
+        started = time.perf_counter()
+        await decrypt_rows(rows, ConsultaRecord)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de lectura del cifrado de campos")
+    parser.add_argument("--rows", type=int, default=1000, help="Filas por lote")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se informa la mediana)")
+    parser.add_argument("--iterations", type=int, default=20000, help="Descifrados para la medición por campo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        keyring = bench_keyring(directory)
+        # encrypt_fields/decrypt_rows usan el llavero global
+        field_encryption.field_keyring = keyring
+
+        field_us = statistics.median(per_field_us(keyring, args.iterations) for _ in range(args.repeat))
+        lote_ms = asyncio.run(batch_ms(args.rows, args.repeat))
+
+    fields = args.rows * len(field_encryption.encrypted_paths(ConsultaRecord))
+    print(f"Descifrado por campo ({FIELD_SIZE} B): {field_us:.1f} µs (presupuesto {FIELD_BUDGET_US} µs)")
+    print(f"decrypt_rows, {args.rows} consultas ({fields} campos): {lote_ms:.1f} ms ({lote_ms * 1000 / fields:.1f} µs por campo)")
+    if field_us > FIELD_BUDGET_US:
+        raise SystemExit(f"Fuera de presupuesto: {field_us:.1f} µs > {FIELD_BUDGET_US} µs por campo")
+
+
+if __name__ == "__main__":
+    main()
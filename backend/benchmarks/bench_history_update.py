@@ -0,0 +1,88 @@
+"""
+Benchmark: escritura de secciones del historial
+===============================================
+Compara la latencia de editar una sección (alergias) de historiales
+grandes, con consultas embebidas anteriores a la colección `consultas`:
+
+- Guardado completo: leer el PatientHistory, modificarlo, recalcular el
+  hash y save() del documento entero (ruta anterior del PUT).
+- Actualización atómica: update_history_fields (lee solo los campos
+  hasheados y escribe un $set condicionado a la revisión).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_history_update [--consultas 0 500 2000] [--repeat 20] [--mongo-uri URI]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from typing import List
+
+from benchmarks.common import add_mongo_argument, bench_database
+from models.models import Consulta, ContactoEmergencia, MedicoAsignado, PatientHistory, Vacuna
+from services.integrity import integrity_service, update_history_fields
+
+TEXT = "Texto clínico de la consulta " * 8
+
+
+async def insert_history(patient_id: str, consultas: int) -> None:
+    history = PatientHistory(
+        patient_id=patient_id,
+        tipoSangre="O+",
+        alergias=["Penicilina"],
+        medicoAsignado=MedicoAsignado(medicoId="medico-bench", nombre="Médico", especialidad="General", telefono="N/A"),
+        contactoEmergencia=ContactoEmergencia(nombre="Contacto", relacion="Familiar", telefono="N/A"),
+        consultas=[
+            Consulta(id=f"cons_{n}", fecha=date(2020, 1, 1), motivo="Control", diagnostico=TEXT, tratamiento=TEXT, notasMedico=TEXT)
+            for n in range(consultas)
+        ],
+        vacunas=[Vacuna(nombre="Influenza", fecha=date(2025, 4, 1))]
+    )
+    history.integrity_hash = integrity_service.calculate_hash(history)
+    await history.insert()
+
+
+async def full_save(patient_id: str, alergias: List[str]) -> None:
+    history = await PatientHistory.find_one({"patient_id": patient_id})
+    history.alergias = alergias
+    history.integrity_hash = integrity_service.calculate_hash(history)
+    await history.save()
+
+
+async def atomic_update(patient_id: str, alergias: List[str]) -> None:
+    if await update_history_fields(patient_id, {"alergias": alergias}) is None:
+        raise RuntimeError(f"update_history_fields failed for {patient_id}")
+
+
+async def median_ms(write, patient_id: str, repeat: int) -> float:
+    timings = []
+    for n in range(repeat):
+        started = time.perf_counter()
+        await write(patient_id, ["Penicilina", f"Alergia {n}"])
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def run(sizes: List[int], repeat: int, uri) -> None:
+    async with bench_database(uri):
+        for size in sizes:
+            await insert_history(f"full-{size}", size)
+            await insert_history(f"atomic-{size}", size)
+            before = await median_ms(full_save, f"full-{size}", repeat)
+            after = await median_ms(atomic_update, f"atomic-{size}", repeat)
+            print(f"{size:>5} consultas embebidas: save() {before:8.2f} ms | atómica {after:8.2f} ms | x{before / after:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escritura de secciones del historial")
+    parser.add_argument("--consultas", type=int, nargs="+", default=[0, 500, 2000], help="Consultas embebidas por historial")
+    parser.add_argument("--repeat", type=int, default=20, help="Escrituras por medición (se informa la mediana)")
+    add_mongo_argument(parser)
+    args = parser.parse_args()
+    asyncio.run(run(args.consultas, args.repeat, args.mongo_uri))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: serialización de listados de citas
+=============================================
+Compara, para listados de 1k a 10k citas, las dos rutas de
+services/serialization:
+
+- Anterior: documentos Beanie -> AppointmentResponse campo a campo ->
+  validación y serialización de FastAPI contra response_model -> JSON.
+- Actual: consulta proyectada a dicts crudos -> model_list_response
+  (un TypeAdapter precompilado valida y serializa directo a bytes).
+
+Ambas rutas incluyen la consulta a MongoDB y producen el mismo JSON.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization [--rows 1000 10000] [--repeat 5] [--mongo-uri URI]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from benchmarks.common import add_mongo_argument, bench_database
+from models.models import Appointment
+from routers.appointments import APPOINTMENT_LIST_PROJECTION
+from schemas.appointment_schemas import AppointmentResponse
+from services.db import get_core_db
+from services.scheduling import slot_cells
+from services.serialization import model_list_response
+
+DOCTOR_ID = "medico-bench"
+RESPONSE_FIELD = create_model_field("response", List[AppointmentResponse], mode="serialization")
+
+
+async def insert_appointments(count: int) -> None:
+    start = datetime(2026, 1, 5, 8, 0)
+    await get_core_db()[Appointment.Settings.name].insert_many([
+        {
+            "patient_id": f"paciente-{n}",
+            "patientName": f"Paciente {n}",
+            "doctor_id": DOCTOR_ID,
+            "doctorName": "Médico",
+            "fecha": start + timedelta(minutes=30 * n),
+            "motivo": "Control",
+            "estado": "Programada",
+            "slotCells": slot_cells(start + timedelta(minutes=30 * n), 30),
+            "created_by": "secretario-bench",
+            "created_at": start,
+            "updated_at": start
+        }
+        for n in range(count)
+    ])
+
+
+async def documents_path(limit: int) -> bytes:
+    appointments = await Appointment.find({"doctor_id": DOCTOR_ID}).sort([("fecha", 1)]).limit(limit).to_list()
+    content = [
+        AppointmentResponse(
+            id=str(apt.id),
+            patient_id=apt.patient_id,
+            patientName=apt.patientName,
+            doctor_id=apt.doctor_id,
+            doctorName=apt.doctorName,
+            fecha=apt.fecha,
+            motivo=apt.motivo,
+            estado=apt.estado,
+            notas=apt.notas,
+            created_at=apt.created_at,
+            updated_at=apt.updated_at
+        )
+        for apt in appointments
+    ]
+    return JSONResponse(await serialize_response(field=RESPONSE_FIELD, response_content=content)).body
+
+
+async def raw_path(limit: int) -> bytes:
+    rows = await get_core_db()[Appointment.Settings.name].find(
+        {"doctor_id": DOCTOR_ID}, APPOINTMENT_LIST_PROJECTION
+    ).sort([("fecha", 1)]).limit(limit).to_list(length=None)
+    return model_list_response(AppointmentResponse, rows).body
+
+
+async def median_ms(path, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await path(limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def run(sizes: List[int], repeat: int, uri) -> None:
+    async with bench_database(uri):
+        await insert_appointments(max(sizes))
+        for size in sizes:
+            assert json.loads(await documents_path(size)) == json.loads(await raw_path(size))
+            before = await median_ms(documents_path, size, repeat)
+            after = await median_ms(raw_path, size, repeat)
+            print(f"{size:>6} citas: anterior {before:8.1f} ms | actual {after:8.1f} ms | x{before / after:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialización de listados de citas")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Tamaños de listado")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se informa la mediana)")
+    add_mongo_argument(parser)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat, args.mongo_uri))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Base de datos de los benchmarks
+===============================
+Con --mongo-uri (o MONGODB_BENCH_URI) los benchmarks corren contra un
+MongoDB real, en una base temporal que se borra al terminar: son las
+cifras que valen. Sin URI se usa mongomock (requirements-dev.txt) con la
+fachada asíncrona de testing/fake_mongo.py, útil para comprobar que el script
+corre; esos tiempos no incluyen la red ni el servidor.
+"""
+
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from models.models import Appointment, ConsultaRecord, PatientHistory
+from services import db
+
+MONGODB_BENCH_URI = os.getenv("MONGODB_BENCH_URI")
+
+BENCH_MODELS = [PatientHistory, ConsultaRecord, Appointment]
+
+
+def add_mongo_argument(parser) -> None:
+    parser.add_argument(
+        "--mongo-uri",
+        default=MONGODB_BENCH_URI,
+        help="MongoDB para la base temporal (por defecto MONGODB_BENCH_URI; sin URI, mongomock)"
+    )
+
+
+@asynccontextmanager
+async def bench_database(uri: Optional[str]):
+    """Base temporal con los modelos inicializados; las bases de la aplicación apuntan a ella."""
+    client = None
+    if uri:
+        client = AsyncIOMotorClient(uri)
+        database = client[f"sirona_bench_{uuid.uuid4().hex[:12]}"]
+    else:
+        from testing.fake_mongo import fake_database
+        database = fake_database("sirona_bench")
+        print("Sin --mongo-uri: mongomock (los tiempos no incluyen red ni servidor)")
+
+    await init_beanie(database=database, document_models=BENCH_MODELS)
+    db.db_auth = db.db_core = db.db_logs = database
+    try:
+        yield database
+    finally:
+        if client is not None:
+            await client.drop_database(database.name)
+            client.close()
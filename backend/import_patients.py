@@ -0,0 +1,105 @@
+"""
+Script de importación masiva de pacientes
+
+Uso:
+    python import_patients.py ARCHIVO [--format csv|ndjson] [--dry-run]
+
+Importa pacientes desde un CSV (con encabezado, mismas columnas que
+/register-patient) o un NDJSON (un objeto por línea). Cada fila se valida
+como en el alta individual; las filas con error se listan con su número
+de línea y el resto se crea con su historial inicial. Al final se envían
+los emails con las contraseñas temporales.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from services.db import init_db, close_db
+from services.patient_import import parse_patient_rows, import_patients, send_import_credentials, IMPORT_FORMATS
+
+
+async def run_import(path: str, file_format: str, dry_run: bool):
+    """
+    Importa los pacientes del archivo
+    """
+    print("=" * 60)
+    print("IMPORTACIÓN MASIVA DE PACIENTES - SIRONA")
+    print("=" * 60)
+
+    with open(path, "rb") as f:
+        rows, parse_errors = parse_patient_rows(f.read(), file_format)
+    print(f"Filas leídas: {len(rows) + len(parse_errors)}")
+
+    await init_db()
+
+    try:
+        started = time.perf_counter()
+        report, credentials = await import_patients(
+            rows,
+            registered_by_id=None,
+            registered_by_email="import_patients.py",
+            ip_address="cli",
+            user_agent="import_patients",
+            dry_run=dry_run
+        )
+        errors = sorted(parse_errors + report["errors"], key=lambda e: e["row"])
+        elapsed = time.perf_counter() - started
+
+        email_failures = []
+        if credentials:
+            print(f"Enviando {len(credentials)} emails de credenciales...")
+            results = await send_import_credentials(credentials, "cli", "import_patients")
+            email_failures = [(email, error) for email, error in results if error]
+
+        print()
+        print("=" * 60)
+        print("✅ VALIDACIÓN COMPLETADA (dry-run)" if dry_run else "✅ IMPORTACIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"Pacientes creados: {report['created']}")
+        print(f"Filas con error: {len(errors)}")
+        print(f"Tiempo: {elapsed:.2f}s")
+
+        if errors:
+            print()
+            print("Errores por fila:")
+            for error in errors:
+                who = error.get("email") or error.get("cedula") or ""
+                print(f"  línea {error['row']}: {who} - {error['error']}")
+
+        if email_failures:
+            print()
+            print(f"⚠️  {len(email_failures)} emails no se pudieron enviar (ver auditoría: email_send_failed)")
+            for email, error in email_failures:
+                print(f"  {email}: {error}")
+        print("=" * 60)
+    finally:
+        await close_db()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description="Importar pacientes desde CSV o NDJSON")
+    parser.add_argument("file", help="Archivo CSV o NDJSON")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Formato (por defecto según extensión)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo validar filas y duplicados")
+    args = parser.parse_args()
+
+    file_format = args.format
+    if not file_format:
+        extension = os.path.splitext(args.file)[1].lower()
+        file_format = "csv" if extension == ".csv" else "ndjson"
+
+    try:
+        asyncio.run(run_import(args.file, file_format, args.dry_run))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Operación cancelada por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error inesperado: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ import os
 
 import uvicorn
 from services.db import init_db, close_db
-from routers import auth, appointments, patients, admin
+from routers import auth, appointments, patients, admin, worklists, clinical_records, exports
+from services.exports import export_manager
 from middleware.rate_limiter import RateLimitMiddleware
 from middleware.cors_handler import CustomCORSMiddleware
 from uvicorn import *
@@ -21,6 +22,7 @@ async def lifespan(app: FastAPI):
     await init_db()
     yield
     # Shutdown
+    export_manager.shutdown()
     await close_db()
 
 
@@ -55,5 +57,8 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(appointments.router, prefix="/api", tags=["Appointments"])
 app.include_router(patients.router, prefix="/api/paciente", tags=["Patients"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(worklists.router, prefix="/api/worklists", tags=["Worklists"])
+app.include_router(clinical_records.router, prefix="/api/registros-clinicos", tags=["Clinical Records"])
+app.include_router(exports.router, prefix="/api/exports", tags=["Exports"])
 
 uvicorn.run(app, host="0.0.0.0", port=8000, reload=False)
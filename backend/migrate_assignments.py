@@ -0,0 +1,114 @@
+"""
+Script de migración: índice de asignación médico-paciente
+
+Uso:
+    python migrate_assignments.py [--dry-run]
+
+Construye la colección `doctor_patient_assignments` a partir de los
+historiales con médico asignado (medicoAsignado.medicoId) y de las citas
+existentes, y desmarca las asignaciones que ya no respalda ningún
+historial. Es idempotente y puede re-ejecutarse sin duplicar datos.
+
+La API no sincroniza el índice al arrancar: mientras falte la asignación
+de un paciente, la autorización la lee del historial. Ejecutar este
+script antes de desplegar (crea el índice único de un médico asignado por
+paciente) y si se editan historiales fuera de la API.
+"""
+
+import argparse
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from models.models import PatientHistory, Appointment, DoctorPatientAssignment
+from services.db import init_db, close_db, MONGO_URI_CORE, DB_NAME_CORE
+from services.assignments import rebuild_assignments
+
+
+async def clear_duplicate_assignments(dry_run: bool) -> int:
+    """
+    Desmarca los pacientes con más de un médico asignado=True (asignaciones
+    concurrentes anteriores al índice único), para que init_db pueda crear
+    el índice. La sincronización vuelve a marcar el médico del historial.
+    """
+    client = AsyncIOMotorClient(MONGO_URI_CORE)
+    try:
+        collection = client[DB_NAME_CORE][DoctorPatientAssignment.Settings.name]
+        duplicated = await collection.aggregate([
+            {"$match": {"asignado": True}},
+            {"$group": {"_id": "$patient_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]).to_list(length=None)
+        patient_ids = [row["_id"] for row in duplicated]
+        if patient_ids and not dry_run:
+            await collection.update_many(
+                {"patient_id": {"$in": patient_ids}, "asignado": True},
+                {"$set": {"asignado": False}}
+            )
+        return len(patient_ids)
+    finally:
+        client.close()
+
+
+async def migrate_assignments(dry_run: bool):
+    """
+    Reconstruye el índice de asignaciones
+    """
+    print("=" * 60)
+    print("MIGRACIÓN DE ASIGNACIONES MÉDICO-PACIENTE - SIRONA")
+    print("=" * 60)
+
+    duplicated = await clear_duplicate_assignments(dry_run)
+    print(f"Pacientes con más de un médico asignado en el índice: {duplicated}")
+
+    await init_db()
+
+    try:
+        assigned = await PatientHistory.find({"medicoAsignado.medicoId": {"$nin": [None, ""]}}).count()
+        appointments = await Appointment.find({}).count()
+        existing = await DoctorPatientAssignment.find({}).count()
+        print(f"Historiales con médico asignado: {assigned}")
+        print(f"Citas: {appointments}")
+        print(f"Pares ya indexados: {existing}")
+
+        if dry_run:
+            print("Modo dry-run: no se escribe nada")
+            return
+
+        started = time.perf_counter()
+        result = await rebuild_assignments()
+        elapsed = time.perf_counter() - started
+
+        print()
+        print("=" * 60)
+        print("✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"Asignaciones de historiales creadas/actualizadas: {result['historiales']}")
+        print(f"Asignaciones obsoletas desmarcadas: {result['obsoletas']}")
+        print(f"Pares de citas creados: {result['citas']}")
+        print(f"Pares indexados: {await DoctorPatientAssignment.find({}).count()}")
+        print(f"Tiempo: {elapsed:.2f}s")
+        print("=" * 60)
+    finally:
+        await close_db()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description="Construir el índice de asignación médico-paciente")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar historiales, citas y pares")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(migrate_assignments(args.dry_run))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Operación cancelada por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error inesperado: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Script de migración: consultas embebidas -> colección `consultas`
+
+Uso:
+    python migrate_consultas.py [--dry-run] [--batch-size N]
+
+Recorre los historiales que aún tienen consultas embebidas en
+PatientHistory.consultas y las mueve a documentos ConsultaRecord.
+La migración es idempotente y puede re-ejecutarse sin duplicar datos.
+Los historiales con discrepancia de hash de integridad no se tocan.
+
+Los historiales que no se migren con este script se migran solos la
+próxima vez que se les agregue una consulta; hasta entonces las lecturas
+devuelven sus consultas embebidas sin escribir nada.
+"""
+
+import argparse
+import asyncio
+import time
+
+from models.models import PatientHistory
+from services.db import init_db, close_db
+from services.consultas import migrate_embedded_consultas
+
+
+async def migrate_consultas(dry_run: bool, batch_size: int):
+    """
+    Migra las consultas embebidas de todos los historiales
+    """
+    print("=" * 60)
+    print("MIGRACIÓN DE CONSULTAS - SIRONA")
+    print("=" * 60)
+    
+    await init_db()
+    
+    try:
+        query = {"consultas.0": {"$exists": True}}
+        pending = await PatientHistory.find(query).count()
+        print(f"Historiales con consultas embebidas: {pending}")
+        
+        if dry_run:
+            print("Modo dry-run: no se escribe nada")
+            return
+        
+        started = time.perf_counter()
+        histories_done = 0
+        histories_skipped = 0
+        consultas_moved = 0
+        
+        async for history in PatientHistory.find(query):
+            migrated = await migrate_embedded_consultas(history)
+            if migrated:
+                histories_done += 1
+                consultas_moved += migrated
+            else:
+                histories_skipped += 1
+            
+            if (histories_done + histories_skipped) % batch_size == 0:
+                print(f"  ... {histories_done + histories_skipped}/{pending} historiales procesados")
+        
+        elapsed = time.perf_counter() - started
+        print()
+        print("=" * 60)
+        print("✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"Historiales migrados: {histories_done}")
+        print(f"Historiales omitidos (hash inválido): {histories_skipped}")
+        print(f"Consultas movidas: {consultas_moved}")
+        print(f"Tiempo: {elapsed:.2f}s")
+        print("=" * 60)
+    finally:
+        await close_db()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description="Migrar consultas embebidas a su propia colección")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar historiales pendientes")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tamaño de lote del cursor")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(migrate_consultas(args.dry_run, args.batch_size))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Operación cancelada por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error inesperado: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
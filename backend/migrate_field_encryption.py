@@ -0,0 +1,95 @@
+"""
+Script de migración: cifrado de campos existentes
+
+Uso:
+    python migrate_field_encryption.py [--dry-run] [--batch-size N]
+
+Pasa al formato cifrado actual (BSON Binary ligado a colección, campo y
+_id) los valores de texto de los campos cifrados (texto clínico de
+consultas y registros clínicos, secretos MFA): tanto los que siguen en
+claro como los del formato anterior "enc:v1:". La migración es
+idempotente: los valores ya en el formato actual no se tocan.
+
+Los documentos que no se migren con este script quedan cifrados la
+próxima vez que se guarden completos; mientras tanto se leen igual.
+"""
+
+import argparse
+import asyncio
+import time
+
+from models.models import User, MFASecret, ConsultaRecord, ClinicalRecord
+from services.db import init_db, close_db, get_auth_db, get_core_db
+from services.field_encryption import encrypted_paths, encrypt_plaintext_fields
+
+# (base de datos, modelo)
+TARGETS = [
+    (get_auth_db, User),
+    (get_auth_db, MFASecret),
+    (get_core_db, ConsultaRecord),
+    (get_core_db, ClinicalRecord),
+]
+
+
+async def migrate_field_encryption(dry_run: bool, batch_size: int):
+    """
+    Cifra los campos de texto de todas las colecciones con campos cifrados
+    """
+    print("=" * 60)
+    print("MIGRACIÓN DE CIFRADO DE CAMPOS - SIRONA")
+    print("=" * 60)
+
+    await init_db()
+
+    try:
+        started = time.perf_counter()
+        total = 0
+
+        for get_db, model in TARGETS:
+            collection = get_db()[model.Settings.name]
+            paths = encrypted_paths(model)
+            pending = await collection.count_documents({"$or": [{path: {"$type": "string"}} for path in paths]})
+            print(f"{model.Settings.name}: {pending} documentos con campos sin el formato actual ({', '.join(paths)})")
+
+            if dry_run or not pending:
+                continue
+
+            updated = await encrypt_plaintext_fields(collection, model, batch_size)
+            total += updated
+            print(f"  ... {updated} documentos cifrados")
+
+        if dry_run:
+            print("Modo dry-run: no se escribe nada")
+            return
+
+        elapsed = time.perf_counter() - started
+        print()
+        print("=" * 60)
+        print("✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"Documentos cifrados: {total}")
+        print(f"Tiempo: {elapsed:.2f}s")
+        print("=" * 60)
+    finally:
+        await close_db()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description="Cifrar los campos sensibles aún en claro")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar documentos pendientes")
+    parser.add_argument("--batch-size", type=int, default=500, help="Tamaño de lote de las escrituras")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(migrate_field_encryption(args.dry_run, args.batch_size))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Operación cancelada por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error inesperado: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
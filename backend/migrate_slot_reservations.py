@@ -0,0 +1,104 @@
+"""
+Script de migración: reserva de horarios de citas activas
+
+Uso:
+    python migrate_slot_reservations.py [--dry-run]
+
+Calcula `slotCells` de las citas activas (Programada, En Progreso) que aún
+no las tienen, para que el índice único (doctor_id, slotCells) proteja
+también los horarios reservados antes de la reserva atómica. La duración
+de cada cita se toma de la disponibilidad del médico ese día (30 minutos
+si ya no existe).
+
+Las citas que chocan con otra ya reservada (dobles reservas previas) se
+listan y quedan sin celdas para revisarlas a mano. Es idempotente.
+"""
+
+import argparse
+import asyncio
+import time
+
+from pymongo.errors import DuplicateKeyError
+
+from models.models import Appointment, DoctorAvailability
+from services.db import init_db, close_db, get_core_db
+from services.scheduling import ACTIVE_APPOINTMENT_STATES, slot_cells
+
+DEFAULT_DURATION = 30
+
+
+async def migrate_slot_reservations(dry_run: bool):
+    """
+    Reserva las celdas de las citas activas sin reserva
+    """
+    print("=" * 60)
+    print("MIGRACIÓN DE RESERVA DE HORARIOS - SIRONA")
+    print("=" * 60)
+
+    await init_db()
+
+    try:
+        collection = get_core_db()[Appointment.Settings.name]
+        query = {"estado": {"$in": ACTIVE_APPOINTMENT_STATES}, "slotCells": {"$not": {"$type": "date"}}}
+        pending = await collection.count_documents(query)
+        print(f"Citas activas sin reserva: {pending}")
+
+        if dry_run or not pending:
+            if dry_run:
+                print("Modo dry-run: no se escribe nada")
+            return
+
+        started = time.perf_counter()
+        durations = {}
+        reserved = 0
+        conflicts = []
+
+        cursor = collection.find(query, {"doctor_id": 1, "fecha": 1}).sort("fecha", 1)
+        async for row in cursor:
+            key = (row["doctor_id"], row["fecha"].date())
+            if key not in durations:
+                availability = await DoctorAvailability.find_one({"doctor_id": key[0], "fecha": key[1]})
+                durations[key] = availability.duracionCita if availability else DEFAULT_DURATION
+
+            try:
+                await collection.update_one(
+                    {"_id": row["_id"]},
+                    {"$set": {"slotCells": slot_cells(row["fecha"], durations[key])}}
+                )
+                reserved += 1
+            except DuplicateKeyError:
+                conflicts.append(row)
+
+        elapsed = time.perf_counter() - started
+        print()
+        print("=" * 60)
+        print("✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"Citas reservadas: {reserved}")
+        print(f"Citas en conflicto: {len(conflicts)}")
+        for row in conflicts:
+            print(f"  - {row['_id']} (médico {row['doctor_id']}, {row['fecha'].isoformat()})")
+        print(f"Tiempo: {elapsed:.2f}s")
+        print("=" * 60)
+    finally:
+        await close_db()
+
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description="Reservar los horarios de las citas activas existentes")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar citas pendientes")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(migrate_slot_reservations(args.dry_run))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Operación cancelada por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error inesperado: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
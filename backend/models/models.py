@@ -1,10 +1,13 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, date
 from enum import Enum
 import pymongo
-from beanie import Document, Indexed
+from beanie import Document, Indexed, before_event, Insert, Replace, Save, SaveChanges
 from pydantic import BaseModel, Field, EmailStr
 
+from services.search import build_search_terms, with_search_terms
+from services.field_encryption import EncryptedStr, EncryptedDocument, ENCRYPTED_BSON_ENCODERS
+
 # ======================================================
 # ENUMS Y SUB-MODELOS COMPARTIDOS
 # ======================================================
@@ -24,11 +27,15 @@ class UserStatus(str, Enum):
 # --- SUB-MODELOS USUARIO ---
 class SecuritySettings(BaseModel):
     mfa_enabled: bool = False
-    mfa_secret: Optional[str] = None
+    mfa_secret: Optional[EncryptedStr] = None  # Cifrado en MongoDB (services/field_encryption)
     failed_attempts: int = 0
     lockout_until: Optional[datetime] = None
     password_changed_at: Optional[datetime] = None
 
+    class Config:
+        # Asignar mfa_secret lo marca para cifrarse al guardar
+        validate_assignment = True
+
 # --- SUB-MODELOS HISTORIAL PACIENTE ---
 class MedicoAsignado(BaseModel):
     medicoId: Optional[str] = None  # ID del médico asignado para verificación de acceso (opcional para compatibilidad con registros antiguos)
@@ -109,7 +116,7 @@ class Seguimiento(BaseModel):
 # ======================================================
 
 # 1. Colección de Usuarios (Credenciales)
-class User(Document):
+class User(EncryptedDocument, Document):
     email: Indexed(EmailStr, unique=True)
     password_hash: str
     fullName: str
@@ -143,13 +150,37 @@ class User(Document):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: Optional[datetime] = None
     member_since: str = ""
+    
+    # Términos normalizados para búsqueda indexada (ver services/search.py)
+    searchTerms: List[str] = []
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def refresh_search_terms(self):
+        self.searchTerms = build_search_terms(self.fullName, self.email, self.cedula)
+
+    def set(self, expression: Dict[Any, Any], **kwargs: Any):
+        # .set() no ejecuta los hooks: searchTerms se añade al mismo $set
+        current = {"fullName": self.fullName, "email": self.email, "cedula": self.cedula}
+        return super().set(with_search_terms({str(k): v for k, v in expression.items()}, current), **kwargs)
 
     class Settings:
         name = "users"
+        bson_encoders = ENCRYPTED_BSON_ENCODERS
         indexes = [
             [("email", pymongo.ASCENDING)],
             [("cedula", pymongo.ASCENDING)],
-            [("role", pymongo.ASCENDING)]
+            [("role", pymongo.ASCENDING)],
+            [("fullName", pymongo.ASCENDING)],
+            [("created_at", pymongo.DESCENDING)],
+            # Directorio de pacientes: keyset por nombre y búsqueda por prefijo
+            [("role", pymongo.ASCENDING), ("fullName", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+            [("role", pymongo.ASCENDING), ("cedula", pymongo.ASCENDING)],
+            [("role", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING)],
+            # Médicos por especialidad (búsqueda de horarios libres)
+            [("role", pymongo.ASCENDING), ("especialidad", pymongo.ASCENDING)],
+            # Búsqueda insensible a mayúsculas/tildes (multikey)
+            [("searchTerms", pymongo.ASCENDING)],
+            [("role", pymongo.ASCENDING), ("searchTerms", pymongo.ASCENDING)]
         ]
 
 # 2. Sesiones Activas (Tokens JWT)
@@ -171,19 +202,30 @@ class Session(Document):
         ]
 
 # 3. Secretos MFA (Autenticación de Dos Factores)
-class MFASecret(Document):
+class MFASecret(EncryptedDocument, Document):
     user_id: Indexed(str, unique=True)
-    secret: str  # ENCRIPTADO
-    backup_codes: List[str] = []  # ENCRIPTADOS
+    secret: EncryptedStr  # ENCRIPTADO
+    backup_codes: List[EncryptedStr] = []  # ENCRIPTADOS
     enabled: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "mfa_secrets"
+        bson_encoders = ENCRYPTED_BSON_ENCODERS
         indexes = [
             [("user_id", pymongo.ASCENDING)]
         ]
 
+# 3b. Claves de datos para cifrado de campos (envueltas con la clave maestra)
+class DataKey(Document):
+    key_id: Indexed(str, unique=True)
+    wrapped_key: str  # Base64 de nonce + DEK cifrada con la clave maestra
+    active: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "data_keys"
+
 # ======================================================
 # BASE DE DATOS 2: NEGOCIO (sirona_core)
 # ======================================================
@@ -207,21 +249,64 @@ class PatientHistory(Document):
     medicamentosActuales: List[str] = []
     medicoAsignado: MedicoAsignado
     contactoEmergencia: ContactoEmergencia
+    # LEGACY: las consultas viven en la colección `consultas` (ConsultaRecord).
+    # Solo historiales aún no migrados tienen elementos aquí.
     consultas: List[Consulta] = []
     vacunas: List[Vacuna] = []
     antecedentesFamiliares: List[str] = []
     proximaCita: Optional[ProximaCita] = None
     ultimaModificacion: datetime = Field(default_factory=datetime.utcnow)
+    # Se incrementa en cada escritura atómica ($inc); permite compare-and-set
+    revision: int = 0
+    
+    # Integridad (PBI-20)
+    integrity_hash: Optional[str] = None
+    is_corrupted: bool = False
+    corruption_detected_at: Optional[datetime] = None
+    corruption_reason: Optional[str] = None
     
     class Settings:
         name = "patient_histories"
         indexes = [
             [("patient_id", pymongo.ASCENDING)],
-            [("ultimaModificacion", pymongo.DESCENDING)]
+            [("ultimaModificacion", pymongo.DESCENDING)],
+            [("is_corrupted", pymongo.ASCENDING)],
+            # Lista de vacunas pendientes (multikey sobre el arreglo embebido)
+            [("vacunas.proximaDosis", pymongo.ASCENDING)],
+            [("medicoAsignado.medicoId", pymongo.ASCENDING), ("vacunas.proximaDosis", pymongo.ASCENDING)]
+        ]
+
+# 4b. Consultas del Paciente (una por documento, antes embebidas en PatientHistory)
+class ConsultaRecord(EncryptedDocument, Document):
+    consulta_id: str  # ID expuesto en la API ("cons_<timestamp>")
+    patient_id: str  # Referencia al User ID del paciente
+    doctor_id: Optional[str] = None  # Médico que registró la consulta
+    fecha: date
+    motivo: str
+    # Texto clínico cifrado en MongoDB (services/field_encryption)
+    diagnostico: EncryptedStr
+    tratamiento: EncryptedStr
+    notasMedico: EncryptedStr
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    integrity_hash: Optional[str] = None  # SHA-256 del contenido clínico (PBI-20)
+    is_corrupted: bool = False
+    corruption_detected_at: Optional[datetime] = None
+    corruption_reason: Optional[str] = None
+    
+    class Settings:
+        name = "consultas"
+        bson_encoders = ENCRYPTED_BSON_ENCODERS
+        indexes = [
+            # Listado paginado por paciente, más recientes primero
+            [("patient_id", pymongo.ASCENDING), ("fecha", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+            pymongo.IndexModel(
+                [("patient_id", pymongo.ASCENDING), ("consulta_id", pymongo.ASCENDING)],
+                unique=True
+            )
         ]
 
 # 5. Registro Clínico Detallado (Vista Médico)
-class ClinicalRecord(Document):
+class ClinicalRecord(EncryptedDocument, Document):
     patient_id: Indexed(str)  # Referencia al User ID del paciente
     patientName: str
     patientCedula: str
@@ -230,7 +315,8 @@ class ClinicalRecord(Document):
     
     fecha: date
     motivoConsulta: str
-    historiaEnfermedadActual: str
+    # Texto clínico cifrado en MongoDB (services/field_encryption)
+    historiaEnfermedadActual: EncryptedStr
     antecedentesPersonales: List[str] = []
     antecedentesQuirurgicos: List[str] = []
     medicamentos: List[str] = []
@@ -241,20 +327,27 @@ class ClinicalRecord(Document):
     examenFisico: ExamenFisico
     laboratorios: List[Laboratorio] = []
     imagenes: List[Imagen] = []
-    diagnostico: str
-    tratamiento: str
-    observaciones: str
+    diagnostico: EncryptedStr
+    tratamiento: EncryptedStr
+    observaciones: EncryptedStr
     seguimiento: Optional[Seguimiento] = None
     
     ultimaModificacion: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "clinical_records"
+        bson_encoders = ENCRYPTED_BSON_ENCODERS
         indexes = [
             [("patient_id", pymongo.ASCENDING)],
             [("doctor_id", pymongo.ASCENDING)],
             [("fecha", pymongo.DESCENDING)],
-            [("ultimaModificacion", pymongo.DESCENDING)]
+            [("ultimaModificacion", pymongo.DESCENDING)],
+            # Listados paginados por paciente / por médico y línea de tiempo (más recientes primero)
+            [("patient_id", pymongo.ASCENDING), ("fecha", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+            [("doctor_id", pymongo.ASCENDING), ("fecha", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+            # Lista de seguimientos pendientes
+            [("seguimiento.fecha", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+            [("patient_id", pymongo.ASCENDING), ("seguimiento.fecha", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
         ]
 
 # 6. Citas Médicas (Appointments)
@@ -268,6 +361,8 @@ class Appointment(Document):
     estado: str  # Programada, Completada, Cancelada, No Asistió
     notas: Optional[str] = None
     created_by: str  # ID del secretario que creó la cita
+    # Celdas de 5 min reservadas mientras la cita está activa (ver services/scheduling)
+    slotCells: Optional[List[datetime]] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -276,12 +371,30 @@ class Appointment(Document):
         indexes = [
             [("patient_id", pymongo.ASCENDING)],
             [("doctor_id", pymongo.ASCENDING)],
-            [("fecha", pymongo.ASCENDING)],
-            [("estado", pymongo.ASCENDING)]
+            [("estado", pymongo.ASCENDING)],
+            # Listados paginados por (fecha, _id), con o sin filtro por médico o estado;
+            # el de médico sirve también a la agenda del día
+            [("fecha", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+            [("doctor_id", pymongo.ASCENDING), ("fecha", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+            [("estado", pymongo.ASCENDING), ("fecha", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+            # "Mis pacientes": $group por paciente de las citas del médico (cubierto)
+            [("doctor_id", pymongo.ASCENDING), ("patient_id", pymongo.ASCENDING), ("fecha", pymongo.DESCENDING)],
+            # Línea de tiempo y listado del paciente (keyset por fecha, _id)
+            [("patient_id", pymongo.ASCENDING), ("fecha", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+            # ETag de "mis citas": cantidad y último updated_at sin leer documentos
+            [("doctor_id", pymongo.ASCENDING), ("estado", pymongo.ASCENDING), ("updated_at", pymongo.DESCENDING)],
+            [("patient_id", pymongo.ASCENDING), ("estado", pymongo.ASCENDING), ("updated_at", pymongo.DESCENDING)],
+            # Reserva atómica: dos citas activas de un médico no comparten celda
+            pymongo.IndexModel(
+                [("doctor_id", pymongo.ASCENDING), ("slotCells", pymongo.ASCENDING)],
+                unique=True,
+                partialFilterExpression={"slotCells": {"$type": "date"}}
+            )
         ]
 
 
 # 7. Disponibilidad de Médicos (Schedule)
+# Un documento por fecha; prevalece sobre las plantillas semanales (activo=False = no atiende ese día)
 class DoctorAvailability(Document):
     doctor_id: Indexed(str)  # ID del médico
     doctorName: str
@@ -297,7 +410,60 @@ class DoctorAvailability(Document):
         indexes = [
             [("doctor_id", pymongo.ASCENDING)],
             [("fecha", pymongo.ASCENDING)],
-            [("activo", pymongo.ASCENDING)]
+            [("activo", pymongo.ASCENDING)],
+            # Disponibilidad de un médico en una fecha
+            [("doctor_id", pymongo.ASCENDING), ("fecha", pymongo.ASCENDING), ("activo", pymongo.ASCENDING)]
+        ]
+
+# 7b. Plantillas semanales de disponibilidad (se expanden por fecha al consultarse)
+class AvailabilityTemplate(Document):
+    doctor_id: Indexed(str)  # ID del médico
+    doctorName: str
+    diasSemana: List[int]  # 0 = lunes ... 6 = domingo
+    horaInicio: str  # Formato "HH:MM"
+    horaFin: str  # Formato "HH:MM"
+    duracionCita: int = 30  # Minutos
+    vigenteDesde: date
+    vigenteHasta: Optional[date] = None  # None = sin fecha de fin
+    excepciones: List[date] = []  # Fechas sin atención (feriados, vacaciones)
+    activo: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "availability_templates"
+        indexes = [
+            # Plantillas de un médico
+            [("doctor_id", pymongo.ASCENDING), ("activo", pymongo.ASCENDING)],
+            # Plantillas vigentes de un día de la semana (índice de horarios libres)
+            [("activo", pymongo.ASCENDING), ("diasSemana", pymongo.ASCENDING), ("vigenteDesde", pymongo.ASCENDING)]
+        ]
+
+# 8. Índice de asignación médico-paciente (control de acceso)
+# Derivado de PatientHistory.medicoAsignado.medicoId y de las citas:
+# permite autorizar y listar pacientes sin leer historiales (PHI).
+class DoctorPatientAssignment(Document):
+    doctor_id: str  # ID del médico
+    patient_id: str  # ID del paciente
+    asignado: bool = False  # True: médico asignado en el historial; False: solo tiene citas con el paciente
+    assigned_at: Optional[datetime] = None  # Última vez que se marcó asignado=True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "doctor_patient_assignments"
+        indexes = [
+            # Pacientes de un médico (consulta cubierta) y unicidad del par
+            pymongo.IndexModel(
+                [("doctor_id", pymongo.ASCENDING), ("patient_id", pymongo.ASCENDING)],
+                unique=True
+            ),
+            # Médico asignado de un paciente (consulta cubierta)
+            [("patient_id", pymongo.ASCENDING), ("asignado", pymongo.ASCENDING), ("doctor_id", pymongo.ASCENDING)],
+            # Como mucho un médico asignado por paciente
+            pymongo.IndexModel(
+                [("patient_id", pymongo.ASCENDING)],
+                unique=True,
+                partialFilterExpression={"asignado": True}
+            )
         ]
 
 # ======================================================
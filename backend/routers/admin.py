@@ -7,18 +7,33 @@ Endpoints para administradores del sistema:
 - Consulta de logs de auditoría (PBI-15)
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Request, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, Request, BackgroundTasks, Query
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
 from enum import Enum
+from pymongo import UpdateOne
 
 from models.models import PatientHistory, User, UserRole, UserStatus, AuditLog, SecuritySettings
 from services.auth import get_admin_user
-from services.integrity import integrity_service
+from services.integrity import (
+    integrity_service,
+    verification_cache,
+    invalidate_history,
+    iter_consulta_hash_views,
+    HistoryHashView,
+    DEFAULT_BATCH_SIZE
+)
+from services.history_cache import history_cache
+from services.assignments import assignment_cache
+from services.scheduling import availability_cache, slot_index
+from services.field_encryption import field_keyring
 from services.audit import audit_logger, AuditEventType
 from services.security import hash_password, validate_password_strength
 from services.email_service import generate_temporary_password, send_temporary_password_email, EmailServiceError
+from services.search import build_search_terms, search_terms_filter
+from services.db import get_auth_db
+from services.serialization import model_response, with_str_id
 
 router = APIRouter()
 
@@ -89,14 +104,25 @@ class UpdateUserRoleRequest(BaseModel):
 
 # ==================== USER ENDPOINTS (PBI-18) ====================
 
+# Campos leídos para el listado (proyección del $facet)
+USER_LIST_PROJECTION = {
+    field: 1 for field in UserListItemResponse.model_fields if field != "id"
+}
+
+# Ordenamientos permitidos: todos respaldados por índices de User
+USER_LIST_SORT_FIELDS = {"created_at", "fullName", "email"}
+
+
 @router.get("/users", response_model=UsersListResponse)
 async def list_users(
     request: Request,
     role: Optional[str] = None,
     status_filter: Optional[str] = None,
-    search: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0,
+    search: Optional[str] = Query(None, max_length=100),
+    sort_by: str = "created_at",
+    sort_dir: int = Query(-1, description="1 ascendente, -1 descendente"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -106,16 +132,22 @@ async def list_users(
     Parámetros:
         role: Filtrar por rol (Administrador, Médico, Paciente, Secretario)
         status_filter: Filtrar por estado (Activo, Inactivo, Bloqueado)
-        search: Buscar por nombre o email
+        search: Buscar por prefijo de nombre, apellido, email o cédula
+                (sin distinguir mayúsculas ni tildes)
+        sort_by: created_at, fullName o email
+        sort_dir: 1 ascendente, -1 descendente
         limit: Límite de resultados
         offset: Offset para paginación
+    
+    El filtro de búsqueda se aplica en MongoDB antes de paginar; total y
+    página se obtienen en una sola agregación con $facet.
     """
     # Construir query
     query = {}
     
     if role:
         try:
-            query["role"] = UserRole(role)
+            query["role"] = UserRole(role).value
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -124,29 +156,38 @@ async def list_users(
     
     if status_filter:
         try:
-            query["status"] = UserStatus(status_filter)
+            query["status"] = UserStatus(status_filter).value
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid status. Valid statuses: {[s.value for s in UserStatus]}"
             )
     
-    # Obtener total
-    total = await User.find(query).count()
+    if search and search.strip():
+        query.update(search_terms_filter(search))
     
-    # Obtener usuarios con paginación
-    users = await User.find(query).sort(
-        [("created_at", -1)]
-    ).skip(offset).limit(limit).to_list()
+    if sort_by not in USER_LIST_SORT_FIELDS or sort_dir not in (1, -1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort. Valid fields: {sorted(USER_LIST_SORT_FIELDS)}, directions: 1, -1"
+        )
     
-    # Filtrar por búsqueda si se proporciona
-    if search:
-        search_lower = search.lower()
-        users = [
-            u for u in users 
-            if search_lower in u.fullName.lower() or search_lower in u.email.lower()
-        ]
-        total = len(users)
+    # $match y $sort antes del $facet para que usen índices
+    pipeline = [
+        {"$match": query},
+        {"$sort": {sort_by: sort_dir, "_id": sort_dir}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "users": [
+                {"$skip": offset},
+                {"$limit": limit},
+                {"$project": USER_LIST_PROJECTION}
+            ]
+        }}
+    ]
+    facet = (await User.aggregate(pipeline).to_list())[0]
+    total = facet["total"][0]["count"] if facet["total"] else 0
+    users = facet["users"]
     
     # Log de auditoría
     await audit_logger.log_event(
@@ -163,26 +204,68 @@ async def list_users(
         }
     )
     
-    return UsersListResponse(
-        total=total,
-        users=[
-            UserListItemResponse(
-                id=str(u.id),
-                fullName=u.fullName,
-                email=u.email,
-                cedula=u.cedula,
-                role=u.role.value,
-                status=u.status.value,
-                created_at=u.created_at,
-                last_login=u.last_login,
-                especialidad=u.especialidad,
-                numeroLicencia=u.numeroLicencia,
-                departamento=u.departamento,
-                telefonoContacto=u.telefonoContacto
-            )
-            for u in users
-        ]
+    # Una sola validación de los dicts del $facet y serialización directa
+    return model_response(UsersListResponse, {
+        "total": total,
+        "users": [with_str_id(u) for u in users]
+    })
+
+
+@router.post("/users/search-index/rebuild")
+async def rebuild_user_search_index(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Recalcular searchTerms de todos los usuarios.
+    Solo administradores.
+    
+    Los usuarios nuevos o editados lo calculan automáticamente al guardarse
+    (save, insert y User.set; las escrituras directas usan with_search_terms);
+    este endpoint es para usuarios creados antes de la búsqueda indexada.
+    """
+    collection = get_auth_db()[User.Settings.name]
+    
+    total = 0
+    updated = 0
+    pending = []
+    
+    async for doc in collection.find({}, {"fullName": 1, "email": 1, "cedula": 1, "searchTerms": 1}):
+        total += 1
+        terms = build_search_terms(doc.get("fullName"), doc.get("email"), doc.get("cedula"))
+        if doc.get("searchTerms") == terms:
+            continue
+        
+        pending.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"searchTerms": terms}}))
+        updated += 1
+        if len(pending) >= batch_size:
+            await collection.bulk_write(pending, ordered=False)
+            pending = []
+    
+    if pending:
+        await collection.bulk_write(pending, ordered=False)
+    
+    # Log de auditoría
+    await audit_logger.log_event(
+        event_type=AuditEventType.USUARIO_EDITADO,
+        user_id=str(current_user.id),
+        user_email=current_user.email,
+        user_role=current_user.role.value,
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "action": "rebuild_user_search_index",
+            "total_users": total,
+            "updated_count": updated
+        }
     )
+    
+    return {
+        "message": f"Search terms rebuilt for {updated} users",
+        "total": total,
+        "updated": updated
+    }
 
 
 @router.get("/users/{user_id}", response_model=UserListItemResponse)
@@ -585,6 +668,16 @@ class IntegrityCheckResult(BaseModel):
     corruption_reason: Optional[str] = None
 
 
+class ConsultaIntegrityCheckResult(BaseModel):
+    """Consulta cuyo hash no coincide o que no tiene hash."""
+    consulta_id: str
+    patient_id: str
+    is_valid: bool
+    expected_hash: Optional[str] = None
+    calculated_hash: Optional[str] = None
+    is_corrupted: bool = False
+
+
 class IntegrityReportResponse(BaseModel):
     """Reporte completo de verificación de integridad."""
     total_histories: int
@@ -593,6 +686,12 @@ class IntegrityReportResponse(BaseModel):
     corrupted_count: int
     missing_hash_count: int
     results: List[IntegrityCheckResult]
+    # Consultas (colección propia): contadores y solo las que tienen problemas
+    total_consultas: int = 0
+    consultas_valid_count: int = 0
+    consultas_invalid_count: int = 0
+    consultas_missing_hash_count: int = 0
+    consulta_results: List[ConsultaIntegrityCheckResult] = []
     checked_at: datetime
 
 
@@ -618,6 +717,7 @@ class AuditLogsListResponse(BaseModel):
 @router.get("/integrity/check-all", response_model=IntegrityReportResponse)
 async def check_all_histories_integrity(
     request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -627,28 +727,33 @@ async def check_all_histories_integrity(
     Este endpoint implementa el "job nocturno" de validación (PBI-20).
     Puede ejecutarse manualmente o programarse vía cron/scheduler.
     
+    Lee con un cursor proyectado (solo campos hasheados); los eventos de
+    verificación y las marcas de corrupción se escriben en lotes.
+    Verifica también el hash propio de cada consulta; el reporte lista
+    solo las consultas con discrepancia o sin hash.
+    
     Returns:
         Reporte con el estado de integridad de todos los historiales
     """
-    # Obtener todos los historiales
-    all_histories = await PatientHistory.find_all().to_list()
+    ip_address = request.client.host
     
     results = []
+    total_histories = 0
     valid_count = 0
     invalid_count = 0
     corrupted_count = 0
     missing_hash_count = 0
     
-    for history in all_histories:
-        # Verificar integridad
-        is_valid, expected_hash, calculated_hash = await integrity_service.verify_integrity(
-            history=history,
-            ip_address=request.client.host,
-            user_agent="integrity_job"
-        )
+    audit_batch = []
+    to_mark = []
+    
+    async for history in PatientHistory.find_all().project(HistoryHashView):
+        total_histories += 1
         
-        is_corrupted = getattr(history, 'is_corrupted', False)
-        corruption_reason = getattr(history, 'corruption_reason', None)
+        expected_hash = history.integrity_hash or ""
+        calculated_hash = integrity_service.calculate_hash(history)
+        is_valid = not expected_hash or expected_hash == calculated_hash
+        is_corrupted = history.is_corrupted
         
         result = IntegrityCheckResult(
             history_id=str(history.id),
@@ -657,52 +762,123 @@ async def check_all_histories_integrity(
             expected_hash=expected_hash[:16] + "..." if expected_hash else None,
             calculated_hash=calculated_hash[:16] + "..." if calculated_hash else None,
             is_corrupted=is_corrupted,
-            corruption_reason=corruption_reason
+            corruption_reason=history.corruption_reason
         )
         results.append(result)
         
         if not expected_hash:
             missing_hash_count += 1
-        elif is_valid:
+            continue
+        
+        # Registrar verificación en auditoría (en lote)
+        audit_batch.append(audit_logger.build_entry(
+            event_type=AuditEventType.INTEGRIDAD_VERIFICADA if is_valid else AuditEventType.INTEGRIDAD_FALLIDA,
+            patient_id=history.patient_id,
+            ip_address=ip_address,
+            user_agent="integrity_job",
+            details={
+                "history_id": str(history.id),
+                "expected_hash": expected_hash[:16] + "...",
+                "calculated_hash": calculated_hash[:16] + "...",
+                "is_valid": is_valid
+            }
+        ))
+        if len(audit_batch) >= batch_size:
+            await audit_logger.log_events_batch(audit_batch)
+            audit_batch = []
+        
+        if is_valid:
             valid_count += 1
         else:
             invalid_count += 1
             # Marcar como corrupto si no lo está ya
             if not is_corrupted:
-                await integrity_service.mark_as_corrupted(
-                    history=history,
-                    reason="Hash mismatch detected during integrity job",
-                    ip_address=request.client.host
-                )
+                to_mark.append(history)
                 corrupted_count += 1
         
         if is_corrupted:
             corrupted_count += 1
     
+    await audit_logger.log_events_batch(audit_batch)
+    
+    for i in range(0, len(to_mark), batch_size):
+        await integrity_service.mark_many_as_corrupted(
+            histories=to_mark[i:i + batch_size],
+            reason="Hash mismatch detected during integrity job",
+            ip_address=ip_address
+        )
+    
+    # Consultas: cada una lleva su propio hash desde que salieron del historial
+    total_consultas = 0
+    consultas_valid_count = 0
+    consultas_invalid_count = 0
+    consultas_missing_hash_count = 0
+    consulta_results = []
+    consultas_to_mark = []
+    
+    async for consulta in iter_consulta_hash_views(batch_size):
+        total_consultas += 1
+        expected_hash = consulta.integrity_hash or ""
+        calculated_hash = integrity_service.calculate_consulta_hash(consulta)
+        
+        if not expected_hash:
+            consultas_missing_hash_count += 1
+        elif expected_hash == calculated_hash:
+            consultas_valid_count += 1
+            continue
+        else:
+            consultas_invalid_count += 1
+            if not consulta.is_corrupted:
+                consultas_to_mark.append(consulta)
+        
+        consulta_results.append(ConsultaIntegrityCheckResult(
+            consulta_id=consulta.consulta_id,
+            patient_id=consulta.patient_id,
+            is_valid=not expected_hash,
+            expected_hash=expected_hash[:16] + "..." if expected_hash else None,
+            calculated_hash=calculated_hash[:16] + "...",
+            is_corrupted=consulta.is_corrupted or bool(expected_hash)
+        ))
+    
+    for i in range(0, len(consultas_to_mark), batch_size):
+        await integrity_service.mark_consultas_as_corrupted(
+            consultas_to_mark[i:i + batch_size],
+            reason="Consulta hash mismatch detected during integrity job",
+            ip_address=ip_address
+        )
+    
     # Log de auditoría
     await audit_logger.log_event(
         event_type=AuditEventType.INTEGRIDAD_VERIFICADA,
         user_id=str(current_user.id),
         user_email=current_user.email,
         user_role=current_user.role.value,
-        ip_address=request.client.host,
+        ip_address=ip_address,
         user_agent=request.headers.get("user-agent", ""),
         details={
-            "total_histories": len(all_histories),
+            "total_histories": total_histories,
             "valid_count": valid_count,
             "invalid_count": invalid_count,
             "corrupted_count": corrupted_count,
-            "missing_hash_count": missing_hash_count
+            "missing_hash_count": missing_hash_count,
+            "total_consultas": total_consultas,
+            "consultas_invalid_count": consultas_invalid_count,
+            "consultas_missing_hash_count": consultas_missing_hash_count
         }
     )
     
     return IntegrityReportResponse(
-        total_histories=len(all_histories),
+        total_histories=total_histories,
         valid_count=valid_count,
         invalid_count=invalid_count,
         corrupted_count=corrupted_count,
         missing_hash_count=missing_hash_count,
         results=results,
+        total_consultas=total_consultas,
+        consultas_valid_count=consultas_valid_count,
+        consultas_invalid_count=consultas_invalid_count,
+        consultas_missing_hash_count=consultas_missing_hash_count,
+        consulta_results=consulta_results,
         checked_at=datetime.utcnow()
     )
 
@@ -710,6 +886,8 @@ async def check_all_histories_integrity(
 @router.post("/integrity/regenerate-hashes")
 async def regenerate_all_hashes(
     request: Request,
+    dry_run: bool = False,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
     current_user: User = Depends(get_admin_user)
 ):
     """
@@ -718,18 +896,15 @@ async def regenerate_all_hashes(
     
     ADVERTENCIA: Solo usar para inicialización o después de una migración.
     Esto NO debe usarse para "arreglar" historiales corruptos.
+    
+    Parámetros:
+        dry_run: Solo calcular y reportar cuántos hashes cambiarían, sin escribir
+        batch_size: Operaciones por bulk_write
     """
-    all_histories = await PatientHistory.find_all().to_list()
-    
-    updated_count = 0
-    for history in all_histories:
-        # Solo regenerar si no está marcado como corrupto
-        is_corrupted = getattr(history, 'is_corrupted', False)
-        if not is_corrupted:
-            new_hash = integrity_service.calculate_hash(history)
-            history.integrity_hash = new_hash
-            await history.save()
-            updated_count += 1
+    report = await integrity_service.regenerate_hashes_bulk(
+        batch_size=batch_size,
+        dry_run=dry_run
+    )
     
     # Log de auditoría
     await audit_logger.log_event(
@@ -741,16 +916,14 @@ async def regenerate_all_hashes(
         user_agent=request.headers.get("user-agent", ""),
         details={
             "action": "regenerate_all_hashes",
-            "total_histories": len(all_histories),
-            "updated_count": updated_count
+            **report
         }
     )
     
+    verb = "Would regenerate" if dry_run else "Regenerated"
     return {
-        "message": f"Regenerated hashes for {updated_count} histories",
-        "total": len(all_histories),
-        "updated": updated_count,
-        "skipped_corrupted": len(all_histories) - updated_count
+        "message": f"{verb} hashes for {report['updated']} histories",
+        **report
     }
 
 
@@ -789,7 +962,8 @@ async def clear_corruption_flag(
     current_user: User = Depends(get_admin_user)
 ):
     """
-    Limpiar el flag de corrupción de un historial y regenerar su hash.
+    Limpiar el flag de corrupción de un historial y regenerar su hash
+    (y el de las consultas del paciente).
     Solo administradores pueden ejecutar esta operación.
     
     ADVERTENCIA: Solo usar después de verificar manualmente que los datos son correctos.
@@ -812,6 +986,10 @@ async def clear_corruption_flag(
     history.integrity_hash = new_hash
     
     await history.save()
+    invalidate_history(history_id)
+    
+    # Las consultas (colección propia) también se dan por revisadas
+    resealed_consultas = await integrity_service.reseal_consultas(history.patient_id)
     
     # Log de auditoría
     await audit_logger.log_event(
@@ -825,14 +1003,41 @@ async def clear_corruption_flag(
         details={
             "action": "clear_corruption_flag",
             "history_id": history_id,
-            "new_hash": new_hash[:16] + "..."
+            "new_hash": new_hash[:16] + "...",
+            "resealed_consultas": resealed_consultas
         }
     )
     
     return {
         "message": "Corruption flag cleared and hash regenerated",
         "history_id": history_id,
-        "new_hash": new_hash[:16] + "..."
+        "new_hash": new_hash[:16] + "...",
+        "resealed_consultas": resealed_consultas
+    }
+
+
+@router.get("/integrity/cache-stats")
+async def get_cache_stats(
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Métricas de las cachés en proceso de historiales.
+    Solo administradores.
+    
+    - history_cache: historiales cifrados en memoria (hits, misses, bytes, desalojos)
+    - verification_cache: verificaciones de hash vigentes
+    - assignment_cache: médico asignado por paciente (control de acceso)
+    - field_keyring: claves de datos desenvueltas para cifrado de campos
+    - slot_index: índice de horarios libres por día
+    - availability_cache: disponibilidad efectiva por (médico, fecha)
+    """
+    return {
+        "history_cache": history_cache.stats(),
+        "verification_cache": verification_cache.stats(),
+        "assignment_cache": assignment_cache.stats(),
+        "field_keyring": field_keyring.stats(),
+        "slot_index": slot_index.stats(),
+        "availability_cache": availability_cache.stats()
     }
 
 
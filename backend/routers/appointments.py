@@ -1,61 +1,137 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta, time
 
-from models.models import Appointment, User, UserRole, AuditLog, DoctorAvailability
+from models.models import Appointment, User, UserRole, AuditLog, DoctorAvailability, AvailabilityTemplate
 from schemas.appointment_schemas import (
     AppointmentCreateRequest,
     AppointmentUpdateRequest,
     AppointmentResponse,
     DoctorAvailabilityRequest,
     DoctorAvailabilityResponse,
+    AvailabilityTemplateRequest,
+    AvailabilityTemplateResponse,
+    BulkAvailabilityRequest,
+    BulkAvailabilityToggleRequest,
+    BulkAppointmentsWindowRequest,
+    BulkAppointmentsMoveRequest,
+    BulkOperationResponse,
     AvailableSlotResponse,
-    DoctorScheduleResponse
+    DoctorScheduleResponse,
+    NextAvailableSlotResponse
 )
 from schemas.user_schemas import DoctorMinimalResponse
 from services.auth import get_secretary_user, get_current_user
+from services.db import get_core_db
+from services.assignments import link_appointment, page_doctor_patients, unlink_appointment
+from services.scheduling import (
+    ACTIVE_APPOINTMENT_STATES,
+    SLOT_SEARCH_MAX_DAYS,
+    availability_changed,
+    booking_changed,
+    day_schedule,
+    doctor_schedule_changed,
+    find_day_availability,
+    find_slot_duration,
+    next_available_slots,
+    reserve_slot,
+    save_reservation
+)
+from services.bulk_scheduling import (
+    BULK_MAX_DAYS,
+    cancel_appointments,
+    create_availability_range,
+    move_appointments,
+    set_availability_days
+)
+from services.http_cache import make_etag, etag_matches, etag_headers, not_modified
+from services.pagination import apply_cursor, split_page
+from services.serialization import model_list_response, response_projection
 
 router = APIRouter()
 
 
-async def check_doctor_availability(doctor_id: str, fecha: datetime) -> bool:
+async def appointments_etag(query: dict, *params) -> str:
     """
-    Verifica si un médico está disponible en una fecha y hora específica.
+    ETag de un listado de citas a partir de (cantidad, último updated_at)
+    de las citas que cumplen el filtro, con un solo $group en MongoDB.
+    Crear o eliminar cambia la cantidad; toda modificación actualiza
+    updated_at. El filtro y los parámetros de página forman parte del ETag.
     """
-    # Extraer la fecha sin hora
-    fecha_solo = fecha.date()
-    hora_cita = fecha.time()
-    
-    # Buscar disponibilidad del médico para esa fecha específica
-    availability = await DoctorAvailability.find_one({
-        "doctor_id": doctor_id,
-        "fecha": fecha_solo,
-        "activo": True
-    })
-    
-    if not availability:
-        return False
-    
-    # Convertir strings a time objects
-    hora_inicio = time.fromisoformat(availability.horaInicio)
-    hora_fin = time.fromisoformat(availability.horaFin)
-    
-    # Verificar si la hora de la cita está dentro del horario
-    if not (hora_inicio <= hora_cita < hora_fin):
-        return False
-    
-    # Verificar que no haya otra cita en ese horario
-    # Buscar citas existentes en una ventana de ±duracionCita minutos
-    inicio_ventana = fecha - timedelta(minutes=availability.duracionCita)
-    fin_ventana = fecha + timedelta(minutes=availability.duracionCita)
+    stats = await Appointment.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "last_update": {"$max": "$updated_at"}}}
+    ]).to_list()
+    count, last_update = (stats[0]["count"], stats[0]["last_update"]) if stats else (0, None)
+    return make_etag(sorted(query.items()), *params, count, last_update)
+
+
+# Solo los campos de AppointmentResponse (excluye created_by)
+APPOINTMENT_PROJECTION = response_projection(AppointmentResponse)
+
+# Filas de listado: sin notas (texto libre, se leen en el detalle o con include_notas)
+APPOINTMENT_LIST_PROJECTION = {k: v for k, v in APPOINTMENT_PROJECTION.items() if k != "notas"}
+
+# Ordenamientos de los listados (keyset sobre fecha, _id como desempate)
+APPOINTMENTS_SORT_ASC = [("fecha", 1), ("_id", 1)]
+APPOINTMENTS_SORT_DESC = [("fecha", -1), ("_id", -1)]
+
+# Cabecera con el cursor de la página siguiente (el cuerpo sigue siendo una lista)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def fecha_window(desde: Optional[str], hasta: Optional[str]) -> dict:
+    """
+    Filtro de fecha de cita entre `desde` y `hasta` (YYYY-MM-DD, días
+    completos e inclusive). Vacío si no se indica ninguno.
+    """
+    window = {}
+    try:
+        if desde:
+            window["$gte"] = datetime.strptime(desde, "%Y-%m-%d")
+        if hasta:
+            window["$lt"] = datetime.strptime(hasta, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    return {"fecha": window} if window else {}
+
+
+async def page_appointment_rows(
+    query: dict,
+    sort: list,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_notas: bool = False
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Página de citas como dicts crudos proyectados (sin construir documentos
+    Beanie), para serializarlas con model_list_response.
     
-    existing_appointment = await Appointment.find_one({
-        "doctor_id": doctor_id,
-        "fecha": {"$gte": inicio_ventana, "$lt": fin_ventana},
-        "estado": {"$in": ["Programada", "En Progreso"]}
-    })
+    Returns:
+        Tuple de (filas, cursor siguiente o None)
+    """
+    try:
+        page_query = apply_cursor(query, sort, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return existing_appointment is None
+    projection = APPOINTMENT_PROJECTION if include_notas else APPOINTMENT_LIST_PROJECTION
+    rows = await get_core_db()[Appointment.Settings.name].find(page_query, projection).sort(sort).limit(limit + 1).to_list(length=None)
+    return split_page(rows, sort, limit)
+
+
+def page_headers(next_cursor: Optional[str], headers: Optional[dict] = None) -> dict:
+    """Cabeceras de un listado paginado (cursor siguiente, si hay más)."""
+    headers = dict(headers or {})
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return headers
 
 
 @router.post("/appointments", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
@@ -84,9 +160,9 @@ async def create_appointment(
             detail="Doctor not found"
         )
     
-    # Verificar disponibilidad del médico
-    is_available = await check_doctor_availability(data.doctor_id, data.fecha)
-    if not is_available:
+    # Verificar que la hora está dentro de la jornada del médico
+    duracion = await find_slot_duration(data.doctor_id, data.fecha)
+    if duracion is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Doctor is not available at the requested time. Please check the doctor's schedule."
@@ -105,7 +181,14 @@ async def create_appointment(
         created_by=str(current_user.id)
     )
     
-    await appointment.insert()
+    # Reservar el horario e insertar en una sola escritura (índice único de celdas)
+    if not await reserve_slot(appointment, duracion):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Doctor is not available at the requested time. Please check the doctor's schedule."
+        )
+    await link_appointment(appointment.doctor_id, appointment.patient_id)
+    booking_changed(appointment.doctor_id, None, (appointment.fecha, appointment.estado))
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -143,13 +226,22 @@ async def list_appointments(
     current_user: User = Depends(get_secretary_user),
     patient_id: str = None,
     doctor_id: str = None,
-    estado: str = None
+    estado: str = None,
+    desde: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD (inclusive)"),
+    hasta: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD (inclusive)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    include_notas: bool = Query(False, description="Incluir las notas de cada cita")
 ):
     """
     Listar citas médicas con filtros opcionales.
     Solo secretarios pueden listar todas las citas.
+    
+    Ordenadas por fecha ascendente y paginadas por keyset sobre (fecha, _id):
+    si hay más resultados, la cabecera `X-Next-Cursor` trae el `cursor` de
+    la página siguiente.
     """
-    query = {}
+    query = fecha_window(desde, hasta)
     
     if patient_id:
         query["patient_id"] = patient_id
@@ -158,24 +250,9 @@ async def list_appointments(
     if estado:
         query["estado"] = estado
     
-    appointments = await Appointment.find(query).to_list()
+    appointments, next_cursor = await page_appointment_rows(query, APPOINTMENTS_SORT_ASC, limit, cursor, include_notas)
     
-    return [
-        AppointmentResponse(
-            id=str(apt.id),
-            patient_id=apt.patient_id,
-            patientName=apt.patientName,
-            doctor_id=apt.doctor_id,
-            doctorName=apt.doctorName,
-            fecha=apt.fecha,
-            motivo=apt.motivo,
-            estado=apt.estado,
-            notas=apt.notas,
-            created_at=apt.created_at,
-            updated_at=apt.updated_at
-        )
-        for apt in appointments
-    ]
+    return model_list_response(AppointmentResponse, appointments, page_headers(next_cursor))
 
 
 @router.get("/appointments/{appointment_id}", response_model=AppointmentResponse)
@@ -229,6 +306,8 @@ async def update_appointment(
             detail="Appointment not found"
         )
     
+    before = (appointment.fecha, appointment.estado)
+    
     # Actualizar campos si se proporcionan
     if data.fecha:
         appointment.fecha = data.fecha
@@ -240,7 +319,21 @@ async def update_appointment(
         appointment.notas = data.notas
     
     appointment.updated_at = datetime.utcnow()
-    await appointment.save()
+    
+    # Reservar el nuevo horario o liberar el anterior según el estado resultante
+    is_active = appointment.estado in ACTIVE_APPOINTMENT_STATES
+    if not is_active:
+        await save_reservation(appointment, None)
+    elif appointment.fecha != before[0] or before[1] not in ACTIVE_APPOINTMENT_STATES:
+        duracion = await find_slot_duration(appointment.doctor_id, appointment.fecha)
+        if duracion is None or not await save_reservation(appointment, duracion):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Doctor is not available at the requested time. Please check the doctor's schedule."
+            )
+    else:
+        await appointment.save()
+    booking_changed(appointment.doctor_id, before, (appointment.fecha, appointment.estado))
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -305,10 +398,127 @@ async def delete_appointment(
     await audit_log.insert()
     
     await appointment.delete()
+    await unlink_appointment(appointment.doctor_id, appointment.patient_id)
+    booking_changed(appointment.doctor_id, (appointment.fecha, appointment.estado), None)
     
     return None
 
 
+def bulk_response(results: List[dict]) -> BulkOperationResponse:
+    """Resumen de una operación masiva a partir de sus resultados por elemento."""
+    failed = sum(1 for result in results if result["error"])
+    return BulkOperationResponse(
+        total=len(results),
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results
+    )
+
+
+def validate_bulk_window(data: BulkAppointmentsWindowRequest) -> None:
+    if data.hasta <= data.desde or data.hasta - data.desde > timedelta(days=BULK_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid window. hasta must be after desde and span at most {BULK_MAX_DAYS} days"
+        )
+
+
+@router.post("/appointments/bulk-cancel", response_model=BulkOperationResponse)
+async def bulk_cancel_appointments(
+    data: BulkAppointmentsWindowRequest,
+    request: Request,
+    current_user: User = Depends(get_secretary_user)
+):
+    """
+    Cancelar todas las citas activas de un médico en una ventana [desde, hasta).
+    Solo secretarios. Un solo registro de auditoría para toda la operación.
+    """
+    validate_bulk_window(data)
+    
+    try:
+        results = await cancel_appointments(data.doctor_id, data.desde, data.hasta)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    response = bulk_response(results)
+    
+    # Log de auditoría (uno por operación)
+    audit_log = AuditLog(
+        event="appointments_bulk_cancelled",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "doctor_id": data.doctor_id,
+            "desde": data.desde.isoformat(),
+            "hasta": data.hasta.isoformat(),
+            "cancelled": response.succeeded,
+            "appointment_ids": [result["id"] for result in results]
+        }
+    )
+    await audit_log.insert()
+    
+    return response
+
+
+@router.post("/appointments/bulk-move", response_model=BulkOperationResponse)
+async def bulk_move_appointments(
+    data: BulkAppointmentsMoveRequest,
+    request: Request,
+    current_user: User = Depends(get_secretary_user)
+):
+    """
+    Mover todas las citas activas de un médico en una ventana [desde, hasta)
+    `desplazamientoMinutos` minutos (1440 = al día siguiente).
+    Solo secretarios.
+    
+    Cada cita se mueve solo si la nueva hora está dentro de la jornada del
+    médico y no choca con otra cita; las demás se informan y no cambian.
+    """
+    validate_bulk_window(data)
+    
+    if data.desplazamientoMinutos == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="desplazamientoMinutos must not be 0"
+        )
+    
+    try:
+        results = await move_appointments(data.doctor_id, data.desde, data.hasta, data.desplazamientoMinutos)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    response = bulk_response(results)
+    
+    # Log de auditoría (uno por operación)
+    audit_log = AuditLog(
+        event="appointments_bulk_moved",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "doctor_id": data.doctor_id,
+            "desde": data.desde.isoformat(),
+            "hasta": data.hasta.isoformat(),
+            "desplazamientoMinutos": data.desplazamientoMinutos,
+            "moved": response.succeeded,
+            "failed": response.failed,
+            "appointment_ids": [result["id"] for result in results if not result["error"]]
+        }
+    )
+    await audit_log.insert()
+    
+    return response
+
+
 # ==================== DISPONIBILIDAD DE MÉDICOS ====================
 
 @router.get("/doctors", response_model=List[DoctorMinimalResponse])
@@ -336,11 +546,16 @@ async def list_doctors(
 @router.get("/doctors/{doctor_id}/availability", response_model=List[DoctorAvailabilityResponse])
 async def get_doctor_availability(
     doctor_id: str,
+    fecha: Optional[str] = Query(None, description="Fecha YYYY-MM-DD: disponibilidad efectiva de ese día"),
     current_user: User = Depends(get_secretary_user)
 ):
     """
     Obtener la disponibilidad de un médico.
     Solo secretarios pueden consultar disponibilidad.
+    
+    Sin `fecha`: las disponibilidades por fecha activas. Con `fecha`: la
+    disponibilidad efectiva de ese día, incluida la expandida de una
+    plantilla semanal (sin id, no es un documento).
     """
     # Verificar que el médico existe
     doctor = await User.get(doctor_id)
@@ -351,13 +566,24 @@ async def get_doctor_availability(
         )
     
     # Obtener disponibilidad
-    availabilities = await DoctorAvailability.find(
-        {"doctor_id": doctor_id, "activo": True}
-    ).to_list()
+    if fecha:
+        try:
+            fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid date format. Use YYYY-MM-DD"
+            )
+        availability = await find_day_availability(doctor_id, fecha_obj)
+        availabilities = [availability] if availability else []
+    else:
+        availabilities = await DoctorAvailability.find(
+            {"doctor_id": doctor_id, "activo": True}
+        ).to_list()
     
     return [
         DoctorAvailabilityResponse(
-            id=str(av.id),
+            id=str(av.id) if av.id else "",
             doctor_id=av.doctor_id,
             doctorName=av.doctorName,
             fecha=av.fecha.isoformat(),
@@ -380,6 +606,8 @@ async def get_doctor_schedule(
     """
     Obtener los horarios disponibles de un médico para una fecha específica.
     Solo secretarios pueden consultar horarios.
+    
+    La disponibilidad y las citas del día se leen una sola vez (ver services/scheduling).
     """
     # Verificar que el médico existe
     doctor = await User.get(doctor_id)
@@ -398,49 +626,62 @@ async def get_doctor_schedule(
             detail="Invalid date format. Use YYYY-MM-DD"
         )
     
-    # Buscar disponibilidad del médico para esa fecha específica
-    availability = await DoctorAvailability.find_one({
-        "doctor_id": doctor_id,
-        "fecha": fecha_obj,
-        "activo": True
-    })
-    
-    if not availability:
-        return DoctorScheduleResponse(
-            doctor_id=doctor_id,
-            doctorName=doctor.fullName,
-            fecha=fecha,
-            slots=[]
-        )
-    
-    # Generar slots de tiempo
-    hora_inicio = time.fromisoformat(availability.horaInicio)
-    hora_fin = time.fromisoformat(availability.horaFin)
-    duracion = availability.duracionCita
-    
-    slots = []
-    current_time = datetime.combine(fecha_obj, hora_inicio)
-    end_time = datetime.combine(fecha_obj, hora_fin)
-    
-    while current_time < end_time:
-        # Verificar si el slot está disponible
-        is_available = await check_doctor_availability(doctor_id, current_time)
-        
-        slots.append(AvailableSlotResponse(
-            fecha=current_time,
-            disponible=is_available
-        ))
-        
-        current_time += timedelta(minutes=duracion)
+    # Horarios del día: una lectura de disponibilidad y una de citas
+    schedule = await day_schedule(doctor_id, fecha_obj)
     
     return DoctorScheduleResponse(
         doctor_id=doctor_id,
         doctorName=doctor.fullName,
         fecha=fecha,
-        slots=slots
+        slots=[
+            AvailableSlotResponse(fecha=slot, disponible=available)
+            for slot, available in schedule
+        ]
     )
 
 
+@router.get("/doctors/available-slots", response_model=List[NextAvailableSlotResponse])
+async def search_available_slots(
+    especialidad: str,
+    desde: str,
+    hasta: Optional[str] = None,
+    duracion: int = Query(30, ge=5, le=480),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_secretary_user)
+):
+    """
+    Próximos horarios libres entre todos los médicos de una especialidad.
+    Solo secretarios.
+    
+    - desde / hasta: rango de fechas YYYY-MM-DD (hasta por defecto = desde)
+    - duracion: minutos que debe durar la cita
+    - limit: cantidad de horarios a devolver, los más tempranos primero
+    
+    Se resuelve con el índice de horarios en memoria (services/scheduling).
+    """
+    try:
+        desde_obj = datetime.strptime(desde, "%Y-%m-%d").date()
+        hasta_obj = datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else desde_obj
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    
+    if hasta_obj < desde_obj or (hasta_obj - desde_obj).days >= SLOT_SEARCH_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid date range. Maximum {SLOT_SEARCH_MAX_DAYS} days"
+        )
+    
+    slots = await next_available_slots(especialidad, desde_obj, hasta_obj, duracion, limit)
+    
+    return [
+        NextAvailableSlotResponse(fecha=slot, doctor_id=doctor_id, doctorName=doctor_name)
+        for slot, doctor_id, doctor_name in slots
+    ]
+
+
 @router.post("/doctors/{doctor_id}/availability", response_model=DoctorAvailabilityResponse, status_code=status.HTTP_201_CREATED)
 async def create_doctor_availability(
     doctor_id: str,
@@ -518,6 +759,7 @@ async def create_doctor_availability(
     )
     
     await availability.insert()
+    await availability_changed(doctor_id, availability.fecha)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -643,6 +885,7 @@ async def create_my_availability(
     )
     
     await availability.insert()
+    await availability_changed(availability.doctor_id, availability.fecha)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -723,12 +966,16 @@ async def update_my_availability(
         )
     
     # Actualizar
+    previous_fecha = availability.fecha
     availability.fecha = fecha_obj
     availability.horaInicio = data.horaInicio
     availability.horaFin = data.horaFin
     availability.duracionCita = data.duracionCita
     
     await availability.save()
+    if previous_fecha != availability.fecha:
+        await availability_changed(availability.doctor_id, previous_fecha)
+    await availability_changed(availability.doctor_id, availability.fecha)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -791,6 +1038,7 @@ async def toggle_my_availability(
     # Toggle activo
     availability.activo = not availability.activo
     await availability.save()
+    await availability_changed(availability.doctor_id, availability.fecha)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -865,6 +1113,406 @@ async def delete_my_availability(
     await audit_log.insert()
     
     await availability.delete()
+    await availability_changed(availability.doctor_id, availability.fecha)
+    
+    return None
+
+
+@router.post("/doctor/my-availability/bulk", response_model=BulkOperationResponse)
+async def bulk_create_my_availability(
+    data: BulkAvailabilityRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Crear disponibilidad para cada fecha de un rango (en los días de la
+    semana indicados) para el médico autenticado, en una sola operación.
+    Las fechas que ya tienen disponibilidad se informan y no se modifican.
+    """
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can create their own availability."
+        )
+    
+    try:
+        desde = datetime.strptime(data.desde, "%Y-%m-%d").date()
+        hasta = datetime.strptime(data.hasta, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    
+    if hasta < desde or (hasta - desde).days >= BULK_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid date range. Maximum {BULK_MAX_DAYS} days"
+        )
+    
+    if not data.diasSemana or any(dia < 0 or dia > 6 for dia in data.diasSemana):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid weekdays. Use 0 (Monday) to 6 (Sunday)"
+        )
+    
+    # Validar formato de horas
+    try:
+        time.fromisoformat(data.horaInicio)
+        time.fromisoformat(data.horaFin)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid time format. Use HH:MM format"
+        )
+    
+    results = await create_availability_range(
+        str(current_user.id),
+        current_user.fullName,
+        desde,
+        hasta,
+        data.diasSemana,
+        data.horaInicio,
+        data.horaFin,
+        data.duracionCita
+    )
+    response = bulk_response(results)
+    
+    # Log de auditoría (uno por operación)
+    audit_log = AuditLog(
+        event="doctor_availability_bulk_created",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "desde": data.desde,
+            "hasta": data.hasta,
+            "diasSemana": data.diasSemana,
+            "created": response.succeeded,
+            "skipped": response.failed
+        }
+    )
+    await audit_log.insert()
+    
+    return response
+
+
+@router.post("/doctor/my-availability/bulk-toggle", response_model=BulkOperationResponse)
+async def bulk_toggle_my_availability(
+    data: BulkAvailabilityToggleRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Activar o desactivar la disponibilidad de muchas fechas del médico
+    autenticado. Desactivar un día cubierto solo por una plantilla semanal
+    crea una excepción puntual para ese día.
+    """
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can toggle their own availability."
+        )
+    
+    try:
+        fechas = [datetime.strptime(fecha, "%Y-%m-%d").date() for fecha in data.fechas]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    
+    if not fechas or len(fechas) > BULK_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid dates. Send between 1 and {BULK_MAX_DAYS} dates"
+        )
+    
+    results = await set_availability_days(str(current_user.id), fechas, data.activo)
+    response = bulk_response(results)
+    
+    # Log de auditoría (uno por operación)
+    audit_log = AuditLog(
+        event="doctor_availability_bulk_toggled",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "fechas": sorted({fecha.isoformat() for fecha in fechas}),
+            "activo": data.activo,
+            "updated": response.succeeded,
+            "not_found": response.failed
+        }
+    )
+    await audit_log.insert()
+    
+    return response
+
+
+# ==================== PLANTILLAS SEMANALES DE DISPONIBILIDAD ====================
+
+def parse_template_request(data: AvailabilityTemplateRequest) -> dict:
+    """
+    Valida una plantilla y devuelve sus campos listos para el documento.
+    Las fechas por día (DoctorAvailability) siguen prevaleciendo sobre la plantilla.
+    """
+    if not data.diasSemana or any(dia < 0 or dia > 6 for dia in data.diasSemana):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid weekdays. Use 0 (Monday) to 6 (Sunday)"
+        )
+    
+    try:
+        hora_inicio = time.fromisoformat(data.horaInicio)
+        hora_fin = time.fromisoformat(data.horaFin)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid time format. Use HH:MM format"
+        )
+    
+    if hora_inicio >= hora_fin or data.duracionCita <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid schedule. horaInicio must be before horaFin and duracionCita positive"
+        )
+    
+    try:
+        vigente_desde = datetime.strptime(data.vigenteDesde, "%Y-%m-%d").date()
+        vigente_hasta = datetime.strptime(data.vigenteHasta, "%Y-%m-%d").date() if data.vigenteHasta else None
+        excepciones = sorted({datetime.strptime(fecha, "%Y-%m-%d").date() for fecha in data.excepciones})
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use YYYY-MM-DD"
+        )
+    
+    if vigente_hasta and vigente_hasta < vigente_desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid validity range. vigenteHasta must not be before vigenteDesde"
+        )
+    
+    return {
+        "diasSemana": sorted(set(data.diasSemana)),
+        "horaInicio": data.horaInicio,
+        "horaFin": data.horaFin,
+        "duracionCita": data.duracionCita,
+        "vigenteDesde": vigente_desde,
+        "vigenteHasta": vigente_hasta,
+        "excepciones": excepciones
+    }
+
+
+def template_to_response(template: AvailabilityTemplate) -> AvailabilityTemplateResponse:
+    return AvailabilityTemplateResponse(
+        id=str(template.id),
+        doctor_id=template.doctor_id,
+        doctorName=template.doctorName,
+        diasSemana=template.diasSemana,
+        horaInicio=template.horaInicio,
+        horaFin=template.horaFin,
+        duracionCita=template.duracionCita,
+        vigenteDesde=template.vigenteDesde.isoformat(),
+        vigenteHasta=template.vigenteHasta.isoformat() if template.vigenteHasta else None,
+        excepciones=[fecha.isoformat() for fecha in template.excepciones],
+        activo=template.activo,
+        created_at=template.created_at
+    )
+
+
+async def get_own_template(template_id: str, current_user: User) -> AvailabilityTemplate:
+    """Plantilla del médico autenticado (404 si no existe, 403 si es de otro médico)."""
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can manage their own availability templates."
+        )
+    
+    try:
+        template = await AvailabilityTemplate.get(template_id)
+    except Exception:
+        template = None
+    
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Availability template not found"
+        )
+    
+    if template.doctor_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. You can only manage your own availability templates."
+        )
+    
+    return template
+
+
+@router.get("/doctor/my-availability-templates", response_model=List[AvailabilityTemplateResponse])
+async def get_my_availability_templates(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtener las plantillas semanales de disponibilidad del médico autenticado.
+    Solo médicos pueden acceder a este endpoint.
+    """
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can access their own availability templates."
+        )
+    
+    templates = await AvailabilityTemplate.find(
+        {"doctor_id": str(current_user.id)}
+    ).sort([("vigenteDesde", -1)]).to_list()
+    
+    return [template_to_response(template) for template in templates]
+
+
+@router.post("/doctor/my-availability-templates", response_model=AvailabilityTemplateResponse, status_code=status.HTTP_201_CREATED)
+async def create_my_availability_template(
+    data: AvailabilityTemplateRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Crear una plantilla semanal de disponibilidad para el médico autenticado.
+    Reemplaza la creación de un documento por fecha: la plantilla se expande
+    al consultar la agenda. Las fechas puntuales (my-availability) la
+    sobrescriben y `excepciones` marca los días sin atención.
+    """
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can create their own availability templates."
+        )
+    
+    template = AvailabilityTemplate(
+        doctor_id=str(current_user.id),
+        doctorName=current_user.fullName,
+        activo=True,
+        **parse_template_request(data)
+    )
+    
+    await template.insert()
+    doctor_schedule_changed(template.doctor_id)
+    
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="availability_template_created",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "template_id": str(template.id),
+            "diasSemana": template.diasSemana,
+            "vigenteDesde": data.vigenteDesde
+        }
+    )
+    await audit_log.insert()
+    
+    return template_to_response(template)
+
+
+@router.put("/doctor/my-availability-templates/{template_id}", response_model=AvailabilityTemplateResponse)
+async def update_my_availability_template(
+    template_id: str,
+    data: AvailabilityTemplateRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Actualizar una plantilla del médico autenticado (incluidas sus excepciones).
+    """
+    template = await get_own_template(template_id, current_user)
+    
+    for field_name, value in parse_template_request(data).items():
+        setattr(template, field_name, value)
+    
+    await template.save()
+    doctor_schedule_changed(template.doctor_id)
+    
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="availability_template_updated",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "template_id": template_id,
+            "changes": data.dict()
+        }
+    )
+    await audit_log.insert()
+    
+    return template_to_response(template)
+
+
+@router.patch("/doctor/my-availability-templates/{template_id}/toggle", response_model=AvailabilityTemplateResponse)
+async def toggle_my_availability_template(
+    template_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Activar/desactivar una plantilla del médico autenticado.
+    """
+    template = await get_own_template(template_id, current_user)
+    
+    template.activo = not template.activo
+    await template.save()
+    doctor_schedule_changed(template.doctor_id)
+    
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="availability_template_toggled",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "template_id": template_id,
+            "activo": template.activo
+        }
+    )
+    await audit_log.insert()
+    
+    return template_to_response(template)
+
+
+@router.delete("/doctor/my-availability-templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_my_availability_template(
+    template_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Eliminar una plantilla del médico autenticado.
+    Las fechas puntuales ya creadas no se modifican.
+    """
+    template = await get_own_template(template_id, current_user)
+    
+    # Log de auditoría antes de eliminar
+    audit_log = AuditLog(
+        event="availability_template_deleted",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "template_id": template_id,
+            "diasSemana": template.diasSemana
+        }
+    )
+    await audit_log.insert()
+    
+    await template.delete()
+    doctor_schedule_changed(template.doctor_id)
     
     return None
 
@@ -873,11 +1521,18 @@ async def delete_my_availability(
 async def get_my_appointments(
     request: Request,
     estado: str = None,
+    desde: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD (inclusive)"),
+    hasta: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD (inclusive)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    include_notas: bool = Query(False, description="Incluir las notas de cada cita"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Obtener las citas del médico autenticado.
+    Obtener las citas del médico autenticado, por fecha ascendente y
+    paginadas por keyset (cabecera `X-Next-Cursor`).
     Solo médicos pueden acceder a este endpoint.
+    Responde 304 si `If-None-Match` coincide con el ETag vigente.
     """
     if current_user.role != UserRole.MEDICO:
         raise HTTPException(
@@ -885,96 +1540,81 @@ async def get_my_appointments(
             detail="Access denied. Only doctors can access their own appointments."
         )
     
-    query = {"doctor_id": str(current_user.id)}
+    query = {"doctor_id": str(current_user.id), **fecha_window(desde, hasta)}
     if estado:
         query["estado"] = estado
     
-    appointments = await Appointment.find(query).sort([("fecha", 1)]).to_list()
+    etag = await appointments_etag(query, limit, cursor, include_notas)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
-    return [
-        AppointmentResponse(
-            id=str(apt.id),
-            patient_id=apt.patient_id,
-            patientName=apt.patientName,
-            doctor_id=apt.doctor_id,
-            doctorName=apt.doctorName,
-            fecha=apt.fecha,
-            motivo=apt.motivo,
-            estado=apt.estado,
-            notas=apt.notas,
-            created_at=apt.created_at,
-            updated_at=apt.updated_at
-        )
-        for apt in appointments
-    ]
+    appointments, next_cursor = await page_appointment_rows(query, APPOINTMENTS_SORT_ASC, limit, cursor, include_notas)
+    
+    return model_list_response(AppointmentResponse, appointments, page_headers(next_cursor, etag_headers(etag)))
 
 
 @router.get("/doctor/my-patients")
 async def get_my_patients(
     request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
     current_user: User = Depends(get_current_user)
 ):
     """
     Obtener los pacientes asignados al médico autenticado.
-    Basado en las citas que ha tenido el médico.
-    """
-    from bson import ObjectId
+    Pacientes asignados en su historial o con citas con el médico, con la
+    última cita primero (los que no tienen citas al final).
     
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
+    """
     if current_user.role != UserRole.MEDICO:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Only doctors can access their own patients."
         )
     
-    # Buscar todas las citas del médico para obtener pacientes únicos
-    appointments = await Appointment.find(
-        {"doctor_id": str(current_user.id)}
-    ).to_list()
-    
-    # Obtener IDs únicos de pacientes
-    patient_ids = list(set([apt.patient_id for apt in appointments]))
-    
-    if not patient_ids:
-        return {"pacientes": []}
-    
-    # Buscar datos de los pacientes
-    patients = await User.find(
-        {"_id": {"$in": [ObjectId(pid) for pid in patient_ids]}}
-    ).to_list()
+    # Agregación por paciente (última cita y cantidad) + lectura de la página en users
+    try:
+        rows, next_cursor = await page_doctor_patients(str(current_user.id), limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Contar diagnósticos y última consulta por paciente
     result = []
-    for patient in patients:
-        patient_appointments = [a for a in appointments if a.patient_id == str(patient.id)]
-        
-        # Obtener última consulta
-        ultima_consulta = None
-        if patient_appointments:
-            sorted_appointments = sorted(patient_appointments, key=lambda x: x.fecha, reverse=True)
-            ultima_consulta = sorted_appointments[0].fecha.isoformat() if sorted_appointments else None
-        
+    for row in rows:
+        patient = row["patient"]
+        fecha_nacimiento = patient.get("fechaNacimiento")
         result.append({
-            "id": str(patient.id),
-            "full_name": patient.fullName,
-            "email": patient.email,
-            "cedula": patient.cedula,
-            "fecha_nacimiento": patient.fechaNacimiento.isoformat() if patient.fechaNacimiento else None,
-            "ultima_consulta": ultima_consulta,
-            "diagnosticos": len(patient_appointments)
+            "id": str(patient["_id"]),
+            "full_name": patient["fullName"],
+            "email": patient["email"],
+            "cedula": patient["cedula"],
+            "fecha_nacimiento": fecha_nacimiento.date().isoformat() if fecha_nacimiento else None,
+            "ultima_consulta": row["ultima_consulta"].isoformat() if row["ultima_consulta"] else None,
+            "diagnosticos": row["citas"]
         })
     
-    return {"pacientes": result}
+    return {"pacientes": result, "next_cursor": next_cursor}
 
 
 @router.get("/patient/my-appointments", response_model=List[AppointmentResponse])
 async def get_patient_appointments(
     request: Request,
     estado: Optional[str] = None,
+    desde: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD (inclusive)"),
+    hasta: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD (inclusive)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
+    include_notas: bool = Query(False, description="Incluir las notas de cada cita"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Obtener las citas del paciente autenticado.
+    Obtener las citas del paciente autenticado, más recientes primero y
+    paginadas por keyset (cabecera `X-Next-Cursor`).
     Solo pacientes pueden ver sus propias citas.
+    Responde 304 si `If-None-Match` coincide con el ETag vigente.
     """
     if current_user.role != UserRole.PACIENTE:
         raise HTTPException(
@@ -983,28 +1623,17 @@ async def get_patient_appointments(
         )
     
     # Buscar citas del paciente
-    query = {"patient_id": str(current_user.id)}
+    query = {"patient_id": str(current_user.id), **fecha_window(desde, hasta)}
     if estado:
         query["estado"] = estado
     
-    appointments = await Appointment.find(query).sort("-fecha").to_list()
+    etag = await appointments_etag(query, limit, cursor, include_notas)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
-    return [
-        AppointmentResponse(
-            id=str(apt.id),
-            patient_id=apt.patient_id,
-            patientName=apt.patientName,
-            doctor_id=apt.doctor_id,
-            doctorName=apt.doctorName,
-            fecha=apt.fecha,
-            motivo=apt.motivo,
-            estado=apt.estado,
-            notas=apt.notas,
-            created_at=apt.created_at,
-            updated_at=apt.updated_at
-        )
-        for apt in appointments
-    ]
+    appointments, next_cursor = await page_appointment_rows(query, APPOINTMENTS_SORT_DESC, limit, cursor, include_notas)
+    
+    return model_list_response(AppointmentResponse, appointments, page_headers(next_cursor, etag_headers(etag)))
 
 
 @router.patch("/doctor/appointments/{appointment_id}/complete", response_model=AppointmentResponse)
@@ -1055,12 +1684,15 @@ async def complete_appointment(
         )
     
     # Actualizar estado y notas
+    before = (appointment.fecha, appointment.estado)
     appointment.estado = "Completada"
     if notas:
         appointment.notas = notas
     appointment.updated_at = datetime.utcnow()
     
-    await appointment.save()
+    # Guardar liberando las celdas reservadas del horario
+    await save_reservation(appointment, None)
+    booking_changed(appointment.doctor_id, before, (appointment.fecha, appointment.estado))
     
     # Log de auditoría
     audit_log = AuditLog(
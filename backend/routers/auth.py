@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query, BackgroundTasks
 from datetime import datetime, timedelta
+from typing import Optional
 import os
 
 from models.models import User, AuditLog, UserStatus, UserRole, PatientHistory, SecuritySettings
@@ -14,6 +15,7 @@ from schemas.auth_schemas import (
     RegisterSecretaryRequest,
     RegisterPatientRequest,
     RegisterResponse,
+    PatientImportResponse,
     ChangePasswordRequest,
     ChangePasswordResponse,
     OTPVerifyRequest,
@@ -25,6 +27,8 @@ from services.security import verify_password, create_access_token, hash_passwor
 from services.auth import get_admin_user, get_secretary_user, get_current_user
 from services.email_service import generate_temporary_password, send_temporary_password_email, EmailServiceError
 from services.mfa import mfa_service
+from services.patient_import import parse_patient_rows, import_patients, send_import_credentials, IMPORT_MAX_ROWS
+from services.patient_history import build_initial_history
 
 router = APIRouter()
 
@@ -606,36 +610,7 @@ async def register_patient(
     await new_user.insert()
     
     # Crear PatientHistory inicial con datos demográficos
-    from models.models import MedicoAsignado, ContactoEmergencia
-    patient_history = PatientHistory(
-        patient_id=str(new_user.id),
-        # Datos demográficos
-        direccion=data.direccion,
-        ciudad=data.ciudad,
-        pais=data.pais,
-        genero=data.genero,
-        estadoCivil=data.estadoCivil,
-        ocupacion=data.ocupacion,
-        # Información médica
-        tipoSangre=data.grupoSanguineo or "No especificado",
-        alergias=[],
-        condicionesCronicas=[],
-        medicamentosActuales=[],
-        medicoAsignado=MedicoAsignado(
-            nombre="Por asignar",
-            especialidad="General",
-            telefono="N/A"
-        ),
-        contactoEmergencia=ContactoEmergencia(
-            nombre="Por definir",
-            relacion="N/A",
-            telefono="N/A"
-        ),
-        consultas=[],
-        vacunas=[],
-        antecedentesFamiliares=[],
-        proximaCita=None
-    )
+    patient_history = build_initial_history(new_user)
     
     await patient_history.insert()
     
@@ -678,6 +653,92 @@ async def register_patient(
 
 
 
+# Content-Type aceptados por la importación masiva
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+
+
+@router.post("/register-patients/bulk", response_model=PatientImportResponse, responses={400: {"model": ErrorResponse}})
+async def register_patients_bulk(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file_format: Optional[str] = Query(None, alias="format", description="csv o ndjson (por defecto según Content-Type)"),
+    dry_run: bool = Query(False, description="Solo validar filas y duplicados, sin crear nada"),
+    current_user: User = Depends(get_secretary_user)
+):
+    """
+    Importación masiva de pacientes (migración de clínicas).
+    Solo secretarios pueden crear pacientes.
+    
+    El cuerpo es el archivo crudo: CSV con encabezado (mismas columnas que
+    /register-patient) o NDJSON (un objeto por línea). Cada fila se valida
+    igual que el alta individual; las filas con error se reportan con su
+    número de línea y el resto se crea. Los emails con contraseñas
+    temporales se envían en segundo plano tras responder.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    file_format = file_format or IMPORT_CONTENT_TYPES.get(content_type)
+    if not file_format:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Unknown file format. Use ?format=csv|ndjson or a text/csv, application/x-ndjson Content-Type"}
+        )
+    
+    try:
+        rows, parse_errors = parse_patient_rows(await request.body(), file_format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": str(e)}
+        )
+    
+    if len(rows) + len(parse_errors) > IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": f"Too many rows. Maximum per import: {IMPORT_MAX_ROWS}"}
+        )
+    
+    ip_address = request.client.host
+    user_agent = request.headers.get("user-agent", "")
+    
+    report, credentials = await import_patients(
+        rows,
+        registered_by_id=str(current_user.id),
+        registered_by_email=current_user.email,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        dry_run=dry_run
+    )
+    report["total_rows"] += len(parse_errors)
+    report["failed"] += len(parse_errors)
+    report["errors"] = sorted(parse_errors + report["errors"], key=lambda e: e["row"])
+    
+    # Envío de credenciales después de responder (una sola conexión SMTP)
+    if credentials:
+        background_tasks.add_task(send_import_credentials, credentials, ip_address, user_agent)
+    
+    await log_audit_event(
+        event="patients_bulk_imported",
+        user_email=current_user.email,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        user_id=str(current_user.id),
+        details={
+            "format": file_format,
+            "dry_run": dry_run,
+            "total_rows": report["total_rows"],
+            "created": report["created"],
+            "failed": report["failed"]
+        }
+    )
+    
+    return PatientImportResponse(emails_queued=len(credentials), **report)
+
+
 async def log_audit_event(
     event: str,
     user_email: str,
@@ -0,0 +1,338 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
+from typing import Optional
+from datetime import datetime, date
+
+from models.models import ClinicalRecord, User, UserRole, AuditLog
+from schemas.clinical_record_schemas import (
+    ClinicalRecordCreateRequest,
+    ClinicalRecordUpdateRequest,
+    ClinicalRecordResponse,
+    ClinicalRecordsPageResponse,
+    LabTestsResponse,
+    LabSeriesResponse
+)
+from services.auth import get_current_user
+from services.patient_access import ensure_assigned_doctor, ensure_patient_access
+from services.serialization import model_response
+from services.clinical_records import page_clinical_record_summaries, clinical_record_to_response
+from services.field_encryption import seal_fields
+from services.lab_series import lab_series_cache, load_patient_labs, available_tests, build_series
+
+router = APIRouter()
+
+
+async def get_record_or_404(record_id: str) -> ClinicalRecord:
+    record = await ClinicalRecord.get(record_id)
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Clinical record not found"
+        )
+    return record
+
+
+def ensure_record_author(record: ClinicalRecord, current_user: User) -> None:
+    """Solo el médico que creó el registro puede modificarlo o eliminarlo."""
+    if current_user.role != UserRole.MEDICO or record.doctor_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only the doctor who created the record can modify it."
+        )
+
+
+@router.post("", response_model=ClinicalRecordResponse, status_code=status.HTTP_201_CREATED)
+async def create_clinical_record(
+    data: ClinicalRecordCreateRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Crear un registro clínico detallado.
+    Solo médicos asignados al paciente pueden crearlo.
+    """
+    if current_user.role != UserRole.MEDICO:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only doctors can create clinical records."
+        )
+
+    # Verificar que el paciente existe
+    patient = await User.get(data.patient_id)
+    if not patient or patient.role != UserRole.PACIENTE:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+
+    await ensure_assigned_doctor(data.patient_id, current_user, request, "unauthorized_clinical_record_attempt")
+
+    record = ClinicalRecord(
+        **data.model_dump(exclude={"fecha"}),
+        fecha=data.fecha or date.today(),
+        patientName=patient.fullName,
+        patientCedula=patient.cedula,
+        doctor_id=str(current_user.id),
+        doctorName=current_user.fullName
+    )
+    await record.insert()
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="clinical_record_created",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": data.patient_id,
+            "record_id": str(record.id),
+            "fecha": record.fecha.isoformat()
+        }
+    )
+    await audit_log.insert()
+
+    return clinical_record_to_response(record)
+
+
+@router.get("", response_model=ClinicalRecordsPageResponse)
+async def list_clinical_records(
+    request: Request,
+    patient_id: Optional[str] = Query(None, description="Registros de este paciente"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Listar registros clínicos (resumen), más recientes primero.
+    - Médicos: los de un paciente asignado (`patient_id`) o, sin él, los propios.
+    - Pacientes: solo los suyos.
+
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
+    El registro completo se obtiene en GET /registros-clinicos/{id}.
+    """
+    if current_user.role == UserRole.MEDICO:
+        if patient_id:
+            await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_clinical_records_access")
+            query = {"patient_id": patient_id}
+        else:
+            query = {"doctor_id": str(current_user.id)}
+    elif current_user.role == UserRole.PACIENTE:
+        if patient_id and patient_id != str(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied. You can only view your own clinical records."
+            )
+        query = {"patient_id": str(current_user.id)}
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied."
+        )
+
+    try:
+        registros, next_cursor = await page_clinical_record_summaries(query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="clinical_records_listed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "filters": query,
+            "viewer_role": current_user.role.value,
+            "returned": len(registros)
+        }
+    )
+    await audit_log.insert()
+
+    return model_response(ClinicalRecordsPageResponse, {"registros": registros, "next_cursor": next_cursor})
+
+
+@router.get("/pacientes/{patient_id}/laboratorios", response_model=LabTestsResponse)
+async def get_patient_lab_tests(
+    patient_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Pruebas de laboratorio con resultados registrados para el paciente.
+    """
+    await ensure_patient_access(patient_id, current_user, request)
+
+    records = await load_patient_labs(patient_id)
+    return LabTestsResponse(pruebas=available_tests(records))
+
+
+@router.get("/pacientes/{patient_id}/laboratorios/serie", response_model=LabSeriesResponse)
+async def get_patient_lab_series(
+    patient_id: str,
+    request: Request,
+    prueba: str = Query(..., min_length=1, description="Nombre de la prueba (sin distinguir mayúsculas ni tildes)"),
+    ventana: int = Query(3, ge=1, le=50, description="Puntos de la media móvil"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Serie temporal de una prueba de laboratorio del paciente, lista para
+    graficar: valores, rangos de referencia, media móvil, banderas fuera
+    de rango y tendencia lineal.
+
+    Los laboratorios de cada registro se parsean una sola vez (caché por
+    revisión del registro) y los cálculos se hacen vectorizados con NumPy.
+    """
+    await ensure_patient_access(patient_id, current_user, request)
+
+    records = await load_patient_labs(patient_id)
+    series = build_series(records, prueba, ventana)
+    if series is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No results for lab test '{prueba}'"
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="lab_series_viewed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": patient_id,
+            "prueba": series["prueba"],
+            "points": series["puntos"],
+            "viewer_role": current_user.role.value
+        }
+    )
+    await audit_log.insert()
+
+    return model_response(LabSeriesResponse, series)
+
+
+@router.get("/{record_id}", response_model=ClinicalRecordResponse)
+async def get_clinical_record(
+    record_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtener un registro clínico completo.
+    Lo pueden ver el médico que lo creó, el médico asignado al paciente y el propio paciente.
+    """
+    record = await get_record_or_404(record_id)
+
+    if current_user.role == UserRole.PACIENTE:
+        if record.patient_id != str(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied. You can only view your own clinical records."
+            )
+    elif current_user.role == UserRole.MEDICO:
+        if record.doctor_id != str(current_user.id):
+            await ensure_assigned_doctor(record.patient_id, current_user, request, "unauthorized_clinical_records_access")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied."
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="clinical_record_viewed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": record.patient_id,
+            "record_id": record_id,
+            "viewer_role": current_user.role.value
+        }
+    )
+    await audit_log.insert()
+
+    return clinical_record_to_response(record)
+
+
+@router.put("/{record_id}", response_model=ClinicalRecordResponse)
+async def update_clinical_record(
+    record_id: str,
+    data: ClinicalRecordUpdateRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Actualizar un registro clínico (solo los campos enviados).
+    Solo el médico que lo creó puede actualizarlo.
+    """
+    record = await get_record_or_404(record_id)
+    ensure_record_author(record, current_user)
+
+    update_data = data.model_dump(exclude_none=True)
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+
+    # $set parcial: no reescribe el documento completo (texto clínico cifrado)
+    update_data["ultimaModificacion"] = datetime.utcnow()
+    await record.set(seal_fields(dict(update_data), record))
+    lab_series_cache.invalidate(record_id)
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="clinical_record_updated",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": record.patient_id,
+            "record_id": record_id,
+            "fields_updated": [field for field in update_data if field != "ultimaModificacion"]
+        }
+    )
+    await audit_log.insert()
+
+    return clinical_record_to_response(record)
+
+
+@router.delete("/{record_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_clinical_record(
+    record_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Eliminar un registro clínico.
+    Solo el médico que lo creó puede eliminarlo.
+    """
+    record = await get_record_or_404(record_id)
+    ensure_record_author(record, current_user)
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="clinical_record_deleted",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": record.patient_id,
+            "record_id": record_id,
+            "fecha": record.fecha.isoformat()
+        }
+    )
+    await audit_log.insert()
+
+    await record.delete()
+    lab_series_cache.invalidate(record_id)
+
+    return None
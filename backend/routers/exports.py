@@ -0,0 +1,164 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi.responses import FileResponse
+
+from models.models import User, AuditLog
+from schemas.export_schemas import ExportJobResponse
+from services.auth import get_current_user
+from services.exports import (
+    export_manager,
+    ExportJob,
+    ExportStatus,
+    ExportLimitError,
+    summary_revision_key,
+    load_summary_data
+)
+from services.integrity import verify_and_get_history_document
+from services.patient_access import ensure_patient_access
+
+router = APIRouter()
+
+
+def job_to_response(job: ExportJob, request: Request) -> ExportJobResponse:
+    response = ExportJobResponse(
+        job_id=job.id,
+        patient_id=job.patient_id,
+        status=job.status.value,
+        cached=job.cached,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        error=job.error
+    )
+    if job.status == ExportStatus.COMPLETADO:
+        export_file = export_manager.cached_file(job.revision_key)
+        if export_file:
+            response.size = export_file.size
+            response.pages = export_file.pages
+            response.download_url = str(request.url_for("download_export", token=job.download_token))
+    return response
+
+
+@router.post("/pacientes/{patient_id}/resumen", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_summary_export(
+    patient_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Solicitar el resumen clínico imprimible (PDF) de un paciente.
+    Pacientes: el suyo. Médicos: pacientes asignados.
+
+    El PDF se genera en segundo plano; consultar GET /exports/{job_id}
+    hasta que el estado sea `completado` y descargar desde `download_url`.
+    Si el historial no cambió desde la última exportación, el trabajo se
+    completa de inmediato con el mismo archivo.
+    """
+    await ensure_patient_access(patient_id, current_user, request)
+
+    # Historial (caché cifrada o MongoDB) verificado por integridad (PBI-20)
+    history, access_allowed, error_msg = await verify_and_get_history_document(
+        patient_id,
+        current_user,
+        request.client.host,
+        request.headers.get("user-agent", "")
+    )
+
+    if not history:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient history not found"
+        )
+
+    if not access_allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=error_msg
+        )
+
+    revision_key = await summary_revision_key(patient_id, history)
+
+    try:
+        job = export_manager.submit(
+            str(current_user.id),
+            patient_id,
+            revision_key,
+            lambda: load_summary_data(patient_id, history)
+        )
+    except ExportLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="summary_export_requested",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": patient_id,
+            "history_id": str(history["_id"]),
+            "job_id": job.id,
+            "cached": job.cached
+        }
+    )
+    await audit_log.insert()
+
+    return job_to_response(job, request)
+
+
+@router.get("/descargar/{token}", name="download_export")
+async def download_export(
+    token: str,
+    request: Request
+):
+    """
+    Descargar el PDF de una exportación completada.
+    El token (de `download_url`) es la credencial: vence con el trabajo.
+    Soporta descargas parciales (cabecera Range, respuesta 206).
+    """
+    found = export_manager.file_for_token(token)
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export not found or expired"
+        )
+    job, export_file = found
+
+    # Solo se audita la descarga inicial (no cada rango)
+    if not request.headers.get("range"):
+        audit_log = AuditLog(
+            event="summary_export_downloaded",
+            user_id=job.user_id,
+            ip_address=request.client.host,
+            user_agent=request.headers.get("user-agent", ""),
+            details={"patient_id": job.patient_id, "job_id": job.id}
+        )
+        await audit_log.insert()
+
+    return FileResponse(
+        export_file.path,
+        media_type="application/pdf",
+        filename=f"resumen_clinico_{job.patient_id}.pdf",
+        headers={"Cache-Control": "private, no-store"}
+    )
+
+
+@router.get("/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Consultar el estado de una exportación propia.
+    """
+    job = export_manager.get(job_id)
+    if not job or job.user_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export not found"
+        )
+
+    return job_to_response(job, request)
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
 from typing import List, Optional
 from datetime import datetime, date
 
-from models.models import PatientHistory, User, UserRole, AuditLog, Consulta, MedicoAsignado, ContactoEmergencia
+from models.models import PatientHistory, ConsultaRecord, User, UserRole, AuditLog, Consulta
 from schemas.patient_schemas import (
     PatientHistoryResponse,
+    PatientHistoryFieldsResponse,
+    HistorySection,
     ConsultaCreateRequest,
     ConsultaUpdateRequest,
     ConsultaResponse,
@@ -13,21 +15,85 @@ from schemas.patient_schemas import (
     VacunaResponse,
     ProximaCitaResponse,
     PatientHistoryUpdateRequest,
-    PatientMinimalResponse
+    PatientMinimalResponse,
+    PatientDirectoryItem,
+    ConsultasPageResponse,
+    TimelinePageResponse,
+    HistoryAccessView
 )
 from services.auth import get_current_user
+from services.pagination import apply_cursor, split_page, prefix_regex
+from services.http_cache import make_etag, etag_matches, etag_headers, not_modified
+from services.serialization import model_response
+from services.search import search_terms_filter
+from services.integrity import integrity_service, verify_and_get_history_document, update_history_fields, touch_history
+from services.history_cache import history_cache
+from services.consultas import (
+    latest_consultas,
+    page_consultas,
+    consultas_by_id,
+    build_record,
+    embedded_consultas,
+    migrate_embedded_consultas
+)
+from services.timeline import TIMELINE_TYPES, page_timeline
+from services.patient_access import ensure_assigned_doctor
+from services.assignments import assign_doctor
+from services.patient_history import build_initial_history
 
 router = APIRouter()
 
+# Mensaje para historiales bloqueados por integridad (PBI-20)
+HISTORY_CORRUPTED_DETAIL = "Historial bloqueado por problemas de integridad. Contacte al administrador."
+
+
+def consulta_to_response(consulta: ConsultaRecord) -> ConsultaResponse:
+    """Convierte un ConsultaRecord al formato de la API."""
+    return ConsultaResponse(
+        id=consulta.consulta_id,
+        fecha=consulta.fecha,
+        motivo=consulta.motivo,
+        diagnostico=consulta.diagnostico,
+        tratamiento=consulta.tratamiento,
+        notasMedico=consulta.notasMedico
+    )
+
+
+async def ensure_consultas_intact(consultas: List[ConsultaRecord], current_user: User, request: Request) -> None:
+    """
+    Verifica el hash de las consultas a devolver (PBI-20). Si alguna no
+    coincide queda marcada, junto con su historial, y la lectura se bloquea
+    para no administradores.
+    """
+    intact = await integrity_service.verify_consultas(consultas, request.client.host)
+    if not intact and current_user.role != UserRole.ADMINISTRADOR:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=HISTORY_CORRUPTED_DETAIL
+        )
+
+
+# Ordenamiento del directorio de pacientes (cubierto por el índice role+fullName+_id)
+PATIENT_DIRECTORY_SORT = [("fullName", 1), ("_id", 1)]
+
 
 @router.get("/listado-pacientes")
 async def list_patients_minimal(
     request: Request,
+    search: Optional[str] = Query(None, min_length=1, max_length=100, description="Prefijo de nombre o cédula"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    include_total: bool = Query(False, description="Incluir el total de pacientes que cumplen el filtro"),
     current_user: User = Depends(get_current_user)
 ):
     """
     Listar pacientes con datos mínimos para agendamiento de citas.
     Secretarios y Administradores pueden acceder a este listado.
+    
+    Paginación por keyset sobre (fullName, _id): usar `next_cursor` de la
+    respuesta como `cursor` para pedir la página siguiente.
+    `search` filtra por prefijo de cédula (si es numérico) o de nombre/apellido,
+    sin distinguir mayúsculas ni tildes.
     """
     # Verificar que el usuario es un secretario o administrador
     if current_user.role not in [UserRole.SECRETARIO, UserRole.ADMINISTRADOR]:
@@ -46,8 +112,30 @@ async def list_patients_minimal(
             detail="Access denied. Only secretaries and administrators can access patient list."
         )
     
-    # Obtener todos los pacientes (solo usuarios con rol PACIENTE)
-    patients = await User.find({"role": UserRole.PACIENTE.value}).to_list()
+    # Solo usuarios con rol PACIENTE
+    query = {"role": UserRole.PACIENTE.value}
+    if search:
+        search = search.strip()
+        if search.isdigit():
+            query["cedula"] = prefix_regex(search)
+        else:
+            query.update(search_terms_filter(search))
+    
+    try:
+        page_query = apply_cursor(query, PATIENT_DIRECTORY_SORT, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Proyección: solo los 7 campos devueltos; limit + 1 para saber si hay más
+    patients = await User.find(page_query).sort(PATIENT_DIRECTORY_SORT).limit(limit + 1).project(
+        PatientDirectoryItem
+    ).to_list()
+    patients, next_cursor = split_page(patients, PATIENT_DIRECTORY_SORT, limit)
+    
+    total = await User.find(query).count() if include_total else None
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -56,13 +144,14 @@ async def list_patients_minimal(
         user_id=str(current_user.id),
         ip_address=request.client.host,
         user_agent=request.headers.get("user-agent", ""),
-        details={"total_patients": len(patients)}
+        details={"returned_patients": len(patients), "search": search, "paged": cursor is not None}
     )
     await audit_log.insert()
     
     # Retornar datos con estructura esperada por el frontend
     return {
-        "total": len(patients),
+        "total": total,
+        "next_cursor": next_cursor,
         "patients": [
             {
                 "id": str(patient.id),
@@ -71,21 +160,137 @@ async def list_patients_minimal(
                 "fechaNacimiento": patient.fechaNacimiento.isoformat() if patient.fechaNacimiento else None,
                 "telefonoContacto": patient.telefonoContacto,
                 "email": patient.email,
-                "status": patient.status.value if patient.status else "Activo"
+                "status": patient.status or "Activo"
             }
             for patient in patients
         ]
     }
 
 
-@router.get("/mi-historial", response_model=PatientHistoryResponse)
-async def get_my_history(
+# Secciones del historial que pueden pedirse con `fields`
+HISTORY_FIELDS = [field for field in PatientHistoryFieldsResponse.model_fields if field != "id"]
+
+# Secciones del historial que lee la línea de tiempo (eventos embebidos y consultas sin migrar)
+TIMELINE_HISTORY_FIELDS = ["vacunas", "proximaCita", "consultas"]
+
+# Endpoints por sección: sección -> campos del historial que devuelve
+HISTORY_SECTIONS = {
+    HistorySection.ALERGIAS: ["alergias"],
+    HistorySection.VACUNAS: ["vacunas"],
+    HistorySection.CONSULTAS: ["consultas"],
+    HistorySection.CONTACTO: ["contactoEmergencia"],
+    HistorySection.MEDICAMENTOS: ["medicamentosActuales"],
+    HistorySection.CONDICIONES: ["condicionesCronicas"],
+    HistorySection.ANTECEDENTES: ["antecedentesFamiliares"],
+    HistorySection.DEMOGRAFICOS: ["direccion", "ciudad", "pais", "genero", "estadoCivil", "ocupacion"],
+}
+
+
+def parse_history_fields(fields: Optional[str]) -> List[str]:
+    """
+    Interpreta el parámetro `fields` (lista separada por comas).
+    Sin `fields` se devuelve el historial completo.
+    """
+    if not fields:
+        return HISTORY_FIELDS
+    
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in selected if f not in HISTORY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown history fields: {', '.join(unknown)}. Allowed: {', '.join(HISTORY_FIELDS)}"
+        )
+    return selected
+
+
+async def build_history_fields(document: dict, fields: List[str], current_user: User, request: Request) -> dict:
+    """
+    Construye los datos de la respuesta con solo las secciones pedidas,
+    directamente desde el documento crudo (sin documento Beanie).
+    """
+    data = {field: document.get(field) for field in fields if field != "consultas"}
+    
+    if "consultas" in fields:
+        # Solo las últimas consultas; el resto se pagina en /consultas.
+        # Las aún embebidas (historial sin migrar) se leen sin escribir
+        embedded = await embedded_consultas(document["patient_id"]) if document.get("consultas") else []
+        consultas = await latest_consultas(document["patient_id"], embedded=embedded)
+        await ensure_consultas_intact(consultas, current_user, request)
+        data["consultas"] = [consulta_to_response(c) for c in consultas]
+    
+    data["id"] = str(document["_id"])
+    return data
+
+
+def history_etag(document: dict, fields: List[str]) -> str:
+    """
+    ETag del historial: cambia con cada escritura (revision, ultimaModificacion,
+    hash) y depende de las secciones pedidas. Crear una consulta también
+    incrementa la revisión del historial (touch_history).
+    """
+    return make_etag(
+        document["_id"],
+        document.get("revision", 0),
+        document.get("ultimaModificacion"),
+        document.get("integrity_hash"),
+        ",".join(fields)
+    )
+
+
+async def read_history_sections(
+    patient_id: str,
+    fields: List[str],
+    current_user: User,
+    request: Request
+):
+    """
+    Lee y verifica (PBI-20) el historial para las secciones pedidas: el
+    historial completo se lee entero (y queda en history_cache); las
+    secciones sueltas y los chequeos de ETag (`fields` vacío), proyectados.
+    """
+    return await verify_and_get_history_document(
+        patient_id,
+        current_user,
+        request.client.host,
+        request.headers.get("user-agent", ""),
+        fields=None if set(HISTORY_FIELDS) <= set(fields) else fields
+    )
+
+
+async def reread_history_sections(
+    patient_id: str,
+    fields: List[str],
+    current_user: User,
+    request: Request
+) -> dict:
+    """
+    Segunda lectura tras un chequeo de ETag que no coincidió: ahora sí con
+    las secciones pedidas.
+    """
+    history, access_allowed, error_msg = await read_history_sections(patient_id, fields, current_user, request)
+    if not history:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Medical history not found"
+        )
+    if not access_allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=error_msg
+        )
+    return history
+
+
+async def read_my_history(
     request: Request,
-    current_user: User = Depends(get_current_user)
+    current_user: User,
+    fields: List[str]
 ):
     """
-    Obtener el historial clínico del paciente autenticado.
+    Lee las secciones pedidas del historial del paciente autenticado.
     Solo pacientes pueden ver su propio historial.
+    Responde 304 si `If-None-Match` coincide con el ETag vigente.
     """
     # Verificar que el usuario es un paciente
     if current_user.role != UserRole.PACIENTE:
@@ -105,8 +310,15 @@ async def get_my_history(
             detail="Access denied. This action is not permitted."
         )
     
-    # Buscar historial del paciente
-    history = await PatientHistory.find_one({"patient_id": str(current_user.id)})
+    # Buscar historial del paciente (caché cifrada o MongoDB) y verificar integridad (PBI-20)
+    # GET condicional: primero solo los campos de control
+    conditional = bool(request.headers.get("if-none-match"))
+    history, access_allowed, error_msg = await read_history_sections(
+        str(current_user.id),
+        [] if conditional else fields,
+        current_user,
+        request
+    )
     
     if not history:
         raise HTTPException(
@@ -114,6 +326,16 @@ async def get_my_history(
             detail="Medical history not found"
         )
     
+    if not access_allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=error_msg
+        )
+    
+    # GET condicional: sin cambios no se construye la respuesta
+    etag = history_etag(history, fields)
+    not_changed = etag_matches(request, etag)
+    
     # Log de auditoría para acceso exitoso
     audit_log = AuditLog(
         event="patient_history_viewed",
@@ -121,49 +343,57 @@ async def get_my_history(
         user_id=str(current_user.id),
         ip_address=request.client.host,
         user_agent=request.headers.get("user-agent", ""),
-        details={"history_id": str(history.id)}
+        details={"history_id": str(history["_id"]), "fields": fields, "not_modified": not_changed}
     )
     await audit_log.insert()
     
-    # Construir response
-    return PatientHistoryResponse(
-        id=str(history.id),
-        tipoSangre=history.tipoSangre,
-        alergias=history.alergias,
-        condicionesCronicas=history.condicionesCronicas,
-        medicamentosActuales=history.medicamentosActuales,
-        medicoAsignado=MedicoAsignadoResponse(**history.medicoAsignado.dict()),
-        contactoEmergencia=ContactoEmergenciaResponse(**history.contactoEmergencia.dict()),
-        consultas=[
-            ConsultaResponse(
-                id=c.id,
-                fecha=c.fecha,
-                motivo=c.motivo,
-                diagnostico=c.diagnostico,
-                tratamiento=c.tratamiento,
-                notasMedico=c.notasMedico
-            )
-            for c in history.consultas
-        ],
-        vacunas=[
-            VacunaResponse(**v.dict())
-            for v in history.vacunas
-        ],
-        antecedentesFamiliares=history.antecedentesFamiliares,
-        proximaCita=ProximaCitaResponse(**history.proximaCita.dict()) if history.proximaCita else None,
-        ultimaModificacion=history.ultimaModificacion
-    )
+    if not_changed:
+        return not_modified(etag)
+    
+    if conditional:
+        history = await reread_history_sections(str(current_user.id), fields, current_user, request)
+    
+    result = await build_history_fields(history, fields, current_user, request)
+    return model_response(PatientHistoryFieldsResponse, result, etag_headers(etag), exclude_unset=True)
 
 
-@router.get("/pacientes/{patient_id}/historial", response_model=PatientHistoryResponse)
-async def get_patient_history(
-    patient_id: str,
+@router.get("/mi-historial", response_model=PatientHistoryFieldsResponse, response_model_exclude_unset=True)
+async def get_my_history(
     request: Request,
+    fields: Optional[str] = Query(None, description="Secciones a devolver, separadas por comas (ej. alergias,vacunas)"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Obtener el historial clínico de un paciente específico.
+    Obtener el historial clínico del paciente autenticado.
+    Solo pacientes pueden ver su propio historial.
+    
+    Con `fields` solo se leen y devuelven las secciones indicadas.
+    """
+    return await read_my_history(request, current_user, parse_history_fields(fields))
+
+
+@router.get("/mi-historial/{seccion}", response_model=PatientHistoryFieldsResponse, response_model_exclude_unset=True)
+async def get_my_history_section(
+    seccion: HistorySection,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtener una sola sección del historial del paciente autenticado.
+    """
+    return await read_my_history(request, current_user, HISTORY_SECTIONS[seccion])
+
+
+async def read_patient_history(
+    patient_id: str,
+    request: Request,
+    current_user: User,
+    fields: List[str]
+):
+    """
+    Lee las secciones pedidas del historial de un paciente.
     Solo médicos pueden ver historiales de sus pacientes asignados.
+    Responde 304 si `If-None-Match` coincide con el ETag vigente.
     """
     # Verificar que el usuario es un médico
     if current_user.role != UserRole.MEDICO:
@@ -183,41 +413,37 @@ async def get_patient_history(
         )
     
     # Verificar que el paciente existe
-    patient = await User.get(patient_id)
-    if not patient or patient.role != UserRole.PACIENTE:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Patient not found"
-        )
+    # (un historial en caché solo puede pertenecer a un paciente ya validado)
+    patient = None
+    if patient_id not in history_cache:
+        patient = await User.get(patient_id)
+        if not patient or patient.role != UserRole.PACIENTE:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Patient not found"
+            )
     
-    # Buscar historial del paciente
-    history = await PatientHistory.find_one({"patient_id": patient_id})
+    # Verificar que el médico está asignado a este paciente antes de leer el historial
+    # Si no tiene médico asignado (registro antiguo), no se valida estrictamente
+    await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_patient_access")
+    
+    # Buscar historial del paciente (caché cifrada o MongoDB) y verificar integridad (PBI-20)
+    # GET condicional: primero solo los campos de control
+    conditional = bool(request.headers.get("if-none-match"))
+    history, access_allowed, error_msg = await read_history_sections(
+        patient_id,
+        [] if conditional else fields,
+        current_user,
+        request
+    )
     
     # Si no existe historial, crear uno automáticamente
     if not history:
-        history = PatientHistory(
-            patient_id=patient_id,
-            tipoSangre="No especificado",
-            alergias=[],
-            condicionesCronicas=[],
-            medicamentosActuales=[],
-            medicoAsignado=MedicoAsignado(
-                nombre=current_user.fullName,
-                especialidad=current_user.especialidad or "General",
-                telefono=current_user.telefonoContacto or ""
-            ),
-            contactoEmergencia=ContactoEmergencia(
-                nombre="No registrado",
-                relacion="",
-                telefono=""
-            ),
-            consultas=[],
-            vacunas=[],
-            antecedentesFamiliares=[],
-            ultimaModificacion=datetime.utcnow()
-        )
+        # `patient` no se leyó si el historial estaba en caché (entonces existe)
+        new_history = build_initial_history(patient or await User.get(patient_id), current_user)
         
-        await history.insert()
+        await new_history.insert()
+        await assign_doctor(str(current_user.id), patient_id)
         
         # Log de auditoría para creación automática
         audit_log_create = AuditLog(
@@ -228,40 +454,29 @@ async def get_patient_history(
             user_agent=request.headers.get("user-agent", ""),
             details={
                 "patient_id": patient_id,
-                "history_id": str(history.id),
+                "history_id": str(new_history.id),
                 "doctor_id": str(current_user.id)
             }
         )
         await audit_log_create.insert()
-    
-    # Verificar que el médico está asignado a este paciente
-    # El médico debe estar asignado al paciente para poder ver su historial
-    # Si medicoId es None (registro antiguo), usar el nombre para compatibilidad
-    assigned_doctor_id = history.medicoAsignado.medicoId or None
-    if assigned_doctor_id and assigned_doctor_id != str(current_user.id):
-        # Log de auditoría para intento de acceso no autorizado
-        audit_log = AuditLog(
-            event="unauthorized_patient_access",
-            user_email=current_user.email,
-            user_id=str(current_user.id),
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent", ""),
-            details={
-                "reason": "doctor_not_assigned_to_patient",
-                "patient_id": patient_id,
-                "assigned_doctor_id": history.medicoAsignado.medicoId,
-                "assigned_doctor": history.medicoAsignado.nombre,
-                "requesting_doctor": current_user.fullName,
-                "requesting_doctor_id": str(current_user.id)
-            }
-        )
-        await audit_log.insert()
         
+        history, access_allowed, error_msg = await read_history_sections(
+            patient_id,
+            [] if conditional else fields,
+            current_user,
+            request
+        )
+    
+    if not access_allowed:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. You are not assigned to this patient."
+            detail=error_msg
         )
     
+    # GET condicional: sin cambios no se construye la respuesta
+    etag = history_etag(history, fields)
+    not_changed = etag_matches(request, etag)
+    
     # Log de auditoría
     audit_log = AuditLog(
         event="doctor_viewed_patient_history",
@@ -271,47 +486,51 @@ async def get_patient_history(
         user_agent=request.headers.get("user-agent", ""),
         details={
             "patient_id": patient_id,
-            "history_id": str(history.id)
+            "history_id": str(history["_id"]),
+            "fields": fields,
+            "not_modified": not_changed
         }
     )
     await audit_log.insert()
     
-    # Construir response
-    return PatientHistoryResponse(
-        id=str(history.id),
-        # Datos demográficos
-        direccion=history.direccion,
-        ciudad=history.ciudad,
-        pais=history.pais,
-        genero=history.genero,
-        estadoCivil=history.estadoCivil,
-        ocupacion=history.ocupacion,
-        # Información médica
-        tipoSangre=history.tipoSangre,
-        alergias=history.alergias,
-        condicionesCronicas=history.condicionesCronicas,
-        medicamentosActuales=history.medicamentosActuales,
-        medicoAsignado=MedicoAsignadoResponse(**history.medicoAsignado.dict()),
-        contactoEmergencia=ContactoEmergenciaResponse(**history.contactoEmergencia.dict()),
-        consultas=[
-            ConsultaResponse(
-                id=c.id,
-                fecha=c.fecha,
-                motivo=c.motivo,
-                diagnostico=c.diagnostico,
-                tratamiento=c.tratamiento,
-                notasMedico=c.notasMedico
-            )
-            for c in history.consultas
-        ],
-        vacunas=[
-            VacunaResponse(**v.dict())
-            for v in history.vacunas
-        ],
-        antecedentesFamiliares=history.antecedentesFamiliares,
-        proximaCita=ProximaCitaResponse(**history.proximaCita.dict()) if history.proximaCita else None,
-        ultimaModificacion=history.ultimaModificacion
-    )
+    if not_changed:
+        return not_modified(etag)
+    
+    if conditional:
+        history = await reread_history_sections(patient_id, fields, current_user, request)
+    
+    result = await build_history_fields(history, fields, current_user, request)
+    return model_response(PatientHistoryFieldsResponse, result, etag_headers(etag), exclude_unset=True)
+
+
+@router.get("/pacientes/{patient_id}/historial", response_model=PatientHistoryFieldsResponse, response_model_exclude_unset=True)
+async def get_patient_history(
+    patient_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Secciones a devolver, separadas por comas (ej. alergias,vacunas)"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtener el historial clínico de un paciente específico.
+    Solo médicos pueden ver historiales de sus pacientes asignados.
+    
+    Con `fields` solo se leen y devuelven las secciones indicadas.
+    """
+    return await read_patient_history(patient_id, request, current_user, parse_history_fields(fields))
+
+
+@router.get("/pacientes/{patient_id}/historial/{seccion}", response_model=PatientHistoryFieldsResponse, response_model_exclude_unset=True)
+async def get_patient_history_section(
+    patient_id: str,
+    seccion: HistorySection,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtener una sola sección del historial de un paciente.
+    Para todas las consultas (paginadas) usar /pacientes/{patient_id}/consultas.
+    """
+    return await read_patient_history(patient_id, request, current_user, HISTORY_SECTIONS[seccion])
 
 
 @router.post("/pacientes/{patient_id}/consultas", response_model=ConsultaResponse, status_code=status.HTTP_201_CREATED)
@@ -340,8 +559,12 @@ async def create_consulta(
             detail="Patient not found"
         )
     
-    # Buscar historial del paciente
-    history = await PatientHistory.find_one({"patient_id": patient_id})
+    # Verificar que el médico está asignado a este paciente (índice de asignaciones)
+    # Si no tiene médico asignado (registro antiguo), no se valida estrictamente
+    await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_consultation_attempt")
+    
+    # Buscar historial del paciente (solo los campos de control de acceso)
+    history = await PatientHistory.find_one({"patient_id": patient_id}).project(HistoryAccessView)
     
     if not history:
         raise HTTPException(
@@ -349,46 +572,33 @@ async def create_consulta(
             detail="Patient history not found. Cannot create consultation."
         )
     
-    # Verificar que el médico está asignado a este paciente
-    # Si medicoId es None (registro antiguo), no validar estrictamente
-    assigned_doctor_id = history.medicoAsignado.medicoId or None
-    if assigned_doctor_id and assigned_doctor_id != str(current_user.id):
-        audit_log = AuditLog(
-            event="unauthorized_consultation_attempt",
-            user_email=current_user.email,
-            user_id=str(current_user.id),
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent", ""),
-            details={
-                "reason": "doctor_not_assigned_to_patient",
-                "patient_id": patient_id,
-                "assigned_doctor_id": history.medicoAsignado.medicoId,
-                "assigned_doctor": history.medicoAsignado.nombre,
-                "requesting_doctor": current_user.fullName,
-                "requesting_doctor_id": str(current_user.id)
-            }
-        )
-        await audit_log.insert()
-        
+    if history.is_corrupted:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. You are not assigned to this patient."
+            detail=HISTORY_CORRUPTED_DETAIL
         )
     
-    # Crear nueva consulta
-    nueva_consulta = Consulta(
-        id=f"cons_{datetime.utcnow().timestamp()}",
-        fecha=date.today(),
-        motivo=data.motivo,
-        diagnostico=data.diagnostico,
-        tratamiento=data.tratamiento,
-        notasMedico=data.notasMedico
+    # Mover consultas embebidas (historiales no migrados) antes de agregar
+    if history.consultas:
+        await migrate_embedded_consultas(await PatientHistory.get(history.id))
+    
+    # Crear nueva consulta como documento propio
+    nueva_consulta = build_record(
+        Consulta(
+            id=f"cons_{datetime.utcnow().timestamp()}",
+            fecha=date.today(),
+            motivo=data.motivo,
+            diagnostico=data.diagnostico,
+            tratamiento=data.tratamiento,
+            notasMedico=data.notasMedico
+        ),
+        patient_id=patient_id,
+        doctor_id=str(current_user.id)
     )
+    await nueva_consulta.insert()
     
-    # Agregar consulta al historial (al inicio para orden DESC)
-    history.consultas.insert(0, nueva_consulta)
-    history.ultimaModificacion = datetime.utcnow()
-    await history.save()
+    # El contenido hasheado del historial no cambia: solo ultimaModificacion/revision
+    await touch_history(patient_id)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -399,31 +609,28 @@ async def create_consulta(
         user_agent=request.headers.get("user-agent", ""),
         details={
             "patient_id": patient_id,
-            "consulta_id": nueva_consulta.id,
+            "consulta_id": nueva_consulta.consulta_id,
             "doctor_name": current_user.fullName
         }
     )
     await audit_log.insert()
     
-    return ConsultaResponse(
-        id=nueva_consulta.id,
-        fecha=nueva_consulta.fecha,
-        motivo=nueva_consulta.motivo,
-        diagnostico=nueva_consulta.diagnostico,
-        tratamiento=nueva_consulta.tratamiento,
-        notasMedico=nueva_consulta.notasMedico
-    )
+    return consulta_to_response(nueva_consulta)
 
 
-@router.get("/pacientes/{patient_id}/consultas", response_model=List[ConsultaResponse])
+@router.get("/pacientes/{patient_id}/consultas", response_model=ConsultasPageResponse)
 async def get_patient_consultas(
     patient_id: str,
     request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Obtener todas las consultas de un paciente.
+    Obtener las consultas de un paciente, más recientes primero.
     Pacientes pueden ver sus propias consultas, médicos pueden ver las de sus pacientes.
+    
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
     """
     # Verificar permisos
     if current_user.role == UserRole.PACIENTE:
@@ -435,39 +642,118 @@ async def get_patient_consultas(
             )
     elif current_user.role == UserRole.MEDICO:
         # Médicos solo pueden ver consultas de sus pacientes asignados
-        # Buscar historial primero para verificar asignación
-        temp_history = await PatientHistory.find_one({"patient_id": patient_id})
-        assigned_doctor_id = temp_history.medicoAsignado.medicoId if temp_history else None
-        if temp_history and assigned_doctor_id and assigned_doctor_id != str(current_user.id):
-            audit_log = AuditLog(
-                event="unauthorized_consultations_access",
-                user_email=current_user.email,
-                user_id=str(current_user.id),
-                ip_address=request.client.host,
-                user_agent=request.headers.get("user-agent", ""),
-                details={
-                    "reason": "doctor_not_assigned_to_patient",
-                    "patient_id": patient_id,
-                    "assigned_doctor_id": temp_history.medicoAsignado.medicoId,
-                    "assigned_doctor": temp_history.medicoAsignado.nombre,
-                    "requesting_doctor": current_user.fullName,
-                    "requesting_doctor_id": str(current_user.id)
-                }
-            )
-            await audit_log.insert()
-            
+        await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_consultations_access")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied."
+        )
+    
+    # Buscar historial (solo los campos de control de acceso)
+    history = await PatientHistory.find_one({"patient_id": patient_id}).project(HistoryAccessView)
+    
+    if not history:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient history not found"
+        )
+    
+    if history.is_corrupted and current_user.role != UserRole.ADMINISTRADOR:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=HISTORY_CORRUPTED_DETAIL
+        )
+    
+    # Consultas aún embebidas (historial sin migrar): se leen sin escribir
+    embedded = await embedded_consultas(patient_id) if history.consultas else []
+    
+    try:
+        consultas, next_cursor = await page_consultas(patient_id, limit, cursor, embedded)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    await ensure_consultas_intact(consultas, current_user, request)
+    
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="consultations_viewed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "patient_id": patient_id,
+            "viewer_role": current_user.role.value,
+            "returned": len(consultas)
+        }
+    )
+    await audit_log.insert()
+    
+    return ConsultasPageResponse(
+        consultas=[consulta_to_response(c) for c in consultas],
+        next_cursor=next_cursor
+    )
+
+
+def parse_timeline_types(tipos: Optional[str]) -> List[str]:
+    """Interpreta el parámetro `tipos` (lista separada por comas); sin él, todos."""
+    if not tipos:
+        return TIMELINE_TYPES
+    
+    selected = list(dict.fromkeys(t.strip() for t in tipos.split(",") if t.strip()))
+    unknown = [t for t in selected if t not in TIMELINE_TYPES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown timeline types: {', '.join(unknown)}. Allowed: {', '.join(TIMELINE_TYPES)}"
+        )
+    return selected
+
+
+@router.get("/pacientes/{patient_id}/timeline", response_model=TimelinePageResponse)
+async def get_patient_timeline(
+    patient_id: str,
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    tipos: Optional[str] = Query(None, description="Tipos de evento separados por comas (ej. cita,consulta)"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Línea de tiempo del paciente: citas, consultas, registros clínicos,
+    vacunas y próxima cita en una sola lista, más recientes primero.
+    Pacientes pueden ver la suya, médicos la de sus pacientes asignados.
+    
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
+    Cada página solo lee de cada fuente los eventos que necesita.
+    """
+    selected_types = parse_timeline_types(tipos)
+    
+    if current_user.role == UserRole.PACIENTE:
+        if str(current_user.id) != patient_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied. You are not assigned to this patient."
+                detail="Access denied. You can only view your own timeline."
             )
+    elif current_user.role == UserRole.MEDICO:
+        # Médicos solo pueden ver la línea de tiempo de sus pacientes asignados
+        await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_timeline_access")
     else:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied."
         )
     
-    # Buscar historial
-    history = await PatientHistory.find_one({"patient_id": patient_id})
+    # Historial (caché cifrada o MongoDB) verificado por integridad (PBI-20)
+    history, access_allowed, error_msg = await verify_and_get_history_document(
+        patient_id,
+        current_user,
+        request.client.host,
+        request.headers.get("user-agent", ""),
+        fields=TIMELINE_HISTORY_FIELDS
+    )
     
     if not history:
         raise HTTPException(
@@ -475,31 +761,46 @@ async def get_patient_consultas(
             detail="Patient history not found"
         )
     
+    if not access_allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=error_msg
+        )
+    
+    # Consultas aún embebidas (historial sin migrar): se leen sin escribir
+    embedded = []
+    if "consulta" in selected_types and history.get("consultas"):
+        embedded = await embedded_consultas(patient_id)
+    
+    try:
+        eventos, next_cursor = await page_timeline(patient_id, history, selected_types, limit, cursor, embedded)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Integridad de las consultas de la página (PBI-20)
+    consulta_ids = [evento["id"] for evento in eventos if evento["tipo"] == "consulta"]
+    await ensure_consultas_intact(await consultas_by_id(patient_id, consulta_ids), current_user, request)
+    
     # Log de auditoría
     audit_log = AuditLog(
-        event="consultations_viewed",
+        event="timeline_viewed",
         user_email=current_user.email,
         user_id=str(current_user.id),
         ip_address=request.client.host,
         user_agent=request.headers.get("user-agent", ""),
         details={
             "patient_id": patient_id,
-            "viewer_role": current_user.role.value
+            "viewer_role": current_user.role.value,
+            "types": selected_types,
+            "returned": len(eventos)
         }
     )
     await audit_log.insert()
     
-    return [
-        ConsultaResponse(
-            id=c.id,
-            fecha=c.fecha,
-            motivo=c.motivo,
-            diagnostico=c.diagnostico,
-            tratamiento=c.tratamiento,
-            notasMedico=c.notasMedico
-        )
-        for c in history.consultas
-    ]
+    return model_response(TimelinePageResponse, {"eventos": eventos, "next_cursor": next_cursor})
 
 
 @router.put("/pacientes/{patient_id}/historial", response_model=PatientHistoryResponse)
@@ -538,8 +839,12 @@ async def update_patient_history(
             detail="Patient not found"
         )
     
-    # Buscar historial del paciente
-    history = await PatientHistory.find_one({"patient_id": patient_id})
+    # Verificar que el médico está asignado a este paciente (índice de asignaciones)
+    # Si no tiene médico asignado (registro antiguo), no se valida estrictamente
+    await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_history_update")
+    
+    # Buscar historial del paciente (solo los campos de control de acceso)
+    history = await PatientHistory.find_one({"patient_id": patient_id}).project(HistoryAccessView)
     
     if not history:
         raise HTTPException(
@@ -547,49 +852,23 @@ async def update_patient_history(
             detail="Medical history not found"
         )
     
-    # Verificar que el médico está asignado a este paciente
-    # Si medicoId es None (registro antiguo), no validar estrictamente
-    assigned_doctor_id = history.medicoAsignado.medicoId or None
-    if assigned_doctor_id and assigned_doctor_id != str(current_user.id):
-        audit_log = AuditLog(
-            event="unauthorized_history_update",
-            user_email=current_user.email,
-            user_id=str(current_user.id),
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent", ""),
-            details={
-                "reason": "doctor_not_assigned_to_patient",
-                "patient_id": patient_id,
-                "assigned_doctor_id": history.medicoAsignado.medicoId,
-                "assigned_doctor": history.medicoAsignado.nombre,
-                "requesting_doctor": current_user.fullName,
-                "requesting_doctor_id": str(current_user.id)
-            }
-        )
-        await audit_log.insert()
-        
+    if history.is_corrupted:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. You are not assigned to this patient."
-        )
-    
-    # Actualizar campos si se proporcionan
-    updated_fields = []
-    if data.alergias is not None:
-        history.alergias = data.alergias
-        updated_fields.append("alergias")
-    if data.condicionesCronicas is not None:
-        history.condicionesCronicas = data.condicionesCronicas
-        updated_fields.append("condicionesCronicas")
-    if data.medicamentosActuales is not None:
-        history.medicamentosActuales = data.medicamentosActuales
-        updated_fields.append("medicamentosActuales")
-    if data.antecedentesFamiliares is not None:
-        history.antecedentesFamiliares = data.antecedentesFamiliares
-        updated_fields.append("antecedentesFamiliares")
-    
-    history.ultimaModificacion = datetime.utcnow()
-    await history.save()
+            detail=HISTORY_CORRUPTED_DETAIL
+        )
+    
+    # Actualizar solo las secciones enviadas ($set atómico, sin save() completo)
+    changes = data.dict(exclude_none=True)
+    updated_fields = list(changes)
+    
+    updated = await update_history_fields(patient_id, changes)
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Medical history changed state during the update. Please retry."
+        )
+    history = PatientHistory.model_validate(updated)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -606,6 +885,13 @@ async def update_patient_history(
     )
     await audit_log.insert()
     
+    # La actualización ya se aplicó: consultas con discrepancia de hash
+    # (PBI-20) quedan marcadas y no se devuelven
+    embedded = await embedded_consultas(patient_id) if history.consultas else []
+    consultas = await latest_consultas(patient_id, embedded=embedded)
+    if not await integrity_service.verify_consultas(consultas, request.client.host):
+        consultas = []
+    
     # Retornar historial actualizado
     return PatientHistoryResponse(
         id=str(history.id),
@@ -623,17 +909,7 @@ async def update_patient_history(
         medicamentosActuales=history.medicamentosActuales,
         medicoAsignado=MedicoAsignadoResponse(**history.medicoAsignado.dict()),
         contactoEmergencia=ContactoEmergenciaResponse(**history.contactoEmergencia.dict()),
-        consultas=[
-            ConsultaResponse(
-                id=c.id,
-                fecha=c.fecha,
-                motivo=c.motivo,
-                diagnostico=c.diagnostico,
-                tratamiento=c.tratamiento,
-                notasMedico=c.notasMedico
-            )
-            for c in history.consultas
-        ],
+        consultas=[consulta_to_response(c) for c in consultas],
         vacunas=[
             VacunaResponse(**v.dict())
             for v in history.vacunas
@@ -677,30 +953,10 @@ async def create_patient_history(
         )
     
     # Crear historial con datos iniciales
-    history = PatientHistory(
-        patient_id=patient_id,
-        tipoSangre="No especificado",
-        alergias=[],
-        condicionesCronicas=[],
-        medicamentosActuales=[],
-        medicoAsignado=MedicoAsignado(
-            medicoId=str(current_user.id),
-            nombre=current_user.fullName,
-            especialidad=current_user.especialidad or "General",
-            telefono=current_user.telefonoContacto or ""
-        ),
-        contactoEmergencia=ContactoEmergencia(
-            nombre="No registrado",
-            relacion="",
-            telefono=""
-        ),
-        consultas=[],
-        vacunas=[],
-        antecedentesFamiliares=[],
-        ultimaModificacion=datetime.utcnow()
-    )
+    history = build_initial_history(patient, current_user)
     
     await history.insert()
+    await assign_doctor(str(current_user.id), patient_id)
     
     # Log de auditoría
     audit_log = AuditLog(
@@ -2,8 +2,8 @@
 Router para gestión de usuarios (PBI-18).
 Solo accesible por usuarios con rol Administrador.
 """
-from fastapi import APIRouter, HTTPException, status, Request, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query
+from typing import List, Optional
 from datetime import datetime
 
 from models.models import User, AuditLog, UserRole, UserStatus
@@ -15,6 +15,7 @@ from schemas.user_schemas import (
     UserActionResponse
 )
 from services.auth import get_admin_user, get_current_user
+from services.search import search_terms_filter
 
 router = APIRouter()
 
@@ -49,18 +50,28 @@ async def log_user_management_event(
 @router.get("/", response_model=List[UserListResponse])
 async def list_users(
     request: Request,
+    search: Optional[str] = Query(None, max_length=100),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_admin_user)
 ):
     """
-    Obtiene la lista de todos los usuarios del sistema.
+    Obtiene la lista de usuarios del sistema, paginada.
     Solo accesible por Administradores.
     
+    `search` busca por prefijo de nombre, apellido, email o cédula
+    (sin distinguir mayúsculas ni tildes) usando el índice de searchTerms.
+    
     No incluye campos sensibles como:
     - password_hash
     - biometric_template
     - mfa_secret
     """
-    users = await User.find_all().to_list()
+    query = search_terms_filter(search) if search and search.strip() else {}
+    
+    users = await User.find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).skip(offset).limit(limit).to_list()
     
     await log_user_management_event(
         event="users_list_viewed",
@@ -68,7 +79,7 @@ async def list_users(
         target_user_id="all",
         ip_address=request.client.host,
         user_agent=request.headers.get("user-agent", ""),
-        details={"users_count": len(users)}
+        details={"users_count": len(users), "search": search, "offset": offset}
     )
     
     return [
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
+from typing import Optional, Tuple
+from datetime import date, timedelta
+
+from models.models import User, UserRole, AuditLog
+from schemas.worklist_schemas import VaccineDuePageResponse, FollowUpDuePageResponse
+from services.auth import get_current_user
+from services.serialization import model_response
+from services.worklists import page_vaccines_due, page_follow_ups_due
+
+router = APIRouter()
+
+# Ventana por defecto de las listas de trabajo (días desde hoy)
+WORKLIST_DEFAULT_DAYS = 7
+
+
+def resolve_worklist_scope(
+    current_user: User,
+    desde: Optional[date],
+    hasta: Optional[date],
+    doctor_id: Optional[str]
+) -> Tuple[date, date, Optional[str]]:
+    """
+    Valida el rango de fechas y el filtro por médico.
+    Los médicos solo ven lo de sus propios pacientes; secretarios y
+    administradores pueden ver todo o filtrar por médico.
+    """
+    if current_user.role == UserRole.MEDICO:
+        if doctor_id and doctor_id != str(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied. Doctors can only view their own worklists."
+            )
+        doctor_id = str(current_user.id)
+    elif current_user.role not in (UserRole.SECRETARIO, UserRole.ADMINISTRADOR):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied."
+        )
+
+    desde = desde or date.today()
+    hasta = hasta or desde + timedelta(days=WORKLIST_DEFAULT_DAYS)
+    if hasta < desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'hasta' must be on or after 'desde'"
+        )
+    return desde, hasta, doctor_id
+
+
+@router.get("/vacunas", response_model=VaccineDuePageResponse)
+async def get_vaccines_due(
+    request: Request,
+    desde: Optional[date] = Query(None, description="Inicio del rango (por defecto hoy)"),
+    hasta: Optional[date] = Query(None, description="Fin del rango (por defecto desde + 7 días)"),
+    doctor_id: Optional[str] = Query(None, description="Solo pacientes asignados a este médico"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Vacunas con próxima dosis en el rango, ordenadas por fecha.
+    Médicos: solo sus pacientes asignados. Secretarios y administradores:
+    todos, o los de un médico con `doctor_id`.
+
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
+    """
+    desde, hasta, doctor_id = resolve_worklist_scope(current_user, desde, hasta, doctor_id)
+
+    try:
+        items, next_cursor = await page_vaccines_due(desde, hasta, limit, cursor, doctor_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="worklist_viewed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "worklist": "vaccines_due",
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "doctor_id": doctor_id,
+            "returned": len(items)
+        }
+    )
+    await audit_log.insert()
+
+    return model_response(VaccineDuePageResponse, {"items": items, "next_cursor": next_cursor})
+
+
+@router.get("/seguimientos", response_model=FollowUpDuePageResponse)
+async def get_follow_ups_due(
+    request: Request,
+    desde: Optional[date] = Query(None, description="Inicio del rango (por defecto hoy)"),
+    hasta: Optional[date] = Query(None, description="Fin del rango (por defecto desde + 7 días)"),
+    doctor_id: Optional[str] = Query(None, description="Solo pacientes asignados a este médico"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Seguimientos de registros clínicos con fecha en el rango, ordenados por fecha.
+    Médicos: solo los de sus pacientes asignados, con diagnóstico e
+    instrucciones. Secretarios y administradores: todos, o los de los
+    pacientes de un médico con `doctor_id`, sin texto clínico (para agendar).
+
+    Paginado por cursor: usar `next_cursor` de la respuesta para la página siguiente.
+    """
+    desde, hasta, doctor_id = resolve_worklist_scope(current_user, desde, hasta, doctor_id)
+
+    try:
+        items, next_cursor = await page_follow_ups_due(
+            desde,
+            hasta,
+            limit,
+            cursor,
+            doctor_id,
+            include_clinical=current_user.role == UserRole.MEDICO
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Log de auditoría
+    audit_log = AuditLog(
+        event="worklist_viewed",
+        user_email=current_user.email,
+        user_id=str(current_user.id),
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", ""),
+        details={
+            "worklist": "follow_ups_due",
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "doctor_id": doctor_id,
+            "returned": len(items)
+        }
+    )
+    await audit_log.insert()
+
+    return model_response(FollowUpDuePageResponse, {"items": items, "next_cursor": next_cursor})
@@ -59,6 +59,31 @@ class DoctorAvailabilityResponse(BaseModel):
         from_attributes = True
 
 
+class AvailabilityTemplateRequest(BaseModel):
+    diasSemana: List[int]  # 0 = lunes ... 6 = domingo
+    horaInicio: str  # Formato "HH:MM"
+    horaFin: str  # Formato "HH:MM"
+    duracionCita: int = 30  # Minutos
+    vigenteDesde: str  # Formato YYYY-MM-DD
+    vigenteHasta: Optional[str] = None  # Formato YYYY-MM-DD; None = sin fin
+    excepciones: List[str] = []  # Fechas sin atención (feriados), YYYY-MM-DD
+
+
+class AvailabilityTemplateResponse(BaseModel):
+    id: str
+    doctor_id: str
+    doctorName: str
+    diasSemana: List[int]
+    horaInicio: str
+    horaFin: str
+    duracionCita: int
+    vigenteDesde: str  # Formato YYYY-MM-DD
+    vigenteHasta: Optional[str] = None
+    excepciones: List[str]
+    activo: bool
+    created_at: datetime
+
+
 class AvailableSlotResponse(BaseModel):
     fecha: datetime
     disponible: bool
@@ -69,3 +94,53 @@ class DoctorScheduleResponse(BaseModel):
     doctorName: str
     fecha: str  # YYYY-MM-DD
     slots: List[AvailableSlotResponse]
+
+
+class NextAvailableSlotResponse(BaseModel):
+    fecha: datetime
+    doctor_id: str
+    doctorName: str
+
+
+# --- OPERACIONES MASIVAS ---
+class BulkAvailabilityRequest(BaseModel):
+    desde: str  # Formato YYYY-MM-DD
+    hasta: str  # Formato YYYY-MM-DD (inclusive)
+    diasSemana: List[int] = [0, 1, 2, 3, 4]  # 0 = lunes ... 6 = domingo
+    horaInicio: str  # Formato "HH:MM"
+    horaFin: str  # Formato "HH:MM"
+    duracionCita: int = 30  # Minutos
+
+
+class BulkAvailabilityToggleRequest(BaseModel):
+    fechas: List[str]  # Formato YYYY-MM-DD
+    activo: bool
+
+
+class BulkAppointmentsWindowRequest(BaseModel):
+    doctor_id: str
+    desde: datetime
+    hasta: datetime  # Exclusivo
+
+
+class BulkAppointmentsMoveRequest(BulkAppointmentsWindowRequest):
+    desplazamientoMinutos: int  # Ej: 1440 = al día siguiente
+
+
+class BulkItemResult(BaseModel):
+    """Resultado de un elemento de una operación masiva."""
+    id: Optional[str] = None
+    fecha: str
+    status: str
+    error: Optional[str] = None
+
+
+class BulkOperationResponse(BaseModel):
+    """
+    Resultado de una operación masiva. Los elementos con error no se
+    aplican; el resto sí (la operación no es todo o nada).
+    """
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult] = []
@@ -87,6 +87,29 @@ class RegisterResponse(BaseModel):
     user_id: str
 
 
+# --- BULK PATIENT IMPORT ---
+class PatientImportRowError(BaseModel):
+    """Error de una fila del archivo de importación."""
+    row: int
+    email: Optional[str] = None
+    cedula: Optional[str] = None
+    error: str
+
+
+class PatientImportResponse(BaseModel):
+    """
+    Resultado de una importación masiva de pacientes.
+    Las filas con error no se crean; el resto sí (la importación no es todo o nada).
+    """
+    dry_run: bool
+    total_rows: int
+    created: int
+    failed: int
+    emails_queued: int
+    user_ids: List[str] = []
+    errors: List[PatientImportRowError] = []
+
+
 # --- CHANGE PASSWORD ---
 class ChangePasswordRequest(BaseModel):
     currentPassword: str
@@ -0,0 +1,188 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date, datetime
+
+
+# --- CLINICAL RECORD (Registro Clínico Detallado) ---
+class HistoriaSocialSchema(BaseModel):
+    tabaquismo: str
+    alcohol: str
+    ocupacion: str
+    actividadFisica: str
+
+
+class RevisionSistemaSchema(BaseModel):
+    sistema: str
+    hallazgos: str
+
+
+class SignosVitalesSchema(BaseModel):
+    tensionArterial: str
+    frecuenciaCardiaca: str
+    temperatura: str
+    frecuenciaRespiratoria: str
+    saturacion: str
+
+
+class HallazgosExamenSchema(BaseModel):
+    general: str
+    cardiovascular: str
+    respiratorio: str
+    abdomen: str
+    neurologico: str
+
+
+class ExamenFisicoSchema(BaseModel):
+    signosVitales: SignosVitalesSchema
+    hallazgos: HallazgosExamenSchema
+
+
+class LaboratorioSchema(BaseModel):
+    prueba: str
+    valor: str
+    unidad: str
+    referencia: str
+    fecha: date
+
+
+class ImagenSchema(BaseModel):
+    estudio: str
+    fecha: date
+    impresion: str
+
+
+class SeguimientoSchema(BaseModel):
+    fecha: date
+    instrucciones: str
+
+
+class ClinicalRecordCreateRequest(BaseModel):
+    patient_id: str
+    fecha: Optional[date] = None  # Por defecto, hoy
+    motivoConsulta: str
+    historiaEnfermedadActual: str
+    antecedentesPersonales: List[str] = []
+    antecedentesQuirurgicos: List[str] = []
+    medicamentos: List[str] = []
+    alergias: List[str] = []
+    historiaSocial: HistoriaSocialSchema
+    antecedentesFamiliares: List[str] = []
+    revisionSistemas: List[RevisionSistemaSchema] = []
+    examenFisico: ExamenFisicoSchema
+    laboratorios: List[LaboratorioSchema] = []
+    imagenes: List[ImagenSchema] = []
+    diagnostico: str
+    tratamiento: str
+    observaciones: str
+    seguimiento: Optional[SeguimientoSchema] = None
+
+
+class ClinicalRecordUpdateRequest(BaseModel):
+    """
+    Actualización parcial: solo se modifican los campos enviados.
+    Solo el médico que creó el registro puede actualizarlo.
+    """
+    fecha: Optional[date] = None
+    motivoConsulta: Optional[str] = None
+    historiaEnfermedadActual: Optional[str] = None
+    antecedentesPersonales: Optional[List[str]] = None
+    antecedentesQuirurgicos: Optional[List[str]] = None
+    medicamentos: Optional[List[str]] = None
+    alergias: Optional[List[str]] = None
+    historiaSocial: Optional[HistoriaSocialSchema] = None
+    antecedentesFamiliares: Optional[List[str]] = None
+    revisionSistemas: Optional[List[RevisionSistemaSchema]] = None
+    examenFisico: Optional[ExamenFisicoSchema] = None
+    laboratorios: Optional[List[LaboratorioSchema]] = None
+    imagenes: Optional[List[ImagenSchema]] = None
+    diagnostico: Optional[str] = None
+    tratamiento: Optional[str] = None
+    observaciones: Optional[str] = None
+    seguimiento: Optional[SeguimientoSchema] = None
+
+
+class ClinicalRecordResponse(BaseModel):
+    id: str
+    patient_id: str
+    patientName: str
+    patientCedula: str
+    doctor_id: str
+    doctorName: str
+    fecha: date
+    motivoConsulta: str
+    historiaEnfermedadActual: str
+    antecedentesPersonales: List[str]
+    antecedentesQuirurgicos: List[str]
+    medicamentos: List[str]
+    alergias: List[str]
+    historiaSocial: HistoriaSocialSchema
+    antecedentesFamiliares: List[str]
+    revisionSistemas: List[RevisionSistemaSchema]
+    examenFisico: ExamenFisicoSchema
+    laboratorios: List[LaboratorioSchema]
+    imagenes: List[ImagenSchema]
+    diagnostico: str
+    tratamiento: str
+    observaciones: str
+    seguimiento: Optional[SeguimientoSchema] = None
+    ultimaModificacion: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ClinicalRecordSummary(BaseModel):
+    """
+    Resumen de un registro clínico para listados.
+    Solo se leen de MongoDB estos campos; el documento completo se
+    obtiene en GET /registros-clinicos/{id}.
+    """
+    id: str
+    patient_id: str
+    patientName: str
+    doctor_id: str
+    doctorName: str
+    fecha: date
+    motivoConsulta: str
+    diagnostico: str
+    seguimiento: Optional[SeguimientoSchema] = None
+    ultimaModificacion: datetime
+
+
+class ClinicalRecordsPageResponse(BaseModel):
+    """Página de registros clínicos; next_cursor es None en la última página."""
+    registros: List[ClinicalRecordSummary]
+    next_cursor: Optional[str] = None
+
+
+# --- LABORATORIOS (Series de resultados) ---
+class LabTestsResponse(BaseModel):
+    """Pruebas de laboratorio con resultados registrados para el paciente."""
+    pruebas: List[str]
+
+
+class LabTrendResponse(BaseModel):
+    pendientePorDia: float
+    pendientePorAnio: float
+    direccion: str  # sube, baja, estable
+    linea: List[Optional[float]]  # Recta de regresión evaluada en cada fecha
+
+
+class LabSeriesResponse(BaseModel):
+    """
+    Serie de una prueba lista para graficar: arreglos paralelos ordenados
+    por fecha. fueraDeRango: -1 bajo, 0 normal o sin referencia, 1 alto.
+    """
+    prueba: str
+    unidad: str
+    fechas: List[date]
+    valores: List[float]
+    referenciaMin: List[Optional[float]]
+    referenciaMax: List[Optional[float]]
+    mediaMovil: List[Optional[float]]
+    fueraDeRango: List[int]
+    ventana: int
+    puntos: int
+    fueraDeRangoTotal: int
+    excluidos: int  # Valores no numéricos o en otra unidad
+    tendencia: Optional[LabTrendResponse] = None
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+# --- EXPORTS (Exportación de resúmenes) ---
+class ExportJobResponse(BaseModel):
+    """
+    Estado de un trabajo de exportación. download_url solo viene cuando
+    el trabajo está completado; el token de la URL vence con el trabajo.
+    """
+    job_id: str
+    patient_id: str
+    status: str  # pendiente, en_proceso, completado, fallido
+    cached: bool = False  # Reutilizó el PDF de la misma revisión del historial
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    size: Optional[int] = None
+    pages: Optional[int] = None
+    download_url: Optional[str] = None
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import date, datetime
+from enum import Enum
+from beanie import PydanticObjectId
 
 
 # --- PATIENT HISTORY (Historial del Paciente) ---
@@ -26,6 +28,12 @@ class ConsultaResponse(BaseModel):
     notasMedico: str
 
 
+class ConsultasPageResponse(BaseModel):
+    """Página de consultas; next_cursor es None en la última página."""
+    consultas: List[ConsultaResponse]
+    next_cursor: Optional[str] = None
+
+
 class VacunaResponse(BaseModel):
     nombre: str
     fecha: date
@@ -64,6 +72,73 @@ class PatientHistoryResponse(BaseModel):
         from_attributes = True
 
 
+class HistorySection(str, Enum):
+    """Secciones del historial con endpoint propio."""
+    ALERGIAS = "alergias"
+    VACUNAS = "vacunas"
+    CONSULTAS = "consultas"
+    CONTACTO = "contacto"
+    MEDICAMENTOS = "medicamentos"
+    CONDICIONES = "condiciones"
+    ANTECEDENTES = "antecedentes"
+    DEMOGRAFICOS = "demograficos"
+
+
+class PatientHistoryFieldsResponse(BaseModel):
+    """
+    Historial con solo las secciones pedidas (parámetro `fields` o
+    endpoints por sección). Las secciones no pedidas se omiten de la
+    respuesta (response_model_exclude_unset).
+    """
+    id: str
+    # Datos demográficos
+    direccion: Optional[str] = None
+    ciudad: Optional[str] = None
+    pais: Optional[str] = None
+    genero: Optional[str] = None
+    estadoCivil: Optional[str] = None
+    ocupacion: Optional[str] = None
+    # Información médica
+    tipoSangre: Optional[str] = None
+    alergias: Optional[List[str]] = None
+    condicionesCronicas: Optional[List[str]] = None
+    medicamentosActuales: Optional[List[str]] = None
+    medicoAsignado: Optional[MedicoAsignadoResponse] = None
+    contactoEmergencia: Optional[ContactoEmergenciaResponse] = None
+    consultas: Optional[List[ConsultaResponse]] = None
+    vacunas: Optional[List[VacunaResponse]] = None
+    antecedentesFamiliares: Optional[List[str]] = None
+    proximaCita: Optional[ProximaCitaResponse] = None
+    ultimaModificacion: Optional[datetime] = None
+
+
+# --- TIMELINE (Línea de tiempo del paciente) ---
+class TimelineEventType(str, Enum):
+    """Tipos de evento de la línea de tiempo."""
+    PROXIMA_CITA = "proxima_cita"
+    CITA = "cita"
+    CONSULTA = "consulta"
+    REGISTRO_CLINICO = "registro_clinico"
+    VACUNA = "vacuna"
+
+
+class TimelineEventResponse(BaseModel):
+    tipo: TimelineEventType
+    fecha: datetime
+    id: Optional[str] = None
+    titulo: str
+    detalle: Optional[str] = None
+    estado: Optional[str] = None
+    medico: Optional[str] = None
+    proximaDosis: Optional[date] = None
+
+
+class TimelinePageResponse(BaseModel):
+    """Página de la línea de tiempo; next_cursor es None en la última página."""
+    eventos: List[TimelineEventResponse]
+    next_cursor: Optional[str] = None
+
+
 # --- CLINICAL RECORD (Registro Médico) ---
 class ConsultaCreateRequest(BaseModel):
     patient_id: str
@@ -104,3 +179,46 @@ class PatientMinimalResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PatientDirectoryItem(BaseModel):
+    """
+    Proyección de User para el directorio de pacientes (listado-pacientes).
+    Solo se leen de MongoDB los campos que se devuelven.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    fullName: str
+    cedula: str
+    fechaNacimiento: Optional[date] = None
+    telefonoContacto: Optional[str] = None
+    email: str
+    status: Optional[str] = None
+
+
+class HistoryAccessView(BaseModel):
+    """
+    Proyección mínima de PatientHistory para validar acceso (médico asignado)
+    y calcular el ETag (revision, ultimaModificacion, integrity_hash).
+    `consultas` trae como máximo 1 elemento ($slice): solo indica si el
+    historial aún tiene consultas embebidas sin migrar.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    patient_id: str
+    medicoAsignado: MedicoAsignadoResponse
+    is_corrupted: bool = False
+    revision: int = 0
+    ultimaModificacion: Optional[datetime] = None
+    integrity_hash: Optional[str] = None
+    consultas: List[ConsultaResponse] = []
+
+    class Settings:
+        projection = {
+            "_id": 1,
+            "patient_id": 1,
+            "medicoAsignado": 1,
+            "is_corrupted": 1,
+            "revision": 1,
+            "ultimaModificacion": 1,
+            "integrity_hash": 1,
+            "consultas": {"$slice": 1}
+        }
@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date
+
+
+# --- WORKLISTS (Listas de trabajo) ---
+class VaccineDueItem(BaseModel):
+    patient_id: str
+    patientName: Optional[str] = None
+    patientCedula: Optional[str] = None
+    vacuna: str
+    fecha: date  # Fecha de la última dosis aplicada
+    proximaDosis: date
+    medicoId: Optional[str] = None
+    medicoNombre: Optional[str] = None
+
+
+class VaccineDuePageResponse(BaseModel):
+    """Página de vacunas pendientes; next_cursor es None en la última página."""
+    items: List[VaccineDueItem]
+    next_cursor: Optional[str] = None
+
+
+class FollowUpDueItem(BaseModel):
+    record_id: str
+    patient_id: str
+    patientName: str
+    patientCedula: str
+    doctor_id: str
+    doctorName: str
+    fechaRegistro: date
+    diagnostico: Optional[str] = None  # Solo para médicos
+    fechaSeguimiento: date
+    instrucciones: Optional[str] = None  # Solo para médicos
+
+
+class FollowUpDuePageResponse(BaseModel):
+    """Página de seguimientos pendientes; next_cursor es None en la última página."""
+    items: List[FollowUpDueItem]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,326 @@
+"""
+Índice de asignación médico-paciente
+====================================
+Autorizar a un médico requería leer el historial del paciente (PHI) solo
+para comparar `medicoAsignado.medicoId`, y "mis pacientes" recorría todas
+las citas del médico. La colección `doctor_patient_assignments` guarda
+un documento pequeño por par (doctor_id, patient_id):
+
+- asignado=True: médico asignado en el historial (control de acceso).
+  Un índice único parcial garantiza como mucho uno por paciente.
+- asignado=False: el médico tiene o tuvo citas con el paciente.
+
+Consultas (ambas cubiertas por índice, sin leer documentos):
+- Médico asignado de un paciente: (patient_id, asignado, doctor_id).
+- Pacientes de un médico: (doctor_id, patient_id), único.
+
+El médico asignado de cada paciente se guarda además en una caché del
+proceso con TTL corto (ASSIGNMENT_CACHE_TTL_SECONDS), invalidada en cada
+asignación. Solo se guardan pacientes con médico: "sin médico asignado"
+no valida estrictamente el acceso, y otro proceso puede asignar uno
+(su invalidación es local); esa respuesta se lee siempre de MongoDB.
+
+"Mis pacientes" (page_doctor_patients) se resuelve con una agregación:
+las citas del médico unidas a sus pares del índice, agrupadas por paciente
+(última cita y cantidad), ordenadas y paginadas en MongoDB; luego una
+sola lectura proyectada de `users` para los pacientes de la página.
+
+Consistencia: el índice se actualiza al crear historiales con médico y al
+crear o eliminar citas. El historial es la fuente de verdad: si el índice
+no tiene asignación para un paciente se consulta `medicoAsignado.medicoId`
+(nunca se concede acceso solo porque falte la fila). `rebuild_assignments`
+(script migrate_assignments.py) reconstruye el índice a partir de los
+historiales y las citas existentes y desmarca asignaciones obsoletas.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from models.models import PatientHistory, Appointment, DoctorPatientAssignment, User
+from services.bounded_cache import MISSING, BoundedCache
+from services.db import get_auth_db, get_core_db
+from services.pagination import apply_cursor, split_page
+
+ASSIGNMENT_CACHE_MAX_ENTRIES = int(os.getenv("ASSIGNMENT_CACHE_MAX_ENTRIES", "10000"))
+ASSIGNMENT_CACHE_TTL_SECONDS = int(os.getenv("ASSIGNMENT_CACHE_TTL_SECONDS", "60"))
+
+# Tamaño de lote de las escrituras de reconstrucción
+REBUILD_BATCH_SIZE = 1000
+
+# Reintentos de assign_doctor ante asignaciones concurrentes del mismo paciente
+ASSIGN_MAX_RETRIES = 5
+
+# "Mis pacientes": última cita más reciente primero; sin citas al final
+DOCTOR_PATIENTS_SORT = [("orden", -1), ("_id", 1)]
+NO_APPOINTMENTS = datetime(1970, 1, 1)
+
+# Campos de `users` que muestra "mis pacientes"
+DOCTOR_PATIENT_PROJECTION = {"fullName": 1, "email": 1, "cedula": 1, "fechaNacimiento": 1}
+
+# Caché global patient_id -> doctor_id asignado (solo pacientes con médico)
+assignment_cache = BoundedCache(ASSIGNMENT_CACHE_MAX_ENTRIES, ASSIGNMENT_CACHE_TTL_SECONDS)
+
+
+def _collection():
+    return get_core_db()[DoctorPatientAssignment.Settings.name]
+
+
+async def get_assigned_doctor_id(patient_id: str) -> Optional[str]:
+    """
+    ID del médico asignado al paciente, o None si no tiene (historial
+    antiguo sin medicoId o "Por asignar"). Una búsqueda puntual cubierta
+    por índice, o ninguna si está en caché (solo se cachean pacientes con
+    médico asignado).
+
+    Si el índice no tiene asignación (par aún no sincronizado) se lee
+    medicoAsignado.medicoId del historial, la fuente de verdad.
+    """
+    cached = assignment_cache.get(patient_id)
+    if cached is not MISSING:
+        return cached
+
+    row = await _collection().find_one(
+        {"patient_id": patient_id, "asignado": True},
+        {"_id": 0, "doctor_id": 1}
+    )
+    if row:
+        doctor_id = row["doctor_id"]
+    else:
+        history = await get_core_db()[PatientHistory.Settings.name].find_one(
+            {"patient_id": patient_id},
+            {"_id": 0, "medicoAsignado.medicoId": 1}
+        )
+        doctor_id = ((history or {}).get("medicoAsignado") or {}).get("medicoId") or None
+    if doctor_id:
+        assignment_cache.put(patient_id, doctor_id)
+    return doctor_id
+
+
+async def get_doctor_patient_ids(doctor_id: str) -> List[str]:
+    """IDs de los pacientes de un médico (asignados o con citas); consulta cubierta."""
+    rows = await _collection().find(
+        {"doctor_id": doctor_id},
+        {"_id": 0, "patient_id": 1}
+    ).to_list(length=None)
+    return [row["patient_id"] for row in rows]
+
+
+async def get_assigned_patient_ids(doctor_id: str) -> List[str]:
+    """IDs de los pacientes asignados al médico (asignado=True), sin los de solo citas."""
+    rows = await _collection().find(
+        {"doctor_id": doctor_id, "asignado": True},
+        {"_id": 0, "patient_id": 1}
+    ).to_list(length=None)
+    return [row["patient_id"] for row in rows]
+
+
+async def page_doctor_patients(
+    doctor_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Página de pacientes del médico (con citas o asignados), con la fecha de
+    su última cita y la cantidad de citas.
+
+    Una agregación sobre `appointments` (unida a los pares del índice para
+    incluir asignados sin citas) y una lectura `$in` proyectada de `users`.
+
+    Returns:
+        Tuple de (filas {patient, ultima_consulta, citas}, cursor siguiente)
+
+    Raises:
+        ValueError: Si el cursor es inválido
+    """
+    rows = await get_core_db()[Appointment.Settings.name].aggregate([
+        {"$match": {"doctor_id": doctor_id}},
+        {"$project": {"_id": 0, "patient_id": 1, "fecha": 1}},
+        {"$unionWith": {
+            "coll": DoctorPatientAssignment.Settings.name,
+            "pipeline": [
+                {"$match": {"doctor_id": doctor_id}},
+                {"$project": {"_id": 0, "patient_id": 1}}
+            ]
+        }},
+        {"$group": {
+            "_id": "$patient_id",
+            "ultima_consulta": {"$max": "$fecha"},
+            "citas": {"$sum": {"$cond": [{"$gt": ["$fecha", None]}, 1, 0]}}
+        }},
+        {"$addFields": {"orden": {"$ifNull": ["$ultima_consulta", NO_APPOINTMENTS]}}},
+        {"$match": apply_cursor({}, DOCTOR_PATIENTS_SORT, cursor)},
+        {"$sort": dict(DOCTOR_PATIENTS_SORT)},
+        {"$limit": limit + 1}
+    ]).to_list(length=None)
+    rows, next_cursor = split_page(rows, DOCTOR_PATIENTS_SORT, limit)
+
+    ids = [ObjectId(row["_id"]) for row in rows if ObjectId.is_valid(row["_id"])]
+    users = await get_auth_db()[User.Settings.name].find(
+        {"_id": {"$in": ids}},
+        DOCTOR_PATIENT_PROJECTION
+    ).to_list(length=None)
+    users_by_id = {str(user["_id"]): user for user in users}
+
+    page = [
+        {"patient": users_by_id[row["_id"]], "ultima_consulta": row["ultima_consulta"], "citas": row["citas"]}
+        for row in rows
+        if row["_id"] in users_by_id
+    ]
+    return page, next_cursor
+
+
+async def _upsert_pair(doctor_id: str, patient_id: str, update: Dict[str, Any]) -> None:
+    try:
+        await _collection().update_one({"doctor_id": doctor_id, "patient_id": patient_id}, update, upsert=True)
+    except DuplicateKeyError:
+        # Otro request insertó el mismo par a la vez: reintentar como actualización
+        await _collection().update_one({"doctor_id": doctor_id, "patient_id": patient_id}, update)
+
+
+async def assign_doctor(doctor_id: str, patient_id: str) -> None:
+    """
+    Registra al médico asignado del paciente (reemplaza la asignación anterior).
+
+    El índice único parcial (patient_id, asignado=True) impide dos médicos
+    asignados a la vez: si el par no puede marcarse porque otro médico
+    sigue asignado, se desmarca ese otro y se reintenta. Mientras tanto las
+    lecturas caen al historial (ya actualizado), nunca a "sin asignar".
+    """
+    for _ in range(ASSIGN_MAX_RETRIES):
+        try:
+            # Un choque de índice es el par insertado a la vez por otro
+            # request o la asignación de otro médico: en ambos casos se
+            # desmarca al otro médico (si lo hay) y se reintenta
+            await _collection().update_one(
+                {"doctor_id": doctor_id, "patient_id": patient_id},
+                {
+                    "$set": {"asignado": True, "assigned_at": datetime.utcnow()},
+                    "$setOnInsert": {"created_at": datetime.utcnow()}
+                },
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            await _collection().update_many(
+                {"patient_id": patient_id, "asignado": True, "doctor_id": {"$ne": doctor_id}},
+                {"$set": {"asignado": False}}
+            )
+    else:
+        raise RuntimeError(f"Could not assign doctor {doctor_id} to patient {patient_id}: concurrent assignments")
+    assignment_cache.pop(patient_id)
+
+
+async def link_appointment(doctor_id: str, patient_id: str) -> None:
+    """Registra que el médico tiene citas con el paciente (no cambia la asignación)."""
+    await _upsert_pair(doctor_id, patient_id, {
+        "$setOnInsert": {
+            "asignado": False,
+            "created_at": datetime.utcnow()
+        }
+    })
+
+
+async def unlink_appointment(doctor_id: str, patient_id: str) -> None:
+    """Quita el par si ya no quedan citas entre ambos y el médico no está asignado."""
+    remaining = await get_core_db()[Appointment.Settings.name].find_one(
+        {"doctor_id": doctor_id, "patient_id": patient_id},
+        {"_id": 1}
+    )
+    if remaining is None:
+        await _collection().delete_one({"doctor_id": doctor_id, "patient_id": patient_id, "asignado": False})
+
+
+async def _bulk_upsert(operations: List[Any], ordered: bool = False) -> int:
+    if not operations:
+        return 0
+    result = await _collection().bulk_write(operations, ordered=ordered)
+    return result.upserted_count + result.modified_count
+
+
+async def sync_assigned_doctors() -> Dict[str, int]:
+    """
+    Sincroniza las asignaciones (asignado=True) desde los historiales con
+    medicoId. Idempotente; solo lee patient_id y medicoId.
+
+    Por cada historial se desmarca primero al médico asignado anterior (si
+    es otro) y luego se marca el del historial, en un bulk_write ordenado.
+    Al final se desmarcan las asignaciones que ningún historial respalda:
+    las que no se marcaron durante esta sincronización (assigned_at
+    anterior al inicio) ni por assign_doctor mientras corría.
+
+    Returns:
+        Dict con los pares creados o actualizados y las asignaciones obsoletas desmarcadas
+    """
+    started = datetime.utcnow()
+    changed = 0
+    operations: List[Any] = []
+    cursor = get_core_db()[PatientHistory.Settings.name].find(
+        {"medicoAsignado.medicoId": {"$nin": [None, ""]}},
+        {"_id": 0, "patient_id": 1, "medicoAsignado.medicoId": 1}
+    ).batch_size(REBUILD_BATCH_SIZE)
+    async for history in cursor:
+        doctor_id = history["medicoAsignado"]["medicoId"]
+        patient_id = history["patient_id"]
+        operations.append(UpdateMany(
+            {"patient_id": patient_id, "asignado": True, "doctor_id": {"$ne": doctor_id}},
+            {"$set": {"asignado": False}}
+        ))
+        operations.append(UpdateOne(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {
+                "$set": {"asignado": True, "assigned_at": datetime.utcnow()},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True
+        ))
+        if len(operations) >= REBUILD_BATCH_SIZE:
+            changed += await _bulk_upsert(operations, ordered=True)
+            operations = []
+    changed += await _bulk_upsert(operations, ordered=True)
+
+    stale = await _collection().update_many(
+        {"asignado": True, "assigned_at": {"$not": {"$gte": started}}},
+        {"$set": {"asignado": False}}
+    )
+    assignment_cache.clear()
+    return {"sincronizadas": changed, "obsoletas": stale.modified_count}
+
+
+async def rebuild_assignments() -> Dict[str, int]:
+    """
+    Reconstruye el índice completo: asignaciones de los historiales
+    (desmarcando las obsoletas) y pares (médico, paciente) de las citas
+    existentes. Idempotente.
+
+    Returns:
+        Dict con los pares de historiales y de citas creados o actualizados
+        y las asignaciones obsoletas desmarcadas
+    """
+    synced = await sync_assigned_doctors()
+
+    linked = 0
+    operations: List[UpdateOne] = []
+    pairs = get_core_db()[Appointment.Settings.name].aggregate([
+        {"$group": {"_id": {"doctor_id": "$doctor_id", "patient_id": "$patient_id"}}}
+    ], allowDiskUse=True)
+    async for pair in pairs:
+        doctor_id, patient_id = pair["_id"]["doctor_id"], pair["_id"]["patient_id"]
+        operations.append(UpdateOne(
+            {"doctor_id": doctor_id, "patient_id": patient_id},
+            {"$setOnInsert": {
+                "asignado": False,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        ))
+        if len(operations) >= REBUILD_BATCH_SIZE:
+            linked += await _bulk_upsert(operations)
+            operations = []
+    linked += await _bulk_upsert(operations)
+
+    return {"historiales": synced["sincronizadas"], "obsoletas": synced["obsoletas"], "citas": linked}
@@ -118,6 +118,37 @@ class AuditLogger:
         Returns:
             AuditLog creado o None si falla
         """
+        audit_entry = self.build_entry(
+            event_type=event_type,
+            user_id=user_id,
+            user_email=user_email,
+            user_role=user_role,
+            patient_id=patient_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            details=details,
+            action=action
+        )
+        
+        # Intentar guardar con reintentos
+        return await self._save_with_retry(audit_entry)
+    
+    @staticmethod
+    def build_entry(
+        event_type: AuditEventType,
+        user_id: Optional[str] = None,
+        user_email: Optional[str] = None,
+        user_role: Optional[str] = None,
+        patient_id: Optional[str] = None,
+        ip_address: str = "unknown",
+        user_agent: str = "",
+        details: Optional[Dict[str, Any]] = None,
+        action: Optional[str] = None
+    ) -> AuditLog:
+        """
+        Construye (sin guardar) un AuditLog con el formato estándar de PBI-15.
+        Permite acumular eventos y persistirlos en lote con log_events_batch.
+        """
         # Construir detalles extendidos para cumplir con PBI-15
         extended_details = {
             "user_role": user_role,
@@ -126,7 +157,7 @@ class AuditLogger:
             **(details or {})
         }
         
-        audit_entry = AuditLog(
+        return AuditLog(
             timestamp=datetime.utcnow(),
             event=event_type.value,
             user_id=user_id,
@@ -135,9 +166,37 @@ class AuditLogger:
             user_agent=user_agent,
             details=extended_details
         )
+    
+    async def log_events_batch(self, entries: List[AuditLog]) -> int:
+        """
+        Registra varios eventos de auditoría con un solo insert_many.
         
-        # Intentar guardar con reintentos
-        return await self._save_with_retry(audit_entry)
+        Usado por operaciones masivas (jobs de integridad, importaciones)
+        para no pagar un round-trip a sirona_logs por cada evento.
+        
+        Returns:
+            Número de eventos guardados (0 si falla tras los reintentos)
+        """
+        if not entries:
+            return 0
+        
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                await AuditLog.insert_many(entries)
+                logger.info(f"Audit batch logged: {len(entries)} events")
+                return len(entries)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to save audit batch (attempt {attempt + 1}/{self.MAX_RETRIES}): {e}"
+                )
+                if attempt < self.MAX_RETRIES - 1:
+                    await asyncio.sleep(self.RETRY_DELAY * (attempt + 1))
+        
+        logger.critical(
+            f"AUDIT BATCH LOST - Failed to save {len(entries)} events after {self.MAX_RETRIES} attempts: "
+            f"Events: {sorted({e.event for e in entries})}"
+        )
+        return 0
     
     async def _save_with_retry(self, audit_entry: AuditLog) -> Optional[AuditLog]:
         """Guarda el evento con reintentos automáticos."""
@@ -0,0 +1,119 @@
+"""
+Caché LRU acotada en memoria del proceso
+========================================
+Base común de las cachés en proceso (historiales cifrados, verificaciones
+de integridad, asignaciones, disponibilidad, índice de horarios y
+laboratorios parseados): como mucho `max_entries` entradas, desalojo de
+la menos usada, TTL opcional y las mismas métricas para
+GET /admin/cache/stats.
+
+Cada caché define sus claves, qué valida una entrada (revisión, hash...)
+y cómo se invalida; aquí solo viven el orden LRU, la expiración y los
+contadores.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+# Valor devuelto por get() cuando la clave no está, expiró o no es válida
+# (None puede ser un valor cacheado: "ese día no atiende")
+MISSING = object()
+
+
+class BoundedCache:
+    """
+    Caché LRU acotada con TTL opcional (ttl_seconds=None: sin expiración).
+
+    on_remove(clave, valor) se llama con cada entrada que sale de la caché
+    (desalojo, expiración, invalidación o reemplazo), salvo en clear().
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        on_remove: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._on_remove = on_remove
+        # clave -> (valor, guardado_en)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+
+    def _lookup(self, key: Hashable, valid: Optional[Callable[[Any], bool]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        if self._expired(entry[1]) or (valid is not None and not valid(entry[0])):
+            self.pop(key)
+            return MISSING
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get(self, key: Hashable, valid: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Valor vigente de la clave, o MISSING si no está, expiró o `valid`
+        lo rechaza (la entrada se descarta). Cuenta como hit o miss.
+        """
+        value = self._lookup(key, valid)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Any:
+        """Como get(), sin contar hit ni miss (actualizaciones en el lugar)."""
+        return self._lookup(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Indica si hay una entrada vigente (no cuenta ni cambia el orden LRU)."""
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> Iterator[Hashable]:
+        """Claves guardadas (incluidas las expiradas aún no descartadas)."""
+        return iter(list(self._entries))
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Guarda el valor, desalojando las entradas menos usadas si hace falta."""
+        self.pop(key)
+        self._entries[key] = (value, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            oldest, (evicted, _) = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self._on_remove is not None:
+                self._on_remove(oldest, evicted)
+
+    def pop(self, key: Hashable) -> None:
+        """Descarta la entrada de la clave, si existe."""
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._on_remove is not None:
+            self._on_remove(key, entry[0])
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self, **extra: Any) -> Dict[str, Any]:
+        """Métricas comunes; `extra` agrega las propias de cada caché."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            **extra
+        }
@@ -0,0 +1,258 @@
+"""
+Operaciones masivas de agenda
+=============================
+Preparar un mes de disponibilidad o reprogramar el día de un médico
+enfermo requería decenas de llamadas individuales, cada una con sus
+lecturas, su escritura y su registro de auditoría. Aquí cada operación
+resuelve todos los elementos con un número fijo de consultas:
+
+- Crear disponibilidad en un rango: una lectura de las fechas existentes
+  y un insert_many.
+- Activar/desactivar muchas fechas: una lectura, un update_many y un
+  insert_many de excepciones para los días que cubre una plantilla.
+- Cancelar las citas de una ventana: una lectura y un update_many.
+- Mover las citas de una ventana: una lectura y una actualización
+  condicional por cita (fecha y celdas en la misma escritura, así una cita
+  nunca queda sin reserva). Se mueven en el sentido del desplazamiento
+  (las últimas primero al posponer), de modo que cada cita
+  libera sus celdas antes de que otra de la ventana las reclame.
+
+Cada función devuelve el resultado por elemento
+({id, fecha, status, error}); el router registra una sola entrada de
+auditoría por operación.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from models.models import Appointment, AvailabilityTemplate, DoctorAvailability
+from services.db import get_core_db
+from services.scheduling import (
+    ACTIVE_APPOINTMENT_STATES,
+    as_stored,
+    booking_changed,
+    doctor_schedule_changed,
+    find_day_availability,
+    pick_availability,
+    slot_cells,
+    slot_duration
+)
+
+# Límites por operación
+BULK_MAX_DAYS = 92
+BULK_MAX_APPOINTMENTS = 500
+
+
+def _result(fecha: Any, status: str, item_id: Optional[str] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"id": item_id, "fecha": fecha.isoformat(), "status": status, "error": error}
+
+
+async def _existing_dates(doctor_id: str, fechas: List[date]) -> Dict[date, List[Dict[str, Any]]]:
+    """Documentos por fecha del médico en esas fechas (solo _id, fecha y activo)."""
+    rows = await get_core_db()[DoctorAvailability.Settings.name].find(
+        {"doctor_id": doctor_id, "fecha": {"$in": [datetime.combine(fecha, time.min) for fecha in fechas]}},
+        {"fecha": 1, "activo": 1}
+    ).to_list(length=None)
+    by_date: Dict[date, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_date.setdefault(row["fecha"].date(), []).append(row)
+    return by_date
+
+
+async def create_availability_range(
+    doctor_id: str,
+    doctor_name: str,
+    desde: date,
+    hasta: date,
+    dias_semana: List[int],
+    hora_inicio: str,
+    hora_fin: str,
+    duracion: int
+) -> List[Dict[str, Any]]:
+    """
+    Crea una disponibilidad por cada fecha del rango que cae en `dias_semana`.
+    Las fechas que ya tienen disponibilidad se informan y no se tocan.
+    """
+    fechas = []
+    current = desde
+    while current <= hasta:
+        if current.weekday() in dias_semana:
+            fechas.append(current)
+        current += timedelta(days=1)
+
+    existing = await _existing_dates(doctor_id, fechas)
+    results = {
+        fecha: _result(fecha, "exists", str(existing[fecha][0]["_id"]), "Availability already exists for this date")
+        for fecha in fechas
+        if fecha in existing
+    }
+
+    new_availabilities = [
+        DoctorAvailability(
+            doctor_id=doctor_id,
+            doctorName=doctor_name,
+            fecha=fecha,
+            horaInicio=hora_inicio,
+            horaFin=hora_fin,
+            duracionCita=duracion,
+            activo=True
+        )
+        for fecha in fechas
+        if fecha not in existing
+    ]
+    if new_availabilities:
+        inserted = await DoctorAvailability.insert_many(new_availabilities)
+        for availability, inserted_id in zip(new_availabilities, inserted.inserted_ids):
+            results[availability.fecha] = _result(availability.fecha, "created", str(inserted_id))
+        doctor_schedule_changed(doctor_id)
+
+    return [results[fecha] for fecha in fechas]
+
+
+async def set_availability_days(doctor_id: str, fechas: List[date], activo: bool) -> List[Dict[str, Any]]:
+    """
+    Activa o desactiva la disponibilidad de muchas fechas. Al desactivar un
+    día que solo cubre una plantilla semanal se crea un documento por fecha
+    inactivo (excepción puntual), así el día deja de ofrecerse.
+    """
+    fechas = sorted(set(fechas))
+    existing = await _existing_dates(doctor_id, fechas)
+    results: Dict[date, Dict[str, Any]] = {}
+
+    to_update = []
+    for fecha, rows in existing.items():
+        changed = [row for row in rows if row["activo"] != activo]
+        to_update.extend(row["_id"] for row in changed)
+        results[fecha] = _result(fecha, "updated" if changed else "unchanged", str(rows[0]["_id"]))
+    if to_update:
+        await get_core_db()[DoctorAvailability.Settings.name].update_many(
+            {"_id": {"$in": to_update}},
+            {"$set": {"activo": activo}}
+        )
+
+    missing = [fecha for fecha in fechas if fecha not in existing]
+    overrides = []
+    if missing and not activo:
+        templates = await AvailabilityTemplate.find(
+            {"doctor_id": doctor_id, "activo": True}
+        ).sort([("vigenteDesde", -1)]).to_list()
+        for fecha in missing:
+            availability = pick_availability([], templates, fecha)
+            if availability:
+                availability.activo = False
+                availability.created_at = datetime.utcnow()
+                overrides.append(availability)
+    if overrides:
+        inserted = await DoctorAvailability.insert_many(overrides)
+        for availability, inserted_id in zip(overrides, inserted.inserted_ids):
+            results[availability.fecha] = _result(availability.fecha, "override_created", str(inserted_id))
+
+    for fecha in missing:
+        results.setdefault(fecha, _result(fecha, "not_found", error="No availability for this date"))
+
+    if to_update or overrides:
+        doctor_schedule_changed(doctor_id)
+
+    return [results[fecha] for fecha in fechas]
+
+
+async def _window_appointments(doctor_id: str, desde: datetime, hasta: datetime) -> List[Dict[str, Any]]:
+    """
+    Citas activas del médico en [desde, hasta), ordenadas por fecha.
+
+    Raises:
+        ValueError: Si superan BULK_MAX_APPOINTMENTS
+    """
+    rows = await get_core_db()[Appointment.Settings.name].find(
+        {
+            "doctor_id": doctor_id,
+            "fecha": {"$gte": as_stored(desde), "$lt": as_stored(hasta)},
+            "estado": {"$in": ACTIVE_APPOINTMENT_STATES}
+        },
+        {"fecha": 1, "estado": 1, "slotCells": 1}
+    ).sort([("fecha", 1), ("_id", 1)]).limit(BULK_MAX_APPOINTMENTS + 1).to_list(length=None)
+    if len(rows) > BULK_MAX_APPOINTMENTS:
+        raise ValueError(f"Too many appointments in the window. Maximum per operation: {BULK_MAX_APPOINTMENTS}")
+    return rows
+
+
+async def cancel_appointments(doctor_id: str, desde: datetime, hasta: datetime) -> List[Dict[str, Any]]:
+    """
+    Cancela las citas activas del médico en la ventana y libera sus horarios.
+
+    Raises:
+        ValueError: Si la ventana tiene demasiadas citas
+    """
+    rows = await _window_appointments(doctor_id, desde, hasta)
+    if not rows:
+        return []
+
+    await get_core_db()[Appointment.Settings.name].update_many(
+        {"_id": {"$in": [row["_id"] for row in rows]}, "estado": {"$in": ACTIVE_APPOINTMENT_STATES}},
+        {"$set": {"estado": "Cancelada", "slotCells": None, "updated_at": datetime.utcnow()}}
+    )
+
+    results = []
+    for row in rows:
+        booking_changed(doctor_id, (row["fecha"], row["estado"]), (row["fecha"], "Cancelada"))
+        results.append(_result(row["fecha"], "cancelled", str(row["_id"])))
+    return results
+
+
+async def move_appointments(doctor_id: str, desde: datetime, hasta: datetime, offset_minutes: int) -> List[Dict[str, Any]]:
+    """
+    Mueve las citas activas del médico en la ventana `offset_minutes` minutos
+    (por ejemplo 1440 para pasarlas al día siguiente). Cada cita solo se
+    mueve si la nueva hora está dentro de la jornada del médico y no choca
+    con otra cita activa; las demás quedan donde estaban.
+
+    Raises:
+        ValueError: Si la ventana tiene demasiadas citas
+    """
+    rows = await _window_appointments(doctor_id, desde, hasta)
+    offset = timedelta(minutes=offset_minutes)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+
+    # Nueva fecha y celdas (la disponibilidad efectiva se lee de MongoDB, sin caché, una vez por día)
+    availability_by_day: Dict[date, Optional[DoctorAvailability]] = {}
+    planned = []
+    for index, row in enumerate(rows):
+        new_fecha = row["fecha"] + offset
+        day = new_fecha.date()
+        if day not in availability_by_day:
+            availability_by_day[day] = await find_day_availability(doctor_id, day, use_cache=False)
+        duracion = slot_duration(availability_by_day[day], new_fecha)
+        if duracion is None:
+            results[index] = _result(row["fecha"], "unavailable", str(row["_id"]), "Doctor is not available at the new time")
+        else:
+            planned.append((index, row, new_fecha, slot_cells(new_fecha, duracion)))
+
+    collection = get_core_db()[Appointment.Settings.name]
+    # Al posponer, la nueva posición de una cita solapa la de la
+    # siguiente: se mueven primero las últimas (y al revés si offset < 0)
+    planned.sort(key=lambda item: (item[1]["fecha"], item[1]["_id"]), reverse=offset_minutes > 0)
+    for index, row, new_fecha, cells in planned:
+        try:
+            # Condicional: la cita sigue activa y en su horario original.
+            # Fecha y celdas cambian juntas; si el índice rechaza las nuevas
+            # celdas la cita conserva su reserva original.
+            result = await collection.update_one(
+                {"_id": row["_id"], "fecha": row["fecha"], "estado": {"$in": ACTIVE_APPOINTMENT_STATES}},
+                {"$set": {"fecha": new_fecha, "slotCells": cells, "updated_at": datetime.utcnow()}}
+            )
+        except DuplicateKeyError:
+            results[index] = _result(row["fecha"], "conflict", str(row["_id"]), "New time overlaps another appointment")
+            continue
+        except OperationFailure as e:
+            results[index] = _result(row["fecha"], "failed", str(row["_id"]), str(e))
+            continue
+
+        if not result.matched_count:
+            results[index] = _result(row["fecha"], "failed", str(row["_id"]), "Appointment changed during the operation")
+            continue
+        booking_changed(doctor_id, (row["fecha"], row["estado"]), (new_fecha, row["estado"]))
+        results[index] = _result(new_fecha, "moved", str(row["_id"]))
+
+    return results
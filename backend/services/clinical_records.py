@@ -0,0 +1,57 @@
+"""
+Servicio de Registros Clínicos
+==============================
+Los registros clínicos (vista médico) son documentos grandes: examen
+físico, laboratorios, imágenes, revisión por sistemas. Los listados solo
+necesitan unos pocos campos, así que se leen con una proyección
+(ClinicalRecordSummary) y se paginan por keyset sobre (fecha DESC, _id DESC)
+con los índices (patient_id, fecha, _id) y (doctor_id, fecha, _id).
+El documento completo solo se lee en la vista de detalle.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.models import ClinicalRecord
+from schemas.clinical_record_schemas import ClinicalRecordSummary, ClinicalRecordResponse
+from services.db import get_core_db
+from services.field_encryption import decrypt_rows
+from services.pagination import apply_cursor, split_page
+from services.serialization import response_projection, with_str_id
+
+# Más recientes primero; _id desempata registros del mismo día
+CLINICAL_RECORDS_SORT = [("fecha", -1), ("_id", -1)]
+
+# Solo los campos del resumen
+CLINICAL_RECORD_SUMMARY_PROJECTION = response_projection(ClinicalRecordSummary)
+
+
+async def page_clinical_record_summaries(
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Página de resúmenes de registros clínicos (dicts crudos proyectados).
+
+    Raises:
+        ValueError: Si el cursor es inválido
+
+    Returns:
+        Tuple de (resúmenes, cursor_siguiente o None)
+    """
+    rows = await get_core_db()[ClinicalRecord.Settings.name].find(
+        apply_cursor(query, CLINICAL_RECORDS_SORT, cursor),
+        CLINICAL_RECORD_SUMMARY_PROJECTION
+    ).sort(CLINICAL_RECORDS_SORT).limit(limit + 1).to_list(length=None)
+
+    rows, next_cursor = split_page(rows, CLINICAL_RECORDS_SORT, limit)
+    await decrypt_rows(rows, ClinicalRecord)
+    return [with_str_id(row) for row in rows], next_cursor
+
+
+def clinical_record_to_response(record: ClinicalRecord) -> ClinicalRecordResponse:
+    """Convierte un ClinicalRecord completo a su respuesta."""
+    return ClinicalRecordResponse(
+        id=str(record.id),
+        **record.model_dump(exclude={"id", "revision_id"})
+    )
@@ -0,0 +1,245 @@
+"""
+Servicio de Consultas Médicas
+=============================
+Las consultas se almacenan como documentos propios en la colección
+`consultas` (ConsultaRecord), indexada por (patient_id, fecha, _id).
+Antes estaban embebidas en PatientHistory.consultas, lo que hacía que
+cada lectura y cada save() del historial transfiriera y reescribiera
+todas las consultas del paciente, acercándose al límite de 16 MB.
+
+Funcionalidades:
+- Últimas N consultas para la vista del historial
+- Listado paginado por cursor (keyset sobre fecha DESC, _id DESC)
+- Migración (idempotente) de las consultas embebidas a la colección
+  (migrate_consultas.py y la creación de consultas)
+
+Las lecturas no migran: mientras un historial conserve consultas
+embebidas, embedded_consultas las devuelve como ConsultaRecord en memoria
+y latest_consultas/page_consultas (y la línea de tiempo) las mezclan con
+las de la colección. Cada consulta embebida tiene un _id determinista,
+el mismo que recibe al migrarse, así que los cursores siguen valiendo
+después de la migración.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, time, timezone
+from typing import Any, List, Optional, Sequence, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from models.models import PatientHistory, ConsultaRecord, Consulta
+from services.db import get_core_db
+from services.field_encryption import encrypt_fields
+from services.integrity import integrity_service, invalidate_history, revision_filter
+from services.pagination import apply_cursor, decode_cursor, split_page
+
+logger = logging.getLogger("sirona.consultas")
+
+# Consultas incluidas en la respuesta del historial completo
+HISTORY_CONSULTAS_PREVIEW = int(os.getenv("HISTORY_CONSULTAS_PREVIEW", "10"))
+
+# Más recientes primero; _id desempata consultas del mismo día
+CONSULTAS_SORT = [("fecha", -1), ("_id", -1)]
+
+
+def _record_key(record: ConsultaRecord) -> Tuple[datetime, Any]:
+    """Clave de CONSULTAS_SORT de una consulta (BSON guarda la fecha como medianoche)."""
+    return datetime.combine(record.fecha, time.min), record.id
+
+
+def _merge(records: List[ConsultaRecord], embedded: Sequence[ConsultaRecord]) -> List[ConsultaRecord]:
+    """Mezcla consultas de la colección y embebidas en el orden de CONSULTAS_SORT."""
+    if not embedded:
+        return records
+    return sorted([*records, *embedded], key=_record_key, reverse=True)
+
+
+async def latest_consultas(
+    patient_id: str,
+    limit: int = HISTORY_CONSULTAS_PREVIEW,
+    embedded: Sequence[ConsultaRecord] = ()
+) -> List[ConsultaRecord]:
+    """
+    Devuelve las `limit` consultas más recientes del paciente (con las
+    `embedded` de un historial aún no migrado, ver embedded_consultas).
+    """
+    records = await ConsultaRecord.find(
+        {"patient_id": patient_id}
+    ).sort(CONSULTAS_SORT).limit(limit).to_list()
+    return _merge(records, embedded)[:limit]
+
+
+async def consultas_by_id(patient_id: str, consulta_ids: List[str]) -> List[ConsultaRecord]:
+    """Consultas del paciente con esos IDs de API (índice único patient_id + consulta_id)."""
+    if not consulta_ids:
+        return []
+    return await ConsultaRecord.find(
+        {"patient_id": patient_id, "consulta_id": {"$in": consulta_ids}}
+    ).to_list()
+
+
+async def page_consultas(
+    patient_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    embedded: Sequence[ConsultaRecord] = ()
+) -> Tuple[List[ConsultaRecord], Optional[str]]:
+    """
+    Página de consultas del paciente (con las `embedded` de un historial
+    aún no migrado, filtradas en memoria con el mismo keyset).
+
+    Raises:
+        ValueError: Si el cursor es inválido
+
+    Returns:
+        Tuple de (consultas, cursor_siguiente o None)
+    """
+    query = apply_cursor({"patient_id": patient_id}, CONSULTAS_SORT, cursor)
+    records = await ConsultaRecord.find(query).sort(CONSULTAS_SORT).limit(limit + 1).to_list()
+    if embedded and cursor:
+        after = decode_cursor(cursor)
+        embedded = [record for record in embedded if _record_key(record) < (after["fecha"], after["_id"])]
+    return split_page(_merge(records, embedded)[:limit + 1], CONSULTAS_SORT, limit)
+
+
+def _consulta_created_at(consulta: Consulta) -> datetime:
+    """
+    Fecha de creación de una consulta embebida.
+    Los IDs tienen la forma "cons_<timestamp>"; si no se puede leer,
+    se usa la fecha de la consulta.
+    """
+    try:
+        return datetime.utcfromtimestamp(float(consulta.id.split("_", 1)[1]))
+    except (IndexError, ValueError, OverflowError):
+        return datetime.combine(consulta.fecha, time.min)
+
+
+def build_record(consulta: Consulta, patient_id: str, doctor_id: Optional[str] = None) -> ConsultaRecord:
+    """Crea un ConsultaRecord (con su hash de integridad) a partir de una Consulta."""
+    record = ConsultaRecord(
+        consulta_id=consulta.id,
+        patient_id=patient_id,
+        doctor_id=doctor_id,
+        fecha=consulta.fecha,
+        motivo=consulta.motivo,
+        diagnostico=consulta.diagnostico,
+        tratamiento=consulta.tratamiento,
+        notasMedico=consulta.notasMedico,
+        created_at=_consulta_created_at(consulta)
+    )
+    record.integrity_hash = integrity_service.calculate_consulta_hash(record)
+    return record
+
+
+def embedded_consulta_id(patient_id: str, consulta: Consulta) -> PydanticObjectId:
+    """
+    _id de una consulta embebida, el mismo al leerla sin migrar y al
+    migrarla: segundos de creación (el orden sigue el de creación) y hash
+    de (patient_id, consulta_id).
+    """
+    seconds = int(_consulta_created_at(consulta).replace(tzinfo=timezone.utc).timestamp())
+    seconds = min(max(seconds, 0), 2 ** 32 - 1)
+    digest = hashlib.sha256(f"{patient_id}:{consulta.id}".encode("utf-8")).digest()
+    return PydanticObjectId(seconds.to_bytes(4, "big") + digest[:8])
+
+
+async def embedded_consultas(patient_id: str) -> List[ConsultaRecord]:
+    """
+    Consultas aún embebidas en el historial, como ConsultaRecord en memoria
+    (con hash y _id de embedded_consulta_id), sin escribir nada. Omite las
+    que una migración interrumpida ya copió a la colección.
+
+    Solo para historiales con consultas embebidas: una lectura del
+    historial y otra de la colección.
+    """
+    history = await get_core_db()[PatientHistory.Settings.name].find_one(
+        {"patient_id": patient_id},
+        {"_id": 0, "consultas": 1, "medicoAsignado.medicoId": 1}
+    )
+    embedded = [Consulta.model_validate(item) for item in (history or {}).get("consultas") or []]
+    if not embedded:
+        return []
+
+    copied = await get_core_db()[ConsultaRecord.Settings.name].find(
+        {"patient_id": patient_id, "consulta_id": {"$in": [consulta.id for consulta in embedded]}},
+        {"_id": 0, "consulta_id": 1}
+    ).to_list(length=None)
+    copied_ids = {row["consulta_id"] for row in copied}
+
+    doctor_id = (history.get("medicoAsignado") or {}).get("medicoId")
+    records = []
+    for consulta in embedded:
+        if consulta.id in copied_ids:
+            continue
+        record = build_record(consulta, patient_id, doctor_id)
+        record.id = embedded_consulta_id(patient_id, consulta)
+        records.append(record)
+    records.sort(key=_record_key, reverse=True)
+    return records
+
+
+async def migrate_embedded_consultas(history: PatientHistory) -> int:
+    """
+    Mueve las consultas embebidas de un historial a la colección `consultas`.
+
+    Es idempotente: cada consulta se inserta con upsert por
+    (patient_id, consulta_id), así que un reintento no duplica datos.
+    Solo migra si el hash almacenado del historial es válido (o no existe);
+    un historial con discrepancia se deja intacto para revisión del
+    administrador.
+
+    Returns:
+        Número de consultas migradas
+    """
+    if not history.consultas:
+        return 0
+
+    stored_hash = history.integrity_hash
+    if stored_hash and stored_hash != integrity_service.calculate_hash(history):
+        logger.warning(
+            f"Skipping consultas migration for history {history.id}: integrity hash mismatch"
+        )
+        return 0
+
+    operations = []
+    for consulta in history.consultas:
+        record = build_record(consulta, history.patient_id, history.medicoAsignado.medicoId)
+        # patient_id y consulta_id los toma el upsert del filtro
+        document = record.model_dump(exclude={"id", "revision_id", "patient_id", "consulta_id"})
+        document["fecha"] = datetime.combine(record.fecha, time.min)
+        # El _id va en el contexto del cifrado: se fija aquí y no en el upsert.
+        # Es el mismo con que embedded_consultas la devolvía sin migrar
+        document["_id"] = embedded_consulta_id(history.patient_id, consulta)
+        encrypt_fields(document, ConsultaRecord)
+        operations.append(UpdateOne(
+            {"patient_id": record.patient_id, "consulta_id": record.consulta_id},
+            {"$setOnInsert": document},
+            upsert=True
+        ))
+
+    collection = get_core_db()[ConsultaRecord.Settings.name]
+    await collection.bulk_write(operations, ordered=True)
+
+    # Vaciar las consultas embebidas y fijar el nuevo hash en una sola
+    # escritura, condicionada a la revisión leída: si otra escritura llegó
+    # entre medio, el hash calculado aquí ya no corresponde y no se escribe
+    # (las consultas ya copiadas se reutilizan en el próximo intento)
+    migrated = len(history.consultas)
+    history.consultas = []
+    new_hash = integrity_service.calculate_hash(history)
+    result = await get_core_db()[PatientHistory.Settings.name].update_one(
+        {"_id": history.id, "is_corrupted": {"$ne": True}, **revision_filter(history.revision)},
+        {"$set": {"consultas": [], "integrity_hash": new_hash}, "$inc": {"revision": 1}}
+    )
+    invalidate_history(str(history.id))
+    if not result.modified_count:
+        logger.warning(
+            f"Consultas migration for history {history.id} lost a race with a concurrent write; run it again"
+        )
+        return 0
+
+    logger.info(f"Migrated {migrated} consultas out of history {history.id}")
+    return migrated
@@ -9,11 +9,16 @@ from models.models import (
     Session,
     MFASecret,
     PatientHistory,
+    ConsultaRecord,
     ClinicalRecord,
     Appointment,
     DoctorAvailability,
+    AvailabilityTemplate,
+    DoctorPatientAssignment,
+    DataKey,
     AuditLog
 )
+from services.field_encryption import field_keyring
 
 # === ARQUITECTURA DE 3 BASES DE DATOS (ZERO TRUST) ===
 
@@ -61,10 +66,14 @@ async def init_db():
             document_models=[
                 User,        # Credenciales, roles
                 Session,     # Tokens activos
-                MFASecret    # Secretos de 2FA
+                MFASecret,   # Secretos de 2FA
+                DataKey      # Claves de datos (cifrado de campos)
             ]
         )
         
+        # Claves de datos envueltas para el cifrado de campos
+        await field_keyring.load(db_auth[DataKey.Settings.name])
+        
         print(f"DB Identidad: {DB_NAME_AUTH}")
         
         # ===== 2. BASE DE NEGOCIO (sirona_core) =====
@@ -75,9 +84,12 @@ async def init_db():
             database=db_core,
             document_models=[
                 PatientHistory,      # Historiales de pacientes
+                ConsultaRecord,      # Consultas (una por documento)
                 ClinicalRecord,      # Registros médicos
                 Appointment,         # Citas médicas
-                DoctorAvailability   # Disponibilidad de médicos
+                DoctorAvailability,  # Disponibilidad de médicos
+                AvailabilityTemplate,  # Plantillas semanales de disponibilidad
+                DoctorPatientAssignment  # Índice de asignación médico-paciente
             ]
         )
         
@@ -2,13 +2,14 @@
 Servicio de envío de emails para notificaciones del sistema.
 Incluye envío de contraseñas temporales a nuevos usuarios.
 """
+import asyncio
 import os
 import smtplib
 import secrets
 import string
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -74,6 +75,33 @@ def generate_temporary_password(length: int = 16) -> str:
     return ''.join(password)
 
 
+def build_message(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None
+) -> MIMEMultipart:
+    """
+    Construye el mensaje MIME (texto plano opcional + HTML).
+    """
+    # Crear mensaje
+    msg = MIMEMultipart('alternative')
+    msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    # Agregar contenido de texto plano si se proporciona
+    if body_text:
+        part1 = MIMEText(body_text, 'plain', 'utf-8')
+        msg.attach(part1)
+    
+    # Agregar contenido HTML
+    part2 = MIMEText(body_html, 'html', 'utf-8')
+    msg.attach(part2)
+    
+    return msg
+
+
 async def send_email(
     to_email: str,
     subject: str,
@@ -101,20 +129,7 @@ async def send_email(
         )
     
     try:
-        # Crear mensaje
-        msg = MIMEMultipart('alternative')
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Agregar contenido de texto plano si se proporciona
-        if body_text:
-            part1 = MIMEText(body_text, 'plain', 'utf-8')
-            msg.attach(part1)
-        
-        # Agregar contenido HTML
-        part2 = MIMEText(body_html, 'html', 'utf-8')
-        msg.attach(part2)
+        msg = build_message(to_email, subject, body_html, body_text)
         
         # Conectar y enviar
         with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
@@ -128,23 +143,17 @@ async def send_email(
         raise EmailServiceError(f"Failed to send email: {str(e)}")
 
 
-async def send_temporary_password_email(
+def build_temporary_password_email(
     to_email: str,
     full_name: str,
     temporary_password: str,
     role: str
-) -> bool:
+) -> Tuple[str, str, str]:
     """
-    Envía un email con la contraseña temporal a un nuevo usuario.
-    
-    Args:
-        to_email: Email del nuevo usuario
-        full_name: Nombre completo del usuario
-        temporary_password: Contraseña temporal generada
-        role: Rol del usuario (Médico, Paciente, Secretario, etc.)
+    Construye el contenido del email de contraseña temporal.
     
     Returns:
-        bool: True si el email se envió correctamente
+        Tuple de (asunto, cuerpo_html, cuerpo_texto)
     """
     subject = "Bienvenido a Sirona - Sus credenciales de acceso"
     
@@ -273,4 +282,76 @@ async def send_temporary_password_email(
     Este es un mensaje automático. Por favor no responda a este correo.
     """
     
+    return subject, body_html, body_text
+
+
+async def send_temporary_password_email(
+    to_email: str,
+    full_name: str,
+    temporary_password: str,
+    role: str
+) -> bool:
+    """
+    Envía un email con la contraseña temporal a un nuevo usuario.
+    
+    Args:
+        to_email: Email del nuevo usuario
+        full_name: Nombre completo del usuario
+        temporary_password: Contraseña temporal generada
+        role: Rol del usuario (Médico, Paciente, Secretario, etc.)
+    
+    Returns:
+        bool: True si el email se envió correctamente
+    """
+    subject, body_html, body_text = build_temporary_password_email(
+        to_email, full_name, temporary_password, role
+    )
     return await send_email(to_email, subject, body_html, body_text)
+
+
+def _send_temporary_password_emails_sync(recipients: List[Dict[str, str]]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Envía varios emails de credenciales reutilizando UNA conexión SMTP
+    (un solo handshake TLS y un solo login).
+    """
+    results = []
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+        server.starttls()
+        server.login(SMTP_USER, SMTP_PASSWORD)
+        for recipient in recipients:
+            try:
+                subject, body_html, body_text = build_temporary_password_email(
+                    recipient["email"], recipient["full_name"], recipient["temporary_password"], recipient["role"]
+                )
+                server.send_message(build_message(recipient["email"], subject, body_html, body_text))
+                results.append((recipient["email"], None))
+            except smtplib.SMTPException as e:
+                results.append((recipient["email"], str(e)))
+    return results
+
+
+async def send_temporary_password_emails(recipients: List[Dict[str, str]]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Envía emails de contraseña temporal en lote (importaciones masivas).
+    El envío SMTP (bloqueante) corre en un hilo para no bloquear el event loop.
+    
+    Args:
+        recipients: Dicts con email, full_name, temporary_password y role
+    
+    Returns:
+        Lista de (email, error o None)
+    
+    Raises:
+        EmailServiceError: Si el servicio no está configurado o falla la conexión
+    """
+    if not recipients:
+        return []
+    if not is_email_configured():
+        raise EmailServiceError(
+            "Email service is not configured. Please set SMTP_HOST, SMTP_USER, and SMTP_PASSWORD in .env"
+        )
+    
+    try:
+        return await asyncio.to_thread(_send_temporary_password_emails_sync, recipients)
+    except (smtplib.SMTPException, OSError) as e:
+        raise EmailServiceError(f"Failed to send emails: {str(e)}")
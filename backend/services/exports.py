@@ -0,0 +1,335 @@
+"""
+Exportación del resumen clínico en segundo plano
+================================================
+Generar el PDF de un historial grande dentro del handler bloquearía el
+event loop varios segundos. En su lugar:
+
+1. POST crea un trabajo y responde 202 de inmediato.
+2. El trabajo lee los datos (historial verificado, consultas, registros
+   clínicos) con consultas proyectadas y delega el render a un proceso de
+   trabajo (ProcessPoolExecutor), que escribe el PDF página por página en
+   un archivo temporal.
+3. El archivo se descarga con un token de un solo propósito y vencimiento
+   (FileResponse: envío por bloques y soporte de Range / 206).
+
+Límites y caché:
+- Cada usuario puede tener como mucho EXPORT_MAX_ACTIVE_PER_USER trabajos
+  pendientes o en proceso.
+- El último PDF de cada revisión del historial (revisión del historial +
+  estado de sus registros clínicos) se reutiliza: pedir otra vez el mismo
+  resumen sin cambios no vuelve a generarlo.
+- Trabajos y archivos vencen a los EXPORT_TTL_SECONDS.
+
+El estado vive en memoria del proceso (como las cachés de historiales).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import secrets
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from bson import ObjectId
+
+from models.models import User, ConsultaRecord, ClinicalRecord
+from services.clinical_records import CLINICAL_RECORDS_SORT
+from services.consultas import CONSULTAS_SORT, embedded_consultas
+from services.field_encryption import decrypt_rows
+from services.db import get_auth_db, get_core_db
+from services.http_cache import make_etag
+from services.integrity import integrity_service, ConsultaHashView, CONSULTA_HASH_PROJECTION
+from services.pdf_summary import render_summary_pdf
+
+logger = logging.getLogger("sirona.exports")
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_MAX_ACTIVE_PER_USER = int(os.getenv("EXPORT_MAX_ACTIVE_PER_USER", "2"))
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sirona_exports"))
+
+
+class ExportStatus(str, Enum):
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+
+
+class ExportLimitError(Exception):
+    """El usuario alcanzó el máximo de exportaciones simultáneas."""
+    pass
+
+
+class ExportIntegrityError(Exception):
+    """Alguna consulta a exportar no supera la verificación de integridad (PBI-20)."""
+    pass
+
+
+class ExportFile:
+    """PDF generado para una revisión del historial (compartido entre trabajos)."""
+
+    def __init__(self, path: str, size: int, pages: int):
+        self.path = path
+        self.size = size
+        self.pages = pages
+        self.expires_at = time.monotonic() + EXPORT_TTL_SECONDS
+
+
+class ExportJob:
+    """Trabajo de exportación de un usuario."""
+
+    def __init__(self, user_id: str, patient_id: str, revision_key: str):
+        self.id = secrets.token_hex(12)
+        self.download_token = secrets.token_urlsafe(32)
+        self.user_id = user_id
+        self.patient_id = patient_id
+        self.revision_key = revision_key
+        self.status = ExportStatus.PENDIENTE
+        self.cached = False
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.expires_at = time.monotonic() + EXPORT_TTL_SECONDS
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (ExportStatus.PENDIENTE, ExportStatus.EN_PROCESO)
+
+
+class ExportManager:
+    """Registro de trabajos, archivos por revisión y pool de procesos de render."""
+
+    def __init__(self):
+        self._jobs: Dict[str, ExportJob] = {}
+        self._jobs_by_token: Dict[str, str] = {}
+        # revision_key -> último PDF generado para esa revisión
+        self._files: Dict[str, ExportFile] = {}
+        # revision_key -> render en curso (un solo render por revisión)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # fork: el proceso hijo no vuelve a importar main.py (que arranca uvicorn)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context("fork")
+            )
+        return self._executor
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.expires_at < now and not job.active]:
+            job = self._jobs.pop(job_id)
+            self._jobs_by_token.pop(job.download_token, None)
+        for key in [key for key, export_file in self._files.items() if export_file.expires_at < now]:
+            _remove_file(self._files.pop(key).path)
+
+    def active_count(self, user_id: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.user_id == user_id and job.active)
+
+    def cached_file(self, revision_key: str) -> Optional[ExportFile]:
+        export_file = self._files.get(revision_key)
+        if export_file and os.path.exists(export_file.path):
+            return export_file
+        return None
+
+    def submit(
+        self,
+        user_id: str,
+        patient_id: str,
+        revision_key: str,
+        load_data: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> ExportJob:
+        """
+        Crea un trabajo. Si ya hay un PDF de la misma revisión, el trabajo
+        queda completado de inmediato sin volver a generarlo.
+
+        Raises:
+            ExportLimitError: Si el usuario ya tiene el máximo de trabajos activos
+        """
+        self._purge_expired()
+
+        job = ExportJob(user_id, patient_id, revision_key)
+        export_file = self.cached_file(revision_key)
+        if export_file:
+            # Extender la vida del archivo mientras el trabajo siga vigente
+            export_file.expires_at = max(export_file.expires_at, job.expires_at)
+            job.status = ExportStatus.COMPLETADO
+            job.cached = True
+            job.finished_at = datetime.utcnow()
+        else:
+            if self.active_count(user_id) >= EXPORT_MAX_ACTIVE_PER_USER:
+                raise ExportLimitError(
+                    f"Maximum of {EXPORT_MAX_ACTIVE_PER_USER} concurrent exports per user reached"
+                )
+            render = self._inflight.get(revision_key)
+            if render is None:
+                render = asyncio.create_task(self._render(revision_key, load_data))
+                self._inflight[revision_key] = render
+            job.task = asyncio.create_task(self._follow(job, render))
+
+        self._jobs[job.id] = job
+        self._jobs_by_token[job.download_token] = job.id
+        return job
+
+    async def _render(self, revision_key: str, load_data: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        """Lee los datos y genera el PDF en el pool de procesos (escritura a .part y rename atómico)."""
+        os.makedirs(EXPORT_DIR, mode=0o700, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, f"{secrets.token_hex(12)}.pdf")
+        partial_path = path + ".part"
+        try:
+            data = await load_data()
+            loop = asyncio.get_running_loop()
+            size, pages = await loop.run_in_executor(self._get_executor(), render_summary_pdf, data, partial_path)
+            os.replace(partial_path, path)
+
+            previous = self._files.get(revision_key)
+            self._files[revision_key] = ExportFile(path, size, pages)
+            if previous:
+                _remove_file(previous.path)
+        except Exception:
+            _remove_file(partial_path)
+            raise
+        finally:
+            self._inflight.pop(revision_key, None)
+
+    async def _follow(self, job: ExportJob, render: asyncio.Task) -> None:
+        """Actualiza el estado del trabajo según el render (propio o compartido) de su revisión."""
+        job.status = ExportStatus.EN_PROCESO
+        try:
+            await asyncio.shield(render)
+            job.status = ExportStatus.COMPLETADO
+        except Exception as e:
+            logger.exception(f"Export job {job.id} failed")
+            job.status = ExportStatus.FALLIDO
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.task = None
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def file_for_token(self, token: str) -> Optional[Tuple[ExportJob, ExportFile]]:
+        """
+        Archivo listo para descargar con ese token.
+
+        Returns:
+            Tuple de (trabajo, archivo) o None si el token no existe, venció
+            o el trabajo aún no terminó
+        """
+        self._purge_expired()
+        job = self._jobs.get(self._jobs_by_token.get(token, ""))
+        if not job or job.status != ExportStatus.COMPLETADO:
+            return None
+        export_file = self.cached_file(job.revision_key)
+        if not export_file:
+            return None
+        return job, export_file
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Instancia global del gestor de exportaciones
+export_manager = ExportManager()
+
+
+async def summary_revision_key(patient_id: str, history: Dict[str, Any]) -> str:
+    """
+    Identifica el contenido del resumen: revisión del historial (crear una
+    consulta también la incrementa) y (cantidad, última modificación) de
+    los registros clínicos del paciente, con un solo $group.
+    """
+    stats = await get_core_db()[ClinicalRecord.Settings.name].aggregate([
+        {"$match": {"patient_id": patient_id}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "last_update": {"$max": "$ultimaModificacion"}}}
+    ]).to_list(length=None)
+    count, last_update = (stats[0]["count"], stats[0]["last_update"]) if stats else (0, None)
+    return make_etag(
+        patient_id,
+        history["_id"],
+        history.get("revision", 0),
+        history.get("ultimaModificacion"),
+        history.get("integrity_hash"),
+        count,
+        last_update
+    )
+
+
+async def load_summary_data(patient_id: str, history: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos del resumen (dicts proyectados, serializables para el proceso de trabajo)."""
+    patient = None
+    if ObjectId.is_valid(patient_id):
+        patient = await get_auth_db()[User.Settings.name].find_one(
+            {"_id": ObjectId(patient_id)},
+            {"_id": 0, "fullName": 1, "cedula": 1, "fechaNacimiento": 1}
+        )
+
+    consultas = await get_core_db()[ConsultaRecord.Settings.name].find(
+        {"patient_id": patient_id},
+        CONSULTA_HASH_PROJECTION
+    ).sort(CONSULTAS_SORT).to_list(length=None)
+
+    registros = await get_core_db()[ClinicalRecord.Settings.name].find(
+        {"patient_id": patient_id},
+        {
+            "fecha": 1, "motivoConsulta": 1, "doctorName": 1, "diagnostico": 1,
+            "tratamiento": 1, "observaciones": 1, "laboratorios": 1, "seguimiento": 1
+        }
+    ).sort(CLINICAL_RECORDS_SORT).to_list(length=None)
+
+    # Texto clínico cifrado: se descifra en lote antes de pasar al proceso de render
+    await decrypt_rows(consultas, ConsultaRecord)
+    await decrypt_rows(registros, ClinicalRecord)
+
+    # Integridad de las consultas (PBI-20): una discrepancia marca la consulta
+    # y su historial y el resumen no se genera
+    if not await integrity_service.verify_consultas([ConsultaHashView.model_validate(c) for c in consultas]):
+        raise ExportIntegrityError("Historial bloqueado por problemas de integridad. Contacte al administrador.")
+
+    # Consultas aún embebidas (historial sin migrar): las cubre el hash del
+    # historial ya verificado; se leen sin escribir
+    if history.get("consultas"):
+        consultas += [
+            {
+                "_id": record.id,
+                "fecha": datetime.combine(record.fecha, datetime.min.time()),
+                "motivo": record.motivo,
+                "diagnostico": str(record.diagnostico),
+                "tratamiento": str(record.tratamiento),
+                "notasMedico": str(record.notasMedico)
+            }
+            for record in await embedded_consultas(patient_id)
+        ]
+        consultas.sort(key=lambda consulta: (consulta["fecha"], consulta["_id"]), reverse=True)
+    consultas = [
+        {key: consulta[key] for key in ("fecha", "motivo", "diagnostico", "tratamiento", "notasMedico")}
+        for consulta in consultas
+    ]
+
+    return {
+        "patient": patient or {},
+        "history": {key: value for key, value in history.items() if key != "_id"},
+        "consultas": consultas,
+        "registros": registros,
+        "generated_at": datetime.utcnow()
+    }
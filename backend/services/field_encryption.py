@@ -0,0 +1,469 @@
+"""
+Cifrado de campos (PHI y secretos) en MongoDB
+=============================================
+Cifrado por sobre (envelope encryption):
+
+- Clave maestra (KEK): 32 bytes en un archivo local
+  (FIELD_ENCRYPTION_KEY_FILE), nunca en la base de datos.
+- Claves de datos (DEK): AES-256-GCM, generadas por la aplicación y
+  guardadas envueltas (cifradas con la KEK) en `sirona_auth.data_keys`.
+  Se cifra siempre con la DEK activa más reciente; las anteriores se
+  conservan para descifrar.
+- Caché de DEKs desenvueltas con TTL (DEK_CACHE_TTL_SECONDS): la KEK solo
+  se usa al desenvolver, no en cada campo.
+
+Formato del valor guardado: BSON Binary de subtipo ENCRYPTED_BINARY_SUBTYPE
+(definido por el usuario) con versión, key_id, nonce y cifrado. Lo que
+marca un valor como cifrado es su tipo BSON, no su contenido: cualquier
+texto de entrada (incluso uno que parezca cifrado) se cifra siempre.
+
+Dato asociado (AAD): "<colección>.<campo>:<_id>" más el key_id, así un
+valor cifrado no puede copiarse a otro campo ni a otro documento.
+
+Valores anteriores:
+- Texto en claro (datos anteriores al cifrado): se lee tal cual.
+- Formato v1 ("enc:v1:<key_id>:<base64>", AAD = key_id): se descifra al
+  leer; si no descifra es texto en claro con ese prefijo y se devuelve tal
+  cual (con un aviso en el log).
+Ambos quedan en el formato actual en la siguiente escritura del documento
+o con el script migrate_field_encryption.py.
+
+Uso en los modelos: los documentos con campos `EncryptedStr` heredan de
+EncryptedDocument. Al leer de MongoDB (datos con `_id`) se descifran antes
+de validar; al guardar, un hook asigna el `_id` si falta y liga cada valor
+a su contexto, y `bson_encoders` (Settings) lo cifra al codificar a BSON.
+Las lecturas y escrituras crudas con Motor usan decrypt_rows /
+encrypt_fields / seal_fields con el modelo (y el `_id` de cada documento).
+
+Los lotes de DECRYPT_THREAD_THRESHOLD valores o más se descifran fuera del
+event loop.
+"""
+
+import asyncio
+import base64
+import binascii
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Annotated, Dict, List, Optional, Tuple, Type, get_args, get_origin
+
+from beanie import PydanticObjectId, before_event, Insert, Replace, Save, SaveChanges
+from bson.binary import Binary
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from pydantic import AfterValidator, BaseModel, model_validator
+from pymongo import UpdateOne
+
+logger = logging.getLogger("sirona.field_encryption")
+
+FIELD_ENCRYPTION_KEY_FILE = os.getenv(
+    "FIELD_ENCRYPTION_KEY_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "keys", "master.key")
+)
+DEK_CACHE_TTL_SECONDS = int(os.getenv("DEK_CACHE_TTL_SECONDS", "300"))
+# A partir de cuántos valores un lote se descifra en un hilo
+DECRYPT_THREAD_THRESHOLD = int(os.getenv("DECRYPT_THREAD_THRESHOLD", "500"))
+
+# Subtipo BSON Binary de los valores cifrados (rango definido por el usuario)
+ENCRYPTED_BINARY_SUBTYPE = 0x80
+# Versión del formato dentro del Binary
+FORMAT_VERSION = 2
+# Formato anterior: texto "enc:v1:<key_id>:<base64(nonce + cifrado)>"
+LEGACY_PREFIX = "enc:v1:"
+# Tamaño del nonce de AES-GCM (96 bits)
+NONCE_SIZE = 12
+KEY_SIZE = 32
+
+
+class FieldEncryptionError(ValueError):
+    """Valor cifrado inválido o clave de datos desconocida."""
+    pass
+
+
+def _load_master_key(path: str) -> bytes:
+    """
+    Lee la clave maestra (base64 de 32 bytes). Si el archivo no existe se
+    genera uno nuevo con permisos 0600; en producción debe provisionarse
+    y respaldarse aparte: sin él los datos cifrados son irrecuperables.
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as key_file:
+            key_file.write(base64.b64encode(AESGCM.generate_key(bit_length=256)))
+        logger.warning(f"Generated new field encryption master key at {path}; back it up securely")
+
+    with open(path, "rb") as key_file:
+        key = base64.b64decode(key_file.read().strip())
+    if len(key) != KEY_SIZE:
+        raise FieldEncryptionError(f"Master key at {path} must be {KEY_SIZE} bytes (base64)")
+    return key
+
+
+class FieldKeyring:
+    """
+    DEKs envueltas (cargadas de `data_keys`) y caché con TTL de DEKs
+    desenvueltas, indexada por key_id.
+    """
+
+    def __init__(self, master_key_file: str, ttl_seconds: int):
+        self.master_key_file = master_key_file
+        self.ttl_seconds = ttl_seconds
+        self._master: Optional[AESGCM] = None
+        self._wrapped: Dict[str, bytes] = {}
+        self._active_key_id: Optional[str] = None
+        # key_id -> (cifrador AES-GCM, desenvuelta en)
+        self._unwrapped: Dict[str, Tuple[AESGCM, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _master_cipher(self) -> AESGCM:
+        if self._master is None:
+            self._master = AESGCM(_load_master_key(self.master_key_file))
+        return self._master
+
+    def _wrap(self, key_id: str, dek: bytes) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._master_cipher().encrypt(nonce, dek, key_id.encode("ascii"))
+
+    async def load(self, collection) -> None:
+        """
+        Carga las DEKs envueltas de `data_keys`; si no hay ninguna activa,
+        crea una. Se llama al inicializar la base de datos.
+        """
+        self._master_cipher()
+        rows = await collection.find({}, {"_id": 0, "key_id": 1, "wrapped_key": 1, "active": 1, "created_at": 1}).to_list(length=None)
+        if not any(row.get("active") for row in rows):
+            key_id = secrets.token_hex(8)
+            row = {
+                "key_id": key_id,
+                "wrapped_key": base64.b64encode(self._wrap(key_id, AESGCM.generate_key(bit_length=256))).decode("ascii"),
+                "active": True,
+                "created_at": datetime.utcnow()
+            }
+            await collection.insert_one(dict(row))
+            rows.append(row)
+            logger.info(f"Created data encryption key {key_id}")
+
+        self._wrapped = {row["key_id"]: base64.b64decode(row["wrapped_key"]) for row in rows}
+        active = max((row for row in rows if row.get("active")), key=lambda row: row["created_at"])
+        self._active_key_id = active["key_id"]
+        self._unwrapped.clear()
+
+    def _cipher(self, key_id: str) -> AESGCM:
+        """DEK desenvuelta (caché con TTL)."""
+        entry = self._unwrapped.get(key_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl_seconds:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        wrapped = self._wrapped.get(key_id)
+        if wrapped is None:
+            raise FieldEncryptionError(f"Unknown data encryption key {key_id}")
+        try:
+            dek = self._master_cipher().decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:], key_id.encode("ascii"))
+        except InvalidTag:
+            raise FieldEncryptionError(f"Data encryption key {key_id} cannot be unwrapped with the master key")
+        cipher = AESGCM(dek)
+        self._unwrapped[key_id] = (cipher, time.monotonic())
+        return cipher
+
+    def encrypt(self, value: str, context: bytes) -> Binary:
+        """
+        Cifra siempre el texto con la DEK activa. `context` es el dato
+        asociado del campo (ver field_context).
+        """
+        if self._active_key_id is None:
+            raise RuntimeError("Field encryption keys not loaded. Call init_db() first.")
+        key_id = self._active_key_id.encode("ascii")
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self._cipher(self._active_key_id).encrypt(nonce, value.encode("utf-8"), context + b"|" + key_id)
+        return Binary(bytes([FORMAT_VERSION, len(key_id)]) + key_id + nonce + ciphertext, ENCRYPTED_BINARY_SUBTYPE)
+
+    def decrypt(self, value: Binary, context: bytes) -> str:
+        """
+        Descifra un valor del formato actual.
+
+        Raises:
+            FieldEncryptionError: Si el valor está dañado, la clave no existe
+                o el contexto no coincide (valor copiado de otro campo o documento)
+        """
+        blob = bytes(value)
+        if len(blob) < 2 or blob[0] != FORMAT_VERSION:
+            raise FieldEncryptionError("Unsupported encrypted value format")
+        key_end = 2 + blob[1]
+        key_id = blob[2:key_end]
+        nonce = blob[key_end:key_end + NONCE_SIZE]
+        try:
+            cipher = self._cipher(key_id.decode("ascii"))
+            plaintext = cipher.decrypt(nonce, blob[key_end + NONCE_SIZE:], context + b"|" + key_id)
+        except (InvalidTag, UnicodeDecodeError, ValueError):
+            raise FieldEncryptionError(f"Encrypted value cannot be decrypted in context {context.decode('utf-8', 'replace')}")
+        return plaintext.decode("utf-8")
+
+    def decrypt_legacy(self, value: str) -> str:
+        """
+        Texto guardado antes del formato actual: en claro, o v1 con prefijo.
+        Un valor con el prefijo v1 que no descifra es texto en claro que
+        empieza igual y se devuelve tal cual.
+        """
+        if not value.startswith(LEGACY_PREFIX):
+            return value
+        key_id, _, payload = value[len(LEGACY_PREFIX):].partition(":")
+        try:
+            blob = base64.b64decode(payload, validate=True)
+            plaintext = self._cipher(key_id).decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], key_id.encode("ascii"))
+            return plaintext.decode("utf-8")
+        except (binascii.Error, InvalidTag, UnicodeError, ValueError):
+            logger.warning("Value with legacy encryption prefix cannot be decrypted; returned as stored")
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "keys": len(self._wrapped),
+            "active_key_id": self._active_key_id,
+            "unwrapped_cached": len(self._unwrapped),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+# Instancia global del llavero de cifrado de campos
+field_keyring = FieldKeyring(FIELD_ENCRYPTION_KEY_FILE, DEK_CACHE_TTL_SECONDS)
+
+
+def field_context(collection: str, path: str, document_id: Any) -> bytes:
+    """Dato asociado de un campo cifrado: "<colección>.<campo>:<_id>"."""
+    if document_id is None:
+        raise FieldEncryptionError(f"Encrypted field {collection}.{path} requires the document _id")
+    return f"{collection}.{path}:{document_id}".encode("utf-8")
+
+
+def is_encrypted(value: Any) -> bool:
+    """True si el valor está guardado en el formato cifrado actual."""
+    return isinstance(value, Binary) and value.subtype == ENCRYPTED_BINARY_SUBTYPE
+
+
+class EncryptedText(str):
+    """
+    Texto en claro en memoria; se cifra al codificarse a BSON con el
+    contexto (colección, campo, _id) ligado en `context`.
+    """
+    context: Optional[bytes] = None
+
+    @classmethod
+    def bound(cls, value: str, context: bytes) -> "EncryptedText":
+        text = cls(value)
+        text.context = context
+        return text
+
+
+def encrypt_text(value: EncryptedText) -> Binary:
+    if value.context is None:
+        raise FieldEncryptionError("Encrypted field written without its context (collection, field, _id)")
+    return field_keyring.encrypt(str(value), value.context)
+
+
+def decrypt_value(value: Any, context: bytes) -> Any:
+    """Descifra un valor guardado (o lista de valores); texto anterior según decrypt_legacy."""
+    if is_encrypted(value):
+        return field_keyring.decrypt(value, context)
+    if isinstance(value, str):
+        return field_keyring.decrypt_legacy(value)
+    if isinstance(value, list):
+        return [decrypt_value(item, context) for item in value]
+    return value
+
+
+class _EncryptedField:
+    """Marca de los campos cifrados (ver encrypted_paths)."""
+    pass
+
+
+ENCRYPTED = _EncryptedField()
+
+# Campo de texto cifrado en MongoDB, en claro en el modelo (texto anterior
+# sin cifrar o en formato v1 también se acepta al validar)
+EncryptedStr = Annotated[str, AfterValidator(lambda value: EncryptedText(field_keyring.decrypt_legacy(value))), ENCRYPTED]
+
+# Para Settings.bson_encoders de los documentos con campos cifrados
+ENCRYPTED_BSON_ENCODERS = {EncryptedText: encrypt_text}
+
+
+def _annotation_encrypted(annotation: Any) -> bool:
+    if get_origin(annotation) is Annotated:
+        return any(meta is ENCRYPTED for meta in annotation.__metadata__)
+    return any(_annotation_encrypted(arg) for arg in get_args(annotation))
+
+
+@lru_cache(maxsize=None)
+def encrypted_paths(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """
+    Rutas (con punto para submodelos) de los campos EncryptedStr del
+    modelo, también Optional o listas, p. ej. "security.mfa_secret".
+    """
+    paths: List[str] = []
+    for name, field in model.model_fields.items():
+        if any(meta is ENCRYPTED for meta in field.metadata) or _annotation_encrypted(field.annotation):
+            paths.append(name)
+            continue
+        for arg in (field.annotation, *get_args(field.annotation)):
+            if isinstance(arg, type) and issubclass(arg, BaseModel):
+                paths.extend(f"{name}.{sub}" for sub in encrypted_paths(arg))
+    return tuple(paths)
+
+
+def encrypted_fields(model: Type[BaseModel]) -> List[str]:
+    """Campos de primer nivel declarados como EncryptedStr."""
+    return [path for path in encrypted_paths(model) if "." not in path]
+
+
+def _walk(document: Dict[str, Any], path: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(dict que contiene el último tramo de la ruta o None, último tramo)."""
+    *parents, leaf = path.split(".")
+    for part in parents:
+        document = document.get(part) if isinstance(document, dict) else None
+    return (document if isinstance(document, dict) else None), leaf
+
+
+def _collection_name(model: Type[BaseModel]) -> str:
+    return model.Settings.name
+
+
+def decrypt_fields(row: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """Descifra en el lugar los campos cifrados de un documento crudo (con `_id`)."""
+    collection = _collection_name(model)
+    for path in encrypted_paths(model):
+        parent, leaf = _walk(row, path)
+        if parent is not None and parent.get(leaf) is not None:
+            parent[leaf] = decrypt_value(parent[leaf], field_context(collection, path, row.get("_id")))
+    return row
+
+
+def encrypt_fields(document: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """Cifra en el lugar los campos de texto de un documento crudo (escrituras con Motor; requiere `_id`)."""
+    collection = _collection_name(model)
+    for path in encrypted_paths(model):
+        parent, leaf = _walk(document, path)
+        if parent is None:
+            continue
+        context = field_context(collection, path, document.get("_id"))
+        value = parent.get(leaf)
+        if isinstance(value, str):
+            parent[leaf] = field_keyring.encrypt(value, context)
+        elif isinstance(value, list):
+            parent[leaf] = [field_keyring.encrypt(item, context) if isinstance(item, str) else item for item in value]
+    return document
+
+
+def seal_fields(update: Dict[str, Any], document: BaseModel) -> Dict[str, Any]:
+    """
+    Marca como EncryptedText, ligados al documento, los campos cifrados de
+    un $set de Beanie sobre `document` (los cifra bson_encoders).
+    """
+    collection = _collection_name(type(document))
+    for path in encrypted_paths(type(document)):
+        value = update.get(path)
+        if isinstance(value, str):
+            update[path] = EncryptedText.bound(value, field_context(collection, path, document.id))
+    return update
+
+
+def _decrypt_rows_sync(rows: List[Dict[str, Any]], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    for row in rows:
+        decrypt_fields(row, model)
+    return rows
+
+
+async def decrypt_rows(rows: List[Dict[str, Any]], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """
+    Descifra en lote los campos cifrados de documentos crudos de `model`
+    (listados; cada fila con su `_id`). Los lotes grandes se descifran en un
+    hilo para no bloquear el event loop.
+    """
+    if len(rows) * len(encrypted_paths(model)) >= DECRYPT_THREAD_THRESHOLD:
+        return await asyncio.to_thread(_decrypt_rows_sync, rows, model)
+    return _decrypt_rows_sync(rows, model)
+
+
+class EncryptedDocument(BaseModel):
+    """
+    Base de los documentos con campos EncryptedStr: descifra al leer de
+    MongoDB y liga cada valor a su contexto antes de guardar.
+    """
+
+    @model_validator(mode="before")
+    @classmethod
+    def decrypt_stored_fields(cls, data: Any) -> Any:
+        # Solo los datos leídos de MongoDB traen "_id" (los construidos en
+        # memoria usan `id`); sin él no hay contexto para descifrar
+        if isinstance(data, dict) and data.get("_id") is not None:
+            data = decrypt_fields(dict(data), cls)
+        return data
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def bind_encrypted_fields(self):
+        if self.id is None:
+            # El _id forma parte del contexto: se asigna antes de codificar
+            self.id = PydanticObjectId()
+        collection = _collection_name(type(self))
+        for path in encrypted_paths(type(self)):
+            *parents, leaf = path.split(".")
+            owner: Any = self
+            for part in parents:
+                owner = getattr(owner, part, None)
+            value = getattr(owner, leaf, None) if owner is not None else None
+            if value is None:
+                continue
+            context = field_context(collection, path, self.id)
+            if isinstance(value, list):
+                value = [EncryptedText.bound(str(item), context) for item in value]
+            else:
+                value = EncryptedText.bound(str(value), context)
+            # Sin validate_assignment: el validador volvería a crear el EncryptedText sin contexto
+            owner.__dict__[leaf] = value
+
+
+async def encrypt_plaintext_fields(collection, model: Type[BaseModel], batch_size: int = 500) -> int:
+    """
+    Pasa al formato cifrado actual los valores de texto (en claro o en
+    formato v1) de los campos cifrados del modelo. Idempotente.
+
+    Returns:
+        Número de documentos actualizados
+    """
+    paths = encrypted_paths(model)
+    query = {"$or": [{path: {"$type": "string"}} for path in paths]}
+    projection = {path: 1 for path in paths}
+
+    updated = 0
+    operations = []
+    cursor = collection.find(query, projection).batch_size(batch_size)
+    async for doc in cursor:
+        changes = {}
+        for path in paths:
+            parent, leaf = _walk(doc, path)
+            value = parent.get(leaf) if parent is not None else None
+            context = field_context(collection.name, path, doc["_id"])
+            if isinstance(value, str):
+                changes[path] = field_keyring.encrypt(field_keyring.decrypt_legacy(value), context)
+            elif isinstance(value, list) and any(isinstance(item, str) for item in value):
+                changes[path] = [
+                    field_keyring.encrypt(field_keyring.decrypt_legacy(item), context) if isinstance(item, str) else item
+                    for item in value
+                ]
+        if changes:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(operations) >= batch_size:
+            updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+    return updated
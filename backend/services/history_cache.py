@@ -0,0 +1,107 @@
+"""
+Caché de lectura de historiales (cifrada en memoria)
+====================================================
+Los médicos abren los historiales de los mismos pacientes muchas veces
+al día. Esta caché read-through guarda en el proceso el documento
+completo del historial (sin consultas, que viven en su colección) ya
+verificado por integridad, para responder sin ir a `sirona_core`.
+
+Como son datos clínicos (PHI), cada entrada se guarda cifrada con
+AES-256-GCM: el documento se codifica en BSON y se cifra con una clave
+aleatoria que solo existe en la memoria del proceso (no se persiste ni
+se comparte). El patient_id va como dato asociado, así una entrada no
+puede descifrarse bajo otra clave.
+
+Consistencia:
+- TTL corto (HISTORY_CACHE_TTL_SECONDS).
+- Invalidación en cada escritura del historial (ver invalidate_history
+  en services.integrity).
+- Solo se cachean historiales íntegros, no corruptos y sin consultas
+  embebidas pendientes de migrar.
+"""
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import bson
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from services.bounded_cache import MISSING, BoundedCache
+
+HISTORY_CACHE_MAX_ENTRIES = int(os.getenv("HISTORY_CACHE_MAX_ENTRIES", "1000"))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "60"))
+
+# Tamaño del nonce de AES-GCM (96 bits)
+NONCE_SIZE = 12
+
+
+class EncryptedHistoryCache:
+    """
+    Caché LRU acotada, con TTL, de historiales cifrados, indexada por patient_id.
+    Mantiene además history_id -> patient_id para invalidar por ID de historial.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._aead = AESGCM(AESGCM.generate_key(bit_length=256))
+        # patient_id -> (nonce + ciphertext, history_id)
+        self._cache = BoundedCache(max_entries, ttl_seconds, on_remove=self._removed)
+        self._patients_by_history: Dict[str, str] = {}
+        self._bytes = 0
+
+    def _removed(self, patient_id: str, entry: Tuple[bytes, str]) -> None:
+        blob, history_id = entry
+        self._bytes -= len(blob)
+        self._patients_by_history.pop(history_id, None)
+
+    def __contains__(self, patient_id: str) -> bool:
+        """Indica si hay una entrada vigente (no cuenta como hit/miss)."""
+        return patient_id in self._cache
+
+    def get(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve una copia descifrada del historial o None si no está o expiró."""
+        entry = self._cache.get(patient_id)
+        if entry is MISSING:
+            return None
+
+        blob = entry[0]
+        plaintext = self._aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], patient_id.encode("utf-8"))
+        return bson.decode(plaintext)
+
+    def put(self, document: Dict[str, Any]) -> None:
+        """Cifra y guarda un historial, desalojando las entradas menos usadas si hace falta."""
+        patient_id = document["patient_id"]
+        history_id = str(document["_id"])
+
+        nonce = os.urandom(NONCE_SIZE)
+        blob = nonce + self._aead.encrypt(nonce, bson.encode(document), patient_id.encode("utf-8"))
+
+        self._cache.pop(patient_id)
+        self._patients_by_history[history_id] = patient_id
+        self._bytes += len(blob)
+        self._cache.put(patient_id, (blob, history_id))
+
+    def invalidate(self, history_id: str) -> None:
+        """Descarta el historial con ese ID (llamar en cada escritura)."""
+        patient_id = self._patients_by_history.get(history_id)
+        if patient_id is not None:
+            self._cache.pop(patient_id)
+
+    def invalidate_patient(self, patient_id: str) -> None:
+        """Descarta el historial de un paciente."""
+        self._cache.pop(patient_id)
+
+    def clear(self) -> None:
+        """Descarta todas las entradas (operaciones masivas)."""
+        self._cache.clear()
+        self._patients_by_history.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats(bytes=self._bytes)
+
+
+# Instancia global de la caché de historiales
+history_cache = EncryptedHistoryCache(
+    max_entries=HISTORY_CACHE_MAX_ENTRIES,
+    ttl_seconds=HISTORY_CACHE_TTL_SECONDS
+)
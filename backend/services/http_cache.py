@@ -0,0 +1,63 @@
+"""
+GET condicional con ETags
+=========================
+Las pantallas del médico y del paciente vuelven a pedir el historial y
+las citas aunque nada haya cambiado. Cada endpoint calcula un ETag
+fuerte a partir de metadatos baratos (revisión, fecha de modificación,
+hash de integridad, conteos) obtenidos con una consulta proyectada; si
+coincide con `If-None-Match` se responde 304 sin leer ni serializar la
+respuesta completa.
+
+Las respuestas llevan `Cache-Control: private, no-cache`: el navegador
+puede guardarlas, pero debe revalidarlas en cada uso (datos clínicos).
+"""
+
+import hashlib
+from typing import Any, Dict
+
+from fastapi import Request, Response, status
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Construye un ETag fuerte a partir de los valores que determinan la respuesta.
+    Deben incluirse también los parámetros que cambian la representación
+    (filtros, secciones pedidas).
+    """
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Indica si el ETag coincide con alguno de los de `If-None-Match`.
+    Para If-None-Match se usa comparación débil (RFC 9110): se ignora `W/`.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    candidates = [tag.strip() for tag in header.split(",")]
+    if "*" in candidates:
+        return True
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """Cabeceras de validación para respuestas construidas a mano."""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Agrega ETag y Cache-Control a una respuesta 200."""
+    response.headers.update(etag_headers(etag))
+
+
+def not_modified(etag: str) -> Response:
+    """Respuesta 304 (sin cuerpo) para un ETag vigente."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=etag_headers(etag)
+    )
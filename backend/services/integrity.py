@@ -26,15 +26,161 @@ Campos EXCLUIDOS (metadata volátil):
 
 import hashlib
 import json
-from typing import Optional, Tuple, Dict, Any, List
+import os
+import time
+from typing import Optional, Tuple, Dict, Any, AsyncIterator, List
 from datetime import datetime, date
 import logging
 
-from models.models import PatientHistory, AuditLog, User, UserRole
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import UpdateOne, ReturnDocument
+
+from models.models import (
+    PatientHistory,
+    ConsultaRecord,
+    AuditLog,
+    User,
+    UserRole,
+    MedicoAsignado,
+    ContactoEmergencia,
+    Consulta,
+    Vacuna
+)
 from services.audit import audit_logger, AuditEventType
+from services.bounded_cache import MISSING, BoundedCache
+from services.db import get_core_db
+from services.field_encryption import decrypt_rows
+from services.history_cache import history_cache
 
 logger = logging.getLogger("sirona.integrity")
 
+# Tamaño de lote por defecto para bulk_write e inserts de auditoría
+DEFAULT_BATCH_SIZE = 500
+
+# Caché de verificaciones en la ruta de lectura
+INTEGRITY_CACHE_MAX_ENTRIES = int(os.getenv("INTEGRITY_CACHE_MAX_ENTRIES", "10000"))
+# Re-verificación periódica: pasado el TTL se vuelve a hashear aunque no haya cambios
+INTEGRITY_CACHE_TTL_SECONDS = int(os.getenv("INTEGRITY_CACHE_TTL_SECONDS", "300"))
+
+# Reintentos de update_history_fields ante escrituras concurrentes
+HISTORY_UPDATE_MAX_RETRIES = 5
+
+
+class HistoryHashView(BaseModel):
+    """
+    Proyección de PatientHistory con solo los campos que entran en el hash
+    (más los de identificación y estado de integridad).
+    Los jobs masivos la usan para no leer demografía ni proximaCita.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    patient_id: str
+    tipoSangre: str
+    alergias: List[str] = []
+    condicionesCronicas: List[str] = []
+    medicamentosActuales: List[str] = []
+    medicoAsignado: Optional[MedicoAsignado] = None
+    contactoEmergencia: Optional[ContactoEmergencia] = None
+    consultas: List[Consulta] = []
+    vacunas: List[Vacuna] = []
+    antecedentesFamiliares: List[str] = []
+    integrity_hash: Optional[str] = None
+    is_corrupted: bool = False
+    corruption_reason: Optional[str] = None
+
+
+class ConsultaHashView(BaseModel):
+    """
+    Proyección de ConsultaRecord con los campos que entran en su hash
+    (texto clínico ya descifrado) y su estado de integridad.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    consulta_id: str
+    patient_id: str
+    fecha: date
+    motivo: str
+    diagnostico: str
+    tratamiento: str
+    notasMedico: str
+    integrity_hash: Optional[str] = None
+    is_corrupted: bool = False
+
+
+# Campos de PatientHistory que lee el recálculo del hash
+HISTORY_HASH_PROJECTION = {field: 1 for field in HistoryHashView.model_fields if field != "id"}
+
+# Campos de ConsultaRecord que lee la verificación de integridad
+CONSULTA_HASH_PROJECTION = {field: 1 for field in ConsultaHashView.model_fields if field != "id"}
+
+
+async def iter_consulta_hash_views(batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[ConsultaHashView]:
+    """Recorre todas las consultas con la proyección de hash, descifrando en lotes."""
+    rows = []
+    cursor = get_core_db()[ConsultaRecord.Settings.name].find({}, CONSULTA_HASH_PROJECTION).batch_size(batch_size)
+    async for row in cursor:
+        rows.append(row)
+        if len(rows) >= batch_size:
+            for row in await decrypt_rows(rows, ConsultaRecord):
+                yield ConsultaHashView.model_validate(row)
+            rows = []
+    for row in await decrypt_rows(rows, ConsultaRecord):
+        yield ConsultaHashView.model_validate(row)
+
+
+class VerificationCache:
+    """
+    Caché LRU acotada (con TTL) de historiales verificados como íntegros.
+    
+    La clave efectiva es (history_id, ultimaModificacion, integrity_hash):
+    una entrada solo vale si el documento leído conserva exactamente la
+    misma fecha de modificación y el mismo hash almacenado. Solo se guardan
+    resultados VÁLIDOS; una discrepancia nunca se cachea.
+    
+    Garantías de detección de manipulación:
+    - TTL corto: cada historial se vuelve a hashear periódicamente, lo que
+      detecta cambios directos en BD que no alteran ultimaModificacion.
+    - Invalidación explícita en cada escritura legítima (invalidate/clear).
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._cache = BoundedCache(max_entries, ttl_seconds)
+    
+    def is_verified(self, history_id: str, ultima_modificacion: datetime, stored_hash: str) -> bool:
+        """Indica si el historial ya fue verificado y no ha cambiado desde entonces."""
+        entry = self._cache.get(history_id, valid=lambda entry: entry == (ultima_modificacion, stored_hash))
+        return entry is not MISSING
+    
+    def mark_verified(self, history_id: str, ultima_modificacion: datetime, stored_hash: str) -> None:
+        """Registra una verificación válida, desalojando la entrada menos usada si hace falta."""
+        self._cache.put(history_id, (ultima_modificacion, stored_hash))
+    
+    def invalidate(self, history_id: str) -> None:
+        """Descarta la verificación de un historial (llamar en cada escritura)."""
+        self._cache.pop(history_id)
+    
+    def clear(self) -> None:
+        """Descarta todas las verificaciones (operaciones masivas)."""
+        self._cache.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Instancia global de la caché de verificación
+verification_cache = VerificationCache(
+    max_entries=INTEGRITY_CACHE_MAX_ENTRIES,
+    ttl_seconds=INTEGRITY_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_history(history_id: str) -> None:
+    """
+    Descarta la verificación cacheada y la copia en history_cache de un
+    historial. Llamar en cada escritura del historial.
+    """
+    verification_cache.invalidate(history_id)
+    history_cache.invalidate(history_id)
+
 
 class IntegrityService:
     """
@@ -62,12 +208,12 @@ class IntegrityService:
             return obj
     
     @staticmethod
-    def calculate_hash(history: PatientHistory) -> str:
+    def calculate_hash(history: PatientHistory | HistoryHashView) -> str:
         """
         Calcula el hash SHA-256 del contenido clínico de un historial.
         
         Args:
-            history: El historial médico a hashear
+            history: El historial médico a hashear (documento completo o HistoryHashView)
             
         Returns:
             String hexadecimal del hash SHA-256
@@ -118,6 +264,25 @@ class IntegrityService:
         hash_obj = hashlib.sha256(json_str.encode('utf-8'))
         return hash_obj.hexdigest()
     
+    @staticmethod
+    def calculate_consulta_hash(consulta: ConsultaRecord | ConsultaHashView) -> str:
+        """
+        Calcula el hash SHA-256 del contenido clínico de una consulta.
+        Cada ConsultaRecord lleva su propio hash desde que las consultas
+        dejaron de estar embebidas en el historial.
+        """
+        clinical_content = {
+            "id": consulta.consulta_id,
+            "patient_id": consulta.patient_id,
+            "fecha": consulta.fecha.isoformat() if isinstance(consulta.fecha, date) else consulta.fecha,
+            "motivo": consulta.motivo,
+            "diagnostico": consulta.diagnostico,
+            "tratamiento": consulta.tratamiento,
+            "notasMedico": consulta.notasMedico
+        }
+        json_str = json.dumps(clinical_content, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(json_str.encode('utf-8')).hexdigest()
+    
     @staticmethod
     async def verify_integrity(
         history: PatientHistory,
@@ -179,6 +344,7 @@ class IntegrityService:
         new_hash = IntegrityService.calculate_hash(history)
         history.integrity_hash = new_hash
         await history.save()
+        invalidate_history(str(history.id))
         
         logger.info(f"Updated integrity hash for history {history.id}: {new_hash[:16]}...")
         return new_hash
@@ -197,10 +363,13 @@ class IntegrityService:
             reason: Razón de la corrupción detectada
             ip_address: IP para auditoría
         """
-        history.is_corrupted = True
-        history.corruption_detected_at = datetime.utcnow()
-        history.corruption_reason = reason
-        await history.save()
+        # $set solo de los flags: no reescribir el documento completo
+        await history.set({
+            PatientHistory.is_corrupted: True,
+            PatientHistory.corruption_detected_at: datetime.utcnow(),
+            PatientHistory.corruption_reason: reason
+        })
+        invalidate_history(str(history.id))
         
         # Registrar evento crítico
         await audit_logger.log_event(
@@ -220,6 +389,228 @@ class IntegrityService:
             f"HISTORIAL MARKED AS CORRUPTED: {history.id} - Reason: {reason}"
         )
     
+    @staticmethod
+    async def mark_many_as_corrupted(
+        histories: List[HistoryHashView],
+        reason: str,
+        ip_address: str = "system"
+    ) -> int:
+        """
+        Marca varios historiales como corruptos con un solo update_many
+        y un solo insert de auditoría.
+        
+        Args:
+            histories: Proyecciones de los historiales a marcar
+            reason: Razón de la corrupción detectada
+            ip_address: IP para auditoría
+            
+        Returns:
+            Número de historiales marcados
+        """
+        if not histories:
+            return 0
+        
+        collection = get_core_db()[PatientHistory.Settings.name]
+        result = await collection.update_many(
+            {"_id": {"$in": [h.id for h in histories]}},
+            {"$set": {
+                "is_corrupted": True,
+                "corruption_detected_at": datetime.utcnow(),
+                "corruption_reason": reason
+            }}
+        )
+        for h in histories:
+            invalidate_history(str(h.id))
+        
+        await audit_logger.log_events_batch([
+            audit_logger.build_entry(
+                event_type=AuditEventType.HISTORIAL_CORRUPTO,
+                patient_id=h.patient_id,
+                ip_address=ip_address,
+                user_agent="integrity_service",
+                details={
+                    "history_id": str(h.id),
+                    "reason": reason,
+                    "action": "MARKED_CORRUPTED"
+                }
+            )
+            for h in histories
+        ])
+        
+        logger.critical(
+            f"{result.modified_count} HISTORIALES MARKED AS CORRUPTED - Reason: {reason} - "
+            f"IDs: {[str(h.id) for h in histories]}"
+        )
+        return result.modified_count
+    
+    @staticmethod
+    async def mark_consultas_as_corrupted(
+        consultas: List[ConsultaRecord | ConsultaHashView],
+        reason: str,
+        ip_address: str = "system"
+    ) -> int:
+        """
+        Marca consultas como corruptas y, con ellas, los historiales de sus
+        pacientes: el historial queda bloqueado para no administradores igual
+        que cuando las consultas estaban embebidas y entraban en su hash.
+        
+        Returns:
+            Número de consultas marcadas
+        """
+        if not consultas:
+            return 0
+        
+        result = await get_core_db()[ConsultaRecord.Settings.name].update_many(
+            {"_id": {"$in": [c.id for c in consultas]}},
+            {"$set": {
+                "is_corrupted": True,
+                "corruption_detected_at": datetime.utcnow(),
+                "corruption_reason": reason
+            }}
+        )
+        
+        histories = await PatientHistory.find(
+            {"patient_id": {"$in": list({c.patient_id for c in consultas})}, "is_corrupted": {"$ne": True}}
+        ).project(HistoryHashView).to_list()
+        consulta_ids = [c.consulta_id for c in consultas]
+        await IntegrityService.mark_many_as_corrupted(
+            histories,
+            reason=f"{reason} (consultas: {', '.join(consulta_ids)})",
+            ip_address=ip_address
+        )
+        return result.modified_count
+    
+    @staticmethod
+    async def verify_consultas(
+        consultas: List[ConsultaRecord | ConsultaHashView],
+        ip_address: str = "system"
+    ) -> bool:
+        """
+        Verifica el hash de cada consulta leída. Las que no coinciden se
+        marcan como corruptas (junto con su historial) y se registran en
+        auditoría; las verificaciones correctas no generan eventos.
+        
+        Returns:
+            True si todas las consultas están íntegras y ninguna estaba marcada
+        """
+        mismatched = [
+            c for c in consultas
+            if c.integrity_hash
+            and not c.is_corrupted
+            and c.integrity_hash != IntegrityService.calculate_consulta_hash(c)
+        ]
+        if mismatched:
+            logger.critical(
+                f"INTEGRITY VIOLATION detected for consultas {[c.consulta_id for c in mismatched]}"
+            )
+            await IntegrityService.mark_consultas_as_corrupted(
+                mismatched,
+                reason="Consulta hash mismatch detected during access",
+                ip_address=ip_address
+            )
+            return False
+        return not any(c.is_corrupted for c in consultas)
+    
+    @staticmethod
+    async def reseal_consultas(patient_id: str) -> int:
+        """
+        Recalcula el hash de las consultas de un paciente y limpia sus marcas
+        de corrupción. Solo tras revisar los datos (clear-corruption).
+        
+        Returns:
+            Número de consultas actualizadas
+        """
+        operations = [
+            UpdateOne({"_id": consulta.id}, {"$set": {
+                "integrity_hash": IntegrityService.calculate_consulta_hash(consulta),
+                "is_corrupted": False,
+                "corruption_detected_at": None,
+                "corruption_reason": None
+            }})
+            async for consulta in ConsultaRecord.find({"patient_id": patient_id})
+        ]
+        if not operations:
+            return 0
+        result = await get_core_db()[ConsultaRecord.Settings.name].bulk_write(operations, ordered=False)
+        return result.modified_count
+    
+    @staticmethod
+    async def regenerate_hashes_bulk(
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Recalcula el hash de todos los historiales no corruptos.
+        
+        Lee con un cursor proyectado (HistoryHashView) y escribe en lotes
+        con bulk_write usando $set de integrity_hash únicamente.
+        Los historiales cuyo hash ya coincide no se reescriben.
+        
+        Args:
+            batch_size: Operaciones por bulk_write
+            dry_run: Si es True, solo calcula y reporta; no escribe nada
+            
+        Returns:
+            Reporte con contadores y throughput
+        """
+        started = time.perf_counter()
+        collection = get_core_db()[PatientHistory.Settings.name]
+        
+        total = 0
+        updated = 0
+        unchanged = 0
+        skipped_corrupted = 0
+        batches = 0
+        pending: List[UpdateOne] = []
+        
+        async for view in PatientHistory.find_all().project(HistoryHashView):
+            total += 1
+            
+            # Solo regenerar si no está marcado como corrupto
+            if view.is_corrupted:
+                skipped_corrupted += 1
+                continue
+            
+            new_hash = IntegrityService.calculate_hash(view)
+            if new_hash == view.integrity_hash:
+                unchanged += 1
+                continue
+            
+            updated += 1
+            if dry_run:
+                continue
+            
+            pending.append(UpdateOne({"_id": view.id}, {"$set": {"integrity_hash": new_hash}}))
+            if len(pending) >= batch_size:
+                await collection.bulk_write(pending, ordered=False)
+                batches += 1
+                pending = []
+        
+        if pending:
+            await collection.bulk_write(pending, ordered=False)
+            batches += 1
+        
+        if updated and not dry_run:
+            verification_cache.clear()
+            history_cache.clear()
+        
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Hash regeneration {'(dry run) ' if dry_run else ''}finished: "
+            f"{total} histories in {elapsed:.2f}s, {updated} updated in {batches} batches"
+        )
+        
+        return {
+            "dry_run": dry_run,
+            "total": total,
+            "updated": updated,
+            "unchanged": unchanged,
+            "skipped_corrupted": skipped_corrupted,
+            "batches": batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "histories_per_second": round(total / elapsed, 1) if elapsed > 0 else None
+        }
+    
     @staticmethod
     async def check_access_allowed(
         history: PatientHistory,
@@ -251,31 +642,172 @@ class IntegrityService:
 integrity_service = IntegrityService()
 
 
-async def verify_and_get_history(
-    history: PatientHistory,
+def revision_filter(revision: int) -> Dict[str, Any]:
+    """
+    Filtro compare-and-set sobre `revision`. Los historiales anteriores a
+    las escrituras atómicas no tienen el campo: revisión 0 = ausente o 0.
+    """
+    if revision:
+        return {"revision": revision}
+    return {"revision": {"$in": [0, None]}}
+
+
+async def update_history_fields(
+    patient_id: str,
+    fields: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Actualiza campos del historial de forma atómica y mantiene su hash.
+    
+    1. Lee solo los campos hasheados y la revisión actual.
+    2. Aplica los cambios en memoria y calcula el hash resultante.
+    3. Una sola escritura ($set de campos, hash y ultimaModificacion,
+       $inc de revision) condicionada a la revisión leída: el hash
+       guardado nunca queda desfasado de los campos, ni siquiera entre
+       dos escrituras.
+    4. Si otra escritura llegó entre medio, se reintenta desde la lectura
+       (hasta HISTORY_UPDATE_MAX_RETRIES veces).
+    
+    Los historiales marcados como corruptos no se modifican.
+    
+    Args:
+        patient_id: ID del paciente dueño del historial
+        fields: Campos a actualizar ({} solo actualiza ultimaModificacion)
+        
+    Returns:
+        El documento actualizado (dict crudo) o None si no existe, está
+        corrupto o no se pudo escribir tras los reintentos
+    """
+    collection = get_core_db()[PatientHistory.Settings.name]
+    
+    for _ in range(HISTORY_UPDATE_MAX_RETRIES):
+        current = await collection.find_one(
+            {"patient_id": patient_id, "is_corrupted": {"$ne": True}},
+            {**HISTORY_HASH_PROJECTION, "revision": 1}
+        )
+        if current is None:
+            return None
+        
+        revision = current.get("revision") or 0
+        new_hash = IntegrityService.calculate_hash(HistoryHashView.model_validate({**current, **fields}))
+        updated = await collection.find_one_and_update(
+            {"_id": current["_id"], "is_corrupted": {"$ne": True}, **revision_filter(revision)},
+            {
+                "$set": {**fields, "integrity_hash": new_hash, "ultimaModificacion": datetime.utcnow()},
+                "$inc": {"revision": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if updated is not None:
+            invalidate_history(str(updated["_id"]))
+            return updated
+    
+    logger.warning(f"update_history_fields: too many concurrent writes on history of patient {patient_id}")
+    return None
+
+
+async def touch_history(patient_id: str) -> bool:
+    """
+    Marca el historial como modificado ($set ultimaModificacion, $inc revision)
+    sin leerlo. Para escrituras que no cambian el contenido hasheado del
+    historial (p. ej. nuevas consultas, que viven en su propia colección).
+    
+    Returns:
+        True si el historial existe y no está corrupto
+    """
+    collection = get_core_db()[PatientHistory.Settings.name]
+    updated = await collection.find_one_and_update(
+        {"patient_id": patient_id, "is_corrupted": {"$ne": True}},
+        {"$set": {"ultimaModificacion": datetime.utcnow()}, "$inc": {"revision": 1}},
+        projection={"_id": 1}
+    )
+    if updated is None:
+        return False
+    invalidate_history(str(updated["_id"]))
+    return True
+
+
+# Campos de control que toda lectura parcial necesita para verificar integridad
+HISTORY_CONTROL_FIELDS = ("_id", "patient_id", "revision", "ultimaModificacion", "integrity_hash", "is_corrupted")
+
+
+def history_projection(fields: List[str]) -> Dict[str, Any]:
+    """Proyección MongoDB para las secciones pedidas más los campos de control."""
+    projection: Dict[str, Any] = {field: 1 for field in HISTORY_CONTROL_FIELDS}
+    for field in fields:
+        # Las consultas viven en su colección; del historial solo interesa
+        # saber si aún tiene consultas embebidas sin migrar
+        projection[field] = {"$slice": 1} if field == "consultas" else 1
+    return projection
+
+
+async def verify_and_get_history_document(
+    patient_id: str,
     user: User,
     ip_address: str,
-    user_agent: str
-) -> Tuple[PatientHistory, bool, Optional[str]]:
+    user_agent: str,
+    fields: Optional[List[str]] = None
+) -> Tuple[Optional[Dict[str, Any]], bool, Optional[str]]:
     """
-    Función de conveniencia que verifica integridad y permisos.
+    Verifica integridad y permisos de un historial y devuelve el documento
+    crudo, para construir respuestas completas o parciales (sparse
+    fieldsets, secciones).
+    
+    Read-through sobre history_cache: si el historial está en la caché
+    (cifrada) no se consulta MongoDB. Si no:
+    
+    - Sin `fields` se lee el documento completo, se verifica su hash y, si
+      es íntegro, se guarda en la caché para las siguientes lecturas.
+    - Con `fields` (secciones, chequeos de ETag) solo se leen esas
+      secciones y los campos de control. Si el historial no está en la
+      caché de verificación, se lee además HistoryHashView (sin demografía
+      ni proximaCita) para recalcular el hash.
     
     Returns:
-        Tuple de (historial, acceso_permitido, mensaje_error)
+        Tuple de (documento o None si no existe, acceso_permitido, mensaje_error)
     """
-    # Verificar integridad
-    is_valid, _, _ = await integrity_service.verify_integrity(
-        history, ip_address, user_agent
-    )
+    document = history_cache.get(patient_id)
     
-    if not is_valid:
-        await integrity_service.mark_as_corrupted(
-            history,
-            reason="Hash mismatch detected during access",
-            ip_address=ip_address
-        )
+    if document is None:
+        collection = get_core_db()[PatientHistory.Settings.name]
+        projection = history_projection(fields) if fields is not None else None
+        document = await collection.find_one({"patient_id": patient_id}, projection)
+        if document is None:
+            return (None, True, None)
+        
+        history_id = str(document["_id"])
+        stored_hash = document.get("integrity_hash") or ""
+        is_valid = True
+        
+        if not stored_hash or not verification_cache.is_verified(
+            history_id, document.get("ultimaModificacion"), stored_hash
+        ):
+            if projection is None:
+                view = HistoryHashView.model_validate(document)
+            else:
+                view = await PatientHistory.find_one({"_id": document["_id"]}).project(HistoryHashView)
+            if view is None:
+                return (None, True, None)
+            is_valid, _, _ = await integrity_service.verify_integrity(view, ip_address, user_agent)
+            
+            if not is_valid:
+                await integrity_service.mark_many_as_corrupted(
+                    [view],
+                    reason="Hash mismatch detected during access",
+                    ip_address=ip_address
+                )
+                document["is_corrupted"] = True
+            elif stored_hash and view.integrity_hash == stored_hash:
+                # Solo se marca si ambas lecturas ven la misma versión
+                verification_cache.mark_verified(history_id, document.get("ultimaModificacion"), stored_hash)
+        
+        if (
+            projection is None and is_valid and stored_hash
+            and not document.get("is_corrupted") and not document.get("consultas")
+        ):
+            history_cache.put(document)
     
-    # Verificar acceso
-    access_allowed, error_msg = await integrity_service.check_access_allowed(history, user)
+    if document.get("is_corrupted") and user.role != UserRole.ADMINISTRADOR:
+        return (document, False, "Historial bloqueado por problemas de integridad. Contacte al administrador.")
     
-    return (history, access_allowed, error_msg)
+    return (document, True, None)
@@ -0,0 +1,251 @@
+"""
+Series de resultados de laboratorio
+===================================
+`ClinicalRecord.laboratorios` guarda cada resultado como texto (valor,
+unidad, referencia), así que graficar la evolución de una prueba obligaba
+a leer y parsear todos los registros del paciente en cada petición.
+
+1. Cada registro se parsea UNA vez a una representación numérica compacta:
+   por prueba (nombre normalizado) un arreglo float64 de N x 4 columnas
+   (día ordinal, valor, límite inferior, límite superior) más las unidades.
+   Se guarda en una caché LRU en memoria indexada por record_id y validada
+   con `ultimaModificacion` (la "revisión" del registro): si el registro
+   cambió, se vuelve a parsear.
+2. Para armar la serie se leen de MongoDB solo (_id, ultimaModificacion)
+   de los registros del paciente; `laboratorios` solo se lee para los
+   registros que no están en caché o cambiaron.
+3. Tendencia (regresión lineal), media móvil y banderas fuera de rango se
+   calculan en una sola pasada vectorizada con NumPy.
+
+La caché solo contiene números y nombres de prueba (sin datos que
+identifiquen al paciente).
+"""
+
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.models import ClinicalRecord
+from services.bounded_cache import MISSING, BoundedCache
+from services.db import get_core_db
+from services.search import normalize_search_text
+
+LAB_SERIES_CACHE_MAX_RECORDS = int(os.getenv("LAB_SERIES_CACHE_MAX_RECORDS", "5000"))
+
+# Columnas de la representación compacta
+COL_DAY, COL_VALUE, COL_LOW, COL_HIGH = range(4)
+
+_NUMBER = r"[-+]?\d+(?:[.,]\d+)?"
+_NUMBER_RE = re.compile(_NUMBER)
+_RANGE_RE = re.compile(rf"({_NUMBER})\s*(?:-|–|a|to)\s*({_NUMBER})", re.IGNORECASE)
+_UPPER_RE = re.compile(rf"(?:<|≤|<=|hasta|menor a|menor que)\s*({_NUMBER})", re.IGNORECASE)
+_LOWER_RE = re.compile(rf"(?:>|≥|>=|mayor a|mayor que)\s*({_NUMBER})", re.IGNORECASE)
+
+# Parseo de un registro: prueba -> (arreglo N x 4, unidades, nombre mostrado)
+ParsedLabs = Dict[str, Tuple[np.ndarray, Tuple[str, ...], str]]
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def parse_lab_value(valor: Optional[str]) -> float:
+    """Primer número del valor ("5,4", "<0.5", "120 mg/dL"); NaN si no hay."""
+    match = _NUMBER_RE.search(valor or "")
+    return _to_float(match.group(0)) if match else np.nan
+
+
+def parse_reference(referencia: Optional[str]) -> Tuple[float, float]:
+    """
+    Límites del rango de referencia: "3.5-5.0", "3,5 a 5,0", "<200", ">40".
+    Los límites ausentes son NaN.
+    """
+    text = referencia or ""
+    match = _RANGE_RE.search(text)
+    if match:
+        return _to_float(match.group(1)), _to_float(match.group(2))
+    match = _UPPER_RE.search(text)
+    if match:
+        return np.nan, _to_float(match.group(1))
+    match = _LOWER_RE.search(text)
+    if match:
+        return _to_float(match.group(1)), np.nan
+    return np.nan, np.nan
+
+
+def _as_date(value: Any) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def parse_record_labs(laboratorios: List[Dict[str, Any]]) -> ParsedLabs:
+    """Convierte los laboratorios de un registro a la representación compacta."""
+    rows: Dict[str, List[Tuple[float, float, float, float]]] = {}
+    units: Dict[str, List[str]] = {}
+    names: Dict[str, str] = {}
+
+    for lab in laboratorios:
+        key = normalize_search_text(lab.get("prueba"))
+        if not key or not lab.get("fecha"):
+            continue
+        low, high = parse_reference(lab.get("referencia"))
+        rows.setdefault(key, []).append((
+            _as_date(lab["fecha"]).toordinal(),
+            parse_lab_value(lab.get("valor")),
+            low,
+            high
+        ))
+        units.setdefault(key, []).append((lab.get("unidad") or "").strip())
+        names.setdefault(key, lab.get("prueba"))
+
+    return {
+        key: (np.array(values, dtype=np.float64).reshape(-1, 4), tuple(units[key]), names[key])
+        for key, values in rows.items()
+    }
+
+
+class LabSeriesCache:
+    """
+    Caché LRU acotada de laboratorios parseados, indexada por record_id.
+    Cada entrada guarda la `ultimaModificacion` con la que se parseó.
+    """
+
+    def __init__(self, max_records: int):
+        self._cache = BoundedCache(max_records)
+
+    def get(self, record_id: str, revision: datetime) -> Optional[ParsedLabs]:
+        entry = self._cache.get(record_id, valid=lambda entry: entry[0] == revision)
+        return None if entry is MISSING else entry[1]
+
+    def put(self, record_id: str, revision: datetime, parsed: ParsedLabs) -> None:
+        self._cache.put(record_id, (revision, parsed))
+
+    def invalidate(self, record_id: str) -> None:
+        self._cache.pop(record_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Instancia global de la caché de laboratorios
+lab_series_cache = LabSeriesCache(max_records=LAB_SERIES_CACHE_MAX_RECORDS)
+
+
+async def load_patient_labs(patient_id: str) -> List[ParsedLabs]:
+    """
+    Laboratorios parseados de todos los registros del paciente.
+    Solo se leen y parsean los registros nuevos o modificados.
+    """
+    collection = get_core_db()[ClinicalRecord.Settings.name]
+    revisions = await collection.find(
+        {"patient_id": patient_id},
+        {"ultimaModificacion": 1}
+    ).to_list(length=None)
+
+    parsed: List[ParsedLabs] = []
+    stale = {}
+    for doc in revisions:
+        record_id = str(doc["_id"])
+        cached = lab_series_cache.get(record_id, doc.get("ultimaModificacion"))
+        if cached is None:
+            stale[doc["_id"]] = doc.get("ultimaModificacion")
+        else:
+            parsed.append(cached)
+
+    if stale:
+        cursor = collection.find(
+            {"_id": {"$in": list(stale)}},
+            {"laboratorios": 1, "ultimaModificacion": 1}
+        )
+        async for doc in cursor:
+            labs = parse_record_labs(doc.get("laboratorios") or [])
+            lab_series_cache.put(str(doc["_id"]), doc.get("ultimaModificacion"), labs)
+            parsed.append(labs)
+
+    return parsed
+
+
+def available_tests(records: List[ParsedLabs]) -> List[str]:
+    """Nombres (como se registraron) de las pruebas con al menos un resultado."""
+    names = {}
+    for labs in records:
+        for key, (_, _, name) in labs.items():
+            names.setdefault(key, name)
+    return sorted(names.values(), key=normalize_search_text)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Media móvil (ventana que termina en cada punto) con sumas acumuladas; ignora NaN."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    n = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (sums[end] - sums[start]) / n, np.nan)
+
+
+def _nullable(array: np.ndarray) -> List[Optional[float]]:
+    """Lista para JSON: NaN -> None."""
+    return [None if np.isnan(x) else float(x) for x in array.tolist()]
+
+
+def build_series(records: List[ParsedLabs], prueba: str, window: int) -> Optional[Dict[str, Any]]:
+    """
+    Serie lista para graficar de una prueba, ordenada por fecha.
+    Solo se incluyen los valores en la unidad más frecuente (los demás
+    se cuentan en `excluidos`). Devuelve None si la prueba no tiene resultados.
+    """
+    key = normalize_search_text(prueba)
+    parts = [labs[key] for labs in records if key in labs]
+    if not parts:
+        return None
+
+    data = np.concatenate([array for array, _, _ in parts])
+    units = np.array([unit for _, record_units, _ in parts for unit in record_units])
+    name = parts[0][2]
+
+    # Unidad más frecuente; valores no numéricos o en otra unidad se excluyen
+    unit_values, unit_counts = np.unique(units, return_counts=True)
+    unit = str(unit_values[np.argmax(unit_counts)])
+    keep = (units == unit) & ~np.isnan(data[:, COL_VALUE])
+    excluded = int(len(data) - keep.sum())
+    data = data[keep]
+    data = data[np.argsort(data[:, COL_DAY], kind="stable")]
+
+    days = data[:, COL_DAY]
+    values = data[:, COL_VALUE]
+    low = data[:, COL_LOW]
+    high = data[:, COL_HIGH]
+
+    # -1 bajo, 0 normal o sin referencia, 1 alto (NaN compara como False)
+    flags = np.where(values < low, -1, np.where(values > high, 1, 0)).astype(np.int8)
+
+    trend = None
+    if len(values) >= 2 and np.ptp(days) > 0:
+        slope, intercept = np.polyfit(days - days[0], values, 1)
+        trend = {
+            "pendientePorDia": float(slope),
+            "pendientePorAnio": float(slope * 365.25),
+            "direccion": "sube" if slope > 0 else "baja" if slope < 0 else "estable",
+            "linea": _nullable(intercept + slope * (days - days[0]))
+        }
+
+    return {
+        "prueba": name,
+        "unidad": unit,
+        "fechas": [date.fromordinal(int(d)) for d in days.tolist()],
+        "valores": values.tolist(),
+        "referenciaMin": _nullable(low),
+        "referenciaMax": _nullable(high),
+        "mediaMovil": _nullable(rolling_mean(values, window)),
+        "fueraDeRango": flags.tolist(),
+        "ventana": window,
+        "puntos": int(len(values)),
+        "fueraDeRangoTotal": int(np.count_nonzero(flags)),
+        "excluidos": excluded,
+        "tendencia": trend
+    }
@@ -0,0 +1,143 @@
+"""
+Utilidades de paginación por keyset (cursor)
+============================================
+La paginación con skip/offset obliga a MongoDB a recorrer y descartar
+todos los documentos anteriores a la página pedida. Con keyset la
+consulta continúa desde el último elemento devuelto usando el mismo
+índice del ordenamiento, por lo que el costo por página es constante.
+
+El cursor es opaco para el cliente: base64url del JSON extendido (BSON)
+con los valores de los campos de ordenamiento del último elemento.
+Soporta ObjectId, datetime y date sin conversiones manuales.
+"""
+
+import base64
+import binascii
+import re
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+
+# Ordenamiento: lista de (campo, dirección) con dirección 1 (ASC) o -1 (DESC)
+SortSpec = List[Tuple[str, int]]
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """
+    Codifica los valores de ordenamiento del último elemento de una página.
+
+    Args:
+        values: Diccionario campo -> valor (ej. {"fullName": "Ana", "_id": ObjectId(...)})
+
+    Returns:
+        Cursor opaco (base64url sin padding)
+    """
+    # BSON no tiene tipo date: se almacena como datetime a medianoche
+    values = {
+        k: datetime.combine(v, time.min) if isinstance(v, date) and not isinstance(v, datetime) else v
+        for k, v in values.items()
+    }
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Raises:
+        ValueError: Si el cursor está mal formado
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii"))
+        values = json_util.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor: expected an object")
+    return values
+
+
+def keyset_filter(sort: SortSpec, last: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Construye el filtro que selecciona los elementos posteriores a `last`
+    según el ordenamiento `sort`.
+
+    Para sort=[(a, 1), (b, 1)] genera:
+        {"$or": [{a: {"$gt": la}}, {a: la, b: {"$gt": lb}}]}
+
+    Raises:
+        ValueError: Si al cursor le falta algún campo del ordenamiento
+    """
+    missing = [field for field, _ in sort if field not in last]
+    if missing:
+        raise ValueError(f"Invalid cursor: missing fields {missing}")
+
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: last[prev_field] for prev_field, _ in sort[:i]}
+        clause[field] = {"$gt" if direction == 1 else "$lt": last[field]}
+        clauses.append(clause)
+
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def apply_cursor(query: Dict[str, Any], sort: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Combina el filtro base con el filtro de keyset (si hay cursor).
+
+    Raises:
+        ValueError: Si el cursor es inválido
+    """
+    if not cursor:
+        return query
+
+    after = keyset_filter(sort, decode_cursor(cursor))
+    return {"$and": [query, after]} if query else after
+
+
+def split_page(items: List[Any], sort: SortSpec, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Recorta una página consultada con limit + 1 y calcula el cursor siguiente.
+
+    El elemento extra solo indica que hay más resultados; no se devuelve.
+    Los elementos pueden ser dicts crudos (admiten campos anidados con
+    punto) o modelos (se leen por atributo, `_id` -> `id`).
+
+    Returns:
+        Tuple de (elementos_de_la_página, cursor_siguiente o None)
+    """
+    if len(items) <= limit:
+        return items, None
+
+    page = items[:limit]
+    last = page[-1]
+    values = {}
+    for field, _ in sort:
+        if isinstance(last, dict):
+            values[field] = _dict_value(last, field)
+        else:
+            values[field] = getattr(last, "id" if field == "_id" else field)
+    return page, encode_cursor(values)
+
+
+def _dict_value(document: Dict[str, Any], field: str) -> Any:
+    """Valor de un campo en un dict crudo; admite rutas con punto ("seguimiento.fecha")."""
+    if field in document:
+        return document[field]
+    value = document
+    for part in field.split("."):
+        value = value[part]
+    return value
+
+
+def prefix_regex(text: str) -> Dict[str, Any]:
+    """
+    Filtro de búsqueda por prefijo anclado.
+    Una expresión `^prefijo` sin opciones puede resolverse con límites de
+    índice (no recorre la colección completa).
+    """
+    return {"$regex": "^" + re.escape(text)}
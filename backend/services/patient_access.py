@@ -0,0 +1,72 @@
+"""
+Control de acceso a datos clínicos de un paciente
+=================================================
+Reglas compartidas por los routers que exponen datos de un paciente
+(registros clínicos, laboratorios, exportaciones):
+- Pacientes: solo sus propios datos.
+- Médicos: solo pacientes asignados. La asignación se valida en el
+  índice de asignaciones (services.assignments), antes de leer cualquier
+  dato clínico del paciente.
+"""
+
+from fastapi import HTTPException, Request, status
+
+from models.models import User, UserRole, AuditLog
+from services.assignments import get_assigned_doctor_id
+
+
+async def ensure_assigned_doctor(patient_id: str, current_user: User, request: Request, event: str) -> None:
+    """
+    Verifica que el médico esté asignado al paciente (búsqueda puntual en
+    el índice de asignaciones; si el índice no tiene la asignación, solo
+    medicoAsignado.medicoId del historial). Si el paciente no tiene médico
+    asignado en el historial (registro antiguo sin medicoId o sin
+    historial), no se valida estrictamente.
+
+    Raises:
+        HTTPException 403: Si el paciente está asignado a otro médico
+    """
+    assigned_doctor_id = await get_assigned_doctor_id(patient_id)
+    if assigned_doctor_id and assigned_doctor_id != str(current_user.id):
+        audit_log = AuditLog(
+            event=event,
+            user_email=current_user.email,
+            user_id=str(current_user.id),
+            ip_address=request.client.host,
+            user_agent=request.headers.get("user-agent", ""),
+            details={
+                "reason": "doctor_not_assigned_to_patient",
+                "patient_id": patient_id,
+                "assigned_doctor_id": assigned_doctor_id,
+                "requesting_doctor": current_user.fullName,
+                "requesting_doctor_id": str(current_user.id)
+            }
+        )
+        await audit_log.insert()
+
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. You are not assigned to this patient."
+        )
+
+
+async def ensure_patient_access(patient_id: str, current_user: User, request: Request) -> None:
+    """
+    Pacientes: solo sus propios datos. Médicos: pacientes asignados.
+
+    Raises:
+        HTTPException 403: Si el usuario no puede ver los datos del paciente
+    """
+    if current_user.role == UserRole.PACIENTE:
+        if patient_id != str(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied. You can only view your own clinical records."
+            )
+    elif current_user.role == UserRole.MEDICO:
+        await ensure_assigned_doctor(patient_id, current_user, request, "unauthorized_clinical_records_access")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied."
+        )
@@ -0,0 +1,64 @@
+"""
+Historial inicial del paciente
+==============================
+El alta individual (POST /register-patient), la importación masiva y los
+historiales que crea un médico (POST o primera lectura de
+/pacientes/{id}/historial) parten del mismo historial: datos demográficos
+del usuario, secciones clínicas vacías, contacto de emergencia pendiente,
+el médico que lo crea (o "Por asignar") y su hash de integridad (PBI-20)
+ya calculado, porque insert_many no pasa por ningún hook del documento.
+"""
+
+from typing import Optional
+
+from models.models import User, PatientHistory, MedicoAsignado, ContactoEmergencia
+from services.integrity import integrity_service
+
+
+def build_initial_history(user: User, doctor: Optional[User] = None) -> PatientHistory:
+    """
+    Historial inicial (sin insertar) con los datos demográficos del
+    paciente. Con `doctor`, queda como médico asignado (medicoId incluido);
+    el llamador registra la asignación con assign_doctor.
+    """
+    if doctor is not None:
+        medico = MedicoAsignado(
+            medicoId=str(doctor.id),
+            nombre=doctor.fullName,
+            especialidad=doctor.especialidad or "General",
+            telefono=doctor.telefonoContacto or "N/A"
+        )
+    else:
+        medico = MedicoAsignado(
+            nombre="Por asignar",
+            especialidad="General",
+            telefono="N/A"
+        )
+
+    history = PatientHistory(
+        patient_id=str(user.id),
+        # Datos demográficos
+        direccion=user.direccion,
+        ciudad=user.ciudad,
+        pais=user.pais,
+        genero=user.genero,
+        estadoCivil=user.estadoCivil,
+        ocupacion=user.ocupacion,
+        # Información médica
+        tipoSangre=user.grupoSanguineo or "No especificado",
+        alergias=[],
+        condicionesCronicas=[],
+        medicamentosActuales=[],
+        medicoAsignado=medico,
+        contactoEmergencia=ContactoEmergencia(
+            nombre="Por definir",
+            relacion="N/A",
+            telefono="N/A"
+        ),
+        consultas=[],
+        vacunas=[],
+        antecedentesFamiliares=[],
+        proximaCita=None
+    )
+    history.integrity_hash = integrity_service.calculate_hash(history)
+    return history
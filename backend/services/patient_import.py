@@ -0,0 +1,327 @@
+"""
+Importación masiva de pacientes
+===============================
+Registrar pacientes uno a uno (POST /register-patient) cuesta por fila
+dos consultas de duplicados, un hash Argon2 bloqueante, dos inserts y
+un envío SMTP síncrono. Para migrar una clínica completa:
+
+1. Se valida cada fila con RegisterPatientRequest (mismas reglas que el alta individual).
+2. Duplicados dentro del archivo y contra la BD con UNA consulta `$in`.
+3. Hash Argon2 de las contraseñas temporales en paralelo (hilos; argon2-cffi
+   libera el GIL durante el cálculo).
+4. insert_many de usuarios y de historiales (con su hash de integridad).
+5. Los emails de credenciales se envían después, en lote, con una sola
+   conexión SMTP.
+
+Cada fila fallida se reporta con su número de línea; las válidas se crean.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field, ValidationError
+from pymongo.errors import BulkWriteError
+
+from models.models import (
+    User,
+    UserRole,
+    UserStatus,
+    SecuritySettings,
+    PatientHistory,
+    AuditLog
+)
+from schemas.auth_schemas import RegisterPatientRequest
+from services.audit import audit_logger
+from services.email_service import generate_temporary_password, send_temporary_password_emails, EmailServiceError
+from services.patient_history import build_initial_history
+from services.search import build_search_terms
+from services.security import hash_password
+
+# Máximo de filas por importación
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+# Hashes Argon2 simultáneos (cada uno usa 64 MB de memoria)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Mismos permisos que el alta individual de pacientes
+PATIENT_PERMISSIONS = ["view_own_records", "view_appointments", "message_doctor"]
+
+
+class ExistingUserView(BaseModel):
+    """Proyección de User para detectar duplicados (email, cédula)."""
+    id: PydanticObjectId = Field(alias="_id")
+    email: str
+    cedula: str
+
+
+def parse_patient_rows(content: bytes, file_format: str) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Lee las filas de un archivo CSV (con encabezado) o NDJSON (un objeto por línea).
+    Las celdas vacías de CSV se tratan como ausentes.
+
+    Raises:
+        ValueError: Si el formato no es soportado o el archivo no es UTF-8
+
+    Returns:
+        Tuple de ([(número_de_línea, fila)], [errores de parseo])
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}'. Use one of: {', '.join(IMPORT_FORMATS)}")
+
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("File must be UTF-8 encoded")
+
+    rows = []
+    errors = []
+
+    if file_format == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            # reader.line_num es la última línea leída (el encabezado es la 1)
+            values = {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip()}
+            if values:
+                rows.append((reader.line_num, values))
+        return rows, errors
+
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append({"row": line_number, "error": f"Invalid JSON: {e.msg}"})
+            continue
+        if not isinstance(value, dict):
+            errors.append({"row": line_number, "error": "Expected a JSON object"})
+            continue
+        rows.append((line_number, value))
+
+    return rows, errors
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def hash_passwords_parallel(passwords: List[str]) -> List[str]:
+    """Calcula los hashes Argon2 en un pool de hilos acotado."""
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS) as pool:
+        return await asyncio.gather(*(
+            loop.run_in_executor(pool, hash_password, password) for password in passwords
+        ))
+
+
+async def import_patients(
+    rows: List[Tuple[int, Dict[str, Any]]],
+    registered_by_id: Optional[str],
+    registered_by_email: Optional[str],
+    ip_address: str,
+    user_agent: str,
+    dry_run: bool = False
+) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+    """
+    Importa pacientes a partir de filas ya parseadas.
+
+    Returns:
+        Tuple de (reporte, credenciales para enviar por email)
+        El reporte tiene la forma de PatientImportResponse (sin emails_queued).
+    """
+    errors: List[Dict[str, Any]] = []
+
+    # 1. Validación por fila
+    valid: List[Tuple[int, RegisterPatientRequest]] = []
+    for line_number, row in rows:
+        try:
+            valid.append((line_number, RegisterPatientRequest(**row)))
+        except ValidationError as e:
+            errors.append({
+                "row": line_number,
+                "email": row.get("email"),
+                "cedula": row.get("cedula"),
+                "error": _validation_message(e)
+            })
+
+    # 2a. Duplicados dentro del archivo (gana la primera aparición)
+    seen_emails = set()
+    seen_cedulas = set()
+    unique: List[Tuple[int, RegisterPatientRequest]] = []
+    for line_number, data in valid:
+        if data.email in seen_emails:
+            errors.append({"row": line_number, "email": data.email, "cedula": data.cedula, "error": "Duplicate email in file"})
+        elif data.cedula in seen_cedulas:
+            errors.append({"row": line_number, "email": data.email, "cedula": data.cedula, "error": "Duplicate cedula in file"})
+        else:
+            seen_emails.add(data.email)
+            seen_cedulas.add(data.cedula)
+            unique.append((line_number, data))
+
+    # 2b. Duplicados contra la BD: una sola consulta $in
+    existing_emails = set()
+    existing_cedulas = set()
+    if unique:
+        existing = await User.find({"$or": [
+            {"email": {"$in": list(seen_emails)}},
+            {"cedula": {"$in": list(seen_cedulas)}}
+        ]}).project(ExistingUserView).to_list()
+        existing_emails = {u.email for u in existing}
+        existing_cedulas = {u.cedula for u in existing}
+
+    candidates: List[Tuple[int, RegisterPatientRequest]] = []
+    for line_number, data in unique:
+        if data.email in existing_emails:
+            errors.append({"row": line_number, "email": data.email, "cedula": data.cedula, "error": "Email already registered"})
+        elif data.cedula in existing_cedulas:
+            errors.append({"row": line_number, "email": data.email, "cedula": data.cedula, "error": "Cedula already registered"})
+        else:
+            candidates.append((line_number, data))
+
+    report = {
+        "dry_run": dry_run,
+        "total_rows": len(rows),
+        "created": 0,
+        "failed": 0,
+        "user_ids": [],
+        "errors": errors
+    }
+
+    if dry_run or not candidates:
+        report["failed"] = len(errors)
+        report["errors"] = sorted(errors, key=lambda e: e["row"])
+        return report, []
+
+    # 3. Contraseñas temporales y hashes en paralelo
+    passwords = [generate_temporary_password() for _ in candidates]
+    password_hashes = await hash_passwords_parallel(passwords)
+
+    # 4. Usuarios con ID asignado de antemano (para enlazar los historiales)
+    member_since = datetime.utcnow().strftime("%B %Y")
+    users = []
+    for (line_number, data), password_hash in zip(candidates, password_hashes):
+        user = User(
+            id=PydanticObjectId(),
+            email=data.email,
+            password_hash=password_hash,
+            fullName=data.fullName,
+            cedula=data.cedula,
+            role=UserRole.PACIENTE,
+            status=UserStatus.ACTIVO,
+            fechaNacimiento=data.fechaNacimiento,
+            telefonoContacto=data.telefonoContacto,
+            direccion=data.direccion,
+            ciudad=data.ciudad,
+            pais=data.pais,
+            genero=data.genero,
+            estadoCivil=data.estadoCivil,
+            ocupacion=data.ocupacion,
+            grupoSanguineo=data.grupoSanguineo,
+            permissions=PATIENT_PERMISSIONS,
+            member_since=member_since,
+            security=SecuritySettings(mfa_enabled=True),  # MFA obligatorio
+            # insert_many no ejecuta los hooks @before_event
+            searchTerms=build_search_terms(data.fullName, data.email, data.cedula)
+        )
+        users.append(user)
+
+    # Inserción no ordenada: un duplicado concurrente solo falla su fila
+    failed_indexes = set()
+    try:
+        await User.insert_many(users, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            index = write_error["index"]
+            failed_indexes.add(index)
+            line_number, data = candidates[index]
+            errors.append({
+                "row": line_number,
+                "email": data.email,
+                "cedula": data.cedula,
+                "error": "Email or cedula already registered" if write_error.get("code") == 11000 else write_error.get("errmsg", "Insert failed")
+            })
+
+    created = [
+        (user, password, candidates[i][1])
+        for i, (user, password) in enumerate(zip(users, passwords))
+        if i not in failed_indexes
+    ]
+
+    if created:
+        await PatientHistory.insert_many([build_initial_history(user) for user, _, _ in created])
+
+        await audit_logger.log_events_batch([
+            AuditLog(
+                event="patient_registered",
+                user_email=user.email,
+                user_id=str(user.id),
+                ip_address=ip_address,
+                user_agent=user_agent,
+                details={
+                    "registered_by": registered_by_id,
+                    "registered_by_email": registered_by_email,
+                    "role": "Paciente",
+                    "demographic_data_included": True,
+                    "bulk_import": True
+                }
+            )
+            for user, _, _ in created
+        ])
+
+    report["created"] = len(created)
+    report["failed"] = len(errors)
+    report["user_ids"] = [str(user.id) for user, _, _ in created]
+    report["errors"] = sorted(errors, key=lambda e: e["row"])
+
+    credentials = [
+        {
+            "email": user.email,
+            "full_name": data.fullName,
+            "temporary_password": password,
+            "role": "Paciente"
+        }
+        for user, password, data in created
+    ]
+    return report, credentials
+
+
+async def send_import_credentials(
+    credentials: List[Dict[str, str]],
+    ip_address: str,
+    user_agent: str
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Envía los emails de credenciales de una importación y registra los
+    fallos en auditoría (email_send_failed), como el alta individual.
+
+    Returns:
+        Lista de (email, error o None)
+    """
+    try:
+        results = await send_temporary_password_emails(credentials)
+    except EmailServiceError as e:
+        results = [(c["email"], str(e)) for c in credentials]
+
+    failures = [(email, error) for email, error in results if error]
+    if failures:
+        await audit_logger.log_events_batch([
+            AuditLog(
+                event="email_send_failed",
+                user_email=email,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                details={"error": error, "bulk_import": True}
+            )
+            for email, error in failures
+        ])
+    return results
@@ -0,0 +1,248 @@
+"""
+Resumen clínico imprimible en PDF
+=================================
+Genera el PDF del resumen de historia clínica sin dependencias externas
+(PDF 1.4 con las fuentes estándar Helvetica, texto en WinAnsiEncoding).
+
+Se ejecuta en un proceso de trabajo (ver services.exports): recibe solo
+dicts y escribe el archivo página por página, de modo que la memoria no
+crece con el tamaño del historial. Este módulo no importa modelos ni la
+conexión a la BD para que el proceso de trabajo arranque rápido.
+"""
+
+import textwrap
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# A4 en puntos
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 50
+BODY_SIZE, HEADING_SIZE, TITLE_SIZE = 10, 13, 16
+LINE_HEIGHT = {BODY_SIZE: 14, HEADING_SIZE: 22, TITLE_SIZE: 26}
+# Caracteres por línea (ancho medio de Helvetica ~0.5 em)
+WRAP_WIDTH = 95
+
+# Una línea del documento: (tamaño de fuente, negrita, texto)
+Line = Tuple[int, bool, str]
+
+
+def _fmt_date(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M") if (value.hour or value.minute) else value.strftime("%d/%m/%Y")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return str(value) if value else "-"
+
+
+def _heading(text: str) -> Iterator[Line]:
+    yield HEADING_SIZE, True, text
+
+
+def _field(label: str, value: Any) -> Iterator[Line]:
+    text = f"{label}: {value if value not in (None, '') else '-'}"
+    for i, part in enumerate(textwrap.wrap(text, WRAP_WIDTH) or [""]):
+        yield BODY_SIZE, False, ("    " + part) if i else part
+
+
+def _items(values: Optional[List[str]]) -> Iterator[Line]:
+    if not values:
+        yield BODY_SIZE, False, "Sin registros"
+        return
+    for value in values:
+        for i, part in enumerate(textwrap.wrap(str(value), WRAP_WIDTH - 4) or [""]):
+            yield BODY_SIZE, False, ("  - " if i == 0 else "    ") + part
+
+
+def _blank() -> Iterator[Line]:
+    yield BODY_SIZE, False, ""
+
+
+def summary_lines(data: Dict[str, Any]) -> Iterator[Line]:
+    """Contenido del resumen, línea a línea (generador: no arma el documento en memoria)."""
+    patient = data.get("patient") or {}
+    history = data.get("history") or {}
+
+    yield TITLE_SIZE, True, "Resumen de Historia Clínica"
+    yield from _field("Paciente", patient.get("fullName"))
+    yield from _field("Cédula", patient.get("cedula"))
+    yield from _field("Fecha de nacimiento", _fmt_date(patient.get("fechaNacimiento")))
+    yield from _field("Generado", _fmt_date(data.get("generated_at")))
+    yield from _blank()
+
+    yield from _heading("Datos generales")
+    for label, key in (
+        ("Tipo de sangre", "tipoSangre"), ("Género", "genero"), ("Estado civil", "estadoCivil"),
+        ("Ocupación", "ocupacion"), ("Dirección", "direccion"), ("Ciudad", "ciudad"), ("País", "pais")
+    ):
+        yield from _field(label, history.get(key))
+    medico = history.get("medicoAsignado") or {}
+    yield from _field("Médico asignado", f"{medico.get('nombre', '-')} ({medico.get('especialidad', '-')})")
+    contacto = history.get("contactoEmergencia") or {}
+    yield from _field(
+        "Contacto de emergencia",
+        f"{contacto.get('nombre', '-')} - {contacto.get('relacion', '-')} - {contacto.get('telefono', '-')}"
+    )
+    proxima = history.get("proximaCita")
+    if proxima:
+        yield from _field("Próxima cita", f"{_fmt_date(proxima.get('fecha'))} - {proxima.get('motivo')} ({proxima.get('medico')})")
+    yield from _blank()
+
+    for title, key in (
+        ("Alergias", "alergias"),
+        ("Condiciones crónicas", "condicionesCronicas"),
+        ("Medicamentos actuales", "medicamentosActuales"),
+        ("Antecedentes familiares", "antecedentesFamiliares"),
+    ):
+        yield from _heading(title)
+        yield from _items(history.get(key))
+        yield from _blank()
+
+    yield from _heading("Vacunas")
+    yield from _items([
+        f"{v.get('nombre')} - {_fmt_date(v.get('fecha'))}"
+        + (f" (próxima dosis: {_fmt_date(v.get('proximaDosis'))})" if v.get("proximaDosis") else "")
+        for v in history.get("vacunas") or []
+    ])
+    yield from _blank()
+
+    yield from _heading("Consultas")
+    consultas = data.get("consultas") or []
+    if not consultas:
+        yield from _items([])
+    for consulta in consultas:
+        yield BODY_SIZE, True, f"{_fmt_date(consulta.get('fecha'))} - {consulta.get('motivo', '')}"
+        yield from _field("Diagnóstico", consulta.get("diagnostico"))
+        yield from _field("Tratamiento", consulta.get("tratamiento"))
+        yield from _field("Notas", consulta.get("notasMedico"))
+        yield from _blank()
+
+    yield from _heading("Registros clínicos")
+    registros = data.get("registros") or []
+    if not registros:
+        yield from _items([])
+    for registro in registros:
+        yield BODY_SIZE, True, f"{_fmt_date(registro.get('fecha'))} - {registro.get('motivoConsulta', '')} ({registro.get('doctorName', '')})"
+        yield from _field("Diagnóstico", registro.get("diagnostico"))
+        yield from _field("Tratamiento", registro.get("tratamiento"))
+        yield from _field("Observaciones", registro.get("observaciones"))
+        for lab in registro.get("laboratorios") or []:
+            yield from _field(
+                "Laboratorio",
+                f"{lab.get('prueba')}: {lab.get('valor')} {lab.get('unidad', '')} (ref. {lab.get('referencia', '-')}) - {_fmt_date(lab.get('fecha'))}"
+            )
+        seguimiento = registro.get("seguimiento")
+        if seguimiento:
+            yield from _field("Seguimiento", f"{_fmt_date(seguimiento.get('fecha'))} - {seguimiento.get('instrucciones')}")
+        yield from _blank()
+
+
+def _pdf_text(text: str) -> bytes:
+    """Texto literal de PDF en WinAnsiEncoding, con los caracteres especiales escapados."""
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _paginate(lines: Iterator[Line]) -> Iterator[List[Tuple[int, bool, str, int]]]:
+    """Agrupa las líneas en páginas con su coordenada y."""
+    page = []
+    y = PAGE_HEIGHT - MARGIN
+    for size, bold, text in lines:
+        height = LINE_HEIGHT[size]
+        if y - height < MARGIN + LINE_HEIGHT[BODY_SIZE] and page:
+            yield page
+            page = []
+            y = PAGE_HEIGHT - MARGIN
+        y -= height
+        page.append((size, bold, text, y))
+    if page:
+        yield page
+
+
+class _PdfWriter:
+    """Escritor incremental de objetos PDF con tabla xref."""
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.position = 0
+        self.offsets: Dict[int, int] = {}
+        self.next_number = 1
+
+    def write(self, data: bytes) -> None:
+        self.output.write(data)
+        self.position += len(data)
+
+    def reserve(self) -> int:
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def add(self, body: bytes, number: Optional[int] = None) -> int:
+        number = number or self.reserve()
+        self.offsets[number] = self.position
+        self.write(f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+        return number
+
+    def add_stream(self, content: bytes) -> int:
+        return self.add(f"<< /Length {len(content)} >>\nstream\n".encode("ascii") + content + b"\nendstream")
+
+    def finish(self, root: int) -> None:
+        xref_position = self.position
+        count = self.next_number
+        self.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode("ascii"))
+        for number in range(1, count):
+            self.write(f"{self.offsets[number]:010d} 00000 n \n".encode("ascii"))
+        self.write(f"trailer\n<< /Size {count} /Root {root} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n".encode("ascii"))
+
+
+def write_summary_pdf(data: Dict[str, Any], output: BinaryIO) -> int:
+    """
+    Escribe el PDF del resumen en `output`, una página a la vez.
+
+    Returns:
+        Número de páginas
+    """
+    pdf = _PdfWriter(output)
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    catalog = pdf.reserve()
+    pages = pdf.reserve()
+    font = pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    font_bold = pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    kids = []
+    for page_number, page in enumerate(_paginate(summary_lines(data)), start=1):
+        content = []
+        for size, bold, text, y in page:
+            if text:
+                content.append(
+                    b"BT /%s %d Tf %d %d Td (%s) Tj ET" % (b"F2" if bold else b"F1", size, MARGIN, y, _pdf_text(text))
+                )
+        footer = f"Sirona - Documento confidencial - Página {page_number}"
+        content.append(b"BT /F1 8 Tf %d %d Td (%s) Tj ET" % (MARGIN, MARGIN - 20, _pdf_text(footer)))
+
+        stream = pdf.add_stream(b"\n".join(content))
+        kids.append(pdf.add(
+            f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font} 0 R /F2 {font_bold} 0 R >> >> /Contents {stream} 0 R >>".encode("ascii")
+        ))
+
+    pdf.add(
+        f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode("ascii"),
+        number=pages
+    )
+    pdf.add(f"<< /Type /Catalog /Pages {pages} 0 R >>".encode("ascii"), number=catalog)
+    pdf.finish(catalog)
+    return len(kids)
+
+
+def render_summary_pdf(data: Dict[str, Any], path: str) -> Tuple[int, int]:
+    """
+    Punto de entrada del proceso de trabajo: genera el PDF en `path`.
+
+    Returns:
+        Tuple de (tamaño en bytes, número de páginas)
+    """
+    with open(path, "wb") as output:
+        page_count = write_summary_pdf(data, output)
+        size = output.tell()
+    return size, page_count
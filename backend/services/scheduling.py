@@ -0,0 +1,545 @@
+"""
+Agenda de médicos
+=================
+Calcular la agenda de un día verificando cada horario por separado
+costaba dos consultas por horario (disponibilidad + cita en la ventana):
+una jornada de 10 horas en horarios de 15 minutos eran 80 idas y vueltas.
+
+Aquí la agenda de un día se calcula con:
+1. Una lectura de la disponibilidad del médico para la fecha.
+2. Una consulta por rango con las citas activas del día (solo `fecha`,
+   índice (doctor_id, fecha)).
+3. Un barrido en memoria sobre ambas listas ordenadas que marca los
+   horarios ocupados, O(horarios + citas).
+
+Un horario `t` está ocupado si hay una cita activa en (t - duración, t + duración),
+es decir, si una cita en `t` se solaparía con otra.
+
+Disponibilidad efectiva de un día
+---------------------------------
+Un médico define su semana con plantillas (AvailabilityTemplate: días de
+la semana, horario, vigencia y excepciones como feriados) y puede
+sobrescribir fechas puntuales con documentos DoctorAvailability (activo=False
+para no atender ese día). Las plantillas se expanden al consultarse, sin
+crear documentos por fecha, y el resultado se guarda por (médico, fecha) en
+`availability_cache` (LRU con TTL, invalidada al cambiar disponibilidades
+o plantillas). La caché es por proceso: solo la usan las lecturas; las
+reservas (find_slot_duration, mover citas) leen siempre de MongoDB.
+
+Reserva atómica de horarios
+---------------------------
+Cada cita activa guarda en `slotCells` las celdas de SLOT_CELL_MINUTES
+minutos que ocupa, y el índice único parcial (doctor_id, slotCells) impide
+que dos citas activas del mismo médico compartan una celda. Verificar el
+choque e insertar la cita es así una sola escritura: si otra cita ya
+ocupa alguna celda, MongoDB rechaza la inserción (DuplicateKeyError),
+incluso con reservas concurrentes desde varios procesos. Las citas
+completadas o canceladas liberan sus celdas (slotCells = None).
+
+Búsqueda de próximos horarios libres
+------------------------------------
+`slot_index` guarda en memoria, por día, la jornada de cada médico y las
+horas de sus citas activas (listas ordenadas). Cada día se construye con
+tres consultas (las disponibilidades por fecha del día, las plantillas
+vigentes de ese día de la semana y las citas activas del día) y luego se
+actualiza en el lugar al crear, modificar, cancelar o eliminar citas y al
+cambiar disponibilidades, sin volver a leer MongoDB. Las entradas expiran tras SLOT_INDEX_TTL_SECONDS para recoger los
+cambios hechos por otros procesos; la búsqueda es orientativa y la
+creación de la cita sigue verificándose contra la base de datos.
+"""
+
+import heapq
+import os
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from models.models import Appointment, AvailabilityTemplate, DoctorAvailability, User, UserRole
+from services.bounded_cache import MISSING, BoundedCache
+from services.db import get_auth_db, get_core_db
+
+# Estados de cita que ocupan un horario
+ACTIVE_APPOINTMENT_STATES = ["Programada", "En Progreso"]
+
+# Resolución de las celdas de reserva (divide a las duraciones habituales)
+SLOT_CELL_MINUTES = 5
+
+SLOT_INDEX_MAX_DAYS = int(os.getenv("SLOT_INDEX_MAX_DAYS", "120"))
+SLOT_INDEX_TTL_SECONDS = int(os.getenv("SLOT_INDEX_TTL_SECONDS", "60"))
+
+AVAILABILITY_CACHE_MAX_ENTRIES = int(os.getenv("AVAILABILITY_CACHE_MAX_ENTRIES", "10000"))
+AVAILABILITY_CACHE_TTL_SECONDS = int(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "60"))
+
+# Rango máximo (en días) de una búsqueda de horarios libres
+SLOT_SEARCH_MAX_DAYS = 31
+
+
+def availability_bounds(availability: DoctorAvailability) -> Tuple[datetime, datetime]:
+    """Inicio y fin (exclusivo) de la jornada de una disponibilidad."""
+    return (
+        datetime.combine(availability.fecha, time.fromisoformat(availability.horaInicio)),
+        datetime.combine(availability.fecha, time.fromisoformat(availability.horaFin))
+    )
+
+
+def slot_times(availability: DoctorAvailability) -> List[datetime]:
+    """Horarios de inicio de cita de una disponibilidad, en orden."""
+    start, end = availability_bounds(availability)
+    step = timedelta(minutes=availability.duracionCita)
+    slots = []
+    current = start
+    while current < end:
+        slots.append(current)
+        current += step
+    return slots
+
+
+# ==================== DISPONIBILIDAD EFECTIVA ====================
+
+def expand_template(template: AvailabilityTemplate, day: date) -> Optional[DoctorAvailability]:
+    """Disponibilidad (no guardada) que la plantilla define para `day`, o None."""
+    if not template.activo or day.weekday() not in template.diasSemana:
+        return None
+    if day < template.vigenteDesde or (template.vigenteHasta and day > template.vigenteHasta):
+        return None
+    if day in template.excepciones:
+        return None
+    return DoctorAvailability(
+        doctor_id=template.doctor_id,
+        doctorName=template.doctorName,
+        fecha=day,
+        horaInicio=template.horaInicio,
+        horaFin=template.horaFin,
+        duracionCita=template.duracionCita,
+        activo=True,
+        created_at=template.created_at
+    )
+
+
+def pick_availability(
+    overrides: List[DoctorAvailability],
+    templates: List[AvailabilityTemplate],
+    day: date
+) -> Optional[DoctorAvailability]:
+    """
+    Disponibilidad efectiva de un médico en `day`: el documento por fecha si
+    existe (si ninguno está activo, el médico no atiende), si no la primera
+    plantilla que cubra el día (`templates` ordenadas de la más reciente a
+    la más antigua).
+    """
+    if overrides:
+        return next((availability for availability in overrides if availability.activo), None)
+    for template in templates:
+        availability = expand_template(template, day)
+        if availability:
+            return availability
+    return None
+
+
+def templates_for_day(day: date) -> Dict[str, Any]:
+    """Filtro de las plantillas activas que pueden cubrir `day`."""
+    return {
+        "activo": True,
+        "diasSemana": day.weekday(),
+        "vigenteDesde": {"$lte": day},
+        "$or": [{"vigenteHasta": None}, {"vigenteHasta": {"$gte": day}}]
+    }
+
+
+class AvailabilityCache:
+    """
+    Caché LRU acotada, con TTL, (doctor_id, fecha) -> disponibilidad efectiva
+    (None si ese día no atiende).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._cache = BoundedCache(max_entries, ttl_seconds)
+
+    def get(self, doctor_id: str, day: date) -> Any:
+        """Devuelve la disponibilidad (o None) vigente, o MISSING si no está o expiró."""
+        return self._cache.get((doctor_id, day))
+
+    def put(self, doctor_id: str, day: date, availability: Optional[DoctorAvailability]) -> None:
+        self._cache.put((doctor_id, day), availability)
+
+    def invalidate(self, doctor_id: str, day: Optional[date] = None) -> None:
+        """Invalida una fecha del médico, o todas si `day` es None."""
+        if day is not None:
+            self._cache.pop((doctor_id, day))
+            return
+        for key in self._cache.keys():
+            if key[0] == doctor_id:
+                self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Instancia global de la caché de disponibilidad efectiva
+availability_cache = AvailabilityCache(AVAILABILITY_CACHE_MAX_ENTRIES, AVAILABILITY_CACHE_TTL_SECONDS)
+
+
+async def find_day_availability(doctor_id: str, fecha: date, use_cache: bool = True) -> Optional[DoctorAvailability]:
+    """
+    Disponibilidad efectiva del médico en la fecha (documento por fecha o
+    plantilla expandida). Sin consultas si está en caché.
+
+    Con use_cache=False se lee siempre de MongoDB (la lectura refresca la
+    caché). Las escrituras lo usan: la caché es por proceso y otra
+    instancia pudo cambiar la disponibilidad dentro del TTL.
+    """
+    if use_cache:
+        cached = availability_cache.get(doctor_id, fecha)
+        if cached is not MISSING:
+            return cached
+
+    overrides = await DoctorAvailability.find({"doctor_id": doctor_id, "fecha": fecha}).to_list()
+    templates = []
+    if not overrides:
+        templates = await AvailabilityTemplate.find(
+            {"doctor_id": doctor_id, **templates_for_day(fecha)}
+        ).sort([("vigenteDesde", -1)]).to_list()
+
+    availability = pick_availability(overrides, templates, fecha)
+    availability_cache.put(doctor_id, fecha, availability)
+    return availability
+
+
+async def busy_times(doctor_id: str, start: datetime, end: datetime) -> List[datetime]:
+    """Fechas de las citas activas del médico en [start, end), ordenadas (una consulta)."""
+    rows = await get_core_db()[Appointment.Settings.name].find(
+        {
+            "doctor_id": doctor_id,
+            "fecha": {"$gte": start, "$lt": end},
+            "estado": {"$in": ACTIVE_APPOINTMENT_STATES}
+        },
+        {"_id": 0, "fecha": 1}
+    ).sort("fecha", 1).to_list(length=None)
+    return [row["fecha"] for row in rows]
+
+
+def mark_taken(slots: List[datetime], busy: List[datetime], duration_minutes: int) -> List[bool]:
+    """
+    Barrido sobre horarios y citas (ambos ordenados): True si el horario
+    `t` tiene una cita en (t - duración, t + duración).
+    """
+    window = timedelta(minutes=duration_minutes)
+    taken = []
+    index = 0
+    for slot in slots:
+        # Las citas anteriores a la ventana de este horario tampoco afectan a los siguientes
+        while index < len(busy) and busy[index] <= slot - window:
+            index += 1
+        taken.append(index < len(busy) and busy[index] < slot + window)
+    return taken
+
+
+async def day_schedule(doctor_id: str, fecha: date) -> List[Tuple[datetime, bool]]:
+    """
+    Horarios del día con su disponibilidad, con dos consultas en total.
+
+    Returns:
+        Lista de (horario, disponible); vacía si el médico no atiende ese día
+    """
+    availability = await find_day_availability(doctor_id, fecha)
+    if not availability:
+        return []
+
+    slots = slot_times(availability)
+    if not slots:
+        return []
+
+    window = timedelta(minutes=availability.duracionCita)
+    busy = await busy_times(doctor_id, slots[0] - window, slots[-1] + window)
+    taken = mark_taken(slots, busy, availability.duracionCita)
+    return [(slot, not is_taken) for slot, is_taken in zip(slots, taken)]
+
+
+# ==================== ÍNDICE DE HORARIOS LIBRES ====================
+
+@dataclass
+class DoctorDay:
+    """Jornada de un médico en un día y horas de sus citas activas (ordenadas)."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    duration: int = 30
+    busy: List[datetime] = field(default_factory=list)
+
+    def free_slots(self, duration_minutes: int) -> Iterator[datetime]:
+        """
+        Horarios de la jornada donde cabe una cita de `duration_minutes`
+        sin chocar con otra: ninguna cita activa en (t - duración, t + max(duración, pedida)).
+        """
+        if self.start is None:
+            return
+        step = timedelta(minutes=self.duration)
+        before = step
+        after = timedelta(minutes=max(self.duration, duration_minutes))
+        needed = timedelta(minutes=duration_minutes)
+        current = self.start
+        while current + needed <= self.end:
+            index = bisect_right(self.busy, current - before)
+            if index == len(self.busy) or self.busy[index] >= current + after:
+                yield current
+            current += step
+
+
+class SlotIndex:
+    """
+    Caché LRU acotada, con TTL, día -> {doctor_id: DoctorDay}.
+    """
+
+    def __init__(self, max_days: int, ttl_seconds: int):
+        self._days = BoundedCache(max_days, ttl_seconds)
+        self.builds = 0
+        self.updates = 0
+
+    def _cached(self, day: date) -> Optional[Dict[str, DoctorDay]]:
+        doctors = self._days.peek(day)
+        return None if doctors is MISSING else doctors
+
+    async def get_day(self, day: date) -> Dict[str, DoctorDay]:
+        """Índice del día; si no está en caché se construye con dos consultas."""
+        doctors = self._days.get(day)
+        if doctors is not MISSING:
+            return doctors
+
+        doctors = await self._build_day(day)
+        self._days.put(day, doctors)
+        return doctors
+
+    async def _build_day(self, day: date) -> Dict[str, DoctorDay]:
+        self.builds += 1
+        doctors: Dict[str, DoctorDay] = {}
+
+        overrides: Dict[str, List[DoctorAvailability]] = {}
+        for availability in await DoctorAvailability.find({"fecha": day}).to_list():
+            overrides.setdefault(availability.doctor_id, []).append(availability)
+        templates: Dict[str, List[AvailabilityTemplate]] = {}
+        for template in await AvailabilityTemplate.find(templates_for_day(day)).sort([("vigenteDesde", -1)]).to_list():
+            templates.setdefault(template.doctor_id, []).append(template)
+
+        for doctor_id in overrides.keys() | templates.keys():
+            availability = pick_availability(overrides.get(doctor_id, []), templates.get(doctor_id, []), day)
+            if availability:
+                start, end = availability_bounds(availability)
+                doctors[doctor_id] = DoctorDay(start, end, availability.duracionCita)
+
+        day_start = datetime.combine(day, time.min)
+        rows = await get_core_db()[Appointment.Settings.name].find(
+            {
+                "fecha": {"$gte": day_start, "$lt": day_start + timedelta(days=1)},
+                "estado": {"$in": ACTIVE_APPOINTMENT_STATES}
+            },
+            {"_id": 0, "doctor_id": 1, "fecha": 1}
+        ).sort("fecha", 1).to_list(length=None)
+        for row in rows:
+            doctors.setdefault(row["doctor_id"], DoctorDay()).busy.append(row["fecha"])
+
+        return doctors
+
+    def add_booking(self, doctor_id: str, fecha: datetime) -> None:
+        """Registra una cita activa en el día ya indexado (si lo está)."""
+        doctors = self._cached(fecha.date())
+        if doctors is not None:
+            insort(doctors.setdefault(doctor_id, DoctorDay()).busy, fecha)
+            self.updates += 1
+
+    def remove_booking(self, doctor_id: str, fecha: datetime) -> None:
+        """Libera el horario de una cita cancelada, completada o eliminada."""
+        doctors = self._cached(fecha.date())
+        doctor_day = doctors.get(doctor_id) if doctors is not None else None
+        if doctor_day is None:
+            return
+        index = bisect_left(doctor_day.busy, fecha)
+        if index < len(doctor_day.busy) and doctor_day.busy[index] == fecha:
+            doctor_day.busy.pop(index)
+            self.updates += 1
+
+    def set_availability(self, doctor_id: str, day: date, availability: Optional[DoctorAvailability]) -> None:
+        """Reemplaza la jornada del médico en el día (None si deja de atender)."""
+        doctors = self._cached(day)
+        if doctors is None:
+            return
+        doctor_day = doctors.setdefault(doctor_id, DoctorDay())
+        if availability is not None and availability.activo:
+            doctor_day.start, doctor_day.end = availability_bounds(availability)
+            doctor_day.duration = availability.duracionCita
+        else:
+            doctor_day.start = doctor_day.end = None
+        self.updates += 1
+
+    def clear(self) -> None:
+        self._days.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._days.stats(builds=self.builds, updates=self.updates)
+
+
+# Instancia global del índice de horarios
+slot_index = SlotIndex(SLOT_INDEX_MAX_DAYS, SLOT_INDEX_TTL_SECONDS)
+
+
+async def availability_changed(doctor_id: str, day: date) -> None:
+    """
+    Tras crear, modificar, activar/desactivar o eliminar una disponibilidad
+    por fecha: recalcula la disponibilidad efectiva del día (puede volver a
+    regir la plantilla) y la aplica a las cachés.
+    """
+    availability_cache.invalidate(doctor_id, day)
+    slot_index.set_availability(doctor_id, day, await find_day_availability(doctor_id, day))
+
+
+def doctor_schedule_changed(doctor_id: str) -> None:
+    """Tras cambiar plantillas del médico o muchas fechas a la vez: puede afectar cualquier fecha."""
+    availability_cache.invalidate(doctor_id)
+    slot_index.clear()
+
+
+def as_stored(fecha: datetime) -> datetime:
+    """Fecha tal como la devuelve MongoDB (UTC sin zona horaria)."""
+    if fecha.tzinfo is None:
+        return fecha
+    return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def booking_changed(doctor_id: str, before: Optional[Tuple[datetime, str]], after: Optional[Tuple[datetime, str]]) -> None:
+    """
+    Actualiza el índice tras un cambio de cita. `before` y `after` son
+    (fecha, estado) antes y después del cambio; None si no existía o se eliminó.
+    """
+    if before == after:
+        return
+    if before is not None and before[1] in ACTIVE_APPOINTMENT_STATES:
+        slot_index.remove_booking(doctor_id, as_stored(before[0]))
+    if after is not None and after[1] in ACTIVE_APPOINTMENT_STATES:
+        slot_index.add_booking(doctor_id, as_stored(after[0]))
+
+
+async def find_doctors_by_specialty(especialidad: str) -> Dict[str, str]:
+    """doctor_id -> nombre de los médicos de la especialidad (solo dos campos)."""
+    rows = await get_auth_db()[User.Settings.name].find(
+        {"role": UserRole.MEDICO.value, "especialidad": especialidad},
+        {"fullName": 1}
+    ).to_list(length=None)
+    return {str(row["_id"]): row["fullName"] for row in rows}
+
+
+async def next_available_slots(
+    especialidad: str,
+    desde: date,
+    hasta: date,
+    duration_minutes: int,
+    limit: int
+) -> List[Tuple[datetime, str, str]]:
+    """
+    Primeros `limit` horarios libres entre todos los médicos de la
+    especialidad, del día `desde` al `hasta` (inclusive), en orden de hora.
+
+    Returns:
+        Lista de (horario, doctor_id, nombre del médico)
+    """
+    doctors = await find_doctors_by_specialty(especialidad)
+    if not doctors:
+        return []
+
+    results: List[Tuple[datetime, str, str]] = []
+    day = desde
+    while day <= hasta and len(results) < limit:
+        day_index = await slot_index.get_day(day)
+        # Mezcla ordenada de los horarios libres de cada médico del día
+        per_doctor = [
+            ((slot, doctor_id) for slot in day_index[doctor_id].free_slots(duration_minutes))
+            for doctor_id in doctors
+            if doctor_id in day_index
+        ]
+        for slot, doctor_id in heapq.merge(*per_doctor):
+            results.append((slot, doctor_id, doctors[doctor_id]))
+            if len(results) >= limit:
+                break
+        day += timedelta(days=1)
+
+    return results
+
+
+# ==================== RESERVA ATÓMICA ====================
+
+def slot_cells(fecha: datetime, duration_minutes: int) -> List[datetime]:
+    """
+    Celdas de SLOT_CELL_MINUTES que ocupa una cita de `duration_minutes`
+    en `fecha`, alineadas a la medianoche. Dos citas se solapan si y solo
+    si comparten alguna celda (con la resolución de la celda).
+    """
+    start = as_stored(fecha)
+    end = start + timedelta(minutes=duration_minutes)
+    midnight = datetime.combine(start.date(), time.min)
+    offset = (start - midnight) // timedelta(minutes=SLOT_CELL_MINUTES)
+    cell = midnight + offset * timedelta(minutes=SLOT_CELL_MINUTES)
+    cells = []
+    while cell < end:
+        cells.append(cell)
+        cell += timedelta(minutes=SLOT_CELL_MINUTES)
+    return cells
+
+
+def slot_duration(availability: Optional[DoctorAvailability], fecha: datetime) -> Optional[int]:
+    """
+    Duración de cita (minutos) si `fecha` está dentro de la jornada de
+    `availability`; None si ese día no atiende o la hora queda fuera del horario.
+    """
+    if not availability:
+        return None
+
+    hora_cita = fecha.time().replace(tzinfo=None)
+    if not (time.fromisoformat(availability.horaInicio) <= hora_cita < time.fromisoformat(availability.horaFin)):
+        return None
+    return availability.duracionCita
+
+
+async def find_slot_duration(doctor_id: str, fecha: datetime) -> Optional[int]:
+    """
+    Duración de cita (minutos) si `fecha` está dentro de la jornada activa
+    del médico; None si ese día no atiende o la hora queda fuera del horario.
+    Para reservar: lee la disponibilidad de MongoDB, sin caché.
+    """
+    return slot_duration(await find_day_availability(doctor_id, fecha.date(), use_cache=False), fecha)
+
+
+async def reserve_slot(appointment: Appointment, duration_minutes: int) -> bool:
+    """
+    Inserta la cita reservando sus celdas en la misma escritura.
+
+    Returns:
+        False si otra cita activa del médico ya ocupa el horario
+    """
+    appointment.slotCells = slot_cells(appointment.fecha, duration_minutes)
+    try:
+        await appointment.insert()
+    except DuplicateKeyError:
+        appointment.slotCells = None
+        return False
+    return True
+
+
+async def save_reservation(appointment: Appointment, duration_minutes: Optional[int]) -> bool:
+    """
+    Guarda la cita reservando las celdas de su horario actual, o
+    liberándolas si `duration_minutes` es None (cita completada, cancelada).
+
+    Returns:
+        False si el nuevo horario choca con otra cita activa del médico
+    """
+    previous = appointment.slotCells
+    appointment.slotCells = slot_cells(appointment.fecha, duration_minutes) if duration_minutes else None
+    try:
+        await appointment.save()
+    except DuplicateKeyError:
+        appointment.slotCells = previous
+        return False
+    return True
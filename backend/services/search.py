@@ -0,0 +1,76 @@
+"""
+Clave de búsqueda normalizada para usuarios
+===========================================
+MongoDB no puede usar índices para búsquedas por subcadena ni para
+expresiones regulares insensibles a mayúsculas. En su lugar cada User
+guarda `searchTerms`: una lista de términos normalizados (minúsculas,
+sin tildes) con el nombre completo, cada palabra del nombre, el email y
+la cédula. Sobre esa lista hay un índice multikey y la búsqueda es un
+prefijo anclado (`^termino`), que se resuelve con límites de índice.
+
+Ejemplo: "José Peña" encuentra "jose", "pena", "jose pena" y también
+se encuentra buscando "JOSE", "peñ" o "jose p".
+
+Mantenimiento: `User` recalcula los términos al insertarse o guardarse
+(hooks @before_event) y en `User.set()`. Cualquier otra escritura que
+cambie nombre, email o cédula (update_one, bulk_write, set sobre una
+consulta) debe pasar su $set por `with_search_terms`.
+
+Este módulo no importa modelos para poder usarse desde models.py.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Mapping, Optional
+
+# Campos de User de los que se derivan los términos de búsqueda
+SEARCH_SOURCE_FIELDS = ("fullName", "email", "cedula")
+
+
+def normalize_search_text(text: Optional[str]) -> str:
+    """
+    Normaliza texto para búsqueda: sin tildes/diacríticos, minúsculas
+    y espacios colapsados.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_marks = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_marks.casefold().split())
+
+
+def build_search_terms(full_name: Optional[str], email: Optional[str], cedula: Optional[str]) -> List[str]:
+    """
+    Construye los términos indexados de un usuario.
+    Incluye el nombre completo (para prefijos con varias palabras) y cada
+    palabra por separado (para buscar por apellido).
+    """
+    name = normalize_search_text(full_name)
+    terms = set(name.split())
+    if name:
+        terms.add(name)
+    if email:
+        terms.add(normalize_search_text(email))
+    if cedula:
+        terms.add(cedula.strip())
+    return sorted(terms)
+
+
+def with_search_terms(changes: Dict[str, Any], current: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Completa un $set parcial de usuario con `searchTerms` si cambia el
+    nombre, el email o la cédula. `current` aporta los valores vigentes de
+    los campos que no cambian (documento crudo o dict).
+    """
+    if not any(field in changes for field in SEARCH_SOURCE_FIELDS):
+        return changes
+    values = {field: changes.get(field, current.get(field)) for field in SEARCH_SOURCE_FIELDS}
+    return {**changes, "searchTerms": build_search_terms(values["fullName"], values["email"], values["cedula"])}
+
+
+def search_terms_filter(text: str) -> Dict[str, Any]:
+    """
+    Filtro MongoDB por prefijo sobre `searchTerms`.
+    Insensible a mayúsculas y tildes porque se normaliza igual que al indexar.
+    """
+    return {"searchTerms": {"$regex": "^" + re.escape(normalize_search_text(text))}}
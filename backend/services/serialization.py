@@ -0,0 +1,83 @@
+"""
+Serialización rápida de respuestas
+==================================
+Ruta normal de un listado: BSON -> documento Beanie (validación) ->
+modelo de respuesta campo a campo (validación) -> jsonable_encoder ->
+json.dumps. En listados de miles de filas ese trabajo domina el tiempo
+de respuesta.
+
+Ruta rápida: consulta proyectada que devuelve dicts crudos -> una sola
+validación con un TypeAdapter precompilado (pydantic-core) -> dump_json
+directo a bytes. Los listados de filas planas (model_list_response) ni
+siquiera se validan: se arman con model_construct y se serializan. El handler devuelve la Response ya serializada, así
+FastAPI no vuelve a validar contra response_model (que se mantiene para
+la documentación OpenAPI).
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def model_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter (compilado una sola vez) para un modelo de respuesta."""
+    return TypeAdapter(model)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter (compilado una sola vez) para una lista del modelo."""
+    return TypeAdapter(List[model])
+
+
+def response_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Proyección MongoDB con los campos del modelo de respuesta (`id` -> `_id`)."""
+    return {("_id" if field == "id" else field): 1 for field in model.model_fields}
+
+
+def with_str_id(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Renombra `_id` (ObjectId) a `id` (str), como esperan los modelos de respuesta."""
+    if "_id" in document:
+        document["id"] = str(document.pop("_id"))
+    return document
+
+
+def json_bytes_response(content: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Response con JSON ya serializado."""
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def model_response(
+    model: Type[BaseModel],
+    data: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+    exclude_unset: bool = False
+) -> Response:
+    """
+    Valida `data` una sola vez contra `model` y lo serializa directamente.
+    Con exclude_unset se omiten las claves que no vienen en `data`
+    (equivalente a response_model_exclude_unset).
+    """
+    adapter = model_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(data), exclude_unset=exclude_unset)
+    return json_bytes_response(content, headers)
+
+
+def model_list_response(
+    model: Type[BaseModel],
+    documents: Iterable[Dict[str, Any]],
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serializa directamente a JSON una lista de dicts crudos de una consulta
+    proyectada con response_projection(model), sin validarlos: cada fila se
+    arma con model_construct (los campos ausentes toman su valor por
+    defecto). Solo para modelos planos cuyos tipos coinciden con los que
+    devuelve MongoDB; los submodelos se quedarían como dicts.
+    """
+    adapter = list_adapter(model)
+    items = [model.model_construct(**with_str_id(document)) for document in documents]
+    return json_bytes_response(adapter.dump_json(items), headers)
@@ -0,0 +1,338 @@
+"""
+Línea de tiempo del paciente
+============================
+Antes el frontend pedía por separado citas, consultas, vacunas y la
+próxima cita y las mezclaba en el navegador. Aquí cada fuente es un
+iterador ya ordenado por fecha (DESC):
+
+- Citas: cursor sobre `appointments` con el índice (patient_id, fecha, _id).
+- Consultas: cursor sobre `consultas` con el índice (patient_id, fecha, _id).
+- Registros clínicos: cursor sobre `clinical_records` con (patient_id, fecha, _id).
+- Vacunas y próxima cita: embebidas en el historial (listas cortas).
+- Consultas aún embebidas de un historial sin migrar (ver
+  services/consultas.embedded_consultas): se mezclan en memoria con el
+  cursor de `consultas`.
+
+Las fuentes se mezclan de forma perezosa (k-way merge con un heap): para
+una página de N eventos se leen como mucho N + 1 elementos de cada fuente,
+sin materializar el historial completo.
+
+Orden total: (fecha DESC, tipo, _id DESC). El cursor de página guarda esos
+tres valores del último evento; cada fuente aplica su propio filtro keyset
+para continuar desde ahí.
+"""
+
+import heapq
+from datetime import datetime, time, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from models.models import Appointment, ConsultaRecord, ClinicalRecord
+from services.db import get_core_db
+from services.pagination import encode_cursor, decode_cursor, keyset_filter
+from services.field_encryption import decrypt_fields
+
+TIMELINE_SORT = [("fecha", -1), ("_id", -1)]
+
+# Tipos de evento, en el orden en que se desempatan eventos de la misma fecha
+TIMELINE_TYPES = ["proxima_cita", "cita", "consulta", "registro_clinico", "vacuna"]
+TIMELINE_RANKS = {tipo: rank for rank, tipo in enumerate(TIMELINE_TYPES)}
+
+# (fecha, id de desempate, evento)
+TimelineEntry = Tuple[datetime, Any, Dict[str, Any]]
+
+
+def _as_datetime(value: Any) -> datetime:
+    """BSON no tiene tipo date: las fechas puras se comparan como medianoche."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+def _appointment_event(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "tipo": "cita",
+        "fecha": doc["fecha"],
+        "id": str(doc["_id"]),
+        "titulo": doc.get("motivo", ""),
+        "detalle": doc.get("notas"),
+        "estado": doc.get("estado"),
+        "medico": doc.get("doctorName")
+    }
+
+
+def _consulta_event(doc: Dict[str, Any]) -> Dict[str, Any]:
+    decrypt_fields(doc, ConsultaRecord)
+    return {
+        "tipo": "consulta",
+        "fecha": doc["fecha"],
+        "id": doc["consulta_id"],
+        "titulo": doc.get("motivo", ""),
+        "detalle": doc.get("diagnostico")
+    }
+
+
+def _consulta_record_event(record: ConsultaRecord) -> Dict[str, Any]:
+    return {
+        "tipo": "consulta",
+        "fecha": _as_datetime(record.fecha),
+        "id": record.consulta_id,
+        "titulo": record.motivo,
+        "detalle": record.diagnostico
+    }
+
+
+def _clinical_record_event(doc: Dict[str, Any]) -> Dict[str, Any]:
+    decrypt_fields(doc, ClinicalRecord)
+    return {
+        "tipo": "registro_clinico",
+        "fecha": doc["fecha"],
+        "id": str(doc["_id"]),
+        "titulo": doc.get("motivoConsulta", ""),
+        "detalle": doc.get("diagnostico"),
+        "medico": doc.get("doctorName")
+    }
+
+
+# tipo -> (colección, proyección, conversión a evento)
+MONGO_SOURCES: Dict[str, Tuple[str, Dict[str, int], Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "cita": (
+        Appointment.Settings.name,
+        {"fecha": 1, "motivo": 1, "notas": 1, "estado": 1, "doctorName": 1},
+        _appointment_event
+    ),
+    "consulta": (
+        ConsultaRecord.Settings.name,
+        {"fecha": 1, "consulta_id": 1, "motivo": 1, "diagnostico": 1},
+        _consulta_event
+    ),
+    "registro_clinico": (
+        ClinicalRecord.Settings.name,
+        {"fecha": 1, "motivoConsulta": 1, "diagnostico": 1, "doctorName": 1},
+        _clinical_record_event
+    ),
+}
+
+
+# Filtro adicional por tipo: las consultas marcadas con discrepancia de
+# hash (PBI-20) quedan fuera de la línea de tiempo
+SOURCE_FILTERS: Dict[str, Dict[str, Any]] = {
+    "consulta": {"is_corrupted": {"$ne": True}},
+}
+
+
+def _source_filter(rank: int, after: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Filtro keyset de una fuente para continuar después del evento `after`.
+    Las fuentes de menor rango ya devolvieron sus eventos de esa fecha;
+    las de mayor rango aún no.
+    """
+    if after is None:
+        return None
+    if rank < after["rank"]:
+        return {"fecha": {"$lt": after["fecha"]}}
+    if rank > after["rank"]:
+        return {"fecha": {"$lte": after["fecha"]}}
+    return keyset_filter(TIMELINE_SORT, {"fecha": after["fecha"], "_id": after["id"]})
+
+
+async def _mongo_source(
+    tipo: str,
+    patient_id: str,
+    after: Optional[Dict[str, Any]],
+    batch_size: int
+) -> AsyncIterator[TimelineEntry]:
+    """Recorre una colección ordenada por (fecha, _id) DESC, en lotes pequeños."""
+    collection_name, projection, to_event = MONGO_SOURCES[tipo]
+    query = {"patient_id": patient_id, **SOURCE_FILTERS.get(tipo, {})}
+    after_filter = _source_filter(TIMELINE_RANKS[tipo], after)
+    if after_filter:
+        query = {"$and": [query, after_filter]}
+
+    cursor = get_core_db()[collection_name].find(query, projection).sort(TIMELINE_SORT).batch_size(batch_size)
+    try:
+        async for doc in cursor:
+            yield _as_datetime(doc["fecha"]), doc["_id"], to_event(doc)
+    finally:
+        await cursor.close()
+
+
+def _embedded_events(tipo: str, history: Dict[str, Any]) -> List[TimelineEntry]:
+    """Eventos embebidos en el historial; el índice en la lista hace de _id."""
+    if tipo == "vacuna":
+        return [
+            (_as_datetime(vacuna["fecha"]), index, {
+                "tipo": "vacuna",
+                "fecha": vacuna["fecha"],
+                "titulo": vacuna.get("nombre", ""),
+                "proximaDosis": vacuna.get("proximaDosis")
+            })
+            for index, vacuna in enumerate(history.get("vacunas") or [])
+        ]
+
+    proxima = history.get("proximaCita")
+    if not proxima:
+        return []
+    return [(_as_datetime(proxima["fecha"]), 0, {
+        "tipo": "proxima_cita",
+        "fecha": proxima["fecha"],
+        "titulo": proxima.get("motivo", ""),
+        "medico": proxima.get("medico")
+    })]
+
+
+def _is_after(rank: int, fecha: datetime, sort_id: Any, after: Optional[Dict[str, Any]]) -> bool:
+    """Equivalente en memoria de _source_filter: el evento va después de `after`."""
+    if after is None or fecha < after["fecha"]:
+        return True
+    if fecha > after["fecha"]:
+        return False
+    return rank > after["rank"] or (rank == after["rank"] and sort_id < after["id"])
+
+
+async def _entries_source(
+    tipo: str,
+    entries: List[TimelineEntry],
+    after: Optional[Dict[str, Any]]
+) -> AsyncIterator[TimelineEntry]:
+    """Ordena en memoria una lista de eventos y aplica el mismo keyset."""
+    rank = TIMELINE_RANKS[tipo]
+    for fecha, sort_id, event in sorted(entries, key=lambda e: (e[0], e[1]), reverse=True):
+        if _is_after(rank, fecha, sort_id, after):
+            yield fecha, sort_id, event
+
+
+def _embedded_source(
+    tipo: str,
+    history: Dict[str, Any],
+    after: Optional[Dict[str, Any]]
+) -> AsyncIterator[TimelineEntry]:
+    """Lista embebida en el historial (vacunas o próxima cita)."""
+    return _entries_source(tipo, _embedded_events(tipo, history), after)
+
+
+async def _next_entry(source: AsyncIterator[TimelineEntry]) -> Optional[TimelineEntry]:
+    try:
+        return await source.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _consulta_source(
+    patient_id: str,
+    after: Optional[Dict[str, Any]],
+    batch_size: int,
+    embedded: Sequence[ConsultaRecord]
+) -> AsyncIterator[TimelineEntry]:
+    """
+    Consultas de la colección mezcladas con las aún embebidas de un
+    historial sin migrar, por (fecha, _id) DESC.
+    """
+    entries = [(_as_datetime(record.fecha), record.id, _consulta_record_event(record)) for record in embedded]
+    sources = [_mongo_source("consulta", patient_id, after, batch_size), _entries_source("consulta", entries, after)]
+    pending = []
+    try:
+        for source in sources:
+            entry = await _next_entry(source)
+            if entry is not None:
+                pending.append((entry, source))
+        while pending:
+            index = max(range(len(pending)), key=lambda i: pending[i][0][:2])
+            entry, source = pending[index]
+            yield entry
+            following = await _next_entry(source)
+            if following is None:
+                pending.pop(index)
+            else:
+                pending[index] = (following, source)
+    finally:
+        for source in sources:
+            await source.aclose()
+
+
+async def merge_desc(sources: Dict[str, AsyncIterator[TimelineEntry]]) -> AsyncIterator[Tuple[str, TimelineEntry]]:
+    """
+    K-way merge perezoso de fuentes ordenadas por fecha DESC.
+    El heap guarda como máximo un evento por fuente; la siguiente lectura
+    de una fuente solo ocurre cuando su evento sale del heap.
+    """
+    heap = []
+    try:
+        for tipo, source in sources.items():
+            try:
+                entry = await source.__anext__()
+            except StopAsyncIteration:
+                continue
+            # datetime.max - fecha: menor = más reciente; el rango desempata
+            heap.append((datetime.max - entry[0], TIMELINE_RANKS[tipo], tipo, entry))
+        heapq.heapify(heap)
+
+        while heap:
+            _, rank, tipo, entry = heap[0]
+            yield tipo, entry
+            try:
+                following = await sources[tipo].__anext__()
+                heapq.heapreplace(heap, (datetime.max - following[0], rank, tipo, following))
+            except StopAsyncIteration:
+                heapq.heappop(heap)
+    finally:
+        for source in sources.values():
+            await source.aclose()
+
+
+async def page_timeline(
+    patient_id: str,
+    history: Dict[str, Any],
+    tipos: List[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    embedded_consultas: Sequence[ConsultaRecord] = ()
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Página de la línea de tiempo del paciente, más recientes primero.
+
+    Args:
+        history: Documento del historial (ya verificado) con vacunas y proximaCita
+        tipos: Tipos de evento a incluir (ver TIMELINE_TYPES)
+        embedded_consultas: Consultas aún embebidas (historial sin migrar)
+
+    Raises:
+        ValueError: Si el cursor es inválido
+
+    Returns:
+        Tuple de (eventos, cursor_siguiente o None)
+    """
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if not {"fecha", "rank", "id"} <= after.keys() or not isinstance(after["rank"], int):
+            raise ValueError("Invalid cursor: missing fields")
+        if not isinstance(after["fecha"], datetime):
+            raise ValueError("Invalid cursor: fecha must be a date")
+        # MongoDB devuelve datetimes UTC sin zona: comparar igual que ellos
+        if after["fecha"].tzinfo is not None:
+            after["fecha"] = after["fecha"].astimezone(timezone.utc).replace(tzinfo=None)
+
+    sources = {}
+    for tipo in tipos:
+        if tipo == "consulta" and embedded_consultas:
+            sources[tipo] = _consulta_source(patient_id, after, limit + 1, embedded_consultas)
+        elif tipo in MONGO_SOURCES:
+            sources[tipo] = _mongo_source(tipo, patient_id, after, limit + 1)
+        else:
+            sources[tipo] = _embedded_source(tipo, history, after)
+
+    events = []
+    last = None
+    next_cursor = None
+    merged = merge_desc(sources)
+    try:
+        async for tipo, (fecha, sort_id, event) in merged:
+            if len(events) == limit:
+                next_cursor = encode_cursor({"fecha": last[0], "rank": TIMELINE_RANKS[last[1]], "id": last[2]})
+                break
+            events.append(event)
+            last = (fecha, tipo, sort_id)
+    finally:
+        await merged.aclose()
+
+    return events, next_cursor
@@ -0,0 +1,179 @@
+"""
+Listas de trabajo: vacunas y seguimientos pendientes
+====================================================
+`Vacuna.proximaDosis` (embebida en PatientHistory.vacunas) y
+`ClinicalRecord.seguimiento.fecha` son fechas accionables. Encontrar a
+todos los pacientes con algo pendiente esta semana obligaba a recorrer
+todos los historiales.
+
+Ambas listas se resuelven con índices, sin colección auxiliar que
+mantener sincronizada:
+
+- Vacunas: índice multikey sobre `vacunas.proximaDosis` (y compuesto con
+  `medicoAsignado.medicoId`). `$elemMatch` acota el rango sobre el mismo
+  elemento del arreglo, así que solo se leen los historiales con alguna
+  dosis en el rango; luego `$unwind` deja una fila por vacuna.
+- Seguimientos: índice sobre (`seguimiento.fecha`, `_id`) y compuesto con
+  `patient_id`; la consulta y el orden salen directamente del índice. El
+  filtro por médico es por médico asignado (como las vacunas y el control
+  de acceso), no por autor del registro: los pacientes asignados salen
+  del índice de asignaciones (services.assignments) y se filtran con `$in`.
+
+Ambas se paginan por keyset (ver services.pagination).
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from models.models import User, PatientHistory, ClinicalRecord
+from services.assignments import get_assigned_patient_ids
+from services.db import get_auth_db, get_core_db
+from services.pagination import apply_cursor, split_page
+from services.field_encryption import decrypt_rows
+
+VACCINES_DUE_SORT = [("proximaDosis", 1), ("patient_id", 1), ("vacuna", 1), ("fecha", 1)]
+FOLLOW_UPS_DUE_SORT = [("seguimiento.fecha", 1), ("_id", 1)]
+
+
+def date_range_filter(desde: date, hasta: date) -> Dict[str, datetime]:
+    """Rango [desde, hasta] en días completos (las fechas se guardan como medianoche)."""
+    return {
+        "$gte": datetime.combine(desde, time.min),
+        "$lt": datetime.combine(hasta + timedelta(days=1), time.min)
+    }
+
+
+async def patient_names(patient_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Nombre y cédula de los pacientes de una página (una sola consulta $in)."""
+    object_ids = [ObjectId(pid) for pid in set(patient_ids) if ObjectId.is_valid(pid)]
+    if not object_ids:
+        return {}
+    cursor = get_auth_db()[User.Settings.name].find(
+        {"_id": {"$in": object_ids}},
+        {"fullName": 1, "cedula": 1}
+    )
+    return {str(user["_id"]): user async for user in cursor}
+
+
+async def page_vaccines_due(
+    desde: date,
+    hasta: date,
+    limit: int,
+    cursor: Optional[str] = None,
+    doctor_id: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Vacunas con próxima dosis en [desde, hasta], ordenadas por fecha.
+    Con doctor_id solo las de pacientes asignados a ese médico.
+    No incluye historiales bloqueados por integridad.
+
+    Raises:
+        ValueError: Si el cursor es inválido
+
+    Returns:
+        Tuple de (filas, cursor_siguiente o None)
+    """
+    due_range = date_range_filter(desde, hasta)
+
+    match: Dict[str, Any] = {
+        "vacunas": {"$elemMatch": {"proximaDosis": due_range}},
+        "is_corrupted": {"$ne": True}
+    }
+    if doctor_id:
+        match["medicoAsignado.medicoId"] = doctor_id
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"patient_id": 1, "medicoAsignado": 1, "vacunas": 1}},
+        {"$unwind": "$vacunas"},
+        {"$match": {"vacunas.proximaDosis": due_range}},
+        {"$project": {
+            "_id": 0,
+            "patient_id": 1,
+            "vacuna": "$vacunas.nombre",
+            "fecha": "$vacunas.fecha",
+            "proximaDosis": "$vacunas.proximaDosis",
+            "medicoId": "$medicoAsignado.medicoId",
+            "medicoNombre": "$medicoAsignado.nombre"
+        }},
+        {"$match": apply_cursor({}, VACCINES_DUE_SORT, cursor)},
+        {"$sort": dict(VACCINES_DUE_SORT)},
+        {"$limit": limit + 1}
+    ]
+
+    rows = await get_core_db()[PatientHistory.Settings.name].aggregate(pipeline).to_list(length=None)
+    rows, next_cursor = split_page(rows, VACCINES_DUE_SORT, limit)
+
+    names = await patient_names([row["patient_id"] for row in rows])
+    for row in rows:
+        patient = names.get(row["patient_id"], {})
+        row["patientName"] = patient.get("fullName")
+        row["patientCedula"] = patient.get("cedula")
+
+    return rows, next_cursor
+
+
+async def page_follow_ups_due(
+    desde: date,
+    hasta: date,
+    limit: int,
+    cursor: Optional[str] = None,
+    doctor_id: Optional[str] = None,
+    include_clinical: bool = True
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Registros clínicos con seguimiento en [desde, hasta], ordenados por fecha.
+    Con doctor_id solo los de pacientes asignados a ese médico. Sin
+    include_clinical no se leen el diagnóstico ni las instrucciones.
+
+    Raises:
+        ValueError: Si el cursor es inválido
+
+    Returns:
+        Tuple de (filas, cursor_siguiente o None)
+    """
+    query: Dict[str, Any] = {"seguimiento.fecha": date_range_filter(desde, hasta)}
+    if doctor_id:
+        patient_ids = await get_assigned_patient_ids(doctor_id)
+        if not patient_ids:
+            return [], None
+        query["patient_id"] = {"$in": patient_ids}
+
+    projection = {
+        "patient_id": 1,
+        "patientName": 1,
+        "patientCedula": 1,
+        "doctor_id": 1,
+        "doctorName": 1,
+        "fecha": 1
+    }
+    if include_clinical:
+        projection.update({"diagnostico": 1, "seguimiento": 1})
+    else:
+        projection["seguimiento.fecha"] = 1
+    records = await get_core_db()[ClinicalRecord.Settings.name].find(
+        apply_cursor(query, FOLLOW_UPS_DUE_SORT, cursor),
+        projection
+    ).sort(FOLLOW_UPS_DUE_SORT).limit(limit + 1).to_list(length=None)
+    records, next_cursor = split_page(records, FOLLOW_UPS_DUE_SORT, limit)
+    if include_clinical:
+        await decrypt_rows(records, ClinicalRecord)
+
+    rows = [
+        {
+            "record_id": str(record["_id"]),
+            "patient_id": record["patient_id"],
+            "patientName": record["patientName"],
+            "patientCedula": record["patientCedula"],
+            "doctor_id": record["doctor_id"],
+            "doctorName": record["doctorName"],
+            "fechaRegistro": record["fecha"],
+            "diagnostico": record.get("diagnostico"),
+            "fechaSeguimiento": record["seguimiento"]["fecha"],
+            "instrucciones": record["seguimiento"].get("instrucciones")
+        }
+        for record in records
+    ]
+    return rows, next_cursor
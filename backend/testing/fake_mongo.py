@@ -0,0 +1,189 @@
+"""
+MongoDB en memoria con la interfaz asíncrona de motor
+=====================================================
+Fachada asíncrona sobre mongomock con la interfaz de motor que usan los
+servicios y Beanie, para las pruebas (tests/) y los benchmarks sin
+servidor (benchmarks/). Cada operación cede el bucle de eventos antes de
+ejecutarse, para que las corutinas concurrentes se intercalen como lo
+harían contra un servidor.
+
+`queries` cuenta las órdenes enviadas por (colección, orden), con los
+nombres del protocolo de MongoDB: find, aggregate, insert, update...
+
+mongomock no aplica los índices únicos sobre arrays por elemento
+(multikey), y en los índices únicos parciales compara también con los
+documentos que quedan fuera de partialFilterExpression. Su bulk_write
+no es compatible con las operaciones de pymongo 4.9+: la fachada las
+aplica una por una.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Optional
+
+import mongomock
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult
+
+# Orden del protocolo que envía cada método de la colección
+COMMANDS = {
+    "find_one": "find",
+    "count_documents": "aggregate",
+    "insert_one": "insert",
+    "insert_many": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "replace_one": "update",
+    "find_one_and_update": "findAndModify",
+    "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+    "delete_one": "delete",
+    "delete_many": "delete",
+    "distinct": "distinct"
+}
+
+
+class FakeCursor:
+    """Cursor asíncrono sobre un cursor (o lista) de mongomock."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, key, direction=None):
+        self._cursor = self._cursor.sort(key, direction) if direction is not None else self._cursor.sort(key)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        rows = list(self._cursor)
+        return rows[:length] if length else rows
+
+    def __aiter__(self):
+        self._iterator = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+    def __await__(self):
+        # Beanie espera el resultado de aggregate(); motor lo usa como cursor
+        yield from asyncio.sleep(0).__await__()
+        return self
+
+
+class FakeCollection:
+    """Colección con la interfaz asíncrona de motor sobre mongomock."""
+
+    def __init__(self, collection, queries: Counter):
+        self._collection = collection
+        self._queries = queries
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        self._queries[(self.name, "find")] += 1
+        return FakeCursor(self._collection.find(*args, **_driver_kwargs(kwargs)))
+
+    def aggregate(self, pipeline, **kwargs):
+        self._queries[(self.name, "aggregate")] += 1
+        return FakeCursor(self._collection.aggregate(pipeline))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        self._queries[(self.name, "bulkWrite")] += 1
+        await asyncio.sleep(0)
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self._collection.insert_one(request._doc)
+                counts["nInserted"] += 1
+                continue
+            if isinstance(request, (DeleteOne, DeleteMany)):
+                delete = self._collection.delete_one if isinstance(request, DeleteOne) else self._collection.delete_many
+                counts["nRemoved"] += delete(request._filter).deleted_count
+                continue
+            if isinstance(request, UpdateOne):
+                result = self._collection.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+            elif isinstance(request, UpdateMany):
+                result = self._collection.update_many(request._filter, request._doc, upsert=bool(request._upsert))
+            elif isinstance(request, ReplaceOne):
+                result = self._collection.replace_one(request._filter, request._doc, upsert=bool(request._upsert))
+            else:
+                raise TypeError(f"Unsupported bulk operation: {request!r}")
+            counts["nMatched"] += result.matched_count
+            counts["nModified"] += result.modified_count
+            if result.upserted_id is not None:
+                counts["nUpserted"] += 1
+                counts["upserted"].append({"index": index, "_id": result.upserted_id})
+        return BulkWriteResult(counts, True)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            if name in COMMANDS:
+                self._queries[(self.name, COMMANDS[name])] += 1
+            await asyncio.sleep(0)
+            return method(*args, **_driver_kwargs(kwargs))
+
+        return call
+
+
+class FakeDatabase:
+    """Base de datos con la interfaz asíncrona de motor sobre mongomock."""
+
+    def __init__(self, database, queries: Counter):
+        self._database = database
+        self._queries = queries
+        self._collections = {}
+        self.name = database.name
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self._database[name], self._queries)
+        return self._collections[name]
+
+    async def command(self, command, *args, **kwargs):
+        if command == "buildInfo" or (isinstance(command, dict) and "buildInfo" in command):
+            return {"version": "7.0.0", "ok": 1.0}
+        return self._database.command(command, *args, **kwargs)
+
+    async def list_collection_names(self, *args, **kwargs):
+        return self._database.list_collection_names()
+
+    async def create_collection(self, name, **kwargs):
+        self._database.create_collection(name, **kwargs)
+        return self[name]
+
+
+def _driver_kwargs(kwargs):
+    """Quita las opciones del driver que mongomock no entiende."""
+    kwargs.pop("session", None)
+    kwargs.pop("comment", None)
+    if kwargs.get("skip") is None:
+        kwargs.pop("skip", None)
+    if kwargs.get("limit") is None:
+        kwargs.pop("limit", None)
+    return kwargs
+
+
+def fake_database(name: str, queries: Optional[Counter] = None) -> FakeDatabase:
+    """Base vacía de mongomock detrás de la fachada asíncrona."""
+    return FakeDatabase(mongomock.MongoClient()[name], queries if queries is not None else Counter())
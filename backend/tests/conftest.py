@@ -0,0 +1,129 @@
+"""
+Fixtures de MongoDB para las pruebas del backend
+================================================
+Por defecto las pruebas corren sobre mongomock, detrás de la fachada
+asíncrona de testing/fake_mongo.py.
+
+Con MONGODB_TEST_URI se usa un MongoDB real (motor) en una base temporal
+que se borra al terminar. mongomock no aplica los índices únicos sobre
+arrays por elemento (multikey): las pruebas de choques parciales entre
+celdas solo tienen sentido contra un servidor real.
+
+`mongo.queries` cuenta las órdenes enviadas por (colección, orden), con
+los nombres del protocolo de MongoDB: find, aggregate, insert, update...
+"""
+
+import os
+import uuid
+from collections import Counter
+
+import pytest
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from models.models import (
+    User,
+    Session,
+    MFASecret,
+    PatientHistory,
+    ConsultaRecord,
+    ClinicalRecord,
+    Appointment,
+    DoctorAvailability,
+    AvailabilityTemplate,
+    DoctorPatientAssignment,
+    DataKey
+)
+from services import db
+from services.field_encryption import field_keyring
+from services.scheduling import availability_cache, slot_index
+from testing.fake_mongo import fake_database
+
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+
+DOCUMENT_MODELS = [
+    User,
+    Session,
+    MFASecret,
+    DataKey,
+    PatientHistory,
+    ConsultaRecord,
+    ClinicalRecord,
+    Appointment,
+    DoctorAvailability,
+    AvailabilityTemplate,
+    DoctorPatientAssignment
+]
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Cuenta las órdenes que el driver envía a un servidor real."""
+
+    def __init__(self, queries: Counter):
+        self.queries = queries
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            self.queries[(collection, event.command_name)] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class MongoFixture:
+    """Base de pruebas inicializada con Beanie y su contador de órdenes."""
+
+    def __init__(self, database, queries: Counter):
+        self.db = database
+        self.queries = queries
+
+    def count(self, collection: str, command: str) -> int:
+        return self.queries[(collection, command)]
+
+    def reset_counts(self) -> None:
+        self.queries.clear()
+
+
+@pytest.fixture
+async def mongo(monkeypatch):
+    """
+    Base de datos de pruebas vacía (mongomock o MONGODB_TEST_URI) con los
+    modelos inicializados. Las tres bases de la aplicación apuntan a ella.
+    """
+    queries = Counter()
+    client = None
+    if MONGODB_TEST_URI:
+        client = AsyncIOMotorClient(MONGODB_TEST_URI, event_listeners=[CommandCounter(queries)])
+        database = client[f"sirona_test_{uuid.uuid4().hex[:12]}"]
+    else:
+        database = fake_database("sirona_test", queries)
+
+    await init_beanie(database=database, document_models=DOCUMENT_MODELS)
+    for name in ("db_auth", "db_core", "db_logs"):
+        monkeypatch.setattr(db, name, database)
+
+    availability_cache.clear()
+    slot_index.clear()
+    queries.clear()
+    try:
+        yield MongoFixture(database, queries)
+    finally:
+        availability_cache.clear()
+        slot_index.clear()
+        if client is not None:
+            await client.drop_database(database.name)
+            client.close()
+
+
+@pytest.fixture
+async def keyring(mongo, tmp_path, monkeypatch):
+    """Claves de cifrado de campos con una clave maestra temporal."""
+    monkeypatch.setattr(field_keyring, "master_key_file", str(tmp_path / "master.key"))
+    monkeypatch.setattr(field_keyring, "_master", None)
+    await field_keyring.load(mongo.db[DataKey.Settings.name])
+    return field_keyring
@@ -0,0 +1,45 @@
+"""Índice de asignación médico-paciente (services/assignments)."""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from models.models import DoctorPatientAssignment, PatientHistory
+from services.assignments import assign_doctor, assignment_cache, get_assigned_doctor_id
+
+PATIENT_ID = "paciente-1"
+
+
+async def test_unassigned_patient_is_not_cached(mongo):
+    assignment_cache.clear()
+    assert await get_assigned_doctor_id(PATIENT_ID) is None
+
+    # Asignación hecha por otro proceso: no invalida la caché de este
+    await mongo.db[DoctorPatientAssignment.Settings.name].insert_one({
+        "doctor_id": "medico-1", "patient_id": PATIENT_ID, "asignado": True,
+        "assigned_at": datetime.utcnow(), "created_at": datetime.utcnow()
+    })
+
+    assert await get_assigned_doctor_id(PATIENT_ID) == "medico-1"
+
+
+@pytest.mark.skipif(not os.getenv("MONGODB_TEST_URI"), reason="mongomock no aplica bien los índices únicos parciales")
+async def test_assign_doctor_replaces_previous(mongo):
+    assignment_cache.clear()
+    await assign_doctor("medico-1", PATIENT_ID)
+    assert await get_assigned_doctor_id(PATIENT_ID) == "medico-1"
+
+    await assign_doctor("medico-2", PATIENT_ID)
+
+    assert await get_assigned_doctor_id(PATIENT_ID) == "medico-2"
+    assert await DoctorPatientAssignment.find({"patient_id": PATIENT_ID, "asignado": True}).count() == 1
+
+
+async def test_missing_index_row_falls_back_to_history(mongo):
+    assignment_cache.clear()
+    await mongo.db[PatientHistory.Settings.name].insert_one({
+        "patient_id": PATIENT_ID, "medicoAsignado": {"medicoId": "medico-3"}
+    })
+
+    assert await get_assigned_doctor_id(PATIENT_ID) == "medico-3"
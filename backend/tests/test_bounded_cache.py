@@ -0,0 +1,53 @@
+"""Caché LRU acotada (services/bounded_cache) y cachés construidas sobre ella."""
+
+from services import bounded_cache
+from services.bounded_cache import MISSING, BoundedCache
+from services.history_cache import EncryptedHistoryCache
+
+
+def test_evicts_least_recently_used():
+    removed = []
+    cache = BoundedCache(2, on_remove=lambda key, value: removed.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert removed == ["b"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_and_invalid_entries_are_misses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(bounded_cache.time, "monotonic", lambda: now[0])
+    cache = BoundedCache(10, ttl_seconds=60)
+    cache.put("a", ("rev-1", "datos"))
+    cache.put("b", None)
+
+    assert cache.get("a", valid=lambda entry: entry[0] == "rev-2") is MISSING
+    assert cache.get("b") is None
+    now[0] += 61
+    assert "b" not in cache
+    assert cache.get("b") is MISSING
+
+    stats = cache.stats(extra=1)
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"], stats["extra"]) == (1, 2, 0.3333, 1)
+    assert len(cache) == 0
+
+
+def test_history_cache_tracks_bytes_and_history_ids():
+    cache = EncryptedHistoryCache(max_entries=1, ttl_seconds=60)
+    cache.put({"_id": "h1", "patient_id": "p1", "alergias": ["Penicilina"]})
+    assert cache.get("p1")["alergias"] == ["Penicilina"]
+
+    cache.put({"_id": "h2", "patient_id": "p2"})
+    assert "p1" not in cache
+    cache.invalidate("h1")
+    assert "p2" in cache
+
+    cache.invalidate("h2")
+    assert cache.stats()["bytes"] == 0
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,73 @@
+"""Consultas embebidas y de la colección (services/consultas)."""
+
+from datetime import date
+
+from beanie import PydanticObjectId
+
+from models.models import Consulta, ConsultaRecord, PatientHistory, User, UserRole
+from services.consultas import (
+    build_record,
+    embedded_consultas,
+    latest_consultas,
+    migrate_embedded_consultas,
+    page_consultas
+)
+from services.integrity import integrity_service
+from services.patient_history import build_initial_history
+
+
+def consulta(index: int, fecha: date) -> Consulta:
+    return Consulta(
+        id=f"cons_{1_700_000_000 + index}",
+        fecha=fecha,
+        motivo=f"Motivo {index}",
+        diagnostico="Diagnóstico",
+        tratamiento="Tratamiento",
+        notasMedico="Notas"
+    )
+
+
+async def history_with_embedded(consultas) -> PatientHistory:
+    patient = User.model_construct(id=PydanticObjectId(), email="p@example.com", fullName="Paciente", role=UserRole.PACIENTE)
+    history = build_initial_history(patient)
+    history.consultas = consultas
+    history.integrity_hash = integrity_service.calculate_hash(history)
+    await history.insert()
+    return history
+
+
+async def test_pages_merge_embedded_without_writing(mongo, keyring):
+    history = await history_with_embedded([
+        consulta(1, date(2026, 1, 10)),
+        consulta(2, date(2026, 1, 5)),
+        consulta(3, date(2026, 1, 5))
+    ])
+    for index, fecha in ((4, date(2026, 1, 7)), (5, date(2026, 1, 1))):
+        await build_record(consulta(index, fecha), history.patient_id).insert()
+    mongo.reset_counts()
+
+    embedded = await embedded_consultas(history.patient_id)
+    seen, cursor = [], None
+    while True:
+        page, cursor = await page_consultas(history.patient_id, 2, cursor, embedded)
+        seen += [record.consulta_id for record in page]
+        if not cursor:
+            break
+
+    # Mismo día: la creada después primero (el _id sigue el orden de creación)
+    assert seen == ["cons_1700000001", "cons_1700000004", "cons_1700000003", "cons_1700000002", "cons_1700000005"]
+    assert [r.consulta_id for r in await latest_consultas(history.patient_id, 2, embedded)] == seen[:2]
+    assert mongo.count(PatientHistory.Settings.name, "update") == 0
+    assert mongo.count(ConsultaRecord.Settings.name, "update") == 0
+    assert (await PatientHistory.get(history.id)).revision == history.revision
+
+
+async def test_migration_keeps_embedded_ids(mongo, keyring):
+    history = await history_with_embedded([consulta(1, date(2026, 2, 1)), consulta(2, date(2026, 1, 1))])
+    read_ids = {record.consulta_id: record.id for record in await embedded_consultas(history.patient_id)}
+
+    assert await migrate_embedded_consultas(history) == 2
+
+    migrated = await ConsultaRecord.find({"patient_id": history.patient_id}).to_list()
+    assert {record.consulta_id: record.id for record in migrated} == read_ids
+    assert await embedded_consultas(history.patient_id) == []
@@ -0,0 +1,112 @@
+"""Cifrado de campos ligado a colección, campo y _id (services/field_encryption)."""
+
+import base64
+import os
+from datetime import date
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from models.models import ConsultaRecord, DataKey, MFASecret
+from services.field_encryption import (
+    LEGACY_PREFIX,
+    NONCE_SIZE,
+    FieldEncryptionError,
+    field_context,
+    field_keyring,
+    is_encrypted,
+    seal_fields
+)
+
+
+def consulta(**fields) -> ConsultaRecord:
+    values = {
+        "consulta_id": "cons_1",
+        "patient_id": "paciente-1",
+        "fecha": date(2026, 3, 2),
+        "motivo": "Control",
+        "diagnostico": "Hipertensión",
+        "tratamiento": "Enalapril",
+        "notasMedico": "Sin novedades"
+    }
+    values.update(fields)
+    return ConsultaRecord(**values)
+
+
+async def stored(mongo, record: ConsultaRecord) -> dict:
+    return await mongo.db[ConsultaRecord.Settings.name].find_one({"_id": record.id})
+
+
+async def test_roundtrip_encrypted_at_rest(mongo, keyring):
+    record = await consulta().insert()
+
+    raw = await stored(mongo, record)
+    assert all(is_encrypted(raw[field]) for field in ("diagnostico", "tratamiento", "notasMedico"))
+
+    loaded = await ConsultaRecord.get(record.id)
+    assert (loaded.diagnostico, loaded.tratamiento, loaded.notasMedico) == ("Hipertensión", "Enalapril", "Sin novedades")
+
+
+async def test_list_fields_encrypted(mongo, keyring):
+    secret = await MFASecret(user_id="usuario-1", secret="JBSWY3DPEHPK3PXP", backup_codes=["1111", "2222"]).insert()
+
+    raw = await mongo.db[MFASecret.Settings.name].find_one({"_id": secret.id})
+    assert is_encrypted(raw["secret"]) and all(is_encrypted(code) for code in raw["backup_codes"])
+    assert (await MFASecret.get(secret.id)).backup_codes == ["1111", "2222"]
+
+
+async def test_partial_update_encrypted(mongo, keyring):
+    record = await consulta().insert()
+
+    await record.set(seal_fields({"diagnostico": "Diabetes tipo 2", "motivo": "Resultados"}, record))
+
+    raw = await stored(mongo, record)
+    assert is_encrypted(raw["diagnostico"]) and raw["motivo"] == "Resultados"
+    assert (await ConsultaRecord.get(record.id)).diagnostico == "Diabetes tipo 2"
+
+
+async def test_legacy_prefix_input_is_encrypted(mongo, keyring):
+    record = await consulta(diagnostico=f"{LEGACY_PREFIX}texto escrito por el médico").insert()
+
+    raw = await stored(mongo, record)
+    assert is_encrypted(raw["diagnostico"])
+    assert (await ConsultaRecord.get(record.id)).diagnostico == f"{LEGACY_PREFIX}texto escrito por el médico"
+
+
+async def test_legacy_v1_value_is_read(mongo, keyring):
+    record = await consulta().insert()
+    key_id = keyring._active_key_id
+    nonce = os.urandom(NONCE_SIZE)
+    blob = nonce + keyring._cipher(key_id).encrypt(nonce, "Diagnóstico v1".encode("utf-8"), key_id.encode("ascii"))
+    legacy = f"{LEGACY_PREFIX}{key_id}:{base64.b64encode(blob).decode('ascii')}"
+    await mongo.db[ConsultaRecord.Settings.name].update_one({"_id": record.id}, {"$set": {"diagnostico": legacy}})
+
+    assert (await ConsultaRecord.get(record.id)).diagnostico == "Diagnóstico v1"
+
+
+async def test_value_copied_to_another_field_fails(mongo, keyring):
+    record = await consulta().insert()
+    raw = await stored(mongo, record)
+    await mongo.db[ConsultaRecord.Settings.name].update_one({"_id": record.id}, {"$set": {"tratamiento": raw["diagnostico"]}})
+
+    # Al validar, pydantic envuelve el FieldEncryptionError (ValueError)
+    with pytest.raises(ValueError, match="cannot be decrypted in context consultas.tratamiento"):
+        await ConsultaRecord.get(record.id)
+
+
+async def test_value_copied_to_another_document_fails(mongo, keyring):
+    first = await consulta().insert()
+    second = await consulta(consulta_id="cons_2").insert()
+    raw = await stored(mongo, first)
+
+    with pytest.raises(FieldEncryptionError):
+        keyring.decrypt(raw["diagnostico"], field_context(ConsultaRecord.Settings.name, "diagnostico", second.id))
+
+
+async def test_unknown_key_fails(keyring):
+    value = keyring.encrypt("texto", b"consultas.diagnostico:1")
+    keyring._wrapped = {"otra": AESGCM.generate_key(bit_length=256)}
+    keyring._unwrapped.clear()
+
+    with pytest.raises(FieldEncryptionError):
+        keyring.decrypt(value, b"consultas.diagnostico:1")
@@ -0,0 +1,40 @@
+"""Historial inicial del paciente (services/patient_history)."""
+
+from beanie import PydanticObjectId
+
+from models.models import User, UserRole
+from services.integrity import integrity_service
+from services.patient_history import build_initial_history
+
+
+def user(role: UserRole, **fields) -> User:
+    return User.model_construct(
+        id=PydanticObjectId(),
+        email=f"{role.value.lower()}@example.com",
+        fullName=fields.pop("fullName", "Usuario"),
+        role=role,
+        **fields
+    )
+
+
+def test_initial_history_without_doctor():
+    patient = user(UserRole.PACIENTE, grupoSanguineo="A+", ciudad="Quito")
+
+    history = build_initial_history(patient)
+
+    assert history.patient_id == str(patient.id)
+    assert (history.tipoSangre, history.ciudad) == ("A+", "Quito")
+    assert history.medicoAsignado.medicoId is None
+    assert history.integrity_hash == integrity_service.calculate_hash(history)
+
+
+def test_initial_history_with_doctor():
+    patient = user(UserRole.PACIENTE)
+    doctor = user(UserRole.MEDICO, fullName="Dra. Pérez", especialidad="Cardiología")
+
+    history = build_initial_history(patient, doctor)
+
+    assert history.tipoSangre == "No especificado"
+    assert history.medicoAsignado.medicoId == str(doctor.id)
+    assert (history.medicoAsignado.nombre, history.medicoAsignado.especialidad) == ("Dra. Pérez", "Cardiología")
+    assert history.integrity_hash == integrity_service.calculate_hash(history)
@@ -0,0 +1,86 @@
+"""Agenda del día y reserva atómica de horarios (services/scheduling)."""
+
+import asyncio
+import os
+from datetime import date, datetime
+
+import pytest
+
+from models.models import Appointment, AvailabilityTemplate, DoctorAvailability
+from services.scheduling import day_schedule, reserve_slot
+
+DOCTOR_ID = "medico-1"
+FECHA = date(2026, 3, 2)
+CONCURRENT_BOOKINGS = 300
+
+
+def appointment(fecha: datetime, patient_id: str = "paciente-1") -> Appointment:
+    return Appointment(
+        patient_id=patient_id,
+        patientName="Paciente",
+        doctor_id=DOCTOR_ID,
+        doctorName="Médico",
+        fecha=fecha,
+        motivo="Control",
+        estado="Programada",
+        created_by="secretario-1"
+    )
+
+
+async def test_day_schedule_two_queries(mongo):
+    await DoctorAvailability(
+        doctor_id=DOCTOR_ID, doctorName="Médico", fecha=FECHA,
+        horaInicio="08:00", horaFin="10:00", duracionCita=30
+    ).insert()
+    assert await reserve_slot(appointment(datetime(2026, 3, 2, 8, 30)), 30)
+    mongo.reset_counts()
+
+    schedule = await day_schedule(DOCTOR_ID, FECHA)
+
+    assert [(slot.strftime("%H:%M"), free) for slot, free in schedule] == [
+        ("08:00", True), ("08:30", False), ("09:00", True), ("09:30", True)
+    ]
+    assert mongo.count(DoctorAvailability.Settings.name, "find") == 1
+    assert mongo.count(Appointment.Settings.name, "find") == 1
+    assert sum(mongo.queries.values()) == 2
+
+
+async def test_day_schedule_cached_availability(mongo):
+    await AvailabilityTemplate(
+        doctor_id=DOCTOR_ID, doctorName="Médico", diasSemana=[FECHA.weekday()],
+        horaInicio="08:00", horaFin="12:00", duracionCita=15, vigenteDesde=date(2026, 1, 1)
+    ).insert()
+    await day_schedule(DOCTOR_ID, FECHA)
+    mongo.reset_counts()
+
+    schedule = await day_schedule(DOCTOR_ID, FECHA)
+
+    assert len(schedule) == 16 and all(free for _, free in schedule)
+    # La disponibilidad sale de la caché: solo se leen las citas del día
+    assert mongo.queries == {(Appointment.Settings.name, "find"): 1}
+
+
+async def test_concurrent_bookings_one_wins(mongo):
+    fecha = datetime(2026, 3, 2, 9, 0)
+    results = await asyncio.gather(*(
+        reserve_slot(appointment(fecha, f"paciente-{n}"), 30)
+        for n in range(CONCURRENT_BOOKINGS)
+    ))
+
+    assert results.count(True) == 1
+    assert await Appointment.find({"doctor_id": DOCTOR_ID, "slotCells": {"$ne": None}}).count() == 1
+
+
+async def test_overlapping_booking_rejected(mongo):
+    assert await reserve_slot(appointment(datetime(2026, 3, 2, 9, 0)), 30)
+
+    assert not await reserve_slot(appointment(datetime(2026, 3, 2, 9, 0), "paciente-2"), 30)
+    assert await reserve_slot(appointment(datetime(2026, 3, 2, 9, 30), "paciente-3"), 30)
+
+
+@pytest.mark.skipif(not os.getenv("MONGODB_TEST_URI"), reason="mongomock no aplica índices únicos multikey")
+async def test_partial_overlap_rejected(mongo):
+    assert await reserve_slot(appointment(datetime(2026, 3, 2, 9, 0)), 30)
+
+    assert not await reserve_slot(appointment(datetime(2026, 3, 2, 9, 15), "paciente-2"), 30)
+    assert not await reserve_slot(appointment(datetime(2026, 3, 2, 8, 45), "paciente-3"), 30)
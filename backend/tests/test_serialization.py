@@ -0,0 +1,45 @@
+"""Serialización de listados sin revalidación (services/serialization)."""
+
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from schemas.appointment_schemas import AppointmentResponse
+from services.serialization import list_adapter, model_list_response, with_str_id
+
+
+def appointment_row(**fields) -> dict:
+    row = {
+        "_id": ObjectId(),
+        "patient_id": "paciente-1",
+        "patientName": "Paciente",
+        "doctor_id": "medico-1",
+        "doctorName": "Médico",
+        "fecha": datetime(2026, 3, 2, 9, 0),
+        "motivo": "Control",
+        "estado": "Programada",
+        "created_at": datetime(2026, 3, 1, 12, 0),
+        "updated_at": datetime(2026, 3, 1, 12, 0)
+    }
+    row.update(fields)
+    return row
+
+
+def test_list_response_matches_validated_output():
+    rows = [appointment_row(), appointment_row(notas="Ayuno de 8 horas")]
+    adapter = list_adapter(AppointmentResponse)
+    expected = adapter.dump_json(adapter.validate_python([with_str_id(dict(row)) for row in rows]))
+
+    response = model_list_response(AppointmentResponse, rows, {"X-Next-Cursor": "abc"})
+
+    assert json.loads(response.body) == json.loads(expected)
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert json.loads(response.body)[0]["notas"] is None
+
+
+def test_list_response_does_not_validate_rows():
+    # Las filas proyectadas se dan por buenas: un valor fuera de tipo no se coerciona ni falla
+    response = model_list_response(AppointmentResponse, [appointment_row(estado=None)])
+
+    assert json.loads(response.body)[0]["estado"] is None
@@ -0,0 +1,99 @@
+"""Línea de tiempo del paciente (services/timeline)."""
+
+from datetime import date, datetime
+
+from beanie import PydanticObjectId
+
+from models.models import Appointment, Consulta
+from services.consultas import build_record
+from services.timeline import TIMELINE_TYPES, merge_desc, page_timeline
+
+PATIENT_ID = "paciente-1"
+DAY = datetime(2026, 3, 2)
+
+
+async def entries(*items):
+    for item in items:
+        yield item
+
+
+async def test_merge_desc_orders_by_date_then_type_rank():
+    merged = merge_desc({
+        "vacuna": entries((DAY, 0, "vacuna")),
+        "cita": entries((datetime(2026, 3, 5), 2, "cita nueva"), (DAY, 1, "cita")),
+        "consulta": entries((DAY, 3, "consulta"), (datetime(2026, 1, 1), 4, "consulta vieja"))
+    })
+
+    assert [entry[2] async for _, entry in merged] == ["cita nueva", "cita", "consulta", "vacuna", "consulta vieja"]
+
+
+def consulta(index: int, fecha: date) -> Consulta:
+    return Consulta(
+        id=f"cons_{index}", fecha=fecha, motivo=f"Consulta {index}",
+        diagnostico="Diagnóstico", tratamiento="Tratamiento", notasMedico="Notas"
+    )
+
+
+async def seed(mongo):
+    """Eventos de varios tipos; varios comparten DAY (desempate por tipo y _id)."""
+    for motivo, fecha in (("Cita A", DAY), ("Cita B", DAY), ("Cita C", datetime(2026, 2, 1))):
+        # Sin slotCells (cita cancelada), cada una con otro médico: mongomock
+        # aplica el índice único parcial también fuera del filtro
+        await mongo.db[Appointment.Settings.name].insert_one({
+            "patient_id": PATIENT_ID, "doctor_id": f"medico-{motivo}", "fecha": fecha, "motivo": motivo
+        })
+    for index, fecha in ((1, DAY.date()), (2, DAY.date()), (3, date(2026, 1, 15))):
+        await build_record(consulta(index, fecha), PATIENT_ID).insert()
+    return {
+        "vacunas": [{"nombre": "Tétanos", "fecha": DAY}, {"nombre": "Influenza", "fecha": datetime(2026, 1, 20)}],
+        "proximaCita": {"fecha": DAY, "motivo": "Control", "medico": "Dra. Pérez"}
+    }
+
+
+async def all_pages(history, limit, embedded=()):
+    titles, cursor = [], None
+    while True:
+        eventos, cursor = await page_timeline(PATIENT_ID, history, TIMELINE_TYPES, limit, cursor, embedded)
+        titles += [evento["titulo"] for evento in eventos]
+        if not cursor:
+            return titles
+
+
+async def test_pages_resume_after_ties(mongo, keyring):
+    history = await seed(mongo)
+
+    single, _ = await page_timeline(PATIENT_ID, history, TIMELINE_TYPES, 100)
+    titles = [evento["titulo"] for evento in single]
+
+    # DAY: próxima cita, citas (_id DESC), consultas (_id DESC), vacuna
+    assert titles == [
+        "Control", "Cita B", "Cita A", "Consulta 2", "Consulta 1", "Tétanos",
+        "Cita C", "Influenza", "Consulta 3"
+    ]
+    for limit in (1, 2, 4):
+        assert await all_pages(history, limit) == titles
+
+
+async def test_corrupted_consultas_are_skipped(mongo, keyring):
+    record = build_record(consulta(1, DAY.date()), PATIENT_ID)
+    record.is_corrupted = True
+    await record.insert()
+
+    eventos, _ = await page_timeline(PATIENT_ID, {}, ["consulta"], 10)
+
+    assert eventos == []
+
+
+async def test_embedded_consultas_merge_with_collection(mongo, keyring):
+    history = await seed(mongo)
+    embedded = []
+    for index, fecha in ((4, DAY.date()), (5, date(2026, 1, 10))):
+        record = build_record(consulta(index, fecha), PATIENT_ID)
+        record.id = PydanticObjectId()
+        embedded.append(record)
+
+    titles = await all_pages(history, 2, embedded)
+
+    assert titles[3:6] == ["Consulta 4", "Consulta 2", "Consulta 1"]
+    assert titles[-1] == "Consulta 5"
+    assert len(titles) == 11
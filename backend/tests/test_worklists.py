@@ -0,0 +1,42 @@
+"""Listas de trabajo (services/worklists)."""
+
+from datetime import date, datetime
+
+from models.models import ClinicalRecord, DoctorPatientAssignment
+from services.worklists import page_follow_ups_due
+
+DESDE, HASTA = date(2026, 3, 1), date(2026, 3, 7)
+
+
+async def seed(mongo):
+    """Paciente asignado a medico-2 con un registro que escribió medico-1."""
+    await mongo.db[DoctorPatientAssignment.Settings.name].insert_one({
+        "doctor_id": "medico-2", "patient_id": "paciente-1", "asignado": True,
+        "assigned_at": datetime.utcnow(), "created_at": datetime.utcnow()
+    })
+    await mongo.db[ClinicalRecord.Settings.name].insert_one({
+        "patient_id": "paciente-1", "patientName": "Paciente", "patientCedula": "0102030405",
+        "doctor_id": "medico-1", "doctorName": "Dr. Autor", "fecha": datetime(2026, 2, 20),
+        "diagnostico": "Hipertensión",
+        "seguimiento": {"fecha": datetime(2026, 3, 3), "instrucciones": "Control de presión"}
+    })
+
+
+async def test_follow_ups_filter_by_assigned_doctor(mongo, keyring):
+    await seed(mongo)
+
+    assigned, _ = await page_follow_ups_due(DESDE, HASTA, 10, doctor_id="medico-2")
+    author, _ = await page_follow_ups_due(DESDE, HASTA, 10, doctor_id="medico-1")
+
+    assert [row["patient_id"] for row in assigned] == ["paciente-1"]
+    assert (assigned[0]["diagnostico"], assigned[0]["instrucciones"]) == ("Hipertensión", "Control de presión")
+    assert author == []
+
+
+async def test_follow_ups_without_clinical_text(mongo, keyring):
+    await seed(mongo)
+
+    rows, _ = await page_follow_ups_due(DESDE, HASTA, 10, include_clinical=False)
+
+    assert rows[0]["fechaSeguimiento"] == datetime(2026, 3, 3)
+    assert (rows[0]["diagnostico"], rows[0]["instrucciones"]) == (None, None)
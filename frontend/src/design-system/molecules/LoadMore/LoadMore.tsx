@@ -0,0 +1,42 @@
+import React from 'react';
+import { ChevronDown } from 'lucide-react';
+import { Button } from '../../atoms/Button/Button';
+import styles from './LoadMore.module.scss';
+
+type LoadMoreProps = {
+  shown: number;
+  total?: number | null;
+  hasMore: boolean;
+  onLoadMore: () => void;
+  loading?: boolean;
+};
+
+/**
+ * Pie de un listado paginado por cursor: cuántos elementos se muestran y
+ * botón para pedir la página siguiente (solo si el servidor indicó que hay más).
+ */
+export const LoadMore: React.FC<LoadMoreProps> = ({
+  shown,
+  total,
+  hasMore,
+  onLoadMore,
+  loading = false,
+}) => (
+  <div className={styles.container}>
+    <span className={styles.info}>
+      Mostrando <strong>{shown}</strong>
+      {total != null && <> de <strong>{total}</strong></>}
+    </span>
+    {hasMore && (
+      <Button
+        variant="outlined"
+        color="secondary"
+        onClick={onLoadMore}
+        disabled={loading}
+        startIcon={<ChevronDown size={16} />}
+      >
+        {loading ? 'Cargando...' : 'Cargar más'}
+      </Button>
+    )}
+  </div>
+);
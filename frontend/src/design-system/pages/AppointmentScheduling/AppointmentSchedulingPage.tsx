@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Calendar, Plus, Edit2, X, User, Stethoscope, Clock } from 'lucide-react';
 import { Button } from '../../atoms/Button/Button';
 import { Badge } from '../../atoms/Badge/Badge';
@@ -8,10 +8,13 @@ import { PageHeader } from '../../molecules/PageHeader/PageHeader';
 import { Table } from '../../molecules/Table/Table';
 import { Modal } from '../../atoms/Modal/Modal';
 import { NoResults } from '../../molecules/NoResults/NoResults';
+import { LoadMore } from '../../molecules/LoadMore/LoadMore';
+import { FilterSelect } from '../../atoms/FilterSelect/FilterSelect';
 import { LoadingSpinner } from '../../atoms/LoadingSpinner/LoadingSpinner';
 import { useAuth } from '../../../contexts/AuthContext';
 import { useToast } from '../../../hooks/useToast';
-import { PatientApiService, AppointmentApiService } from '../../../services/api';
+import { PatientApiService, AppointmentApiService, type AppointmentResponse } from '../../../services/api';
+import { APPOINTMENT_PERIODS, periodWindow } from '../../../utils/dateWindow';
 import styles from './AppointmentSchedulingPage.module.scss';
 
 type Patient = {
@@ -41,6 +44,29 @@ type Appointment = {
   updated_at: string;
 };
 
+const toAppointment = (apt: AppointmentResponse): Appointment => ({
+  id: apt.id,
+  patient_id: apt.patient_id,
+  patientName: apt.patientName,
+  doctor_id: apt.doctor_id,
+  doctorName: apt.doctorName,
+  fecha: apt.fecha,
+  motivo: apt.motivo,
+  estado: apt.estado,
+  notas: apt.notas ?? null,
+  created_at: apt.created_at,
+  updated_at: apt.updated_at
+});
+
+// Citas por página de la tabla
+const PAGE_SIZE = 50;
+
+// Pacientes que se ofrecen en el selector (los primeros que coinciden con la búsqueda)
+const PATIENT_OPTIONS_LIMIT = 20;
+
+// Espera tras la última tecla antes de buscar pacientes en el servidor
+const SEARCH_DEBOUNCE_MS = 300;
+
 type AppointmentForm = {
   patientId: string;
   doctorId: string;
@@ -52,8 +78,16 @@ export const AppointmentSchedulingPage: React.FC = () => {
   const { token, user } = useAuth();
   const toast = useToast();
   const [patients, setPatients] = useState<Patient[]>([]);
+  const [patientSearch, setPatientSearch] = useState('');
+  // Paciente elegido: sigue en el selector aunque una nueva búsqueda no lo incluya
+  const [selectedPatient, setSelectedPatient] = useState<Patient | null>(null);
   const [doctors, setDoctors] = useState<Doctor[]>([]);
   const [appointments, setAppointments] = useState<Appointment[]>([]);
+  const [period, setPeriod] = useState('mes');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Periodo vigente: descarta páginas que llegan después de cambiarlo
+  const activePeriod = useRef(period);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -70,7 +104,40 @@ export const AppointmentSchedulingPage: React.FC = () => {
   const [loadingAvailability, setLoadingAvailability] = useState(false);
   const [availability, setAvailability] = useState<string[]>([]);
 
+  // Primera página de citas del periodo elegido (los pacientes se buscan en el formulario)
+  const loadAppointments = async () => {
+    if (!token) return;
+    activePeriod.current = period;
+    const page = await AppointmentApiService.getAppointments(token, {
+      ...periodWindow(period),
+      limit: PAGE_SIZE,
+    });
+    if (activePeriod.current !== period) return;
+    setAppointments(page.items.map(toAppointment));
+    setNextCursor(page.nextCursor);
+  };
+
   // Load real data from API
+  useEffect(() => {
+    const loadDoctors = async () => {
+      if (!token) return;
+
+      try {
+        const doctorsRes = await AppointmentApiService.getDoctors(token);
+        setDoctors(doctorsRes.map(d => ({
+          id: d.id,
+          name: d.fullName,
+          specialization: d.especialidad || ''
+        })));
+      } catch (err) {
+        console.error('Error loading doctors:', err);
+        toast.error('Error al cargar los médicos');
+      }
+    };
+
+    loadDoctors();
+  }, [token]);
+
   useEffect(() => {
     const loadData = async () => {
       if (!token) {
@@ -82,53 +149,73 @@ export const AppointmentSchedulingPage: React.FC = () => {
       try {
         setLoading(true);
         setError(null);
+        await loadAppointments();
+      } catch (err) {
+        console.error('Error loading data:', err);
+        setError('Error al cargar los datos de citas');
+      } finally {
+        setLoading(false);
+      }
+    };
+
+    loadData();
+  }, [token, period]);
+
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    const requested = period;
+
+    try {
+      setLoadingMore(true);
+      const page = await AppointmentApiService.getAppointments(token, {
+        ...periodWindow(requested),
+        cursor: nextCursor,
+        limit: PAGE_SIZE,
+      });
+      if (activePeriod.current !== requested) return;
+      setAppointments((previous) => [...previous, ...page.items.map(toAppointment)]);
+      setNextCursor(page.nextCursor);
+    } catch (err: unknown) {
+      console.error('Error loading appointments:', err);
+      const errorObj = err as { detail?: string };
+      toast.error(errorObj.detail || 'Error al cargar más citas');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
-        // Cargar pacientes, médicos y citas en paralelo
-        const [patientsRes, doctorsRes, appointmentsRes] = await Promise.all([
-          PatientApiService.getPatientsList(token),
-          AppointmentApiService.getDoctors(token),
-          AppointmentApiService.getAppointments(token)
-        ]);
+  // Pacientes del selector: búsqueda por prefijo de nombre o cédula en el servidor
+  useEffect(() => {
+    if (!token || !showForm || editingId) return;
+    let cancelled = false;
 
-        // Mapear pacientes
-        setPatients(patientsRes.patients.map(p => ({
+    const timer = setTimeout(async () => {
+      try {
+        const data = await PatientApiService.getPatientsList(token, {
+          search: patientSearch,
+          limit: PATIENT_OPTIONS_LIMIT,
+        });
+        if (cancelled) return;
+        setPatients(data.patients.map(p => ({
           id: p.id,
           name: p.fullName,
           cedula: p.cedula,
-          phone: '' // El endpoint no devuelve teléfono actualmente
-        })));
-
-        // Mapear médicos
-        setDoctors(doctorsRes.map(d => ({
-          id: d.id,
-          name: d.fullName,
-          specialization: d.especialidad || ''
-        })));
-
-        // Mapear citas
-        setAppointments(appointmentsRes.map(apt => ({
-          id: apt.id,
-          patient_id: apt.patient_id,
-          patientName: apt.patientName,
-          doctor_id: apt.doctor_id,
-          doctorName: apt.doctorName,
-          fecha: apt.fecha,
-          motivo: apt.motivo,
-          estado: apt.estado,
-          notas: apt.notas ?? null,
-          created_at: apt.created_at,
-          updated_at: apt.updated_at
+          phone: p.telefonoContacto || ''
         })));
       } catch (err) {
-        console.error('Error loading data:', err);
-        setError('Error al cargar los datos de citas');
-      } finally {
-        setLoading(false);
+        if (!cancelled) console.error('Error searching patients:', err);
       }
+    }, patientSearch.trim() ? SEARCH_DEBOUNCE_MS : 0);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
     };
+  }, [token, showForm, editingId, patientSearch]);
 
-    loadData();
-  }, [token]);
+  const patientOptions = selectedPatient && !patients.some((p) => p.id === selectedPatient.id)
+    ? [selectedPatient, ...patients]
+    : patients;
 
   const handleAddAppointment = async () => {
     if (!formData.patientId || !formData.doctorId || !formData.date || !formData.time) {
@@ -141,7 +228,7 @@ export const AppointmentSchedulingPage: React.FC = () => {
       return;
     }
 
-    const patient = patients.find((p) => p.id === formData.patientId);
+    const patient = patientOptions.find((p) => p.id === formData.patientId);
     const doctor = doctors.find((d) => d.id === formData.doctorId);
 
     if (!patient || !doctor) {
@@ -156,21 +243,8 @@ export const AppointmentSchedulingPage: React.FC = () => {
           fecha: `${formData.date}T${formData.time}:00`
         });
         
-        // Recargar las citas para obtener los datos actualizados
-        const appointmentsRes = await AppointmentApiService.getAppointments(token);
-        setAppointments(appointmentsRes.map(apt => ({
-          id: apt.id,
-          patient_id: apt.patient_id,
-          patientName: apt.patientName,
-          doctor_id: apt.doctor_id,
-          doctorName: apt.doctorName,
-          fecha: apt.fecha,
-          motivo: apt.motivo,
-          estado: apt.estado,
-          notas: apt.notas ?? null,
-          created_at: apt.created_at,
-          updated_at: apt.updated_at
-        })));
+        // Recargar la primera página del periodo para obtener los datos actualizados
+        await loadAppointments();
         
         setEditingId(null);
       } else {
@@ -182,24 +256,13 @@ export const AppointmentSchedulingPage: React.FC = () => {
           motivo: 'Consulta médica'
         });
         
-        const newAppointment: Appointment = {
-          id: newApt.id,
-          patient_id: newApt.patient_id,
-          patientName: newApt.patientName,
-          doctor_id: newApt.doctor_id,
-          doctorName: newApt.doctorName,
-          fecha: newApt.fecha,
-          motivo: newApt.motivo,
-          estado: newApt.estado,
-          notas: newApt.notas ?? null,
-          created_at: newApt.created_at,
-          updated_at: newApt.updated_at
-        };
-        setAppointments([...appointments, newAppointment]);
+        setAppointments([...appointments, toAppointment(newApt)]);
       }
 
       toast.success(editingId ? 'Cita actualizada exitosamente' : 'Cita creada exitosamente');
       setFormData({ patientId: '', doctorId: '', date: '', time: '' });
+      setPatientSearch('');
+      setSelectedPatient(null);
       setShowForm(false);
       setError(null);
     } catch (err: unknown) {
@@ -219,6 +282,8 @@ export const AppointmentSchedulingPage: React.FC = () => {
       date: date,
       time: time,
     });
+    // El paciente no cambia al editar: basta con la opción de la propia cita
+    setSelectedPatient({ id: apt.patient_id, name: apt.patientName, cedula: '', phone: '' });
     setEditingId(apt.id);
     setShowForm(true);
   };
@@ -249,6 +314,8 @@ export const AppointmentSchedulingPage: React.FC = () => {
 
   const handleCancel = () => {
     setFormData({ patientId: '', doctorId: '', date: '', time: '' });
+    setPatientSearch('');
+    setSelectedPatient(null);
     setEditingId(null);
     setShowForm(false);
     setError(null);
@@ -333,6 +400,13 @@ export const AppointmentSchedulingPage: React.FC = () => {
           >
             {showForm ? 'Cerrar' : 'Nueva Cita'}
           </Button>
+          <FilterSelect
+            id="appointments-period"
+            value={period}
+            onChange={setPeriod}
+            placeholder="Periodo"
+            options={APPOINTMENT_PERIODS}
+          />
         </div>
 
         {/* Error Alert */}
@@ -360,17 +434,30 @@ export const AppointmentSchedulingPage: React.FC = () => {
                       <User size={16} className={styles.labelIcon} />
                       Paciente
                     </label>
+                    {!editingId && (
+                      <input
+                        id="patient-search"
+                        type="search"
+                        placeholder="Buscar por nombre o cédula..."
+                        value={patientSearch}
+                        onChange={(e) => setPatientSearch(e.target.value)}
+                        className={styles.input}
+                      />
+                    )}
                     <select
                       id="patient"
                       value={formData.patientId}
-                      onChange={(e) => setFormData({ ...formData, patientId: e.target.value })}
+                      onChange={(e) => {
+                        setFormData({ ...formData, patientId: e.target.value });
+                        setSelectedPatient(patientOptions.find((p) => p.id === e.target.value) ?? null);
+                      }}
                       className={styles.select}
                       disabled={!!editingId}
                     >
                       <option value="">Selecciona un paciente</option>
-                      {patients.map((p) => (
+                      {patientOptions.map((p) => (
                         <option key={p.id} value={p.id}>
-                          {p.name} ({p.cedula})
+                          {p.cedula ? `${p.name} (${p.cedula})` : p.name}
                         </option>
                       ))}
                     </select>
@@ -549,7 +636,13 @@ export const AppointmentSchedulingPage: React.FC = () => {
             ]}
             data={appointments}
             rowKey="id"
-            emptyMessage="No hay citas agendadas"
+            emptyMessage="No hay citas agendadas en este periodo"
+          />
+          <LoadMore
+            shown={appointments.length}
+            hasMore={!!nextCursor}
+            onLoadMore={handleLoadMore}
+            loading={loadingMore}
           />
         </div>
       </div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import styles from './DoctorAppointmentsPage.module.scss';
 import { Container } from '../../atoms/Container/Container';
 import { Calendar, Clock, User, RefreshCw, FileText, CheckCircle, X } from 'lucide-react';
@@ -11,9 +11,14 @@ import { PageHeader } from '../../molecules/PageHeader/PageHeader';
 import { Table, type TableColumn } from '../../molecules/Table/Table';
 import { TableToolbar } from '../../molecules/TableToolbar/TableToolbar';
 import { FilterSelect } from '../../atoms/FilterSelect/FilterSelect';
+import { LoadMore } from '../../molecules/LoadMore/LoadMore';
 import { useAuth } from '../../../contexts/AuthContext';
 import { DoctorApiService, type AppointmentResponse } from '../../../services/api';
 import { useNavigate } from 'react-router-dom';
+import { APPOINTMENT_PERIODS, periodWindow } from '../../../utils/dateWindow';
+
+// Citas por página
+const PAGE_SIZE = 50;
 
 export const DoctorAppointmentsPage: React.FC = () => {
   const { token } = useAuth();
@@ -22,6 +27,11 @@ export const DoctorAppointmentsPage: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [statusFilter, setStatusFilter] = useState<string>('');
+  const [period, setPeriod] = useState('semana');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Filtros vigentes: descarta páginas que llegan después de cambiarlos
+  const activeFilters = useRef('');
 
   // Modal para completar cita
   const [showCompleteModal, setShowCompleteModal] = useState(false);
@@ -29,19 +39,51 @@ export const DoctorAppointmentsPage: React.FC = () => {
   const [completionNotes, setCompletionNotes] = useState('');
   const [completing, setCompleting] = useState(false);
 
+  // Primera página de citas del periodo y estado elegidos
   const loadAppointments = async () => {
     if (!token) return;
+    const filters = `${period}|${statusFilter}`;
+    activeFilters.current = filters;
     setLoading(true);
     setError(null);
 
     try {
-      const data = await DoctorApiService.getMyAppointments(token, statusFilter || undefined);
-      setAppointments(data);
+      const page = await DoctorApiService.getMyAppointments(token, {
+        ...periodWindow(period),
+        estado: statusFilter || undefined,
+        limit: PAGE_SIZE,
+      });
+      if (activeFilters.current !== filters) return;
+      setAppointments(page.items);
+      setNextCursor(page.nextCursor);
+    } catch (err: unknown) {
+      const apiError = err as { detail?: string };
+      setError(apiError?.detail || 'Error al cargar citas');
+    } finally {
+      if (activeFilters.current === filters) setLoading(false);
+    }
+  };
+
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    const filters = `${period}|${statusFilter}`;
+
+    setLoadingMore(true);
+    try {
+      const page = await DoctorApiService.getMyAppointments(token, {
+        ...periodWindow(period),
+        estado: statusFilter || undefined,
+        cursor: nextCursor,
+        limit: PAGE_SIZE,
+      });
+      if (activeFilters.current !== filters) return;
+      setAppointments((previous) => [...previous, ...page.items]);
+      setNextCursor(page.nextCursor);
     } catch (err: unknown) {
       const apiError = err as { detail?: string };
       setError(apiError?.detail || 'Error al cargar citas');
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -72,7 +114,7 @@ export const DoctorAppointmentsPage: React.FC = () => {
 
   useEffect(() => {
     loadAppointments();
-  }, [token, statusFilter]);
+  }, [token, statusFilter, period]);
 
   const formatDate = (dateStr: string) => {
     const date = new Date(dateStr);
@@ -173,20 +215,30 @@ export const DoctorAppointmentsPage: React.FC = () => {
 
         <TableToolbar
           left={
-            <FilterSelect
-              id="status-filter"
-              value={statusFilter}
-              onChange={setStatusFilter}
-              placeholder="Todas las citas"
-              themeColor="var(--role-doctor-color)"
-              options={[
-                { value: '', label: 'Todas las citas' },
-                { value: 'Programada', label: 'Programadas' },
-                { value: 'Completada', label: 'Completadas' },
-                { value: 'Cancelada', label: 'Canceladas' },
-                { value: 'No Asistió', label: 'No Asistió' },
-              ]}
-            />
+            <>
+              <FilterSelect
+                id="period-filter"
+                value={period}
+                onChange={setPeriod}
+                placeholder="Periodo"
+                themeColor="var(--role-doctor-color)"
+                options={APPOINTMENT_PERIODS}
+              />
+              <FilterSelect
+                id="status-filter"
+                value={statusFilter}
+                onChange={setStatusFilter}
+                placeholder="Todas las citas"
+                themeColor="var(--role-doctor-color)"
+                options={[
+                  { value: '', label: 'Todas las citas' },
+                  { value: 'Programada', label: 'Programadas' },
+                  { value: 'Completada', label: 'Completadas' },
+                  { value: 'Cancelada', label: 'Canceladas' },
+                  { value: 'No Asistió', label: 'No Asistió' },
+                ]}
+              />
+            </>
           }
           right={
             <Button
@@ -212,7 +264,7 @@ export const DoctorAppointmentsPage: React.FC = () => {
           />
         ) : appointments.length === 0 ? (
           <NoResults
-            title={`No tienes citas${statusFilter ? ` con estado "${statusFilter}"` : ''}`}
+            title={`No tienes citas${statusFilter ? ` con estado "${statusFilter}"` : ''} en este periodo`}
             icon={<Calendar size={48} />}
           />
         ) : (
@@ -223,6 +275,12 @@ export const DoctorAppointmentsPage: React.FC = () => {
               emptyMessage="No hay citas para mostrar"
               rowKey="id"
             />
+            <LoadMore
+              shown={appointments.length}
+              hasMore={!!nextCursor}
+              onLoadMore={handleLoadMore}
+              loading={loadingMore}
+            />
           </div>
         )}
 
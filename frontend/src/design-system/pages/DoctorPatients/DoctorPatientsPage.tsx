@@ -10,7 +10,8 @@ import { useNavigate } from 'react-router-dom';
 import { Table, type TableColumn } from '../../molecules/Table/Table';
 import { TableToolbar } from '../../molecules/TableToolbar/TableToolbar';
 import { PageHeader } from '../../molecules/PageHeader/PageHeader';
-import { DoctorApiService } from '../../../services/api';
+import { LoadMore } from '../../molecules/LoadMore/LoadMore';
+import { DoctorApiService, type DoctorAssignedPatient } from '../../../services/api';
 import { useAuth } from '../../../contexts/AuthContext';
 import { useToast } from '../../../hooks/useToast';
 
@@ -24,9 +25,25 @@ type PacienteAsignado = {
   diagnosticos: number;
 };
 
+// Pacientes por página
+const PAGE_SIZE = 50;
+
+// Mapear la respuesta del backend al formato esperado
+const toPaciente = (p: DoctorAssignedPatient): PacienteAsignado => ({
+  id: p.id,
+  fullName: p.full_name,
+  email: p.email,
+  cedula: p.cedula,
+  fechaNacimiento: p.fecha_nacimiento || '',
+  ultimaConsulta: p.ultima_consulta || null,
+  diagnosticos: p.diagnosticos || 0,
+});
+
 export const DoctorPatientsPage: React.FC = () => {
   const [pacientes, setPacientes] = useState<PacienteAsignado[]>([]);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
   const { token } = useAuth();
   const { error, success } = useToast();
@@ -95,7 +112,7 @@ export const DoctorPatientsPage: React.FC = () => {
     },
   ];
 
-  // Cargar pacientes asignados desde el backend
+  // Cargar la primera página de pacientes asignados desde el backend
   const loadPacientes = async () => {
     if (!token) {
       error('No se encontró token de autenticación');
@@ -103,18 +120,9 @@ export const DoctorPatientsPage: React.FC = () => {
     }
     setLoading(true);
     try {
-      const response = await DoctorApiService.getMyPatients(token);
-      // Mapear la respuesta del backend al formato esperado
-      const mappedPacientes: PacienteAsignado[] = response.pacientes.map((p) => ({
-        id: p.id,
-        fullName: p.full_name,
-        email: p.email,
-        cedula: p.cedula,
-        fechaNacimiento: p.fecha_nacimiento || '',
-        ultimaConsulta: p.ultima_consulta || null,
-        diagnosticos: p.diagnosticos || 0,
-      }));
-      setPacientes(mappedPacientes);
+      const response = await DoctorApiService.getMyPatients(token, { limit: PAGE_SIZE });
+      setPacientes(response.pacientes.map(toPaciente));
+      setNextCursor(response.next_cursor);
       success('Pacientes cargados exitosamente');
     } catch (err) {
       console.error('Error loading pacientes:', err);
@@ -124,6 +132,21 @@ export const DoctorPatientsPage: React.FC = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await DoctorApiService.getMyPatients(token, { cursor: nextCursor, limit: PAGE_SIZE });
+      setPacientes((previous) => [...previous, ...response.pacientes.map(toPaciente)]);
+      setNextCursor(response.next_cursor);
+    } catch (err) {
+      console.error('Error loading pacientes:', err);
+      error('Error al cargar más pacientes. Por favor, intente nuevamente.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     loadPacientes();
   }, []);
@@ -180,12 +203,20 @@ export const DoctorPatientsPage: React.FC = () => {
             icon={<Users size={48} />}
           />
         ) : (
-          <Table
-            columns={columns}
-            data={pacientes}
-            emptyMessage="No hay pacientes para mostrar"
-            rowKey="id"
-          />
+          <>
+            <Table
+              columns={columns}
+              data={pacientes}
+              emptyMessage="No hay pacientes para mostrar"
+              rowKey="id"
+            />
+            <LoadMore
+              shown={pacientes.length}
+              hasMore={!!nextCursor}
+              onLoadMore={handleLoadMore}
+              loading={loadingMore}
+            />
+          </>
         )}
       </main>
     </Container>
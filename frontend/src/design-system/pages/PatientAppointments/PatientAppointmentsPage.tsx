@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import styles from './PatientAppointmentsPage.module.scss';
 import { Container } from '../../atoms/Container/Container';
 import { useNavigate } from 'react-router-dom';
@@ -8,7 +8,13 @@ import { Button } from '../../atoms/Button/Button';
 import { LoadingSpinner } from '../../atoms/LoadingSpinner/LoadingSpinner';
 import { PageHeader } from '../../molecules/PageHeader/PageHeader';
 import { NoResults } from '../../molecules/NoResults/NoResults';
+import { LoadMore } from '../../molecules/LoadMore/LoadMore';
+import { FilterSelect } from '../../atoms/FilterSelect/FilterSelect';
 import { PatientApiService, type AppointmentResponse } from '../../../services/api';
+import { APPOINTMENT_PERIODS, periodWindow } from '../../../utils/dateWindow';
+
+// Citas por página
+const PAGE_SIZE = 20;
 
 export const PatientAppointmentsPage: React.FC = () => {
   const navigate = useNavigate();
@@ -17,6 +23,11 @@ export const PatientAppointmentsPage: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [appointments, setAppointments] = useState<AppointmentResponse[]>([]);
   const [error, setError] = useState<string | null>(null);
+  const [period, setPeriod] = useState('trimestre');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Periodo vigente: descarta páginas que llegan después de cambiarlo
+  const activePeriod = useRef(period);
 
   useEffect(() => {
     const loadAppointments = async () => {
@@ -28,10 +39,15 @@ export const PatientAppointmentsPage: React.FC = () => {
 
       setLoading(true);
       setError(null);
+      activePeriod.current = period;
 
       try {
-        const data = await PatientApiService.getMyAppointments(token);
-        setAppointments(data);
+        const page = await PatientApiService.getMyAppointments(token, {
+          ...periodWindow(period),
+          limit: PAGE_SIZE,
+        });
+        setAppointments(page.items);
+        setNextCursor(page.nextCursor);
       } catch (err: unknown) {
         console.error('Error loading appointments:', err);
         const errorObj = err as { status?: number; detail?: string; message?: string };
@@ -49,7 +65,30 @@ export const PatientAppointmentsPage: React.FC = () => {
     };
 
     loadAppointments();
-  }, [navigate, token]);
+  }, [navigate, token, period]);
+
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    const requested = period;
+
+    try {
+      setLoadingMore(true);
+      const page = await PatientApiService.getMyAppointments(token, {
+        ...periodWindow(requested),
+        cursor: nextCursor,
+        limit: PAGE_SIZE,
+      });
+      if (activePeriod.current !== requested) return;
+      setAppointments((previous) => [...previous, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err: unknown) {
+      console.error('Error loading appointments:', err);
+      const errorObj = err as { detail?: string; message?: string };
+      setError(errorObj.detail || errorObj.message || 'Error al cargar las citas');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const getStatusBadge = (estado: string) => {
     const statusMap: Record<string, { label: string; className: string }> = {
@@ -83,6 +122,19 @@ export const PatientAppointmentsPage: React.FC = () => {
           subtitle="Historial de citas médicas programadas"
         />
 
+        {!error && (
+          <div className={styles.periodFilter}>
+            <FilterSelect
+              id="appointments-period"
+              value={period}
+              onChange={setPeriod}
+              placeholder="Periodo"
+              options={APPOINTMENT_PERIODS}
+              disabled={loading}
+            />
+          </div>
+        )}
+
         {loading && (
           <LoadingSpinner
             variant="bouncing-role"
@@ -111,7 +163,7 @@ export const PatientAppointmentsPage: React.FC = () => {
         {!loading && !error && appointments.length === 0 && (
           <NoResults
             title="Sin Citas Registradas"
-            description="Aún no tienes citas médicas agendadas. Contacta con tu centro médico para agendar una cita."
+            description="No tienes citas médicas en este periodo. Contacta con tu centro médico para agendar una cita."
             icon={<Calendar size={48} />}
             fullHeight
           />
@@ -124,7 +176,7 @@ export const PatientAppointmentsPage: React.FC = () => {
                 <Calendar size={24} />
                 <div className={styles.statContent}>
                   <span className={styles.statValue}>{appointments.length}</span>
-                  <span className={styles.statLabel}>Total de citas</span>
+                  <span className={styles.statLabel}>Citas mostradas</span>
                 </div>
               </div>
               <div className={styles.statItem}>
@@ -194,6 +246,13 @@ export const PatientAppointmentsPage: React.FC = () => {
                 </div>
               ))}
             </div>
+
+            <LoadMore
+              shown={appointments.length}
+              hasMore={!!nextCursor}
+              onLoadMore={handleLoadMore}
+              loading={loadingMore}
+            />
           </div>
         )}
       </main>
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useAuth } from '../../../contexts/AuthContext';
 import { PatientApiService, type PatientInfo } from '../../../services/api';
 import styles from './PatientListPage.module.scss';
@@ -9,15 +9,26 @@ import { Container } from '../../atoms/Container/Container';
 import { PageHeader } from '../../molecules/PageHeader/PageHeader';
 import { Table, type TableColumn } from '../../molecules/Table/Table';
 import { NoResults } from '../../molecules/NoResults/NoResults';
+import { LoadMore } from '../../molecules/LoadMore/LoadMore';
 import { LoadingSpinner } from '../../atoms/LoadingSpinner/LoadingSpinner';
 
+// Pacientes por página del directorio
+const PAGE_SIZE = 50;
+
+// Espera tras la última tecla antes de buscar en el servidor
+const SEARCH_DEBOUNCE_MS = 300;
+
 export const PatientListPage: React.FC = () => {
   const { token, user } = useAuth();
   const [patients, setPatients] = useState<PatientInfo[]>([]);
-  const [filteredPatients, setFilteredPatients] = useState<PatientInfo[]>([]);
+  const [total, setTotal] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [searchQuery, setSearchQuery] = useState('');
+  // Búsqueda vigente: descarta páginas que llegan después de cambiarla
+  const activeQuery = useRef('');
 
   // Definir columnas de la tabla
   const columns: TableColumn<PatientInfo>[] = [
@@ -51,35 +62,59 @@ export const PatientListPage: React.FC = () => {
     },
   ];
 
+  // Primera página de la búsqueda (prefijo de nombre o cédula en el servidor)
   useEffect(() => {
-    const fetchPatients = async () => {
-      if (!token) return;
-      
+    if (!token) return;
+    let cancelled = false;
+    activeQuery.current = searchQuery;
+
+    const timer = setTimeout(async () => {
       try {
-        setLoading(true);
         setError(null);
-        const data = await PatientApiService.getPatientsList(token);
+        const data = await PatientApiService.getPatientsList(token, {
+          search: searchQuery,
+          limit: PAGE_SIZE,
+          includeTotal: true,
+        });
+        if (cancelled) return;
         setPatients(data.patients || []);
-        setFilteredPatients(data.patients || []);
+        setTotal(data.total ?? null);
+        setNextCursor(data.next_cursor ?? null);
       } catch (err: any) {
+        if (cancelled) return;
         console.error('Error al obtener pacientes:', err);
         setError(err.detail || 'Error al cargar la lista de pacientes');
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
+    }, searchQuery.trim() ? SEARCH_DEBOUNCE_MS : 0);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
     };
+  }, [token, searchQuery]);
 
-    fetchPatients();
-  }, [token]);
+  const handleLoadMore = async () => {
+    if (!token || !nextCursor) return;
+    const query = searchQuery;
 
-  const handleSearch = (query: string) => {
-    setSearchQuery(query);
-    const filtered = patients.filter(patient => 
-      patient.fullName.toLowerCase().includes(query.toLowerCase()) ||
-      patient.email.toLowerCase().includes(query.toLowerCase()) ||
-      patient.cedula.includes(query)
-    );
-    setFilteredPatients(filtered);
+    try {
+      setLoadingMore(true);
+      const data = await PatientApiService.getPatientsList(token, {
+        search: query,
+        cursor: nextCursor,
+        limit: PAGE_SIZE,
+      });
+      if (activeQuery.current !== query) return;
+      setPatients((previous) => [...previous, ...(data.patients || [])]);
+      setNextCursor(data.next_cursor ?? null);
+    } catch (err: any) {
+      console.error('Error al obtener pacientes:', err);
+      setError(err.detail || 'Error al cargar la lista de pacientes');
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   if (loading) {
@@ -115,27 +150,34 @@ export const PatientListPage: React.FC = () => {
         <PageHeader 
           title="Listado de Pacientes" 
           icon={<Users size={32} />}
-          subtitle={`Total de pacientes: ${patients.length}`}
+          subtitle={`${searchQuery.trim() ? 'Pacientes encontrados' : 'Total de pacientes'}: ${total ?? patients.length}`}
         />
 
         <div className={styles.searchSection}>
           <Input
             id="patient-search"
             label=""
-            placeholder="Buscar por nombre, email o cédula..."
+            placeholder="Buscar por nombre o cédula..."
             value={searchQuery}
-            onChange={(value) => handleSearch(value)}
+            onChange={(value) => setSearchQuery(value)}
             icon={<Search size={20} />}
           />
         </div>
 
-        {filteredPatients.length > 0 ? (
+        {patients.length > 0 ? (
           <div className={styles.tableWrapper}>
             <Table<PatientInfo>
               columns={columns}
-              data={filteredPatients}
+              data={patients}
               emptyMessage="No se encontraron pacientes"
             />
+            <LoadMore
+              shown={patients.length}
+              total={total}
+              hasMore={!!nextCursor}
+              onLoadMore={handleLoadMore}
+              loading={loadingMore}
+            />
           </div>
         ) : (
           <NoResults 
@@ -280,6 +280,7 @@ export interface PatientInfo {
 
 export interface PatientListResponse {
   total?: number;
+  next_cursor?: string | null;
   patients: PatientInfo[];
 }
 
@@ -310,45 +311,35 @@ export class PatientApiService {
   }
 
   /**
-   * Obtener citas del paciente autenticado
+   * Página de citas del paciente autenticado (más recientes primero)
    */
-  static async getMyAppointments(token: string, estado?: string): Promise<AppointmentResponse[]> {
-    const params = estado ? `?estado=${estado}` : '';
-    const response = await fetch(`${API_BASE_URL}/api/patient/my-appointments${params}`, {
-      method: 'GET',
-      headers: {
-        'Authorization': `Bearer ${token}`,
-        'Content-Type': 'application/json',
-      },
-    });
-
-    if (!response.ok) {
-      const error = await response.json();
-      throw error;
-    }
-
-    return response.json();
+  static async getMyAppointments(token: string, options?: AppointmentPageOptions): Promise<AppointmentPage> {
+    const params = new URLSearchParams({ include_notas: 'true' });
+    return fetchAppointmentPage(`${API_BASE_URL}/api/patient/my-appointments`, token, params, options);
   }
 
   /**
-   * Obtener lista de pacientes (para Secretario/Admin)
+   * Página del directorio de pacientes (para Secretario/Admin).
+   * `search` filtra por prefijo de nombre o cédula; para la página
+   * siguiente se pasa como `cursor` el `next_cursor` de la respuesta.
    */
-  static async getPatientsList(token: string): Promise<PatientListResponse> {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/paciente/listado-pacientes`, {
-        method: 'GET',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json',
-        },
-      });
-
-      if (!response.ok) {
-        const error = await response.json();
-        throw error;
-      }
+  static async getPatientsList(
+    token: string,
+    options?: { search?: string; cursor?: string | null; limit?: number; includeTotal?: boolean }
+  ): Promise<PatientListResponse> {
+    const params = new URLSearchParams();
+    const search = options?.search?.trim();
+    if (search) params.append('search', search);
+    if (options?.cursor) params.append('cursor', options.cursor);
+    if (options?.limit) params.append('limit', options.limit.toString());
+    if (options?.includeTotal) params.append('include_total', 'true');
+    const queryString = params.toString();
 
-      return response.json();
+    try {
+      return await authenticatedFetch(
+        `${API_BASE_URL}/api/paciente/listado-pacientes${queryString ? `?${queryString}` : ''}`,
+        token
+      );
     } catch (error) {
       console.error('Error fetching patients list:', error);
       throw error;
@@ -374,6 +365,23 @@ export interface AppointmentResponse {
   updated_at: string;
 }
 
+/**
+ * Filtros de un listado de citas: `desde`/`hasta` (YYYY-MM-DD, inclusive)
+ * acotan la ventana que muestra la vista; `cursor` pide la página siguiente.
+ */
+export interface AppointmentPageOptions {
+  estado?: string;
+  desde?: string;
+  hasta?: string;
+  cursor?: string | null;
+  limit?: number;
+}
+
+export interface AppointmentPage {
+  items: AppointmentResponse[];
+  nextCursor: string | null;
+}
+
 export interface CreateAppointmentRequest {
   patient_id: string;
   doctor_id: string;
@@ -448,6 +456,44 @@ export interface DoctorAssignedPatient {
   condicionesCronicas?: string[];
 }
 
+export interface DoctorPatientsResponse {
+  pacientes: DoctorAssignedPatient[];
+  next_cursor: string | null;
+}
+
+/**
+ * Pide una sola página de un listado de citas con los filtros de `options`;
+ * el cursor siguiente viaja en la cabecera X-Next-Cursor.
+ */
+async function fetchAppointmentPage(
+  url: string,
+  token: string,
+  params: URLSearchParams,
+  options?: AppointmentPageOptions
+): Promise<AppointmentPage> {
+  if (options?.estado) params.append('estado', options.estado);
+  if (options?.desde) params.append('desde', options.desde);
+  if (options?.hasta) params.append('hasta', options.hasta);
+  if (options?.cursor) params.append('cursor', options.cursor);
+  if (options?.limit) params.append('limit', options.limit.toString());
+  const queryString = params.toString();
+
+  const response = await fetch(`${url}${queryString ? `?${queryString}` : ''}`, {
+    method: 'GET',
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Content-Type': 'application/json',
+    },
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw error;
+  }
+
+  return { items: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+}
+
 // Helper function for authenticated requests
 async function authenticatedFetch(url: string, token: string, options?: RequestInit) {
   const response = await fetch(url, {
@@ -483,29 +529,25 @@ export class AppointmentApiService {
   }
 
   /**
-   * Listar citas con filtros opcionales (solo Secretarios)
+   * Página de citas con filtros opcionales, por fecha ascendente (solo Secretarios)
    */
   static async listAppointments(
     token: string,
-    filters?: { patient_id?: string; doctor_id?: string; estado?: string }
-  ): Promise<AppointmentResponse[]> {
+    filters?: AppointmentPageOptions & { patient_id?: string; doctor_id?: string }
+  ): Promise<AppointmentPage> {
     const params = new URLSearchParams();
     if (filters?.patient_id) params.append('patient_id', filters.patient_id);
     if (filters?.doctor_id) params.append('doctor_id', filters.doctor_id);
-    if (filters?.estado) params.append('estado', filters.estado);
-
-    const queryString = params.toString();
-    const url = `${API_BASE_URL}/api/appointments${queryString ? `?${queryString}` : ''}`;
+    params.append('include_notas', 'true');
 
-    return authenticatedFetch(url, token);
+    return fetchAppointmentPage(`${API_BASE_URL}/api/appointments`, token, params, filters);
   }
 
   /**
-   * Listar citas del doctor autenticado (solo Médicos)
+   * Página de citas del doctor autenticado, por fecha ascendente (solo Médicos)
    */
-  static async getDoctorAppointments(token: string, estado?: string): Promise<AppointmentResponse[]> {
-    const params = estado ? `?estado=${estado}` : '';
-    return authenticatedFetch(`${API_BASE_URL}/api/doctor/my-appointments${params}`, token);
+  static async getDoctorAppointments(token: string, options?: AppointmentPageOptions): Promise<AppointmentPage> {
+    return fetchAppointmentPage(`${API_BASE_URL}/api/doctor/my-appointments`, token, new URLSearchParams(), options);
   }
 
   /**
@@ -559,7 +601,10 @@ export class AppointmentApiService {
   /**
    * Alias para listAppointments (compatibilidad)
    */
-  static async getAppointments(token: string, filters?: { patient_id?: string; doctor_id?: string; estado?: string }): Promise<AppointmentResponse[]> {
+  static async getAppointments(
+    token: string,
+    filters?: AppointmentPageOptions & { patient_id?: string; doctor_id?: string }
+  ): Promise<AppointmentPage> {
     return this.listAppointments(token, filters);
   }
 
@@ -696,11 +741,10 @@ export class DoctorApiService {
   }
 
   /**
-   * Obtener citas del médico actual
+   * Página de citas del médico actual, por fecha ascendente
    */
-  static async getMyAppointments(token: string, estado?: string): Promise<AppointmentResponse[]> {
-    const params = estado ? `?estado=${estado}` : '';
-    return authenticatedFetch(`${API_BASE_URL}/api/doctor/my-appointments${params}`, token);
+  static async getMyAppointments(token: string, options?: AppointmentPageOptions): Promise<AppointmentPage> {
+    return fetchAppointmentPage(`${API_BASE_URL}/api/doctor/my-appointments`, token, new URLSearchParams(), options);
   }
 
   /**
@@ -714,10 +758,22 @@ export class DoctorApiService {
   }
 
   /**
-   * Obtener pacientes asignados al médico
+   * Página de pacientes asignados al médico; para la siguiente se pasa
+   * como `cursor` el `next_cursor` de la respuesta
    */
-  static async getMyPatients(token: string): Promise<{ pacientes: DoctorAssignedPatient[] }> {
-    return authenticatedFetch(`${API_BASE_URL}/api/doctor/my-patients`, token);
+  static async getMyPatients(
+    token: string,
+    options?: { cursor?: string | null; limit?: number }
+  ): Promise<DoctorPatientsResponse> {
+    const params = new URLSearchParams();
+    if (options?.cursor) params.append('cursor', options.cursor);
+    if (options?.limit) params.append('limit', options.limit.toString());
+    const queryString = params.toString();
+
+    return authenticatedFetch(
+      `${API_BASE_URL}/api/doctor/my-patients${queryString ? `?${queryString}` : ''}`,
+      token
+    );
   }
 
   /**
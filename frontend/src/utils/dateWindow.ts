@@ -0,0 +1,46 @@
+/**
+ * Ventanas de fechas para los listados de citas (filtros desde/hasta de la API)
+ */
+
+export interface DateWindow {
+  desde: string;
+  hasta: string;
+}
+
+/**
+ * Fecha local en formato YYYY-MM-DD (toISOString usa UTC y puede cambiar el día)
+ */
+export const toISODate = (date: Date): string => {
+  const month = String(date.getMonth() + 1).padStart(2, '0');
+  const day = String(date.getDate()).padStart(2, '0');
+  return `${date.getFullYear()}-${month}-${day}`;
+};
+
+/**
+ * Ventana relativa a hoy: desde `offsetDesde` hasta `offsetHasta` días (ambos inclusive)
+ */
+export const dateWindow = (offsetDesde: number, offsetHasta: number): DateWindow => {
+  const desde = new Date();
+  desde.setDate(desde.getDate() + offsetDesde);
+  const hasta = new Date();
+  hasta.setDate(hasta.getDate() + offsetHasta);
+  return { desde: toISODate(desde), hasta: toISODate(hasta) };
+};
+
+/**
+ * Periodos que ofrecen las vistas de citas
+ */
+export const APPOINTMENT_PERIODS: Array<{ value: string; label: string; window: () => DateWindow }> = [
+  { value: 'hoy', label: 'Hoy', window: () => dateWindow(0, 0) },
+  { value: 'semana', label: 'Próximos 7 días', window: () => dateWindow(0, 6) },
+  { value: 'mes', label: 'Próximos 30 días', window: () => dateWindow(0, 29) },
+  { value: 'trimestre', label: 'Próximos 3 meses', window: () => dateWindow(0, 89) },
+  { value: 'ultimoMes', label: 'Últimos 30 días', window: () => dateWindow(-29, 0) },
+  { value: 'ultimoAnio', label: 'Último año', window: () => dateWindow(-364, 0) },
+];
+
+/**
+ * Ventana del periodo elegido (el primero si el valor no existe)
+ */
+export const periodWindow = (period: string): DateWindow =>
+  (APPOINTMENT_PERIODS.find((option) => option.value === period) ?? APPOINTMENT_PERIODS[0]).window();